@@ -6,12 +6,17 @@ def viewer_request(event, context):
     Handler to run on viewer_request events which:
       * authorizes the http method based on the Method querystirng parameter
       * authorized methods default to read-only methods (GET, HEAD) if not specified
+      * urls signed with a custom policy are always read-only, as their policy may cover many
+        objects with a wildcard, and so does not cover the Method querystring parameter
     """
     # https://docs.aws.amazon.com/AmazonCloudFront/latest/DeveloperGuide/lambda-event-structure.html
     request = event['Records'][0]['cf']['request']
     http_method = request['method']
     parsed_qs = urllib.parse.parse_qs(request['querystring'])
-    allowed_http_methods = parsed_qs.get('Method', ['GET', 'HEAD'])
+    if 'Policy' in parsed_qs:
+        allowed_http_methods = ['GET', 'HEAD']
+    else:
+        allowed_http_methods = parsed_qs.get('Method', ['GET', 'HEAD'])
 
     if http_method not in allowed_http_methods:
         return {'status': 403}
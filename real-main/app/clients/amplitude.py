@@ -1,43 +1,126 @@
+import contextlib
+import json
 import logging
 import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 
-import amplitude
+import requests
 
 AMPLITUDE_API_KEY = os.environ.get('AMPLITUDE_API_KEY')
+AMPLITUDE_BATCH_URL = 'https://api2.amplitude.com/batch'
+AMPLITUDE_BATCH_SIZE = int(os.environ.get('AMPLITUDE_BATCH_SIZE', 1000))
+AMPLITUDE_MAX_ATTEMPTS = int(os.environ.get('AMPLITUDE_MAX_ATTEMPTS', 4))
+# attributes that change on nearly every request, a change to only these is not worth an event
+AMPLITUDE_IGNORED_ATTRIBUTES = ('lastClient', 'lastPostViewAt', 'lastPostFocusViewAt')
 logger = logging.getLogger()
 
 
+class DecimalEncoder(json.JSONEncoder):
+    "Encodes the Decimals and sets that boto3 deserializes dynamo numbers and sets to"
+
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        if isinstance(obj, set):
+            return list(obj)
+        return super().default(obj)
+
+
 class AmplitudeClient:
-    def __init__(self, api_key=AMPLITUDE_API_KEY):
-        self.amplitude_logger = amplitude.AmplitudeLogger(api_key=api_key)
+    """
+    Sends events to amplitude's batch api.
 
-    def send_event(self, user_id, new_items, old_items=None):
-        event_type = 'UPDATE_USER' if old_items else 'CREATE_USER'
-        event_args = {
-            'user_id': user_id,
-            'event_type': event_type,
-            "event_properties": {**new_items},
-        }
-        self.convert_decimal_to_float(event_args)
-        event = self.amplitude_logger.create_event(**event_args)
+    Outside of a `batch()` scope, each event is sent as it comes. Within one, events are buffered and
+    sent `batch_size` to a request, in the background as each batch fills, with what's left sent at the
+    end of the scope. Requests that fail with a retryable error are retried with exponential backoff and
+    full jitter. Failures to send are logged as warnings, not raised: events are best-effort.
+    """
 
+    def __init__(
+        self,
+        api_key=AMPLITUDE_API_KEY,
+        url=AMPLITUDE_BATCH_URL,
+        batch_size=AMPLITUDE_BATCH_SIZE,
+        max_attempts=AMPLITUDE_MAX_ATTEMPTS,
+        backoff_seconds=0.1,
+    ):
+        self.api_key = api_key
+        self.url = url
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.lock = threading.Lock()
+        self.events = None  # a list of events waiting to be sent, only while in a batch scope
+        self.executor = None
+
+    @contextlib.contextmanager
+    def batch(self):
+        with self.lock:
+            assert self.events is None, 'Amplitude batch scopes cannot be nested'
+            self.events = []
+            self.executor = ThreadPoolExecutor(max_workers=1)
         try:
-            # send event to amplitude
-            self.amplitude_logger.log_event(event)
-        except Exception as err:
-            logger.warning(str(err))
+            yield self
+        finally:
+            with self.lock:
+                events, self.events = self.events, None
+                executor, self.executor = self.executor, None
+            if events:
+                executor.submit(self.post_events, events)
+            executor.shutdown(wait=True)
+
+    def send_event(self, user_id, new_item, old_item=None):
+        """
+        Send, or queue to send if within a batch scope, an event for a change to a user.
+        Returns False if the change isn't worth an event, or if sending it failed.
+        """
+        if old_item and not self.has_changes(new_item, old_item):
             return False
+        event = {
+            'user_id': user_id,
+            'event_type': 'UPDATE_USER' if old_item else 'CREATE_USER',
+            'event_properties': new_item,
+            'time': int(time.time() * 1000),
+            # lets amplitude de-duplicate events sent more than once by retries
+            'insert_id': str(uuid.uuid4()),
+        }
+        with self.lock:
+            if self.events is not None:
+                self.events.append(event)
+                if len(self.events) >= self.batch_size:
+                    self.executor.submit(self.post_events, self.events)
+                    self.events = []
+                return True
+        return self.post_events([event])
+
+    def has_changes(self, new_item, old_item):
+        "Whether the item changed in anything but the ignored attributes"
+        keys = (new_item.keys() | old_item.keys()) - set(AMPLITUDE_IGNORED_ATTRIBUTES)
+        return any(new_item.get(k) != old_item.get(k) for k in keys)
 
-        return True
-
-    def convert_decimal_to_float(self, source, parent_source=None, key=None):
-        if type(source) == dict:
-            for key in source:
-                self.convert_decimal_to_float(source[key], source, key)
-        elif type(source) == list:
-            for item in source:
-                self.convert_decimal_to_float(item, None, None)
-        elif type(source) == Decimal:
-            value = float(source)
-            parent_source[key] = value
+    def post_events(self, events):
+        "Send the events in one request. Returns True on success, False on failure"
+        data = json.dumps({'api_key': self.api_key, 'events': events}, cls=DecimalEncoder)
+        headers = {'Content-Type': 'application/json'}
+        error = None
+        for attempt in range(self.max_attempts):
+            if attempt > 0:
+                time.sleep(random.uniform(0, self.backoff_seconds * 2 ** attempt))
+            try:
+                resp = requests.post(self.url, data=data, headers=headers, timeout=10)
+            except requests.RequestException as err:
+                error = str(err)
+                continue
+            if resp.status_code == 200:
+                return True
+            error = f'status `{resp.status_code}` with body `{resp.text}`'
+            # https://developers.amplitude.com/docs/batch-event-upload-api#status-codes
+            if resp.status_code != 429 and resp.status_code < 500:
+                break
+        logger.warning(f'Failed to send {len(events)} events to amplitude: {error}')
+        return False
@@ -1,7 +1,6 @@
 import json
 import os
 
-import jwt
 import requests
 
 # https://developer.apple.com/documentation/sign_in_with_apple/
@@ -18,6 +17,8 @@ class AppleClient:
 
     def get_public_key(self, kid, alg):
         # would be good to cache this info but have to be careful not to cache it too long
+        import jwt
+
         payload = requests.get(self.public_key_url).json()
         for key in payload['keys']:
             if key['kid'] == kid and key['alg'] == alg:
@@ -25,6 +26,9 @@ class AppleClient:
         raise ValueError(f'No Apple public key with kid `{kid}` and alg `{alg}` found')
 
     def get_verified_email(self, id_token):
+        # pyjwt imports cryptography, which is slow to import, so it is deferred until there is a token to verify
+        import jwt
+
         header = jwt.get_unverified_header(id_token)
         public_key = self.get_public_key(header['kid'], header['alg'])
         # To avoid expired signature when testing: jwt.decode(... options={'verify_exp': False})
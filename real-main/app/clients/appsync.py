@@ -1,8 +1,9 @@
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
-import gql.transport.requests
+import requests
 import requests_aws4auth
 
 APPSYNC_GRAPHQL_URL = os.environ.get('APPSYNC_GRAPHQL_URL')
@@ -18,21 +19,87 @@ class AppSyncClient:
         'Content-Type': 'application/json',
     }
 
-    def __init__(self, appsync_graphql_url=APPSYNC_GRAPHQL_URL):
+    def __init__(self, appsync_graphql_url=APPSYNC_GRAPHQL_URL, max_workers=8, batch_size=25):
+        """
+        `batch_size` is the max number of notifications sent as aliased mutations in one request,
+        `max_workers` is the max number of those requests sent concurrently.
+        """
         self.appsync_graphql_url = appsync_graphql_url
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.notification_mutations = {}
+        self.documents = {}
+
+    @property
+    def transport(self):
+        "A long-lived transport, so the connection pool and aws credentials are reused across requests"
+        if not hasattr(self, '_transport'):
+            # gql, and graphql with it, is slow to import so it is deferred until there is something to send
+            import gql.transport.requests
+
+            session = boto3.Session()
+            credentials = session.get_credentials().get_frozen_credentials()
+            auth = requests_aws4auth.AWS4Auth(
+                credentials.access_key,
+                credentials.secret_key,
+                session.region_name,
+                self.service_name,
+                session_token=credentials.token,
+            )
+            transport = gql.transport.requests.RequestsHTTPTransport(
+                url=self.appsync_graphql_url,
+                use_json=True,
+                headers=self.headers,
+                auth=auth,
+            )
+            transport.session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=self.max_workers))
+            self._transport = transport
+        return self._transport
+
+    def get_notification_mutation(self, extra_fields, count=None):
+        """
+        Get the parsed TriggerNotification mutation that selects `extra_fields`.
+        If `count` is given, the mutation is repeated `count` times under aliases `n0`, `n1`, ...
+        with inputs from variables `$input0`, `$input1`, ...
+        """
+        key = (extra_fields, count)
+        if key not in self.notification_mutations:
+            selection = f'''{{
+                userId
+                type
+                {' '.join(extra_fields)}
+            }}'''
+            if count is None:
+                mutation = f'''
+                    mutation TriggerNotification ($input: NotificationInput!) {{
+                        triggerNotification (input: $input) {selection}
+                    }}
+                '''
+            else:
+                variables = ', '.join(f'$input{i}: NotificationInput!' for i in range(count))
+                fields = '\n'.join(
+                    f'n{i}: triggerNotification (input: $input{i}) {selection}' for i in range(count)
+                )
+                mutation = f'''
+                    mutation TriggerNotifications ({variables}) {{
+                        {fields}
+                    }}
+                '''
+            self.notification_mutations[key] = self.parse(mutation)
+        return self.notification_mutations[key]
+
+    def parse(self, query):
+        "Parse a graphql query string, cached. Lets the modules that define queries do so without importing gql"
+        if not isinstance(query, str):
+            return query
+        if query not in self.documents:
+            import gql
+
+            self.documents[query] = gql.gql(query)
+        return self.documents[query]
 
     def fire_notification(self, user_id, notification_type, **extra):
-        mutation = gql.gql(
-            f'''
-            mutation TriggerNotification ($input: NotificationInput!) {{
-                triggerNotification (input: $input) {{
-                    userId
-                    type
-                    {' '.join(extra.keys())}
-                }}
-            }}
-        '''
-        )
+        mutation = self.get_notification_mutation(tuple(sorted(extra.keys())))
         input_obj = {
             'userId': user_id,
             'type': notification_type,
@@ -40,22 +107,37 @@ class AppSyncClient:
         }
         self.send(mutation, {'input': input_obj})
 
+    def fire_notifications(self, user_ids, notification_type, **extra):
+        """
+        Fire the same notification to many users.
+
+        Notifications are grouped into requests of aliased mutations, and those requests
+        are sent concurrently. All requests are attempted even if some of them fail.
+        """
+        user_ids = list(user_ids)
+        extra_fields = tuple(sorted(extra.keys()))
+        batches = [user_ids[i : i + self.batch_size] for i in range(0, len(user_ids), self.batch_size)]
+
+        def send_batch(batch_user_ids):
+            mutation = self.get_notification_mutation(extra_fields, count=len(batch_user_ids))
+            variables = {
+                f'input{i}': {'userId': user_id, 'type': notification_type, **extra}
+                for i, user_id in enumerate(batch_user_ids)
+            }
+            try:
+                self.send(mutation, variables)
+            except Exception as err:
+                logger.warning(str(err))
+                return err
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            errors = [err for err in executor.map(send_batch, batches) if err]
+        if errors:
+            raise Exception(
+                f'Appsync: {len(errors)} of {len(batches)} notification batches failed: `{errors[0]}`'
+            )
+
     def send(self, query, variables):
-        aws_session = boto3.session.Session()
-        creds = aws_session.get_credentials().get_frozen_credentials()
-        auth = requests_aws4auth.AWS4Auth(
-            creds.access_key,
-            creds.secret_key,
-            aws_session.region_name,
-            self.service_name,
-            session_token=creds.token,
-        )
-        transport = gql.transport.requests.RequestsHTTPTransport(
-            url=self.appsync_graphql_url,
-            use_json=True,
-            headers=self.headers,
-            auth=auth,
-        )
-        resp = transport.execute(query, variables)
+        resp = self.transport.execute(self.parse(query), variables)
         if resp.errors:
             raise Exception(f'Appsync resp error: `{resp.errors}` from query `{query}`, variables `{variables}`')
@@ -1,31 +1,133 @@
 import json
 import logging
 import os
+import re
+import threading
+import time
 
 from .s3 import S3Client
 
 S3_BAD_WORDS_BUCKET = os.environ.get('S3_BAD_WORDS_BUCKET')
+BAD_WORDS_CACHE_TTL_SECONDS = int(os.environ.get('BAD_WORDS_CACHE_TTL_SECONDS', 300))
 logger = logging.getLogger()
 
 
+class BadWordsIndex:
+    """
+    A precompiled index of bad words and phrases.
+
+    Both the bad words and the text being checked are lower cased and split into tokens of word
+    characters, so punctuation and whitespace don't affect matching. Single-word entries are matched
+    with a set lookup, multi-word phrases by walking a trie of tokens.
+
+    Entries with symbols that would be lost to that tokenizing, such as `a$$`, are instead split on
+    whitespace only and matched against the text split the same way, with punctuation stripped from
+    the ends of each token. Otherwise `a$$` would be indexed as the ordinary word `a`.
+    """
+
+    token_regex = re.compile(r'\w+')
+    edge_punctuation = '.,;:!?"\'()[]'
+
+    def __init__(self, bad_words):
+        self.words = set()
+        self.phrases = {}  # trie of tokens, a `None` key marks the end of a phrase
+        self.raw_words = set()
+        self.raw_phrases = {}
+        for bad_word in bad_words:
+            tokens = self.tokenize(bad_word)
+            raw_tokens = self.tokenize_raw(bad_word)
+            if tokens == raw_tokens:
+                self.add(self.words, self.phrases, tokens)
+            else:
+                self.add(self.raw_words, self.raw_phrases, raw_tokens)
+
+    @staticmethod
+    def add(words, phrases, tokens):
+        if len(tokens) == 1:
+            words.add(tokens[0])
+        elif len(tokens) > 1:
+            node = phrases
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node[None] = True
+
+    @classmethod
+    def tokenize(cls, text):
+        return cls.token_regex.findall(text.lower())
+
+    @classmethod
+    def tokenize_raw(cls, text):
+        return [token.strip(cls.edge_punctuation) or token for token in text.lower().split()]
+
+    def matches(self, text):
+        "Does the text contain any bad word or phrase?"
+        if self.contains(self.tokenize(text), self.words, self.phrases):
+            return True
+        if self.raw_words or self.raw_phrases:
+            return self.contains(self.tokenize_raw(text), self.raw_words, self.raw_phrases)
+        return False
+
+    @staticmethod
+    def contains(tokens, words, phrases):
+        if not words.isdisjoint(tokens):
+            return True
+        if phrases:
+            for start in range(len(tokens)):
+                node = phrases
+                for token in tokens[start:]:
+                    node = node.get(token)
+                    if node is None:
+                        break
+                    if None in node:
+                        return True
+        return False
+
+
 class BadWordsClient:
-    def __init__(self, bucket_name=S3_BAD_WORDS_BUCKET):
+    """
+    Detects bad words using the list in the bad words bucket.
+
+    The list is loaded once and kept in memory. After `cache_ttl` seconds it is revalidated
+    with a conditional get using its etag, so it is only downloaded again if it has changed.
+    """
+
+    def __init__(self, bucket_name=S3_BAD_WORDS_BUCKET, cache_ttl=BAD_WORDS_CACHE_TTL_SECONDS):
         self.s3_bad_words = S3Client(bucket_name)
         self.file_name = 'bad_words.json'
+        self.cache_ttl = cache_ttl
+        self.lock = threading.Lock()
+        self.index = None
+        self.etag = None
+        self.validated_at = None
 
-    def validate_bad_words_detection(self, text):
-        try:
-            fh = self.s3_bad_words.get_object_data_stream(self.file_name)
-        except Exception as err:
-            logger.warning(str(err))
-            raise err
+    def get_index(self):
+        "Get the BadWordsIndex, loading or revalidating it as needed"
+        with self.lock:
+            if self.index is None or time.monotonic() - self.validated_at >= self.cache_ttl:
+                try:
+                    self.load_index()
+                except Exception as err:
+                    logger.warning(str(err))
+                    if self.index is None:
+                        raise err
+                # on failure, keep the stale index in service until the next ttl period
+                self.validated_at = time.monotonic()
+            return self.index
 
-        data = json.loads(fh.read().decode())
-        bad_words = {word.lower(): '' for word in data.keys()}
-        words = text.split(' ')
+    def refresh_index(self):
+        "Revalidate the list now, regardless of the ttl. Ex: before sweeping with a newly uploaded list"
+        with self.lock:
+            self.load_index()
+            self.validated_at = time.monotonic()
 
-        for word in words:
-            if bad_words.get(word.lower(), None) == '':
-                return True
+    def load_index(self):
+        resp = self.s3_bad_words.get_object_data_stream_if_modified(self.file_name, self.etag)
+        if resp is None:
+            return
+        fh, etag = resp
+        data = json.loads(fh.read().decode())
+        self.index = BadWordsIndex(data.keys())
+        self.etag = etag
 
-        return False
+    def validate_bad_words_detection(self, text):
+        return self.get_index().matches(text)
@@ -5,22 +5,29 @@ import urllib
 
 import botocore
 import pendulum
-from cryptography.hazmat import backends
-from cryptography.hazmat.primitives.asymmetric.padding import PKCS1v15
-from cryptography.hazmat.primitives.hashes import SHA1
-from cryptography.hazmat.primitives.serialization import load_pem_private_key
 
 CLOUDFRONT_UPLOADS_DOMAIN = os.environ.get('CLOUDFRONT_UPLOADS_DOMAIN')
+READONLY_SIGNATURE_CACHE_SIZE = int(os.environ.get('CLOUDFRONT_READONLY_SIGNATURE_CACHE_SIZE', 4096))
 
 
 class CloudFrontClient:
 
     lifetime = pendulum.duration(hours=48)
 
-    def __init__(self, key_pair_getter, domain=CLOUDFRONT_UPLOADS_DOMAIN):
+    # read-only urls expire at the end of the bucket their lifetime ends in, so that all those
+    # generated for a directory within the same bucket can share one cached signature
+    readonly_expiry_bucket = pendulum.duration(hours=1)
+
+    def __init__(
+        self, key_pair_getter, domain=CLOUDFRONT_UPLOADS_DOMAIN, readonly_cache_size=READONLY_SIGNATURE_CACHE_SIZE
+    ):
         assert domain, "CloudFront domain is required"
         self.domain = domain
         self.key_pair_getter = key_pair_getter
+        # signed querystrings by (directory, expires_at_ts). Entries are dropped oldest first, which
+        # as expiry timestamps only move forward, are those least likely to be needed again
+        self.readonly_signatures = {}
+        self.readonly_cache_size = readonly_cache_size
 
     def get_key_pair(self):
         if not hasattr(self, '_key_pair'):
@@ -30,6 +37,10 @@ class CloudFrontClient:
     def get_private_key(self):
         "A PrivateKey object ready to use to .sign()"
         if not hasattr(self, '_private_key'):
+            # cryptography is slow to import, so it is deferred until there is something to sign
+            from cryptography.hazmat import backends
+            from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
             private_key = self.get_key_pair()['privateKey']
 
             # the private key format requires newlines after the header and before the footer
@@ -40,15 +51,17 @@ class CloudFrontClient:
             self._private_key = load_pem_private_key(pk_raw, password=None, backend=backend)
         return self._private_key
 
+    def sign(self, msg):
+        "RSA-SHA1 signature of `msg`, as cloudfront expects"
+        from cryptography.hazmat.primitives.asymmetric.padding import PKCS1v15
+        from cryptography.hazmat.primitives.hashes import SHA1
+
+        return self.get_private_key().sign(msg, PKCS1v15(), SHA1())
+
     def get_cloudfront_signer(self):
         if not hasattr(self, '_cfsigner'):
             key_id = self.get_key_pair()['keyId']
-            pk = self.get_private_key()
-
-            def sign(msg):
-                return pk.sign(msg, PKCS1v15(), SHA1())
-
-            self._cfsigner = botocore.signers.CloudFrontSigner(key_id, sign)
+            self._cfsigner = botocore.signers.CloudFrontSigner(key_id, self.sign)
         return self._cfsigner
 
     def generate_unsigned_url(self, path):
@@ -61,12 +74,49 @@ class CloudFrontClient:
         url = f'https://{self.domain}/{path}?{qs}'
         return self.get_cloudfront_signer().generate_presigned_url(url, date_less_than=expires_at)
 
+    def generate_presigned_readonly_url(self, path, now=None):
+        """
+        Presigned url to GET or HEAD the object at `path`.
+
+        The signature is of a custom policy over every object in the same directory, so for
+        example all the sizes of one image share a single signature. Read-only is enforced by
+        our edge lambda for all urls signed with a custom policy.
+        """
+        assert '/' in path, f'Path `{path}` is not in a directory'
+        now = now or pendulum.now('utc')
+        bucket_seconds = int(self.readonly_expiry_bucket.total_seconds())
+        expires_at_ts = -(-(now + self.lifetime).int_timestamp // bucket_seconds) * bucket_seconds
+        directory = path.rsplit('/', 1)[0]
+        qs = self.sign_readonly_directory(directory, expires_at_ts)
+        return f'https://{self.domain}/{path}?{qs}'
+
+    def sign_readonly_directory(self, directory, expires_at_ts):
+        "The signed querystring that grants access to all objects in `directory` until `expires_at_ts`"
+        key = (directory, expires_at_ts)
+        if key not in self.readonly_signatures:
+            if len(self.readonly_signatures) >= self.readonly_cache_size:
+                self.readonly_signatures.pop(next(iter(self.readonly_signatures)), None)
+            self.readonly_signatures[key] = self.generate_readonly_directory_qs(directory, expires_at_ts)
+        return self.readonly_signatures[key]
+
+    def generate_readonly_directory_qs(self, directory, expires_at_ts):
+        resource = f'https://{self.domain}/{directory}/*'
+        policy = self.generate_cookie_policy(resource, pendulum.from_timestamp(expires_at_ts))
+        signature = self.sign(policy)
+        return urllib.parse.urlencode(
+            [
+                ('Policy', self._encode(policy)),
+                ('Signature', self._encode(signature)),
+                ('Key-Pair-Id', self.get_key_pair()['keyId']),
+            ]
+        )
+
     def generate_presigned_cookies(self, path, expires_at=None):
         # https://gist.github.com/mjohnsullivan/31064b04707923f82484c54981e4749e
         expires_at = expires_at or pendulum.now('utc') + self.lifetime
         url = self.generate_unsigned_url(path)
         policy = self.generate_cookie_policy(url, expires_at)
-        signature = self.get_private_key().sign(policy, PKCS1v15(), SHA1())
+        signature = self.sign(policy)
         return {
             'ExpiresAt': expires_at.to_iso8601_string(),
             'CloudFront-Policy': self._encode(policy),
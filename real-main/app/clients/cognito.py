@@ -4,10 +4,6 @@ import os
 from uuid import uuid4
 
 import boto3
-from cryptography.hazmat import backends
-from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.primitives.hashes import SHA1
-from cryptography.hazmat.primitives.serialization import load_pem_private_key
 
 COGNITO_USER_POOL_ID = os.environ.get('COGNITO_USER_POOL_ID')
 COGNITO_BACKEND_CLIENT_ID = os.environ.get('COGNITO_USER_POOL_BACKEND_CLIENT_ID')
@@ -39,6 +35,10 @@ class CognitoClient:
 
     def get_private_key(self):
         if not hasattr(self, '_private_key'):
+            # cryptography is slow to import, so it is deferred until there is something to decrypt
+            from cryptography.hazmat import backends
+            from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
             private_key = self.real_key_pair_getter()['privateKey']
 
             # the private key format requires newlines after the header and before the footer
@@ -87,6 +87,9 @@ class CognitoClient:
         return resp['AuthenticationResult']
 
     def set_user_password(self, user_id, encrypted_password):
+        from cryptography.hazmat.primitives.asymmetric import padding
+        from cryptography.hazmat.primitives.hashes import SHA1
+
         private_key = self.get_private_key()
         try:
             password = private_key.decrypt(
@@ -1,32 +1,102 @@
 import base64
+import collections
+import contextlib
 import json
 import logging
 import os
+import queue
+import random
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
 
 DYNAMO_TABLE = os.environ.get('DYNAMO_TABLE')
+BATCH_WRITE_MAX_ATTEMPTS = int(os.environ.get('DYNAMO_BATCH_WRITE_MAX_ATTEMPTS', 8))
+BATCH_GET_MAX_ATTEMPTS = int(os.environ.get('DYNAMO_BATCH_GET_MAX_ATTEMPTS', 8))
+BATCH_GET_MAX_WORKERS = int(os.environ.get('DYNAMO_BATCH_GET_MAX_WORKERS', 4))
+SCAN_TOTAL_SEGMENTS = int(os.environ.get('DYNAMO_SCAN_TOTAL_SEGMENTS', 8))
+SCAN_MAX_WORKERS = int(os.environ.get('DYNAMO_SCAN_MAX_WORKERS', 8))
+SCAN_MAX_QUEUED_PAGES = int(os.environ.get('DYNAMO_SCAN_MAX_QUEUED_PAGES', 4))
+SCAN_MAX_ATTEMPTS = int(os.environ.get('DYNAMO_SCAN_MAX_ATTEMPTS', 8))
+# read capacity units per second a scan may consume, zero for no limit
+SCAN_MAX_CAPACITY_PER_SECOND = float(os.environ.get('DYNAMO_SCAN_MAX_CAPACITY_PER_SECOND', 0))
 logger = logging.getLogger()
 
 
+class ScanConcurrency:
+    """
+    Limits how many segments of a parallel scan are scanned at once, adapting to the capacity consumed.
+
+    Starts at `maximum`. If a request is throttled, or the read capacity consumed over the last second
+    goes over `max_capacity_per_second`, the limit is halved, and it grows back by one with each page
+    read while within budget. While over budget, no more pages are requested until it's back under.
+    """
+
+    def __init__(self, maximum, max_capacity_per_second=None):
+        self.cond = threading.Condition()
+        self.maximum = self.limit = maximum
+        self.max_capacity_per_second = max_capacity_per_second
+        self.active = 0
+        self.window = collections.deque()  # (time, capacity units) of the pages read in the last second
+
+    def get_rate(self, now):
+        while self.window and self.window[0][0] <= now - 1:
+            self.window.popleft()
+        return sum(units for _, units in self.window)
+
+    @contextlib.contextmanager
+    def slot(self):
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                over_budget = self.max_capacity_per_second and self.get_rate(now) >= self.max_capacity_per_second
+                if self.active < self.limit and not over_budget:
+                    break
+                # the rate only drops as pages leave the window, so wait no longer than the oldest takes to
+                self.cond.wait(timeout=self.window[0][0] + 1 - now if over_budget else None)
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.active -= 1
+                self.cond.notify_all()
+
+    def record(self, capacity_units, throttled=False):
+        with self.cond:
+            now = time.monotonic()
+            self.window.append((now, capacity_units))
+            rate = self.get_rate(now)
+            if throttled or (self.max_capacity_per_second and rate > self.max_capacity_per_second):
+                self.limit = max(self.limit // 2, 1)
+            elif self.limit < self.maximum:
+                self.limit += 1
+            self.cond.notify_all()
+
+
 class DynamoClient:
-    def __init__(self, table_name=DYNAMO_TABLE, create_table_schema=None):
+    def __init__(self, table_name=DYNAMO_TABLE, create_table_schema=None, boto3_resource=None, boto3_client=None):
         """
         If create_table_schema is not None, then the table will be created
         on-the-fly. Useful when testing with a mocked dynamodb backend.
+
+        Pass in a `boto3_resource` and `boto3_client` to share them with other clients. The resource's own
+        client can't stand in for the low-level one, it converts attribute values to and from python types.
         """
         assert table_name, "Table name is required"
         self.table_name = table_name
 
-        boto3_resource = boto3.resource('dynamodb')
+        boto3_resource = boto3_resource or boto3.resource('dynamodb')
         self.table = (
             boto3_resource.create_table(TableName=table_name, **create_table_schema)
             if create_table_schema
             else boto3_resource.Table(table_name)
         )
 
-        self.boto3_client = boto3.client('dynamodb')
+        self.boto3_client = boto3_client or boto3.client('dynamodb')
         self.exceptions = self.boto3_client.exceptions
 
     def add_item(self, query_kwargs):
@@ -62,6 +132,62 @@ class DynamoClient:
             kwargs['RequestItems'][self.table_name]['ProjectionExpression'] = projection_expression
         return self.boto3_client.batch_get_item(**kwargs)['Responses'][self.table_name]
 
+    def batch_load_items(
+        self,
+        keys,
+        projection_expression=None,
+        max_workers=BATCH_GET_MAX_WORKERS,
+        max_attempts=BATCH_GET_MAX_ATTEMPTS,
+        backoff_seconds=0.05,
+    ):
+        """
+        Get the items with the given primary keys, in non-verbose format.
+        Returns a list in the same order as `keys`, with None for any item that does not exist.
+
+        Duplicate keys are fetched once. Keys are fetched 100 to a batch_get_item call, with calls
+        made in parallel, and unprocessed keys are retried with exponential backoff and full jitter.
+        Raises an exception if keys are still unprocessed after `max_attempts`.
+        """
+        keys = list(keys)
+        if not keys:
+            return []
+        key_names = sorted(keys[0].keys())
+        key_ids = [tuple(key[name] for name in key_names) for key in keys]
+        unique_keys = list(dict(zip(key_ids, keys)).values())
+
+        request = {}
+        if projection_expression:
+            # the key attributes are needed to put the items back in order
+            projected = {name.strip() for name in projection_expression.split(',')}
+            missing = [name for name in key_names if name not in projected]
+            request['ProjectionExpression'] = ', '.join([projection_expression, *missing])
+
+        def get_chunk(chunk):
+            items = []
+            unprocessed = {self.table_name: {**request, 'Keys': chunk}}
+            for attempt in range(max_attempts):
+                if attempt > 0:
+                    time.sleep(random.uniform(0, backoff_seconds * 2 ** attempt))
+                resp = self.table.meta.client.batch_get_item(RequestItems=unprocessed)
+                items.extend(resp['Responses'].get(self.table_name, []))
+                unprocessed = resp.get('UnprocessedKeys')
+                if not unprocessed:
+                    return items
+            cnt = len(unprocessed[self.table_name]['Keys'])
+            raise Exception(f'Dynamo batch get: {cnt} keys unprocessed after {max_attempts} attempts')
+
+        chunks = [unique_keys[i : i + 100] for i in range(0, len(unique_keys), 100)]
+        if len(chunks) == 1:
+            chunk_items = [get_chunk(chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+                chunk_items = list(executor.map(get_chunk, chunks))
+
+        items_by_key_id = {
+            tuple(item[name] for name in key_names): item for items in chunk_items for item in items
+        }
+        return [items_by_key_id.get(key_id) for key_id in key_ids]
+
     def update_item(self, query_kwargs, failure_warning=None):
         """
         Update an item and return the new item.
@@ -94,6 +220,34 @@ class DynamoClient:
         }
         return self.table.update_item(**kwargs).get('Attributes')
 
+    def add_to_set(self, key, attribute_name, values, **attributes):
+        """
+        Add the values to a set attribute, and set any other given attributes.
+        If the item does not exist, create it.
+        """
+        update_exp = 'ADD #attrName :values'
+        if attributes:
+            update_exp += ' SET ' + ', '.join([f'{k} = :{k}' for k in attributes.keys()])
+        kwargs = {
+            'Key': key,
+            'UpdateExpression': update_exp,
+            'ExpressionAttributeNames': {'#attrName': attribute_name},
+            'ExpressionAttributeValues': {':values': set(values), **{f':{k}': v for k, v in attributes.items()}},
+            'ReturnValues': 'ALL_NEW',
+        }
+        return self.table.update_item(**kwargs).get('Attributes')
+
+    def delete_from_set(self, key, attribute_name, values):
+        "Delete the values from a set attribute. Dynamo removes the attribute once the set is empty."
+        kwargs = {
+            'Key': key,
+            'UpdateExpression': 'DELETE #attrName :values',
+            'ExpressionAttributeNames': {'#attrName': attribute_name},
+            'ExpressionAttributeValues': {':values': set(values)},
+            'ReturnValues': 'ALL_NEW',
+        }
+        return self.table.update_item(**kwargs).get('Attributes')
+
     def increment_count(self, key, attribute_name):
         "Best-effort attempt to increment a counter. Logs a WARNING upon failure."
         query_kwargs = {
@@ -127,6 +281,30 @@ class DynamoClient:
                 cnt += 1
         return cnt
 
+    def batch_write_items(self, write_requests, max_attempts=BATCH_WRITE_MAX_ATTEMPTS, backoff_seconds=0.05):
+        """
+        Write the given PutRequest / DeleteRequest dicts, 25 to a batch_write_item call.
+
+        Unlike `batch_put_items`, unprocessed items are retried with exponential backoff and full jitter,
+        and the underlying client is thread safe so this may be called concurrently from many threads.
+        Raises an exception if items are still unprocessed after `max_attempts`.
+        Returns count of how many writes requested.
+        """
+        write_requests = list(write_requests)
+        for i in range(0, len(write_requests), 25):
+            unprocessed = {self.table_name: write_requests[i : i + 25]}
+            for attempt in range(max_attempts):
+                if attempt > 0:
+                    time.sleep(random.uniform(0, backoff_seconds * 2 ** attempt))
+                resp = self.table.meta.client.batch_write_item(RequestItems=unprocessed)
+                unprocessed = resp.get('UnprocessedItems')
+                if not unprocessed:
+                    break
+            else:
+                cnt = len(unprocessed[self.table_name])
+                raise Exception(f'Dynamo batch write: {cnt} items unprocessed after {max_attempts} attempts')
+        return len(write_requests)
+
     def delete_item(self, pk, **kwargs):
         "Delete an item and return what was deleted"
         return_values = kwargs.pop('ReturnValues', 'ALL_OLD')
@@ -180,23 +358,138 @@ class DynamoClient:
 
     def generate_all_query(self, query_kwargs):
         "Return a generator that iterates over all results of the query"
-        last_key = False
+        for items, _ in self.generate_query_pages(query_kwargs):
+            yield from items
+
+    def generate_query_pages(self, query_kwargs, exclusive_start_key=None):
+        """
+        Return a generator that iterates over the pages of the query, as tuples of (items, last evaluated key).
+        The last page has a last evaluated key of None. Pass in the key of a page to resume the query after it.
+        """
+        last_key = exclusive_start_key or False
         while last_key is not None:
             start_kwargs = {'ExclusiveStartKey': last_key} if last_key else {}
             resp = self.table.query(**query_kwargs, **start_kwargs)
-            for item in resp['Items']:
-                yield item
             last_key = resp.get('LastEvaluatedKey')
+            yield resp['Items'], last_key
 
-    def generate_all_scan(self, scan_kwargs):
-        "Return a generator that iterates over all results of the scan"
-        last_key = False
+    def count_query(self, query_kwargs):
+        "Count the items matched by the query, without reading them out"
+        kwargs = {**query_kwargs, 'Select': 'COUNT'}
+        count, last_key = 0, False
         while last_key is not None:
             start_kwargs = {'ExclusiveStartKey': last_key} if last_key else {}
-            resp = self.table.scan(**scan_kwargs, **start_kwargs)
-            for item in resp['Items']:
-                yield item
+            resp = self.table.query(**kwargs, **start_kwargs)
+            count += resp['Count']
             last_key = resp.get('LastEvaluatedKey')
+        return count
+
+    def generate_all_scan(self, scan_kwargs, **kwargs):
+        "Return a generator that iterates over all results of the scan. Accepts kwargs of generate_scan_pages()"
+        for items, _ in self.generate_scan_pages(scan_kwargs, **kwargs):
+            yield from items
+
+    def generate_scan_pages(
+        self,
+        scan_kwargs,
+        cursor=None,
+        total_segments=SCAN_TOTAL_SEGMENTS,
+        max_workers=SCAN_MAX_WORKERS,
+        max_capacity_per_second=SCAN_MAX_CAPACITY_PER_SECOND,
+        max_queued_pages=SCAN_MAX_QUEUED_PAGES,
+    ):
+        """
+        Return a generator that iterates over the pages of a parallel scan, as tuples of (items, cursor).
+
+        The table is split into `total_segments` segments, which are scanned concurrently by a pool of
+        threads. Pages are yielded as they arrive, through a queue of at most `max_queued_pages`, so
+        segments are interleaved and the items are in no particular order. How many segments are scanned
+        at once adapts to the read capacity consumed, see ScanConcurrency.
+
+        The cursor is a list with an entry per segment, where the segment is up to as of the items yielded
+        so far: False if not started, its last evaluated key, or None once done. Pass in the cursor of a
+        page to resume the scan after it. It is JSON serializable, ex: for encode_pagination_token().
+        """
+        cursor = list(cursor) if cursor else [False] * total_segments
+        concurrency = ScanConcurrency(max_workers, max_capacity_per_second=max_capacity_per_second)
+        segments = [segment for segment, last_key in enumerate(cursor) if last_key is not None]
+        if len(segments) <= 1:
+            for segment in segments:
+                for items, last_key in self.generate_segment_pages(scan_kwargs, segment, cursor, concurrency):
+                    cursor[segment] = last_key
+                    yield items, list(cursor)
+            return
+
+        pages = queue.Queue(maxsize=max_queued_pages)
+        stopped = threading.Event()
+
+        def put(page):
+            # don't block forever on a full queue if the consumer has gone away
+            while not stopped.is_set():
+                try:
+                    return pages.put(page, timeout=0.1)
+                except queue.Full:
+                    pass
+
+        def scan_segment(segment):
+            try:
+                for items, last_key in self.generate_segment_pages(scan_kwargs, segment, cursor, concurrency):
+                    put((segment, items, last_key))
+                    if stopped.is_set():
+                        return
+            except Exception as err:
+                put((segment, err, None))
+
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(segments)))
+        try:
+            for segment in segments:
+                executor.submit(scan_segment, segment)
+            remaining = len(segments)
+            while remaining:
+                segment, items, last_key = pages.get()
+                if isinstance(items, Exception):
+                    raise items
+                cursor[segment] = last_key
+                remaining -= last_key is None
+                yield items, list(cursor)
+        finally:
+            stopped.set()
+            executor.shutdown(wait=True)
+
+    def generate_segment_pages(
+        self, scan_kwargs, segment, cursor, concurrency, max_attempts=SCAN_MAX_ATTEMPTS, backoff_seconds=0.05
+    ):
+        """
+        Return a generator that iterates over the pages of one segment of a parallel scan, from where the cursor
+        has it up to, as tuples of (items, last evaluated key). Throttled requests are retried with exponential
+        backoff and full jitter.
+        """
+        total_segments = len(cursor)
+        segment_kwargs = {'Segment': segment, 'TotalSegments': total_segments} if total_segments > 1 else {}
+        last_key = cursor[segment]
+        while last_key is not None:
+            start_kwargs = {'ExclusiveStartKey': last_key} if last_key else {}
+            for attempt in range(max_attempts):
+                if attempt > 0:
+                    time.sleep(random.uniform(0, backoff_seconds * 2 ** attempt))
+                try:
+                    with concurrency.slot():
+                        # segments are scanned from several threads: boto3 resources aren't thread safe,
+                        # but the resource's client is, and it still handles the non-verbose format
+                        resp = self.table.meta.client.scan(
+                            **{'TableName': self.table_name, 'ReturnConsumedCapacity': 'TOTAL', **scan_kwargs},
+                            **segment_kwargs,
+                            **start_kwargs,
+                        )
+                except self.exceptions.ProvisionedThroughputExceededException:
+                    concurrency.record(0, throttled=True)
+                    continue
+                concurrency.record(resp.get('ConsumedCapacity', {}).get('CapacityUnits', 0))
+                break
+            else:
+                raise Exception(f'Dynamo scan: segment {segment} throttled after {max_attempts} attempts')
+            last_key = resp.get('LastEvaluatedKey')
+            yield resp['Items'], last_key
 
     def transact_write_items(self, transact_items, transact_exceptions=None):
         """
@@ -230,3 +523,44 @@ class DynamoClient:
                     if transact_exception is not None:
                         raise transact_exception from err
             raise err
+
+
+class DynamoLoader:
+    """
+    Collects the primary keys of items needed during a unit of work, and fetches all those
+    not yet loaded together, with `DynamoClient.batch_load_items`, the first time any of them is needed.
+    """
+
+    def __init__(self, dynamo_client, projection_expression=None):
+        self.client = dynamo_client
+        self.projection_expression = projection_expression
+        self.pending = {}
+        self.loaded = {}
+
+    def key_id(self, key):
+        return tuple(sorted(key.items()))
+
+    def load(self, key):
+        "Queue the key to be loaded. Returns a callable that returns the item, or None if it does not exist."
+        key_id = self.key_id(key)
+        if key_id not in self.loaded:
+            self.pending[key_id] = key
+        return lambda: self.get(key_id)
+
+    def load_many(self, keys):
+        "Load the given keys. Returns a list of items, in the same order as `keys`."
+        getters = [self.load(key) for key in keys]
+        return [getter() for getter in getters]
+
+    def get(self, key_id):
+        if key_id in self.pending:
+            self.dispatch()
+        return self.loaded[key_id]
+
+    def dispatch(self):
+        "Load all pending keys"
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        items = self.client.batch_load_items(pending.values(), projection_expression=self.projection_expression)
+        self.loaded.update(zip(pending.keys(), items))
@@ -1,25 +1,60 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
 import boto3
 import botocore
 
+logger = logging.getLogger()
+
+S3_MAX_WORKERS = int(os.environ.get('S3_CLIENT_MAX_WORKERS', 10))
+
 
 class S3Client:
-    def __init__(self, bucket_name, create_bucket=False):
+
+    # the max number of keys S3 accepts in one DeleteObjects request
+    delete_objects_max_keys = 1000
+
+    def __init__(self, bucket_name, create_bucket=False, max_workers=S3_MAX_WORKERS, s3=None):
         """
         The create_bucket kwarg is intended for use with moto in the test suite.
+        Pass in an `s3` resource to share it, and its low-level client, with other clients.
         """
         assert bucket_name, "Bucket name is required"
-        self.boto_client = boto3.client('s3')
+        self.s3 = s3 or self.create_resource(max_workers)
+        # boto3 clients are thread safe, this one is shared by the workers of the batch methods
+        self.boto_client = self.s3.meta.client
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._executor_threads = threading.local()  # is_worker is set on the pool's threads
         self.bucket_name = bucket_name
-        self.s3 = boto3.resource('s3')
         self.bucket = self.s3.Bucket(bucket_name)
         self.exceptions = self.boto_client.exceptions
 
         if create_bucket:
             self.s3.create_bucket(Bucket=bucket_name)
 
+    @staticmethod
+    def create_resource(max_workers=S3_MAX_WORKERS, session=None):
+        "Create an s3 resource whose client has a connection for each of `max_workers` workers"
+        return (session or boto3).resource('s3', config=botocore.config.Config(max_pool_connections=max_workers))
+
     def get_object_data_stream(self, path):
         return self.bucket.Object(path).get()['Body']
 
+    def get_object_data_stream_if_modified(self, path, etag=None):
+        "Get a tuple of (data stream, etag) for the object, or None if the object's etag still matches `etag`"
+        kwargs = {'IfNoneMatch': etag} if etag else {}
+        try:
+            resp = self.bucket.Object(path).get(**kwargs)
+        except botocore.exceptions.ClientError as err:
+            if err.response['Error']['Code'] == '304':
+                return None
+            raise
+        return resp['Body'], resp['ETag']
+
     def get_object_checksum(self, path):
         resp = self.boto_client.head_object(Bucket=self.bucket_name, Key=path)
         # etags start and end with '"', as required by RFC
@@ -38,9 +73,17 @@ class S3Client:
         self.bucket.Object(path).delete()
 
     def delete_objects(self, paths):
-        "Delete mutliple objects in one call to S3"
-        kwargs = {'Delete': {'Objects': [{'Key': p} for p in paths]}}
-        self.bucket.delete_objects(**kwargs)
+        "Delete mutliple objects, in as few calls to S3 as possible, made concurrently"
+        paths = list(paths)
+        chunk_size = self.delete_objects_max_keys
+        chunks = [paths[i : i + chunk_size] for i in range(0, len(paths), chunk_size)]
+        self.map_concurrently(self.delete_objects_chunk, chunks)
+
+    def delete_objects_chunk(self, paths):
+        kwargs = {'Delete': {'Objects': [{'Key': p} for p in paths], 'Quiet': True}}
+        resp = self.boto_client.delete_objects(Bucket=self.bucket_name, **kwargs)
+        for error in resp.get('Errors', []):
+            logger.warning(f'Unable to delete S3 object `{error["Key"]}`: {error.get("Message")}')
 
     def delete_objects_with_prefix(self, path_prefix):
         "Delete mutliple objects with the same prefix in one call to S3"
@@ -53,6 +96,37 @@ class S3Client:
     def put_object(self, path, body, content_type):
         self.bucket.put_object(Key=path, Body=body, ContentType=content_type)
 
+    def put_objects(self, objects):
+        "Put multiple objects concurrently. `objects` is an iterable of (path, body, content_type) tuples"
+        self.map_concurrently(lambda obj: self.put_object_with_client(*obj), list(objects))
+
+    def put_object_with_client(self, path, body, content_type):
+        self.boto_client.put_object(Bucket=self.bucket_name, Key=path, Body=body, ContentType=content_type)
+
+    @property
+    def executor(self):
+        "The worker pool of the batch methods, created on first use and shared by all calls"
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix=f's3-{self.bucket_name}'
+                    )
+        return self._executor
+
+    def map_concurrently(self, func, args):
+        "Call `func` on each of `args` using the worker pool, raising the first error only once all are done"
+        # a worker waiting on the pool it's part of could deadlock it
+        if len(args) <= 1 or getattr(self._executor_threads, 'is_worker', False):
+            return [func(arg) for arg in args]
+        futures = [self.executor.submit(self._run_in_worker, func, arg) for arg in args]
+        wait(futures)
+        return [future.result() for future in futures]
+
+    def _run_in_worker(self, func, arg):
+        self._executor_threads.is_worker = True
+        return func(arg)
+
     def exists(self, path):
         # https://stackoverflow.com/a/33843019
         try:
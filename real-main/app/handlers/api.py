@@ -3,28 +3,19 @@ import logging
 
 import pendulum
 
-from app import clients, models
 from app.logging import LogLevelContext, handler_logging
 
 from . import xray
+from .registry import Registry
 
 logger = logging.getLogger()
 xray.patch_all()
 
-secrets_manager_client = clients.SecretsManagerClient()
-clients = {
-    'appstore': clients.AppStoreClient(secrets_manager_client.get_apple_appstore_params),
-    'appsync': clients.AppSyncClient(),
-    'dynamo': clients.DynamoClient(),
-    'cognito': clients.CognitoClient(),
-    'pinpoint': clients.PinpointClient(),
-}
-
-managers = {}
-chat_manager = managers.get('chat') or models.ChatManager(clients, managers=managers)
-chat_message_manager = managers.get('chat_message') or models.ChatMessageManager(clients, managers=managers)
-user_manager = managers.get('user') or models.UserManager(clients, managers=managers)
-appstore_manager = managers.get('appstore') or models.AppStoreManager(clients, managers=managers)
+registry = Registry(['appstore', 'appsync', 'dynamo', 'cognito', 'pinpoint', 'real_dating'])
+chat_manager = registry.get_manager('chat')
+chat_message_manager = registry.get_manager('chat_message')
+user_manager = registry.get_manager('user')
+appstore_manager = registry.get_manager('appstore')
 
 
 @handler_logging(event_to_extras=lambda event: {'event': event})
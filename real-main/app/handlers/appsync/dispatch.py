@@ -1,8 +1,10 @@
 "AppSync GraphQL data source"
+import collections
 import logging
 import os
 
 from app.logging import LogLevelContext, handler_logging
+from app.utils import identity_map
 
 from . import routes
 from .exceptions import ClientException
@@ -36,14 +38,25 @@ def get_gql_details(event):
 
 
 def event_to_extras(event):
+    if isinstance(event, list):
+        # a BatchInvoke, all events of which come from the same graphql request
+        extras = event_to_extras(event[0]) if event else {}
+        return {**extras, 'batchSize': len(event)}
     client = get_client_details(event)
     gql = get_gql_details(event)
     return {'gql': gql, 'client': client}
 
 
-@handler_logging(event_to_extras=event_to_extras)
-def dispatch(event, context):
-    "Top-level dispatch of appsync event to the correct handler"
+def to_result(data):
+    "Wrap a handler's return value, or the ClientException it raised, in an appsync lambda result"
+    if isinstance(data, ClientException):
+        logger.warning(str(data))
+        return {'error': data.serialize()}
+    return {'data': data}
+
+
+def resolve(event, context):
+    "Resolve a single field with its handler"
     # it is a sin that python has no dictionary destructing asignment
     client = get_client_details(event)
     gql = get_gql_details(event)
@@ -56,7 +69,7 @@ def dispatch(event, context):
         logger.exception(msg)
         raise Exception(msg)
 
-    # we suppress INFO logging, except this message
+    # we suppress INFO logging, except this message and the identity map stats
     with LogLevelContext(logger, logging.INFO):
         logger.info(f'Handling AppSync GQL resolution of `{field}`')
 
@@ -70,7 +83,64 @@ def dispatch(event, context):
             client=client,
         )
     except ClientException as err:
-        logger.warning(str(err))
-        return {'error': err.serialize()}
+        data = err
+    return to_result(data)
+
+
+def resolve_batch(events, context):
+    """
+    Resolve the events of a BatchInvoke. Events are grouped by field and caller, and each group is
+    resolved by one call to the field's batch handler, if it has one, else event by event.
+    Returns a list of results in the same order as `events`.
+    """
+    gqls = [get_gql_details(event) for event in events]
+    groups = collections.defaultdict(list)
+    for index, gql in enumerate(gqls):
+        groups[(gql['field'], gql['callerUserId'])].append(index)
+
+    results = [None] * len(events)
+    for (field, caller_user_id), indexes in groups.items():
+        batch_handler = routes.get_batch_handler(field)
+        if not batch_handler:
+            for index in indexes:
+                results[index] = resolve(events[index], context)
+            continue
+
+        with LogLevelContext(logger, logging.INFO):
+            logger.info(f'Handling AppSync GQL batch resolution of `{field}` for {len(indexes)} sources')
+
+        group_events = [events[index] for index in indexes]
+        try:
+            datas = batch_handler(
+                caller_user_id,
+                [gqls[index]['arguments'] for index in indexes],
+                sources=[gqls[index]['source'] for index in indexes],
+                context=context,
+                events=group_events,
+                client=get_client_details(group_events[0]),
+            )
+        except ClientException as err:
+            datas = [err] * len(indexes)
+        for index, data in zip(indexes, datas):
+            results[index] = to_result(data)
+    return results
 
-    return {'data': data}
+
+@handler_logging(event_to_extras=event_to_extras)
+def dispatch(event, context):
+    """
+    Top-level dispatch of appsync event to the correct handler.
+    A list of events is a BatchInvoke, for which a list of results is returned in the same order.
+    """
+    is_batch = isinstance(event, list)
+    events = event if is_batch else [event]
+
+    # models loaded while resolving are shared until the response is returned
+    with identity_map.scope():
+        try:
+            return resolve_batch(events, context) if is_batch else resolve(event, context)
+        finally:
+            if logger.isEnabledFor(logging.DEBUG):
+                fields = ', '.join(sorted({get_gql_details(e)['field'] for e in events}))
+                stats = identity_map.get_stats()
+                logger.debug(f'Identity map for `{fields}`: {stats["hits"]} hits, {stats["misses"]} misses')
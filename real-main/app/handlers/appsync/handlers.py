@@ -1,9 +1,7 @@
 import logging
-import os
 
 import pendulum
 
-from app import clients, models
 from app.mixins.flag.enums import FlagStatus
 from app.mixins.flag.exceptions import FlagException
 from app.mixins.view.enums import ViewType
@@ -16,6 +14,7 @@ from app.models.chat.exceptions import ChatException
 from app.models.chat_message.enums import ChatMessageNotificationType
 from app.models.chat_message.exceptions import ChatMessageException
 from app.models.comment.exceptions import CommentException
+from app.models.feed.exceptions import FeedException
 from app.models.follower.enums import FollowStatus
 from app.models.follower.exceptions import FollowerException
 from app.models.like.enums import LikeStatus
@@ -27,6 +26,7 @@ from app.models.user.exceptions import UserException
 from app.utils import image_size
 
 from .. import xray
+from ..registry import Registry
 from . import routes
 from .exceptions import ClientException
 from .validation import (
@@ -39,43 +39,41 @@ from .validation import (
     validate_match_location_radius,
 )
 
-S3_UPLOADS_BUCKET = os.environ.get('S3_UPLOADS_BUCKET')
-S3_PLACEHOLDER_PHOTOS_BUCKET = os.environ.get('S3_PLACEHOLDER_PHOTOS_BUCKET')
-
 logger = logging.getLogger()
 xray.patch_all()
 
-secrets_manager_client = clients.SecretsManagerClient()
-clients = {
-    'apple': clients.AppleClient(),
-    'appstore': clients.AppStoreClient(secrets_manager_client.get_apple_appstore_params),
-    'appsync': clients.AppSyncClient(),
-    'cloudfront': clients.CloudFrontClient(secrets_manager_client.get_cloudfront_key_pair),
-    'cognito': clients.CognitoClient(real_key_pair_getter=secrets_manager_client.get_real_key_pair),
-    'dynamo': clients.DynamoClient(),
-    'elasticsearch': clients.ElasticSearchClient(),
-    'facebook': clients.FacebookClient(),
-    'google': clients.GoogleClient(secrets_manager_client.get_google_client_ids),
-    'pinpoint': clients.PinpointClient(),
-    'post_verification': clients.PostVerificationClient(secrets_manager_client.get_post_verification_api_creds),
-    's3_uploads': clients.S3Client(S3_UPLOADS_BUCKET),
-    's3_placeholder_photos': clients.S3Client(S3_PLACEHOLDER_PHOTOS_BUCKET),
-}
-
-# shared hash table of all managers, enables inter-manager communication
-managers = {}
-appstore_manager = managers.get('appstore') or models.AppStoreManager(clients, managers=managers)
-album_manager = managers.get('album') or models.AlbumManager(clients, managers=managers)
-block_manager = managers.get('block') or models.BlockManager(clients, managers=managers)
-card_manager = managers.get('card') or models.CardManager(clients, managers=managers)
-chat_manager = managers.get('chat') or models.ChatManager(clients, managers=managers)
-chat_message_manager = managers.get('chat_message') or models.ChatMessageManager(clients, managers=managers)
-comment_manager = managers.get('comment') or models.CommentManager(clients, managers=managers)
-follower_manager = managers.get('follower') or models.FollowerManager(clients, managers=managers)
-like_manager = managers.get('like') or models.LikeManager(clients, managers=managers)
-post_manager = managers.get('post') or models.PostManager(clients, managers=managers)
-screen_manager = managers.get('screen') or models.ScreenManager(clients, managers=managers)
-user_manager = managers.get('user') or models.UserManager(clients, managers=managers)
+registry = Registry(
+    [
+        'apple',
+        'appstore',
+        'appsync',
+        'cloudfront',
+        'cognito',
+        'dynamo',
+        'dynamo_feed',
+        'elasticsearch',
+        'facebook',
+        'google',
+        'pinpoint',
+        'post_verification',
+        'real_dating',
+        's3_uploads',
+        's3_placeholder_photos',
+    ]
+)
+appstore_manager = registry.get_manager('appstore')
+album_manager = registry.get_manager('album')
+block_manager = registry.get_manager('block')
+card_manager = registry.get_manager('card')
+chat_manager = registry.get_manager('chat')
+chat_message_manager = registry.get_manager('chat_message')
+comment_manager = registry.get_manager('comment')
+feed_manager = registry.get_manager('feed')
+follower_manager = registry.get_manager('follower')
+like_manager = registry.get_manager('like')
+post_manager = registry.get_manager('post')
+screen_manager = registry.get_manager('screen')
+user_manager = registry.get_manager('user')
 
 
 def validate_caller(*args, allowed_statuses=None):
@@ -551,9 +549,7 @@ def add_app_store_receipt(caller_user, arguments, **kwargs):
     return True
 
 
-@routes.register('User.photo')
-def user_photo(caller_user_id, arguments, source=None, **kwargs):
-    user = user_manager.init_user(source)
+def serialize_user_photo(user):
     native_url = user.get_photo_url(image_size.NATIVE)
     if not native_url:
         return None
@@ -566,6 +562,31 @@ def user_photo(caller_user_id, arguments, source=None, **kwargs):
     }
 
 
+@routes.register('User.photo')
+def user_photo(caller_user_id, arguments, source=None, **kwargs):
+    return serialize_user_photo(user_manager.init_user(source))
+
+
+@routes.register_batch('User.photo')
+def user_photo_batch(caller_user_id, arguments, sources=None, **kwargs):
+    return [serialize_user_photo(user_manager.init_user(source)) for source in sources]
+
+
+@routes.register('User.feed')
+def user_feed(caller_user_id, arguments, source=None, **kwargs):
+    # feed is private to the user themselves
+    if source['userId'] != caller_user_id:
+        return None
+    limit = arguments.get('limit')
+    limit = 20 if limit is None else limit
+    if limit < 1 or limit > 100:
+        raise ClientException('Limit cannot be less than 1 or greater than 100')
+    try:
+        return feed_manager.get_feed(caller_user_id, limit=limit, next_token=arguments.get('nextToken'))
+    except FeedException as err:
+        raise ClientException(str(err)) from err
+
+
 @routes.register('Mutation.followUser')
 @validate_caller
 @update_last_client
@@ -759,10 +780,7 @@ def add_post(caller_user, arguments, **kwargs):
     return post.serialize(caller_user.id)
 
 
-@routes.register('Post.image')
-def post_image(caller_user_id, arguments, source=None, **kwargs):
-    post = post_manager.get_post(source['postId'])
-
+def serialize_post_image(post):
     if not post or post.status == PostStatus.DELETING:
         return None
 
@@ -785,6 +803,18 @@ def post_image(caller_user_id, arguments, source=None, **kwargs):
     return image_item
 
 
+@routes.register('Post.image')
+def post_image(caller_user_id, arguments, source=None, **kwargs):
+    post = post_manager.init_posts_from_sources([source], subitems=['image'])[0]
+    return serialize_post_image(post)
+
+
+@routes.register_batch('Post.image')
+def post_image_batch(caller_user_id, arguments, sources=None, **kwargs):
+    posts = post_manager.init_posts_from_sources(sources, subitems=['image'])
+    return [serialize_post_image(post) for post in posts]
+
+
 @routes.register('Post.imageUploadUrl')
 def post_image_upload_url(caller_user_id, arguments, source=None, **kwargs):
     post_id = source['postId']
@@ -802,7 +832,7 @@ def post_image_upload_url(caller_user_id, arguments, source=None, **kwargs):
 
 @routes.register('Post.video')
 def post_video(caller_user_id, arguments, source=None, **kwargs):
-    post = post_manager.get_post(source['postId'])
+    post = post_manager.init_posts_from_sources([source])[0]
 
     statuses = (PostStatus.COMPLETED, PostStatus.ARCHIVED)
     if not post or post.type != PostType.VIDEO or post.status not in statuses:
@@ -1179,9 +1209,7 @@ def delete_card(caller_user, arguments, **kwargs):
     return card.serialize(caller_user.id)
 
 
-@routes.register('Card.thumbnail')
-def card_thumbnail(caller_user_id, arguments, source=None, **kwargs):
-    card = card_manager.get_card(source['cardId'])
+def serialize_card_thumbnail(card):
     if card and card.post and card.post.type != PostType.TEXT_ONLY:
         return {
             'url': card.post.get_image_readonly_url(image_size.NATIVE),
@@ -1193,6 +1221,17 @@ def card_thumbnail(caller_user_id, arguments, source=None, **kwargs):
     return None
 
 
+@routes.register('Card.thumbnail')
+def card_thumbnail(caller_user_id, arguments, source=None, **kwargs):
+    return serialize_card_thumbnail(card_manager.get_card(source['cardId']))
+
+
+@routes.register_batch('Card.thumbnail')
+def card_thumbnail_batch(caller_user_id, arguments, sources=None, **kwargs):
+    cards = card_manager.get_cards((source['cardId'] for source in sources), with_posts=True)
+    return [serialize_card_thumbnail(card) for card in cards]
+
+
 @routes.register('Mutation.addAlbum')
 @validate_caller
 @update_last_client
@@ -1259,9 +1298,7 @@ def delete_album(caller_user, arguments, **kwargs):
     return album.serialize(caller_user.id)
 
 
-@routes.register('Album.art')
-def album_art(caller_user_id, arguments, source=None, **kwargs):
-    album = album_manager.init_album(source)
+def serialize_album_art(album):
     return {
         'url': album.get_art_image_url(image_size.NATIVE),
         'url64p': album.get_art_image_url(image_size.P64),
@@ -1271,6 +1308,16 @@ def album_art(caller_user_id, arguments, source=None, **kwargs):
     }
 
 
+@routes.register('Album.art')
+def album_art(caller_user_id, arguments, source=None, **kwargs):
+    return serialize_album_art(album_manager.init_album(source))
+
+
+@routes.register_batch('Album.art')
+def album_art_batch(caller_user_id, arguments, sources=None, **kwargs):
+    return [serialize_album_art(album_manager.init_album(source)) for source in sources]
+
+
 @routes.register('Mutation.createDirectChat')
 @validate_caller
 @update_last_client
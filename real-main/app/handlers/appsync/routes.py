@@ -4,9 +4,13 @@ import importlib
 # graphql field -> python handler
 cache = {}
 
+# graphql field -> python handler that resolves a BatchInvoke of the field in one go
+batch_cache = {}
+
 
 def clear():
     cache.clear()
+    batch_cache.clear()
 
 
 def register(field):
@@ -19,12 +23,29 @@ def register(field):
     return inner
 
 
+def register_batch(field):
+    """
+    Decorator to register a batch-aware handler for an appsync graphql field.
+    The handler is called with lists of arguments and sources and must return a list of results in the same order.
+    """
+
+    def inner(func):
+        batch_cache[field] = func
+        return func
+
+    return inner
+
+
 def get_handler(field):
     return cache.get(field)
 
 
+def get_batch_handler(field):
+    return batch_cache.get(field)
+
+
 def discover(path):
-    cache.clear()
+    clear()
     # registers handlers in the routing table as a side effect of importing
     # add more imports here as handlers are spread across files
     importlib.import_module(path)
@@ -3,56 +3,48 @@ import os
 
 import pendulum
 
-from app import clients, models
 from app.logging import LogLevelContext, handler_logging
 
 from . import xray
+from .registry import Registry
 
-S3_UPLOADS_BUCKET = os.environ.get('S3_UPLOADS_BUCKET')
 USER_NOTIFICATIONS_ENABLED = os.environ.get('USER_NOTIFICATIONS_ENABLED')
 USER_NOTIFICATIONS_ONLY_USERNAMES = os.environ.get('USER_NOTIFICATIONS_ONLY_USERNAMES')
 
 logger = logging.getLogger()
 xray.patch_all()
 
-secrets_manager_client = clients.SecretsManagerClient()
-clients = {
-    'appstore': clients.AppStoreClient(secrets_manager_client.get_apple_appstore_params),
-    'dynamo': clients.DynamoClient(),
-    'cognito': clients.CognitoClient(),
-    'pinpoint': clients.PinpointClient(),
-    'real_dating': clients.RealDatingClient(),
-    's3_uploads': clients.S3Client(S3_UPLOADS_BUCKET),
-}
-
-managers = {}
-appstore_manager = managers.get('appstore') or models.AppStoreManager(clients, managers=managers)
-album_manager = managers.get('album') or models.AlbumManager(clients, managers=managers)
-card_manager = managers.get('card') or models.CardManager(clients, managers=managers)
-post_manager = managers.get('post') or models.PostManager(clients, managers=managers)
-user_manager = managers.get('user') or models.UserManager(clients, managers=managers)
-comment_manager = managers.get('comment') or models.CommentManager(clients, managers=managers)
-chat_message_manager = managers.get('chat_message') or models.ChatMessageManager(clients, managers=managers)
+registry = Registry(['appstore', 'bad_words', 'dynamo', 'cognito', 'pinpoint', 'real_dating', 's3_uploads'])
+appstore_manager = registry.get_manager('appstore')
+album_manager = registry.get_manager('album')
+card_manager = registry.get_manager('card')
+post_manager = registry.get_manager('post')
+user_manager = registry.get_manager('user')
+comment_manager = registry.get_manager('comment')
+chat_message_manager = registry.get_manager('chat_message')
+
+
+def log_trending_deflation(label, result):
+    rate = result['processed'] / result['seconds'] if result['seconds'] else 0
+    resumed = ' (resumed)' if result['resumed'] else ''
+    with LogLevelContext(logger, logging.INFO):
+        logger.info(
+            f'Trending {label}{resumed}: {result["deflated"]} deflated, {result["deleted"]} removed, '
+            + f'out of {result["total"]}. Processed {result["processed"]} in {result["seconds"]:.2f}s, '
+            + f'{rate:.0f} items/sec'
+        )
 
 
 @handler_logging
 def deflate_trending_users(event, context):
-    total_cnt, deflated_cnt = user_manager.trending_deflate()
-    with LogLevelContext(logger, logging.INFO):
-        logger.info(f'Trending users deflated: {deflated_cnt} out of {total_cnt}')
-    deleted_cnt = user_manager.trending_delete_tail(total_cnt)
-    with LogLevelContext(logger, logging.INFO):
-        logger.info(f'Trending users removed: {deleted_cnt} out of {total_cnt}')
+    result = user_manager.trending_deflate_and_delete_tail()
+    log_trending_deflation('users', result)
 
 
 @handler_logging
 def deflate_trending_posts(event, context):
-    total_cnt, deflated_cnt = post_manager.trending_deflate()
-    with LogLevelContext(logger, logging.INFO):
-        logger.info(f'Trending posts deflated: {deflated_cnt} out of {total_cnt}')
-    deleted_cnt = post_manager.trending_delete_tail(total_cnt)
-    with LogLevelContext(logger, logging.INFO):
-        logger.info(f'Trending posts removed: {deleted_cnt} out of {total_cnt}')
+    result = post_manager.trending_deflate_and_delete_tail()
+    log_trending_deflation('posts', result)
 
 
 @handler_logging
@@ -119,6 +111,8 @@ def auto_disable_dating(event, context):
 
 @handler_logging
 def detect_bad_words(event, context):
+    # runs on each upload of the list, which may be within the cached list's ttl
+    registry.clients['bad_words'].refresh_index()
     comment_manager.clear_comment_bad_words()
     chat_message_manager.clear_chat_message_bad_words()
     with LogLevelContext(logger, logging.INFO):
@@ -12,31 +12,78 @@ class DynamoDispatch:
 
     def __init__(self):
         self.listeners = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        self.plans = {}
 
-    def register(self, pk_prefix, sk_prefix, event_names, handler, attributes=None):
+    def register(self, pk_prefix, sk_prefix, event_names, handler, attributes=None, idempotent=False):
         """
         Register a handler.
 
         The `attributes` parameter, if provided, should be a dictionary of {name: default_value}.
         If `attributes` is present handler will only be called if at least one of the
         values of `attributes` have changed when applied to the old & new items.
+
+        Set `idempotent` if calling the handler again with the same items does no harm. Only failures
+        of idempotent handlers cause a stream record to be retried.
         """
         for event_name in event_names:
             self.listeners[pk_prefix][sk_prefix][event_name].append(
-                {'handler': handler, 'attributes': attributes}
+                {'handler': handler, 'attributes': attributes, 'idempotent': idempotent}
             )
+            self.plans.pop((pk_prefix, sk_prefix, event_name), None)
+
+    def get_plan(self, pk_prefix, sk_prefix, event_name):
+        "Get the compiled DispatchPlan for the given prefixes and event, compiling it if needed"
+        key = (pk_prefix, sk_prefix, event_name)
+        if key not in self.plans:
+            listeners = self.listeners.get(pk_prefix, {}).get(sk_prefix, {}).get(event_name, [])
+            self.plans[key] = DispatchPlan(listeners)
+        return self.plans[key]
 
     def search(self, pk_prefix, sk_prefix, event_name, old_item, new_item):
-        "Returns a set of matching listener functions"
-        matches = []
-        for listener in self.listeners[pk_prefix][sk_prefix][event_name]:
-            if not listener['attributes']:
-                matches.append(listener['handler'])
-                continue
-            for attr_name, attr_default in listener['attributes'].items():
-                old_value = old_item.get(attr_name, attr_default)
-                new_value = new_item.get(attr_name, attr_default)
-                if old_value != new_value:
-                    matches.append(listener['handler'])
-                    break
-        return matches
+        "Returns a list of matching listener functions"
+        return self.get_plan(pk_prefix, sk_prefix, event_name).search(old_item, new_item)
+
+
+class DispatchPlan:
+    """
+    The listeners for one (pk_prefix, sk_prefix, event_name), compiled for fast searching.
+
+    Each distinct watched (attribute name, default value) pair is diffed only once per search,
+    with the result shared by all listeners watching it.
+    """
+
+    def __init__(self, listeners):
+        self.attributes = []  # list of distinct (name, default) pairs
+        self.listeners = []  # list of (handler, indexes into self.attributes), indexes is None for no filter
+        self.idempotent_handlers = set()
+        for listener in listeners:
+            indexes = None
+            if listener['attributes']:
+                indexes = tuple(self.index_attribute(*attr) for attr in listener['attributes'].items())
+            self.listeners.append((listener['handler'], indexes))
+            if listener['idempotent']:
+                self.idempotent_handlers.add(listener['handler'])
+
+        # attributes needed from the old & new items to complete a search
+        self.attribute_names = set(name for name, _ in self.attributes)
+
+    def index_attribute(self, name, default):
+        for idx, (other_name, other_default) in enumerate(self.attributes):
+            if name == other_name and type(default) is type(other_default) and default == other_default:
+                return idx
+        self.attributes.append((name, default))
+        return len(self.attributes) - 1
+
+    def search(self, old_item, new_item):
+        """
+        Returns a list of matching listener functions.
+        The old & new items need only include the attributes in `self.attribute_names`.
+        """
+        changed = [
+            old_item.get(name, default) != new_item.get(name, default) for name, default in self.attributes
+        ]
+        return [
+            handler
+            for handler, indexes in self.listeners
+            if indexes is None or any(changed[idx] for idx in indexes)
+        ]
@@ -0,0 +1,127 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from app.logging import log_info
+
+logger = logging.getLogger()
+
+# https://stackoverflow.com/a/46738251
+deserialize = TypeDeserializer().deserialize
+
+
+class DynamoStreamProcessor:
+    """
+    Processes a batch of dynamo stream records, calling the matching listeners from a DynamoDispatch.
+
+    Records are grouped by partition key. Groups are processed concurrently on a bounded thread pool,
+    records within a group are processed serially in the order they appear in the batch. Dynamo streams
+    only guarantee ordering per item, so no ordering across partition keys is lost.
+
+    Failures of idempotent listeners are reported rather than swallowed, via a partial batch response.
+    For a stream, the lambda service checkpoints at the first failed record and retries it and *every*
+    record after it in the batch, whatever their partition key. So all records from the first failed
+    one on are reported, and listeners that are not idempotent (ex: ones that increment counters) must
+    not have run on any of them. That's done in two passes over the batch:
+      1. the idempotent listeners of every record, stopping at the first failure
+      2. the other listeners of the records before the first failure, their failures are logged only
+    https://docs.aws.amazon.com/lambda/latest/dg/with-ddb.html#services-ddb-batchfailurereporting
+    """
+
+    def __init__(self, dispatch, max_workers=8):
+        self.dispatch = dispatch
+        self.max_workers = max_workers
+
+    def process(self, records):
+        "Process the given stream records. Returns a list of the sequence numbers of the records to retry"
+        groups = OrderedDict()
+        for index, record in enumerate(records):
+            pk = deserialize(record['dynamodb']['Keys']['partitionKey'])
+            groups.setdefault(pk, []).append(index)
+
+        calls = [None] * len(records)
+        first_failed = len(records)
+        lock = threading.Lock()
+
+        def run_idempotent_listeners(indexes):
+            nonlocal first_failed
+            for index in indexes:
+                if index > first_failed:
+                    # will be retried anyway
+                    return
+                calls[index] = self.get_calls(records[index])
+                if calls[index] and not self.run_listeners(calls[index], calls[index]['idempotent_funcs']):
+                    with lock:
+                        first_failed = min(first_failed, index)
+                    return
+
+        def run_other_listeners(indexes):
+            for index in indexes:
+                if index >= first_failed:
+                    return
+                if calls[index]:
+                    self.run_listeners(calls[index], calls[index]['other_funcs'])
+
+        self.map_groups(run_idempotent_listeners, groups.values())
+        self.map_groups(run_other_listeners, groups.values())
+        return [record['dynamodb']['SequenceNumber'] for record in records[first_failed:]]
+
+    def map_groups(self, func, groups):
+        "Call `func` with each group, concurrently if there's more than one"
+        groups = list(groups)
+        if len(groups) < 2 or self.max_workers < 2:
+            for group in groups:
+                func(group)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(groups))) as executor:
+                list(executor.map(func, groups))
+
+    def get_calls(self, record):
+        """
+        Find the listeners that match the record.
+        Returns None if there are none, else a dict of what's needed to call them.
+        """
+        name = record['eventName']
+        pk = deserialize(record['dynamodb']['Keys']['partitionKey'])
+        sk = deserialize(record['dynamodb']['Keys']['sortKey'])
+        old_image = record['dynamodb'].get('OldImage', {})
+        new_image = record['dynamodb'].get('NewImage', {})
+        log_info(logger, f'{name}: `{pk}` / `{sk}` starting processing')
+
+        pk_prefix, item_id = pk.split('/')
+        sk_prefix = sk.split('/')[0]
+
+        # only the watched attributes are needed to find the matching listeners
+        plan = self.dispatch.get_plan(pk_prefix, sk_prefix, name)
+        funcs = plan.search(
+            {k: deserialize(old_image[k]) for k in plan.attribute_names if k in old_image},
+            {k: deserialize(new_image[k]) for k in plan.attribute_names if k in new_image},
+        )
+        if not funcs:
+            return None
+
+        old_item = {k: deserialize(v) for k, v in old_image.items()}
+        new_item = {k: deserialize(v) for k, v in new_image.items()}
+        return {
+            'description': f'{name}: `{pk}` / `{sk}`',
+            'item_id': item_id,
+            'item_kwargs': {k: v for k, v in {'new_item': new_item, 'old_item': old_item}.items() if v},
+            'idempotent_funcs': [func for func in funcs if func in plan.idempotent_handlers],
+            'other_funcs': [func for func in funcs if func not in plan.idempotent_handlers],
+        }
+
+    def run_listeners(self, calls, funcs):
+        "Call the listeners. Returns True if all succeeded, False if any of them raised an exception"
+        success = True
+        for func in funcs:
+            log_info(logger, f'{calls["description"]} running: {func}')
+            # other listeners on the same record are still run, they're independent of each other
+            try:
+                func(calls['item_id'], **calls['item_kwargs'])
+            except Exception as err:
+                logger.exception(str(err))
+                success = False
+        return success
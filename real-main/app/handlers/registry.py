@@ -0,0 +1,125 @@
+import os
+import threading
+
+import boto3
+
+from app import clients, models
+
+DYNAMO_FEED_TABLE = os.environ.get('DYNAMO_FEED_TABLE')
+S3_UPLOADS_BUCKET = os.environ.get('S3_UPLOADS_BUCKET')
+S3_PLACEHOLDER_PHOTOS_BUCKET = os.environ.get('S3_PLACEHOLDER_PHOTOS_BUCKET')
+
+MANAGER_CLASS_NAMES = {
+    'album': 'AlbumManager',
+    'appstore': 'AppStoreManager',
+    'block': 'BlockManager',
+    'card': 'CardManager',
+    'chat': 'ChatManager',
+    'chat_message': 'ChatMessageManager',
+    'comment': 'CommentManager',
+    'feed': 'FeedManager',
+    'follower': 'FollowerManager',
+    'like': 'LikeManager',
+    'post': 'PostManager',
+    'screen': 'ScreenManager',
+    'user': 'UserManager',
+}
+
+
+class Lazy:
+    """
+    Stands in for an object that is constructed by `factory` the first time any of its attributes is used.
+    The factory is called at most once, even if the first uses are concurrent.
+    """
+
+    __slots__ = ('_factory', '_lock', '_target')
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._factory()
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __repr__(self):
+        return f'<Lazy {self._target!r}>' if self._target is not None else '<Lazy (not yet constructed)>'
+
+
+class Registry:
+    """
+    The clients and managers of a lambda handler module, each constructed the first time it is used.
+
+    A handler module lists all the clients its managers may need, but only pays at cold start for those
+    its invocations actually use. Clients that need a secret fetch it the first time they need it, and the
+    secrets manager client is itself only constructed then. A manager is constructed the first time it is
+    used, along with the managers it references, all sharing the clients.
+
+    The aws clients share one boto3 session, and one boto3 resource and low-level client per service.
+    Boto3 clients are thread safe, the resources are only used to look up tables and buckets.
+
+    Clients are looked up on `app.clients` when constructed, so patching a client class there - as tests
+    and benchmarks do - is respected.
+    """
+
+    def __init__(self, client_names):
+        self.boto3_session = None
+        self.boto3_lock = threading.Lock()
+        dynamodb = Lazy(lambda: self.from_boto3_session(lambda session: session.resource('dynamodb')))
+        dynamodb_client = Lazy(lambda: self.from_boto3_session(lambda session: session.client('dynamodb')))
+        s3 = Lazy(
+            lambda: self.from_boto3_session(lambda session: clients.S3Client.create_resource(session=session))
+        )
+        secrets = Lazy(lambda: clients.SecretsManagerClient())
+        factories = {
+            'apple': lambda: clients.AppleClient(),
+            'appstore': lambda: clients.AppStoreClient(lambda: secrets.get_apple_appstore_params()),
+            'appsync': lambda: clients.AppSyncClient(),
+            'bad_words': lambda: clients.BadWordsClient(),
+            'cloudfront': lambda: clients.CloudFrontClient(lambda: secrets.get_cloudfront_key_pair()),
+            'cognito': lambda: clients.CognitoClient(real_key_pair_getter=lambda: secrets.get_real_key_pair()),
+            'dynamo': lambda: clients.DynamoClient(boto3_resource=dynamodb, boto3_client=dynamodb_client),
+            'dynamo_feed': lambda: clients.DynamoClient(
+                table_name=DYNAMO_FEED_TABLE, boto3_resource=dynamodb, boto3_client=dynamodb_client
+            ),
+            'elasticsearch': lambda: clients.ElasticSearchClient(),
+            'facebook': lambda: clients.FacebookClient(),
+            'google': lambda: clients.GoogleClient(lambda: secrets.get_google_client_ids()),
+            'mediaconvert': lambda: clients.MediaConvertClient(),
+            'pinpoint': lambda: clients.PinpointClient(),
+            'post_verification': lambda: clients.PostVerificationClient(
+                lambda: secrets.get_post_verification_api_creds()
+            ),
+            'real_dating': lambda: clients.RealDatingClient(),
+            's3_uploads': lambda: clients.S3Client(S3_UPLOADS_BUCKET, s3=s3),
+            's3_placeholder_photos': lambda: clients.S3Client(S3_PLACEHOLDER_PHOTOS_BUCKET, s3=s3),
+        }
+        self.clients = {name: Lazy(factories[name]) for name in client_names}
+        # shared hash table of all managers, enables inter-manager communication
+        self.managers = {}
+        self.managers_lock = threading.Lock()
+
+    def from_boto3_session(self, factory):
+        "Create a boto3 resource or client from the shared session. Sessions aren't thread safe, so one at a time"
+        with self.boto3_lock:
+            if self.boto3_session is None:
+                self.boto3_session = boto3.session.Session()
+            return factory(self.boto3_session)
+
+    def get_manager(self, name):
+        "Returns a stand-in for the manager, constructed along with the managers it references on first use"
+        return Lazy(lambda: self.init_manager(name))
+
+    def init_manager(self, name):
+        with self.managers_lock:
+            if name not in self.managers:
+                manager_class = getattr(models, MANAGER_CLASS_NAMES[name])
+                manager_class(self.clients, managers=self.managers)
+            return self.managers[name]
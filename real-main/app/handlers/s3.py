@@ -1,31 +1,20 @@
 import logging
-import os
 import urllib
 
-from app import clients, models
 from app.logging import LogLevelContext, handler_logging
 from app.models.post.enums import PostStatus, PostType
 from app.models.post.exceptions import PostException
 
 from . import xray
-
-S3_UPLOADS_BUCKET = os.environ.get('S3_UPLOADS_BUCKET')
+from .registry import Registry
 
 logger = logging.getLogger()
 xray.patch_all()
 
-secrets_manager_client = clients.SecretsManagerClient()
-clients = {
-    'appsync': clients.AppSyncClient(),
-    'cloudfront': clients.CloudFrontClient(secrets_manager_client.get_cloudfront_key_pair),
-    'dynamo': clients.DynamoClient(),
-    'mediaconvert': clients.MediaConvertClient(),
-    'post_verification': clients.PostVerificationClient(secrets_manager_client.get_post_verification_api_creds),
-    's3_uploads': clients.S3Client(S3_UPLOADS_BUCKET),
-}
-
-managers = {}
-post_manager = managers.get('post') or models.PostManager(clients, managers=managers)
+registry = Registry(
+    ['appsync', 'cloudfront', 'dynamo', 'mediaconvert', 'post_verification', 'real_dating', 's3_uploads']
+)
+post_manager = registry.get_manager('post')
 
 
 def event_to_extras(event):
@@ -58,6 +58,17 @@ class LogLevelContext:
         self.logger.setLevel(self.old_level)
 
 
+def log_info(logger, msg):
+    """
+    Log at INFO even if the logger is set to a higher level.
+    Unlike LogLevelContext, the logger is left alone, so it's safe to use from concurrent threads.
+    """
+    if logger.disabled:
+        return
+    fn, lno, func, sinfo = logger.findCaller(stacklevel=2)
+    logger.handle(logger.makeRecord(logger.name, logging.INFO, fn, lno, msg, (), None, func, None, sinfo))
+
+
 # https://github.com/python/cpython/blob/v3.8.3/Lib/logging/__init__.py#L510
 class CloudWatchFormatter(logging.Formatter):
     "Format logging records so they json and readable in CloudWatch"
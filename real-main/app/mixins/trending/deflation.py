@@ -0,0 +1,153 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pendulum
+
+from .exceptions import TrendingDNEOrAttributeMismatch
+
+logger = logging.getLogger()
+
+TRENDING_DEFLATION_MAX_WORKERS = int(os.environ.get('TRENDING_DEFLATION_MAX_WORKERS', 8))
+
+
+class TrendingDeflation:
+    """
+    Deflates all the trending items of a manager's item type, deleting the low-scoring tail as it goes.
+
+    Trending items are paged from the trending index lowest score first. Items whose deflated score would
+    fall below the manager's `min_score_to_keep` are deleted, as long as more than `min_count_to_keep`
+    items would remain. All others are deflated. The items of each page are processed concurrently by a
+    pool of workers while the next page is being read.
+
+    Once every item of a page is processed a checkpoint is saved, so a run that is interrupted (ex: by a
+    lambda timeout) and retried on the same day resumes after the last fully processed page.
+    """
+
+    def __init__(self, manager, max_workers=TRENDING_DEFLATION_MAX_WORKERS, page_size=None):
+        "`page_size` optionally limits the number of items read per page, and so the work between checkpoints"
+        self.manager = manager
+        self.trending_dynamo = manager.trending_dynamo
+        self.client = manager.trending_dynamo.client
+        self.max_workers = max_workers
+        self.page_size = page_size
+
+    @property
+    def item_type(self):
+        return self.trending_dynamo.item_type
+
+    def checkpoint_pk(self):
+        return {
+            'partitionKey': f'{self.item_type}/trending',
+            'sortKey': 'deflation',
+        }
+
+    def get_checkpoint(self, now):
+        "Get the checkpoint left by an interrupted run earlier in the day, if any"
+        item = self.client.get_item(self.checkpoint_pk(), ConsistentRead=True)
+        return item if item and item['deflationDate'] == str(now.date()) else None
+
+    def save_checkpoint(self, last_key, now):
+        return self.client.set_attributes(
+            self.checkpoint_pk(), schemaVersion=0, deflationDate=str(now.date()), lastEvaluatedKey=last_key
+        )
+
+    def delete_checkpoint(self):
+        return self.client.delete_item(self.checkpoint_pk())
+
+    def is_below_min_score_once_deflated(self, trending_item, now):
+        last_deflation_at = pendulum.parse(trending_item['lastDeflatedAt'])
+        days_since_last_deflation = max((now - last_deflation_at.start_of('day')).days, 0)
+        inflation = self.manager.score_inflation_per_day ** days_since_last_deflation
+        return trending_item['gsiA4SortKey'] / inflation < self.manager.min_score_to_keep
+
+    def deflate_item(self, trending_item, now, retry_count=0):
+        "Returns True if the item was deflated, False if it had already been deflated today"
+        item_id = trending_item['partitionKey'].split('/')[1]
+        if retry_count > 2:
+            raise Exception(f'Deflation failed for item `{self.item_type}:{item_id}` after {retry_count} tries')
+
+        current_score = trending_item['gsiA4SortKey']
+        if current_score == 0:
+            logger.warning(f'Trending for item `{self.item_type}:{item_id}` already has score of zero')
+
+        last_deflation_at = pendulum.parse(trending_item['lastDeflatedAt'])
+        days_since_last_deflation = (now - last_deflation_at.start_of('day')).days
+        if days_since_last_deflation < 1:
+            logger.warning(f'Trending for item `{self.item_type}:{item_id}` has already been deflated today')
+            return False
+
+        new_score = current_score / (self.manager.score_inflation_per_day ** days_since_last_deflation)
+        try:
+            self.trending_dynamo.deflate_score(item_id, current_score, new_score, last_deflation_at.date(), now)
+        except TrendingDNEOrAttributeMismatch:
+            logger.warning(f'Trending deflate failure, trying again for `{self.item_type}:{item_id}`')
+            trending_item = self.trending_dynamo.get(item_id, strongly_consistent=True)
+            return self.deflate_item(trending_item, now, retry_count=retry_count + 1)
+        return True
+
+    def process_item(self, trending_item, delete, now):
+        "Returns 'deleted', 'deflated', or None if neither was done"
+        if delete:
+            item_id = trending_item['partitionKey'].split('/')[1]
+            try:
+                self.trending_dynamo.delete(item_id, expected_score=trending_item['gsiA4SortKey'])
+            except TrendingDNEOrAttributeMismatch:
+                # race condition, the item must have recieved a boost in score, so deflate it instead
+                logger.warning(f'Lost race condition, not deleting trending for `{self.item_type}:{item_id}`')
+                trending_item = self.trending_dynamo.get(item_id, strongly_consistent=True)
+                if not trending_item:
+                    return None
+            else:
+                return 'deleted'
+        return 'deflated' if self.deflate_item(trending_item, now) else None
+
+    def run(self, now=None):
+        """
+        Deflate and delete the tail of the trending items.
+        Returns a dict with the count of total, processed, deflated and deleted items, and the elapsed seconds.
+        """
+        now = now or pendulum.now('utc')
+        checkpoint = self.get_checkpoint(now)
+        checkpointed = checkpoint is not None
+        started_at = time.perf_counter()
+
+        total_count = self.trending_dynamo.count_items()
+        max_to_delete = max(total_count - self.manager.min_count_to_keep, 0)
+        counts = {'processed': 0, 'deflated': 0, 'deleted': 0}
+        to_delete = 0
+
+        def complete_page(futures, last_key):
+            nonlocal checkpointed
+            for future in futures:
+                result = future.result()
+                counts['processed'] += 1
+                if result:
+                    counts[result] += 1
+            if last_key is not None:
+                self.save_checkpoint(last_key, now)
+                checkpointed = True
+            elif checkpointed:
+                self.delete_checkpoint()
+
+        start_key = checkpoint['lastEvaluatedKey'] if checkpoint else None
+        pages = self.trending_dynamo.generate_item_pages(exclusive_start_key=start_key, page_size=self.page_size)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = None
+            for items, last_key in pages:
+                futures = []
+                for item in items:
+                    # the delete budget is handed out here, in score order, so the lowest scores go first
+                    delete = to_delete < max_to_delete and self.is_below_min_score_once_deflated(item, now)
+                    to_delete += int(delete)
+                    futures.append(executor.submit(self.process_item, item, delete, now))
+                # the next page is read while this one is being processed
+                if pending:
+                    complete_page(*pending)
+                pending = (futures, last_key)
+            if pending:
+                complete_page(*pending)
+
+        elapsed = time.perf_counter() - started_at
+        return {'total': total_count, **counts, 'seconds': elapsed, 'resumed': checkpoint is not None}
@@ -102,9 +102,21 @@ class TrendingDynamo:
 
     def generate_items(self):
         "Ordered with lowest score first."
-        query_kwargs = {
+        return self.client.generate_all_query(self.index_query_kwargs())
+
+    def generate_item_pages(self, exclusive_start_key=None, page_size=None):
+        "Generate tuples of (items, last evaluated key), ordered with lowest score first."
+        query_kwargs = self.index_query_kwargs()
+        if page_size:
+            query_kwargs['Limit'] = page_size
+        return self.client.generate_query_pages(query_kwargs, exclusive_start_key=exclusive_start_key)
+
+    def count_items(self):
+        return self.client.count_query(self.index_query_kwargs())
+
+    def index_query_kwargs(self):
+        return {
             'KeyConditionExpression': 'gsiA4PartitionKey = :gsia1pk',
             'ExpressionAttributeValues': {':gsia1pk': f'{self.item_type}/trending'},
             'IndexName': 'GSI-A4',
         }
-        return self.client.generate_all_query(query_kwargs)
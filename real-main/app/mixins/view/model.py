@@ -32,11 +32,13 @@ class ViewModelMixin:
         else:
             return ViewedStatus.NOT_VIEWED
 
-    def record_view_count(self, user_id, view_count, viewed_at=None, view_type=None):
+    def record_view_count(self, user_id, view_count, viewed_at=None, view_type=None, view_exists=None):
+        "Pass `view_exists` if it is already known whether the user has a view record, to save a read"
         viewed_at = viewed_at or pendulum.now('utc')
         is_first_view_for_user = False
-        view_item = self.view_dynamo.get_view(self.id, user_id)
-        if view_item:
+        if view_exists is None:
+            view_exists = bool(self.view_dynamo.get_view(self.id, user_id))
+        if view_exists:
             self.view_dynamo.increment_view_count(self.id, user_id, view_count, viewed_at, view_type=view_type)
         else:
             try:
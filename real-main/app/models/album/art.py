@@ -1,6 +1,7 @@
 import math
 
-import PIL.Image
+# PIL is imported within the functions that use it, as it is slow to import and most lambda
+# invocations don't generate art
 
 
 def generate_basic_grid(pil_images):
@@ -11,6 +12,7 @@ def generate_basic_grid(pil_images):
     No zooming or croping of input images.
     """
     assert len(pil_images) in (4, 9, 16), f'Unexpected number of inputs: `{len(pil_images)}`'
+    import PIL.Image
 
     # collect all the 1080p thumbs from all the post images
     max_width, max_height = 0, 0
@@ -31,7 +33,28 @@ def generate_basic_grid(pil_images):
     return target_image
 
 
-def generate_zoomed_grid(pil_images):
+def fit_dimensions(dimensions, max_dimensions):
+    """
+    Return the dimensions an image of the given `dimensions` would be thumbnailed to by PIL
+    to fit within `max_dimensions`, keeping its aspect ratio. Images are never enlarged.
+    """
+    width, height = dimensions
+    max_width, max_height = max_dimensions
+    if width <= max_width and height <= max_height:
+        return (width, height)
+
+    def round_aspect(number, key):
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+    aspect = width / height
+    if max_width / max_height >= aspect:
+        new_width = round_aspect(max_height * aspect, key=lambda n: abs(aspect - n / max_height))
+        return (new_width, max_height)
+    new_height = round_aspect(max_width / aspect, key=lambda n: 0 if n == 0 else abs(aspect - max_width / n))
+    return (max_width, new_height)
+
+
+def generate_zoomed_grid(pil_images, output_size=(3840, 2160)):
     """
     Given a square number (4, 9 or 16) of image data buffers, generate an buffer with a
     jpeg-encoded grid of those images.
@@ -39,42 +62,39 @@ def generate_zoomed_grid(pil_images):
     Zoom in or out and crop each image as needed so that it fills its cell perfectly.
     """
     assert len(pil_images) in (4, 9, 16), f'Unexpected number of inputs: `{len(pil_images)}`'
+    import PIL.Image
 
-    output_width, output_height = 3840, 2160
+    output_width, output_height = output_size
     stride = int(math.sqrt(len(pil_images)))
-    cell_width, cell_height = output_width // stride, output_height // stride
-
-    # collect and resize (zoom in or out as needed so each image fills its cell)
-    images = []
-    for image in pil_images:
-        image_width, image_height = image.size
-
-        # comparing aspect ratios without rounding errors
-        if image_width * cell_height > image_height * cell_width:
-            # image is wider than cell
-            new_image_width = image_height * cell_width / cell_height
-            margin = (image_width - new_image_width) / 2
-            box = (margin, 0, image_width - margin, image_height)
-        elif image_width * cell_height < image_height * cell_width:
-            # image is taller than cell
-            new_image_height = image_width * cell_height / cell_width
-            margin = (image_height - new_image_height) / 2
-            box = (0, margin, image_width, image_height - margin)
-        else:
-            # aspect ratios equal
-            box = None
-
-        if image_width != cell_width or image_height != cell_height:
-            image = image.resize((cell_width, cell_height), box=box, resample=PIL.Image.LANCZOS)
-
-        images.append(image)
+    # cells differ in size by at most a pixel when the output doesn't divide evenly
+    xs = [round(i * output_width / stride) for i in range(stride + 1)]
+    ys = [round(i * output_height / stride) for i in range(stride + 1)]
 
-    # paste those thumbs together as a grid
-    # Min size will be 4k since max_width and max_height come from 1080p thumbs
+    # resize (zoom in or out as needed so each image fills its cell) and paste together as a grid
     target_image = PIL.Image.new('RGB', (output_width, output_height))
     for row in range(0, stride):
         for column in range(0, stride):
-            image = images[row * stride + column]
-            loc = (column * cell_width, row * cell_height)
-            target_image.paste(image, loc)
+            image = pil_images[row * stride + column]
+            cell_width, cell_height = xs[column + 1] - xs[column], ys[row + 1] - ys[row]
+            image_width, image_height = image.size
+
+            # comparing aspect ratios without rounding errors
+            if image_width * cell_height > image_height * cell_width:
+                # image is wider than cell
+                new_image_width = image_height * cell_width / cell_height
+                margin = (image_width - new_image_width) / 2
+                box = (margin, 0, image_width - margin, image_height)
+            elif image_width * cell_height < image_height * cell_width:
+                # image is taller than cell
+                new_image_height = image_width * cell_height / cell_width
+                margin = (image_height - new_image_height) / 2
+                box = (0, margin, image_width, image_height - margin)
+            else:
+                # aspect ratios equal
+                box = None
+
+            if image_width != cell_width or image_height != cell_height:
+                image = image.resize((cell_width, cell_height), box=box, resample=PIL.Image.LANCZOS)
+
+            target_image.paste(image, (xs[column], ys[row]))
     return target_image
@@ -0,0 +1,189 @@
+import collections
+import contextlib
+import io
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.models.post.enums import PostType
+from app.utils import image_size
+
+from . import art
+from .exceptions import AlbumException
+
+ART_ENGINE_MAX_WORKERS = int(os.environ.get('ALBUM_ART_ENGINE_MAX_WORKERS', 8))
+ART_TILE_CACHE_MAX_BYTES = int(os.environ.get('ALBUM_ART_TILE_CACHE_MAX_BYTES', 128 * 2 ** 20))
+
+# the sizes a post's image can be fetched at to use as a tile, ordered by increasing size
+TILE_SIZES = (image_size.P64, image_size.P480, image_size.P1080, image_size.K4)
+TEXT_ONLY_TILE_SIZES = (image_size.P1080, image_size.K4)
+TILE_CACHE_ATTRS = {
+    image_size.K4.name: 'k4_jpeg_cache',
+    image_size.P1080.name: 'p1080_jpeg_cache',
+    image_size.P480.name: 'p480_jpeg_cache',
+    image_size.P64.name: 'p64_jpeg_cache',
+}
+
+# the size of the grid album art is composed at, before thumbnailing
+GRID_DIMENSIONS = image_size.K4.max_dimensions
+
+
+class TileCache:
+    """
+    Least-recently-used cache of decoded tiles, keyed by (post id, image size name).
+
+    Only active within a scope, which is meant to span one batch of stream records, so the art of albums
+    that are updated more than once in a batch, or that share posts, is generated without re-fetching and
+    re-decoding the same images. Outside of a scope nothing is cached.
+    """
+
+    def __init__(self, max_bytes=ART_TILE_CACHE_MAX_BYTES):
+        self.lock = threading.Lock()
+        self.max_bytes = max_bytes
+        self.active = False
+        self.tiles = collections.OrderedDict()
+        self.bytes = 0
+
+    @contextlib.contextmanager
+    def scope(self):
+        with self.lock:
+            self.active = True
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self.active = False
+                self.tiles.clear()
+                self.bytes = 0
+
+    def get(self, key):
+        with self.lock:
+            tile = self.tiles.get(key)
+            if tile is not None:
+                self.tiles.move_to_end(key)
+            return tile
+
+    def put(self, key, tile):
+        tile_bytes = tile.width * tile.height * len(tile.getbands())
+        with self.lock:
+            if not self.active or key in self.tiles or tile_bytes > self.max_bytes:
+                return
+            self.tiles[key] = tile
+            self.bytes += tile_bytes
+            while self.bytes > self.max_bytes:
+                _, evicted = self.tiles.popitem(last=False)
+                self.bytes -= evicted.width * evicted.height * len(evicted.getbands())
+
+
+class AlbumArtEngine:
+    """
+    Composes album art from the images of its posts.
+
+    Rather than composing the native art and then re-decoding it to generate the thumbnails, each size of
+    the art is composed directly, from the smallest thumbnail of each post that still covers its cell of
+    the grid without enlarging it. All posts are loaded in one batch, and their thumbnails are fetched and
+    decoded concurrently. Art sizes that come out the same - ex: the native and the 4K - are encoded once.
+    """
+
+    def __init__(self, post_manager, max_workers=ART_ENGINE_MAX_WORKERS, tile_cache=None):
+        self.post_manager = post_manager
+        self.max_workers = max_workers
+        self.tile_cache = tile_cache or TileCache()
+
+    def get_tile_sizes(self, post):
+        return TEXT_ONLY_TILE_SIZES if post.type == PostType.TEXT_ONLY else TILE_SIZES
+
+    def get_tile_dimensions(self, post, size):
+        "The dimensions of the image of the post at the given size, without fetching it"
+        image_item = post.image_item if post.type != PostType.TEXT_ONLY else {}
+        if image_item.get('width') and image_item.get('height'):
+            return art.fit_dimensions((int(image_item['width']), int(image_item['height'])), size.max_dimensions)
+        # text-only posts are rendered to fill their size, and other posts are guessed to be landscape
+        return size.max_dimensions
+
+    def choose_tile_size(self, post, dimensions):
+        "Choose the smallest size of the post's image that covers the given dimensions without being enlarged"
+        sizes = self.get_tile_sizes(post)
+        largest_dimensions = self.get_tile_dimensions(post, sizes[-1])
+        for size in sizes:
+            width, height = tile_dimensions = self.get_tile_dimensions(post, size)
+            if (width >= dimensions[0] and height >= dimensions[1]) or tile_dimensions == largest_dimensions:
+                return size
+        return sizes[-1]
+
+    def fetch_tile(self, post, size):
+        key = (post.id, size.name)
+        tile = self.tile_cache.get(key)
+        if tile is None:
+            tile = getattr(post, TILE_CACHE_ATTRS[size.name]).readonly_image
+            self.tile_cache.put(key, tile)
+        return tile
+
+    def plan(self, posts):
+        """
+        Plan the composition of each size of the art.
+        Returns a dict mapping each art size to a tuple of (dimensions, tuple of the tile size for each post).
+        """
+        plans = {}
+        if len(posts) == 1:
+            post = posts[0]
+            # art of a single post is the post's own image, no bigger than its 4K thumbnail
+            k4_dimensions = self.get_tile_dimensions(post, image_size.K4)
+            for size in image_size.JPEGS:
+                dimensions = art.fit_dimensions(k4_dimensions, size.max_dimensions or k4_dimensions)
+                plans[size] = (dimensions, (self.choose_tile_size(post, dimensions),))
+            return plans
+
+        stride = int(math.sqrt(len(posts)))
+        for size in image_size.JPEGS:
+            dimensions = art.fit_dimensions(GRID_DIMENSIONS, size.max_dimensions or GRID_DIMENSIONS)
+            cell_dimensions = (math.ceil(dimensions[0] / stride), math.ceil(dimensions[1] / stride))
+            plans[size] = (dimensions, tuple(self.choose_tile_size(post, cell_dimensions) for post in posts))
+        return plans
+
+    def compose(self, tiles, dimensions):
+        # PIL is slow to import, so it is deferred until there is art to generate
+        import PIL.Image
+
+        if len(tiles) == 1:
+            # as PIL's thumbnail() would do, but without copying a tile that already fits
+            tile = tiles[0]
+            fit_dimensions = art.fit_dimensions(tile.size, dimensions)
+            image = (
+                tile if tile.size == fit_dimensions else tile.resize(fit_dimensions, resample=PIL.Image.LANCZOS)
+            )
+        else:
+            image = art.generate_zoomed_grid(tiles, output_size=dimensions)
+        buf = io.BytesIO()
+        image = image if image.mode == 'RGB' else image.convert('RGB')
+        image.save(buf, format='JPEG', quality=100)
+        return buf.getvalue()
+
+    def generate(self, post_ids):
+        """
+        Generate the art for the posts with the given ids, of which there must be 1, 4, 9 or 16.
+        Returns a dict mapping each image size in `image_size.JPEGS` to jpeg-encoded data.
+        """
+        assert len(post_ids) in (1, 4, 9, 16), f'Unexpected number of posts: `{len(post_ids)}`'
+        posts = self.post_manager.get_posts(post_ids, subitems=('image',))
+        if missing_post_ids := [post_id for post_id, post in zip(post_ids, posts) if not post]:
+            raise AlbumException(f'Posts `{missing_post_ids}` not found for album art')
+
+        plans = self.plan(posts)
+        # art sizes that come out the same are composed once
+        compositions = set(plans.values())
+        tile_keys = {key for _, tile_sizes in compositions for key in enumerate(tile_sizes)}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            tile_futures = {key: executor.submit(self.fetch_tile, posts[key[0]], key[1]) for key in tile_keys}
+            tiles = {key: future.result() for key, future in tile_futures.items()}
+            data_futures = {
+                composition: executor.submit(
+                    self.compose,
+                    [tiles[(post_idx, tile_size)] for post_idx, tile_size in enumerate(composition[1])],
+                    composition[0],
+                )
+                for composition in compositions
+            }
+            return {size: data_futures[composition].result() for size, composition in plans.items()}
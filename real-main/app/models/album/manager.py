@@ -4,6 +4,7 @@ import pendulum
 
 from app import models
 
+from .art_engine import AlbumArtEngine
 from .dynamo import AlbumDynamo
 from .model import Album
 
@@ -15,10 +16,11 @@ class AlbumManager:
     zero_post_lifetime = pendulum.duration(hours=24)
 
     def __init__(self, clients, managers=None):
-        managers = managers or {}
+        managers = {} if managers is None else managers
         managers['album'] = self
         self.post_manager = managers.get('post') or models.PostManager(clients, managers=managers)
         self.user_manager = managers.get('user') or models.UserManager(clients, managers=managers)
+        self.art_engine = AlbumArtEngine(self.post_manager)
 
         self.clients = clients
         if 'dynamo' in clients:
@@ -36,6 +38,7 @@ class AlbumManager:
             cloudfront_client=self.clients.get('cloudfront'),
             user_manager=self.user_manager,
             post_manager=self.post_manager,
+            art_engine=self.art_engine,
         )
 
     def add_album(self, caller_user_id, album_id, name, description=None, now=None):
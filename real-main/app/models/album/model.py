@@ -1,14 +1,10 @@
 import hashlib
-import io
 import itertools
 import logging
 import os
 
-import PIL.Image
-
 from app.utils import image_size
 
-from . import art
 from .exceptions import AlbumException
 
 logger = logging.getLogger()
@@ -28,6 +24,7 @@ class Album:
         s3_uploads_client=None,
         user_manager=None,
         post_manager=None,
+        art_engine=None,
         frontend_resources_domain=CLOUDFRONT_FRONTEND_RESOURCES_DOMAIN,
     ):
         self.dynamo = album_dynamo
@@ -39,6 +36,8 @@ class Album:
             self.post_manager = post_manager
         if user_manager:
             self.user_manager = user_manager
+        if art_engine:
+            self.art_engine = art_engine
         self.frontend_resources_domain = frontend_resources_domain
         self.item = album_item
         self.id = album_item['albumId']
@@ -80,7 +79,7 @@ class Album:
     def get_art_image_url(self, size):
         art_image_path = self.get_art_image_path(size)
         if art_image_path:
-            return self.cloudfront_client.generate_presigned_url(art_image_path, ['GET', 'HEAD'])
+            return self.cloudfront_client.generate_presigned_readonly_url(art_image_path)
         return f'https://{self.frontend_resources_domain}/default-album-art/{size.filename}'
 
     def get_art_image_path_prefix(self):
@@ -120,21 +119,8 @@ class Album:
         if new_art_hash == old_art_hash:
             return self  # no changes
 
-        posts = [self.post_manager.get_post(post_id) for post_id in post_ids]
-        if len(posts) == 0:
-            new_native_image = None
-        elif len(posts) == 1:
-            new_native_image = posts[0].k4_jpeg_cache.readonly_image
-        else:
-            images = [post.p1080_jpeg_cache.readonly_image for post in posts]
-            new_native_image = art.generate_zoomed_grid(images)
-
-        if new_native_image:
-            # convert to jpeg
-            buf_out = io.BytesIO()
-            new_native_image.save(buf_out, format='JPEG', quality=100)
-            buf_out.seek(0)
-            self.save_art_images(new_art_hash, buf_out)
+        if post_ids:
+            self.save_art_images(new_art_hash, self.art_engine.generate(post_ids))
 
         self.item = self.dynamo.set_album_art_hash(self.id, new_art_hash)
 
@@ -145,22 +131,13 @@ class Album:
 
     def delete_art_images(self, art_hash):
         # remove the images from s3
-        for size in image_size.JPEGS:
-            path = self.get_art_image_path(size, art_hash=art_hash)
-            self.s3_uploads_client.delete_object(path)
-
-    def save_art_images(self, art_hash, native_image_buf):
-        # save the native size to S3
-        path = self.get_art_image_path(image_size.NATIVE, art_hash=art_hash)
-        self.s3_uploads_client.put_object(path, native_image_buf.read(), self.jpeg_content_type)
-
-        # generate and save thumbnails
-        native_image_buf.seek(0)
-        image = PIL.Image.open(native_image_buf)
-        for size in image_size.THUMBNAILS:  # ordered by decreasing size
-            image.thumbnail(size.max_dimensions, resample=PIL.Image.LANCZOS)
-            in_mem_file = io.BytesIO()
-            image.save(in_mem_file, format='JPEG', quality=100, icc_profile=image.info.get('icc_profile'))
-            in_mem_file.seek(0)
-            path = self.get_art_image_path(size, art_hash=art_hash)
-            self.s3_uploads_client.put_object(path, in_mem_file.read(), self.jpeg_content_type)
+        paths = [self.get_art_image_path(size, art_hash=art_hash) for size in image_size.JPEGS]
+        self.s3_uploads_client.delete_objects(paths)
+
+    def save_art_images(self, art_hash, art_images):
+        "Save to S3 the jpeg-encoded `art_images`, keyed by image size"
+        objects = [
+            (self.get_art_image_path(size, art_hash=art_hash), data, self.jpeg_content_type)
+            for size, data in art_images.items()
+        ]
+        self.s3_uploads_client.put_objects(objects)
@@ -15,7 +15,7 @@ class AppStoreManager:
     verification_period = pendulum.duration(hours=24)
 
     def __init__(self, clients, managers=None):
-        managers = managers or {}
+        managers = {} if managers is None else managers
         managers['appstore'] = self
 
         self.clients = clients
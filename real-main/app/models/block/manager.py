@@ -2,6 +2,7 @@ import logging
 
 from app import models
 from app.models.user.enums import UserStatus
+from app.utils import identity_map
 
 from .dynamo import BlockDynamo
 from .enums import BlockStatus
@@ -12,7 +13,7 @@ logger = logging.getLogger()
 
 class BlockManager:
     def __init__(self, clients, managers=None):
-        managers = managers or {}
+        managers = {} if managers is None else managers
         managers['block'] = self
         self.chat_manager = managers.get('chat') or models.ChatManager(clients, managers=managers)
         self.follower_manager = managers.get('follower') or models.FollowerManager(clients, managers=managers)
@@ -24,8 +25,10 @@ class BlockManager:
             self.dynamo = BlockDynamo(clients['dynamo'])
 
     def is_blocked(self, blocker_user_id, blocked_user_id):
-        block_item = self.dynamo.get_block(blocker_user_id, blocked_user_id)
-        return bool(block_item)
+        def load():
+            return bool(self.dynamo.get_block(blocker_user_id, blocked_user_id))
+
+        return identity_map.get(('block', blocker_user_id, blocked_user_id), load)
 
     def get_block_status(self, blocker_user_id, blocked_user_id):
         if blocker_user_id == blocked_user_id:
@@ -35,6 +38,7 @@ class BlockManager:
 
     def block(self, blocker_user, blocked_user):
         block_item = self.dynamo.add_block(blocker_user.id, blocked_user.id)
+        identity_map.invalidate(('block', blocker_user.id, blocked_user.id))
 
         if blocked_user.status != UserStatus.ACTIVE:
             raise BlockException(f'Cannot block user with status `{blocked_user.status}`')
@@ -62,6 +66,7 @@ class BlockManager:
 
     def unblock(self, blocker_user, blocked_user):
         deleted_item = self.dynamo.delete_block(blocker_user.id, blocked_user.id)
+        identity_map.invalidate(('block', blocker_user.id, blocked_user.id))
         if not deleted_item:
             raise NotBlocked(blocker_user.id, blocked_user.id)
         return deleted_item
@@ -70,6 +75,7 @@ class BlockManager:
         "Unblock everyone who the user has blocked, or has blocked the user"
         self.dynamo.delete_all_blocks_by_user(user_id)
         self.dynamo.delete_all_blocks_of_user(user_id)
+        identity_map.invalidate_type('block')
 
     def on_user_blocked_sync_user_status(self, user_id, new_item):
         blocker_user_id = new_item['sortKey'].split('/')[1]
@@ -1,31 +1,28 @@
 import logging
 
-import gql
-
 logger = logging.getLogger()
 
 
 class CardAppSync:
+    trigger_notification_mutation = '''
+        mutation TriggerCardNotification ($input: CardNotificationInput!) {
+            triggerCardNotification (input: $input) {
+                userId
+                type
+                card {
+                    cardId
+                    title
+                    subTitle
+                    action
+                }
+            }
+        }
+    '''
+
     def __init__(self, appsync_client):
         self.client = appsync_client
 
     def trigger_notification(self, notification_type, user_id, card_id, title, action, sub_title=None):
-        mutation = gql.gql(
-            '''
-            mutation TriggerCardNotification ($input: CardNotificationInput!) {
-                triggerCardNotification (input: $input) {
-                    userId
-                    type
-                    card {
-                        cardId
-                        title
-                        subTitle
-                        action
-                    }
-                }
-            }
-        '''
-        )
         input_obj = {
             'userId': user_id,
             'type': notification_type,
@@ -34,4 +31,4 @@ class CardAppSync:
             'subTitle': sub_title,
             'action': action,
         }
-        self.client.send(mutation, {'input': input_obj})
+        self.client.send(self.trigger_notification_mutation, {'input': input_obj})
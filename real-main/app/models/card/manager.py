@@ -4,6 +4,7 @@ from functools import partialmethod
 import pendulum
 
 from app import models
+from app.clients.dynamo import DynamoLoader
 from app.models.user.enums import UserStatus, UserSubscriptionLevel
 
 from . import templates
@@ -18,7 +19,7 @@ logger = logging.getLogger()
 
 class CardManager:
     def __init__(self, clients, managers=None):
-        managers = managers or {}
+        managers = {} if managers is None else managers
         managers['card'] = self
         self.comment_manager = managers.get('comment') or models.CommentManager(clients, managers=managers)
         self.post_manager = managers.get('post') or models.PostManager(clients, managers=managers)
@@ -35,6 +36,21 @@ class CardManager:
         item = self.dynamo.get_card(card_id, strongly_consistent=strongly_consistent)
         return self.init_card(item) if item else None
 
+    def get_cards(self, card_ids, with_posts=False):
+        """
+        Get many cards at once. Returns a list in the same order as `card_ids`, with None for any that DNE.
+        If `with_posts` is set, the cards' posts are loaded in one more batch.
+        """
+        loader = DynamoLoader(self.dynamo.client)
+        items = loader.load_many(self.dynamo.pk(card_id) for card_id in card_ids)
+        cards = [self.init_card(item) if item else None for item in items]
+        if with_posts:
+            post_cards = [card for card in cards if card and card.post_id]
+            posts = self.post_manager.get_posts(card.post_id for card in post_cards)
+            for card, post in zip(post_cards, posts):
+                card._post = post
+        return cards
+
     def init_card(self, item):
         kwargs = {
             'appsync': getattr(self, 'appsync', None),
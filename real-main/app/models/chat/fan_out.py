@@ -0,0 +1,86 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pendulum
+
+logger = logging.getLogger()
+
+CHAT_FAN_OUT_MAX_WORKERS = int(os.environ.get('CHAT_FAN_OUT_MAX_WORKERS', 16))
+
+
+class ChatMemberFanOut:
+    """
+    Applies the addition or deletion of a chat message to each of the chat's members.
+
+    Dynamo has no batch update, so the per-member updates are made concurrently by a pool of workers.
+    Each update is an independent, best-effort conditional update of one member's item, so there is
+    nothing to gain from making them in transactions. The views of the chat that decide which members
+    had already seen a deleted message are batch loaded, rather than read one member at a time.
+    """
+
+    def __init__(self, member_dynamo, view_dynamo, max_workers=CHAT_FAN_OUT_MAX_WORKERS):
+        self.member_dynamo = member_dynamo
+        self.view_dynamo = view_dynamo
+        self.max_workers = max_workers
+
+    def on_message_add(self, message):
+        """
+        For each member of the chat:
+          - update the last message activity timestamp (controls chat ordering)
+          - for everyone except the author, increment their 'messagesUnviewedCount'
+        """
+
+        def update_member(user_id):
+            self.member_dynamo.update_last_message_activity_at(message.chat_id, user_id, message.created_at)
+            if user_id != message.user_id:
+                self.member_dynamo.increment_messages_unviewed_count(message.chat_id, user_id)
+                # TODO
+                # we can be in a state where the user manually dismissed a card, and this view does not
+                # change the user's overall count of chats with unread messages, but should still create a card
+
+        user_ids = list(self.member_dynamo.generate_user_ids_by_chat(message.chat_id))
+        self.run(message, 'add', user_ids, update_member)
+        return user_ids
+
+    def on_message_delete(self, message):
+        """
+        For each member of the chat other than the author that had not viewed the chat since the
+        message was created, decrement their 'messagesUnviewedCount'.
+        Returns the ids of the members whose count was decremented.
+        """
+        user_ids = [
+            user_id
+            for user_id in self.member_dynamo.generate_user_ids_by_chat(message.chat_id)
+            if user_id != message.user_id
+        ]
+        view_keys = [self.view_dynamo.key(message.chat_id, user_id) for user_id in user_ids]
+        view_items = self.view_dynamo.client.batch_load_items(view_keys, projection_expression='lastViewedAt')
+        unviewed_user_ids = [
+            user_id
+            for user_id, view_item in zip(user_ids, view_items)
+            if not (view_item and pendulum.parse(view_item['lastViewedAt']) > message.created_at)
+        ]
+
+        def update_member(user_id):
+            self.member_dynamo.decrement_messages_unviewed_count(message.chat_id, user_id)
+
+        self.run(message, 'delete', unviewed_user_ids, update_member)
+        return unviewed_user_ids
+
+    def run(self, message, action, user_ids, update_member):
+        "Call `update_member` for each of the user ids, concurrently. Re-raises the first failure, if any."
+        started_at = time.perf_counter()
+        if len(user_ids) <= 1:
+            for user_id in user_ids:
+                update_member(user_id)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(user_ids))) as executor:
+                for _ in executor.map(update_member, user_ids):
+                    pass
+        elapsed = time.perf_counter() - started_at
+        logger.info(
+            f'Chat member fan-out of message {action} `{message.id}` in chat `{message.chat_id}`: '
+            f'{len(user_ids)} members updated in {elapsed * 1000:.1f}ms'
+        )
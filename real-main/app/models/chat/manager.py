@@ -14,6 +14,7 @@ from app.models.user.enums import UserStatus
 from .dynamo import ChatDynamo, ChatMemberDynamo
 from .enums import ChatType
 from .exceptions import ChatException
+from .fan_out import ChatMemberFanOut
 from .model import Chat
 
 logger = logging.getLogger()
@@ -25,7 +26,7 @@ class ChatManager(FlagManagerMixin, ViewManagerMixin, ManagerBase):
 
     def __init__(self, clients, managers=None):
         super().__init__(clients, managers=managers)
-        managers = managers or {}
+        managers = {} if managers is None else managers
         managers['chat'] = self
         self.block_manager = managers.get('block') or models.BlockManager(clients, managers=managers)
         self.chat_message_manager = managers.get('chat_message') or models.ChatMessageManager(
@@ -34,10 +35,11 @@ class ChatManager(FlagManagerMixin, ViewManagerMixin, ManagerBase):
         self.user_manager = managers.get('user') or models.UserManager(clients, managers=managers)
 
         self.clients = clients
-        self.real_dating_client = RealDatingClient()
+        self.real_dating_client = clients.get('real_dating') or RealDatingClient()
         if 'dynamo' in clients:
             self.dynamo = ChatDynamo(clients['dynamo'])
             self.member_dynamo = ChatMemberDynamo(clients['dynamo'])
+            self.member_fan_out = ChatMemberFanOut(self.member_dynamo, self.view_dynamo)
 
     def get_model(self, item_id, strongly_consistent=False):
         return self.get_chat(item_id, strongly_consistent=strongly_consistent)
@@ -155,32 +157,13 @@ class ChatManager(FlagManagerMixin, ViewManagerMixin, ManagerBase):
         self.dynamo.update_last_message_activity_at(message.chat_id, message.created_at)
         self.dynamo.increment_messages_count(message.chat_id)
 
-        # for each memeber of the chat
-        #   - update the last message activity timestamp (controls chat ordering)
-        #   - for everyone except the author, increment their 'messagesUnviewedCount'
-        for user_id in self.member_dynamo.generate_user_ids_by_chat(message.chat_id):
-            self.member_dynamo.update_last_message_activity_at(message.chat_id, user_id, message.created_at)
-            if user_id != message.user_id:
-                # Note that dynamo has no support for batch updates.
-                self.member_dynamo.increment_messages_unviewed_count(message.chat_id, user_id)
-                # TODO
-                # we can be in a state where the user manually dismissed a card, and this view does not
-                # change the user's overall count of chats with unread messages, but should still create a card
+        self.member_fan_out.on_message_add(message)
 
     def on_chat_message_delete(self, message_id, old_item):
         message = self.chat_message_manager.init_chat_message(old_item)
         self.dynamo.decrement_messages_count(message.chat_id)
 
-        # for each memeber of the chat other than the author
-        #   - delete any view record that exists directly on the message
-        #   - determine if the message had status 'unviewed', and if so, then decrement the unviewed message counter
-        for user_id in self.member_dynamo.generate_user_ids_by_chat(message.chat_id):
-            if user_id != message.user_id:
-                chat_view_item = self.view_dynamo.get_view(message.chat_id, user_id)
-                chat_last_viewed_at = pendulum.parse(chat_view_item['lastViewedAt']) if chat_view_item else None
-                if not (chat_last_viewed_at and chat_last_viewed_at > message.created_at):
-                    # Note that dynamo has no support for batch updates.
-                    self.member_dynamo.decrement_messages_unviewed_count(message.chat_id, user_id)
+        self.member_fan_out.on_message_delete(message)
 
     def sync_member_messages_unviewed_count(self, chat_id, new_item, old_item=None):
         if new_item.get('viewCount', 0) > (old_item or {}).get('viewCount', 0):
@@ -1,4 +1,5 @@
 import logging
+import zlib
 
 from boto3.dynamodb.conditions import Key
 
@@ -6,9 +7,16 @@ logger = logging.getLogger()
 
 
 class ChatMessageDynamo:
+
+    # messages with an author are indexed on GSI-K1, spread over this many partitions so writes don't all land on one
+    index_shard_count = 16
+
     def __init__(self, dynamo_client):
         self.client = dynamo_client
 
+    def index_shard_pk(self, message_id):
+        return f'chatMessageShard/{zlib.crc32(message_id.encode()) % self.index_shard_count}'
+
     def pk(self, message_id):
         return {
             'partitionKey': f'chatMessage/{message_id}',
@@ -37,6 +45,9 @@ class ChatMessageDynamo:
         }
         if author_user_id:
             query_kwargs['Item']['userId'] = author_user_id
+            # system messages, those without an author, aren't reviewed for bad words
+            query_kwargs['Item']['gsiK1PartitionKey'] = self.index_shard_pk(message_id)
+            query_kwargs['Item']['gsiK1SortKey'] = created_at_str
         return self.client.add_item(query_kwargs)
 
     def edit_chat_message(self, message_id, text, text_tags, now):
@@ -68,9 +79,14 @@ class ChatMessageDynamo:
             gen = ({'partitionKey': item['partitionKey'], 'sortKey': item['sortKey']} for item in gen)
         return gen
 
-    def generate_all_chat_messages_by_scan(self):
-        scan_kwargs = {
-            'FilterExpression': 'begins_with(partitionKey, :pk_prefix) AND sortKey = :sk_prefix',
-            'ExpressionAttributeValues': {':pk_prefix': 'chatMessage/', ':sk_prefix': '-'},
-        }
-        return self.client.generate_all_scan(scan_kwargs)
+    def generate_all_chat_messages_with_author(self):
+        "Generate all chat messages with an author, shard by shard from the index, so the table needn't be scanned"
+        for shard in range(self.index_shard_count):
+            query_kwargs = {
+                'KeyConditionExpression': Key('gsiK1PartitionKey').eq(f'chatMessageShard/{shard}'),
+                'IndexName': 'GSI-K1',
+                'ProjectionExpression': 'partitionKey, sortKey',
+            }
+            for keys, _ in self.client.generate_query_pages(query_kwargs):
+                # messages deleted since they were indexed come back as None
+                yield from filter(None, self.client.batch_load_items(keys))
@@ -4,7 +4,6 @@ import uuid
 import pendulum
 
 from app import models
-from app.clients import BadWordsClient
 from app.mixins.base import ManagerBase
 from app.mixins.flag.manager import FlagManagerMixin
 from app.models.chat.enums import ChatType
@@ -24,7 +23,7 @@ class ChatMessageManager(FlagManagerMixin, ManagerBase):
 
     def __init__(self, clients, managers=None):
         super().__init__(clients, managers=managers)
-        managers = managers or {}
+        managers = {} if managers is None else managers
         managers['chat_message'] = self
         self.block_manager = managers.get('block') or models.BlockManager(clients, managers=managers)
         self.chat_manager = managers.get('chat') or models.ChatManager(clients, managers=managers)
@@ -34,6 +33,8 @@ class ChatMessageManager(FlagManagerMixin, ManagerBase):
         self.clients = clients
         if 'appsync' in clients:
             self.appsync = ChatMessageAppSync(clients['appsync'])
+        if 'bad_words' in clients:
+            self.bad_words_client = clients['bad_words']
         if 'dynamo' in clients:
             self.dynamo = ChatMessageDynamo(clients['dynamo'])
 
@@ -98,8 +99,7 @@ class ChatMessageManager(FlagManagerMixin, ManagerBase):
         return message
 
     def clear_chat_message_bad_words(self):
-        # scan for all chat messages and detect bad words
-        for message in self.dynamo.generate_all_chat_messages_by_scan():
+        for message in self.dynamo.generate_all_chat_messages_with_author():
             self.on_chat_message_changed_detect_bad_words(message['messageId'], message)
 
     def on_flag_add(self, message_id, new_item):
@@ -124,8 +124,7 @@ class ChatMessageManager(FlagManagerMixin, ManagerBase):
             return
 
         # if detects bad words, force delete the chat message
-        bad_words_client = BadWordsClient()
-        if bad_words_client.validate_bad_words_detection(text):
+        if self.bad_words_client.validate_bad_words_detection(text):
             logger.warning(f'Force deleting chat message `{message_id}` from detecting bad words')
             chat_message.delete(forced=True)
 
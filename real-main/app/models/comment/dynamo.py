@@ -1,4 +1,5 @@
 import logging
+import zlib
 
 import pendulum
 from boto3.dynamodb.conditions import Key
@@ -9,9 +10,16 @@ logger = logging.getLogger()
 
 
 class CommentDynamo:
+
+    # every comment is indexed on GSI-K1, spread over this many partitions so writes don't all land on one
+    index_shard_count = 16
+
     def __init__(self, dynamo_client):
         self.client = dynamo_client
 
+    def index_shard_pk(self, comment_id):
+        return f'commentShard/{zlib.crc32(comment_id.encode()) % self.index_shard_count}'
+
     def pk(self, comment_id):
         return {
             'partitionKey': f'comment/{comment_id}',
@@ -32,6 +40,8 @@ class CommentDynamo:
                 'gsiA1SortKey': commented_at_str,
                 'gsiA2PartitionKey': f'comment/{user_id}',
                 'gsiA2SortKey': commented_at_str,
+                'gsiK1PartitionKey': self.index_shard_pk(comment_id),
+                'gsiK1SortKey': commented_at_str,
                 'commentId': comment_id,
                 'postId': post_id,
                 'userId': user_id,
@@ -68,9 +78,14 @@ class CommentDynamo:
         }
         return self.client.generate_all_query(query_kwargs)
 
-    def generate_all_comments_by_scan(self):
-        scan_kwargs = {
-            'FilterExpression': 'begins_with(partitionKey, :pk_prefix) AND sortKey = :sk_prefix',
-            'ExpressionAttributeValues': {':pk_prefix': 'comment/', ':sk_prefix': '-'},
-        }
-        return self.client.generate_all_scan(scan_kwargs)
+    def generate_all_comments(self):
+        "Generate all comments, shard by shard from the index, so the table needn't be scanned"
+        for shard in range(self.index_shard_count):
+            query_kwargs = {
+                'KeyConditionExpression': Key('gsiK1PartitionKey').eq(f'commentShard/{shard}'),
+                'IndexName': 'GSI-K1',
+                'ProjectionExpression': 'partitionKey, sortKey',
+            }
+            for keys, _ in self.client.generate_query_pages(query_kwargs):
+                # comments deleted since they were indexed come back as None
+                yield from filter(None, self.client.batch_load_items(keys))
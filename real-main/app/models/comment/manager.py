@@ -4,7 +4,7 @@ import logging
 import pendulum
 
 from app import models
-from app.clients import BadWordsClient, RealDatingClient
+from app.clients import RealDatingClient
 from app.mixins.base import ManagerBase
 from app.mixins.flag.manager import FlagManagerMixin
 from app.models.follower.enums import FollowStatus
@@ -24,15 +24,16 @@ class CommentManager(FlagManagerMixin, ManagerBase):
 
     def __init__(self, clients, managers=None):
         super().__init__(clients, managers=managers)
-        managers = managers or {}
+        managers = {} if managers is None else managers
         managers['comment'] = self
         self.block_manager = managers.get('block') or models.BlockManager(clients, managers=managers)
         self.follower_manager = managers.get('follower') or models.FollowerManager(clients, managers=managers)
         self.post_manager = managers.get('post') or models.PostManager(clients, managers=managers)
         self.user_manager = managers.get('user') or models.UserManager(clients, managers=managers)
 
-        self.real_dating_client = RealDatingClient()
-        # self.bad_words_client = BadWordsClient()
+        self.real_dating_client = clients.get('real_dating') or RealDatingClient()
+        if 'bad_words' in clients:
+            self.bad_words_client = clients['bad_words']
         if 'dynamo' in clients:
             self.dynamo = CommentDynamo(clients['dynamo'])
 
@@ -90,8 +91,7 @@ class CommentManager(FlagManagerMixin, ManagerBase):
         return self.init_comment(comment_item)
 
     def clear_comment_bad_words(self):
-        # scan for all comment texts and detect bad words
-        for comment in self.dynamo.generate_all_comments_by_scan():
+        for comment in self.dynamo.generate_all_comments():
             self.on_comment_added_detect_bad_words(comment['commentId'], comment)
 
     def on_user_delete_delete_all_by_user(self, user_id, old_item):
@@ -137,8 +137,7 @@ class CommentManager(FlagManagerMixin, ManagerBase):
                 return
 
         # if detects bad words, force delete the comment
-        bad_words_client = BadWordsClient()
-        if bad_words_client.validate_bad_words_detection(text):
+        if self.bad_words_client.validate_bad_words_detection(text):
             logger.warning(f'Force deleting comment `{comment_id}` from detecting bad words')
             comment.delete(forced=True)
 
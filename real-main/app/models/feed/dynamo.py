@@ -1,5 +1,8 @@
+import functools
 import logging
 
+from boto3.dynamodb.conditions import Key
+
 logger = logging.getLogger()
 
 
@@ -22,8 +25,10 @@ class FeedDynamo:
     def add_post_to_feeds(self, feed_user_id_generator, post_item):
         "Add the post to all the feeds of the generated user_ids, return a list of those user_ids"
         feed_user_ids = list(feed_user_id_generator)
-        item_generator = (self.item(feed_user_id, post_item) for feed_user_id in feed_user_ids)
-        self.feed_client.batch_put_items(item_generator)
+        write_requests = (
+            {'PutRequest': {'Item': self.item(feed_user_id, post_item)}} for feed_user_id in feed_user_ids
+        )
+        self.feed_client.batch_write_items(write_requests)
         return feed_user_ids
 
     def delete_by_post_owner(self, feed_user_id, post_user_id):
@@ -46,6 +51,21 @@ class FeedDynamo:
         }
         return self.feed_client.generate_all_query(query_kwargs)
 
+    def generate_newest_items(self, feed_user_id, posted_at_or_before=None, page_size=None):
+        "Generate the postId and postedAt of the items in the user's feed, newest first"
+        key_conditions = [Key('feedUserId').eq(feed_user_id)]
+        if posted_at_or_before:
+            key_conditions.append(Key('postedAt').lte(posted_at_or_before))
+        query_kwargs = {
+            'KeyConditionExpression': functools.reduce(lambda a, b: a & b, key_conditions),
+            'IndexName': 'GSI-A1',
+            'ScanIndexForward': False,
+            'ProjectionExpression': 'postId, postedAt',
+        }
+        if page_size:
+            query_kwargs['Limit'] = page_size
+        return self.feed_client.generate_all_query(query_kwargs)
+
     def generate_keys_by_post(self, post_id):
         query_kwargs = {
             'KeyConditionExpression': 'postId = :pid',
@@ -0,0 +1,114 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger()
+
+FEED_FAN_OUT_MAX_WORKERS = int(os.environ.get('FEED_FAN_OUT_MAX_WORKERS', 8))
+
+
+class FeedFanOut:
+    """
+    Adds a post to the feeds of its owner and all of the owner's followers.
+
+    Follower user ids are paged from the follower index. Each page is split into shards which
+    are written concurrently by a pool of writers while the next page is being read.
+
+    Once every shard of a page is written a checkpoint is saved, so a fan-out that is interrupted
+    (ex: by a lambda timeout) resumes after the last fully written page when it is re-run.
+    """
+
+    def __init__(
+        self,
+        feed_dynamo,
+        follower_dynamo,
+        dynamo_client,
+        max_workers=FEED_FAN_OUT_MAX_WORKERS,
+        shard_size=100,
+        page_size=None,
+    ):
+        """
+        `shard_size` is the number of feeds written by one writer task, `page_size` optionally limits
+        the number of followers read per page (and so the amount of work between checkpoints).
+        """
+        self.feed_dynamo = feed_dynamo
+        self.follower_dynamo = follower_dynamo
+        self.client = dynamo_client
+        self.max_workers = max_workers
+        self.shard_size = shard_size
+        self.page_size = page_size
+
+    def checkpoint_pk(self, post_id):
+        return {
+            'partitionKey': f'post/{post_id}',
+            'sortKey': 'feedFanOut',
+        }
+
+    def get_checkpoint(self, post_id):
+        return self.client.get_item(self.checkpoint_pk(post_id), ConsistentRead=True)
+
+    def save_checkpoint(self, post_id, follower_last_key):
+        return self.client.set_attributes(
+            self.checkpoint_pk(post_id), schemaVersion=0, followerLastEvaluatedKey=follower_last_key
+        )
+
+    def delete_checkpoint(self, post_id):
+        return self.client.delete_item(self.checkpoint_pk(post_id))
+
+    def generate_user_id_pages(self, followed_user_id, checkpoint=None):
+        "Generate tuples of (user ids, follower last evaluated key), starting after the checkpoint if given"
+        start_key = checkpoint['followerLastEvaluatedKey'] if checkpoint else None
+        pages = self.follower_dynamo.generate_follower_item_pages(
+            followed_user_id, exclusive_start_key=start_key, page_size=self.page_size
+        )
+        for index, (items, last_key) in enumerate(pages):
+            user_ids = [item['followerUserId'] for item in items]
+            if index == 0 and not start_key:
+                # the post owner's feed goes in with the first page
+                user_ids.insert(0, followed_user_id)
+            yield user_ids, last_key
+
+    def run(self, followed_user_id, post_item):
+        "Add the post to all the feeds, return a list of the user ids whose feeds were written by this run"
+        post_id = post_item['postId']
+        checkpoint = self.get_checkpoint(post_id)
+        checkpointed = checkpoint is not None
+        feed_user_ids = []
+        started_at = time.perf_counter()
+
+        def complete_page(futures, user_ids, last_key):
+            nonlocal checkpointed
+            for future in futures:
+                future.result()
+            feed_user_ids.extend(user_ids)
+            if last_key is not None:
+                self.save_checkpoint(post_id, last_key)
+                checkpointed = True
+            elif checkpointed:
+                self.delete_checkpoint(post_id)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = None
+            for user_ids, last_key in self.generate_user_id_pages(followed_user_id, checkpoint=checkpoint):
+                futures = [
+                    executor.submit(
+                        self.feed_dynamo.add_post_to_feeds, user_ids[i : i + self.shard_size], post_item
+                    )
+                    for i in range(0, len(user_ids), self.shard_size)
+                ]
+                # the next page is read while this one is being written
+                if pending:
+                    complete_page(*pending)
+                pending = (futures, user_ids, last_key)
+            if pending:
+                complete_page(*pending)
+
+        elapsed = time.perf_counter() - started_at
+        rate = len(feed_user_ids) / elapsed if elapsed else 0
+        resumed = ' (resumed)' if checkpoint else ''
+        logger.info(
+            f'Feed fan-out of post `{post_id}`{resumed}: {len(feed_user_ids)} feed items written '
+            f'in {elapsed:.2f}s, {rate:.0f} items/sec'
+        )
+        return feed_user_ids
@@ -1,5 +1,8 @@
-import itertools
+import heapq
 import logging
+import os
+
+import pendulum
 
 from app import models
 from app.models.follower.enums import FollowStatus
@@ -7,32 +10,113 @@ from app.models.post.enums import PostStatus
 from app.utils import GqlNotificationType
 
 from .dynamo import FeedDynamo
+from .exceptions import FeedException
+from .fan_out import FeedFanOut
+from .pull_users import FeedPullUsers
 
 logger = logging.getLogger()
 
+# users with at least this many followers have their posts pulled into feeds at read time
+FEED_PULL_FOLLOWER_THRESHOLD = int(os.environ.get('FEED_PULL_FOLLOWER_THRESHOLD', 10000))
+
 
 class FeedManager:
-    def __init__(self, clients, managers=None):
-        managers = managers or {}
+    """
+    Feeds are push-based for most users: posts are written into the feeds of the poster's followers.
+
+    Users with at least `pull_follower_threshold` followers are pull users instead. Their posts are
+    not written into their followers' feeds. Instead, they are merged with the pushed feed when the
+    feed is read. Users stop being pull users once their follower count drops below
+    `pull_follower_threshold * pull_leave_ratio`. That gap keeps users near the threshold from flipping
+    back and forth.
+    """
+
+    pull_leave_ratio = 0.9
+
+    def __init__(self, clients, managers=None, pull_follower_threshold=FEED_PULL_FOLLOWER_THRESHOLD):
+        managers = {} if managers is None else managers
         managers['feed'] = self
         self.follower_manager = managers.get('follower') or models.FollowerManager(clients, managers=managers)
         self.post_manager = managers.get('post') or models.PostManager(clients, managers=managers)
 
         self.clients = clients
+        self.pull_follower_threshold = pull_follower_threshold
         if 'appsync' in clients:
             self.appsync_client = clients['appsync']
         if 'dynamo_feed' in clients:
             self.dynamo = FeedDynamo(clients['dynamo_feed'])
+        if 'dynamo' in clients and 'dynamo_feed' in clients:
+            self.fan_out = FeedFanOut(self.dynamo, self.follower_manager.dynamo, clients['dynamo'])
+        if 'dynamo' in clients:
+            self.pull_users = FeedPullUsers(clients['dynamo'])
 
     def add_users_posts_to_feed(self, feed_user_id, posted_by_user_id):
+        if self.pull_users.is_pull_user(posted_by_user_id):
+            return
         post_item_generator = self.post_manager.dynamo.generate_posts_by_user(posted_by_user_id, completed=True)
         self.dynamo.add_posts_to_feed(feed_user_id, post_item_generator)
 
     def add_post_to_followers_feeds(self, followed_user_id, post_item):
-        user_id_gen = itertools.chain(
-            [followed_user_id], self.follower_manager.generate_follower_user_ids(followed_user_id)
-        )
-        return self.dynamo.add_post_to_feeds(user_id_gen, post_item)
+        if self.pull_users.is_pull_user(followed_user_id):
+            # followers pull the post in at read time
+            return self.dynamo.add_post_to_feeds([followed_user_id], post_item)
+        return self.fan_out.run(followed_user_id, post_item)
+
+    def get_feed(self, feed_user_id, limit=20, next_token=None):
+        """
+        Get a page of the user's feed as post ids, newest first.
+
+        The pushed feed and the completed posts of the pull users the user follows are k-way
+        merged by (postedAt, postId). The pagination token encodes the position of the last
+        post returned.
+        """
+        cursor = None
+        if next_token:
+            try:
+                decoded = self.dynamo.feed_client.decode_pagination_token(next_token)
+                if isinstance(decoded, dict) and 'token' in decoded:
+                    # TODO: remove after the next release. Tokens issued when the feed was read by the appsync
+                    # dynamo resolver wrap an encrypted key we can't read, so restart from the first page.
+                    logger.warning(
+                        f'User `{feed_user_id}`: ignoring nextToken from before feed was lambda-resolved'
+                    )
+                else:
+                    posted_at, post_id = decoded
+                    cursor = (str(posted_at), str(post_id))
+            except (TypeError, ValueError) as err:
+                raise FeedException(f'Invalid nextToken `{next_token}`') from err
+        posted_at_or_before = cursor[0] if cursor else None
+
+        # read one extra item to know if there is another page
+        page_size = limit + 1
+        sources = [self.dynamo.generate_newest_items(feed_user_id, posted_at_or_before, page_size=page_size)]
+        pull_user_ids = self.pull_users.get_user_ids() - {feed_user_id}
+        if pull_user_ids:
+            followed_pull_user_ids = self.follower_manager.dynamo.batch_get_followed_user_ids(
+                feed_user_id, pull_user_ids, FollowStatus.FOLLOWING
+            )
+            sources.extend(
+                self.post_manager.dynamo.generate_newest_completed_posts_by_user(
+                    user_id, posted_at_or_before, page_size=page_size
+                )
+                for user_id in followed_pull_user_ids
+            )
+
+        post_keys = []
+        for item in heapq.merge(*sources, key=lambda item: (item['postedAt'], item['postId']), reverse=True):
+            post_key = (item['postedAt'], item['postId'])
+            # skip what was already returned, and posts that were both pushed and pulled
+            if (cursor and post_key >= cursor) or (post_keys and post_key == post_keys[-1]):
+                continue
+            post_keys.append(post_key)
+            if len(post_keys) == page_size:
+                break
+
+        next_token = None
+        if len(post_keys) == page_size:
+            post_keys.pop()
+            next_token = self.dynamo.feed_client.encode_pagination_token(post_keys[-1])
+        return {'items': [post_id for _, post_id in post_keys], 'nextToken': next_token}
 
     def on_user_follow_status_change_sync_feed(self, followed_user_id, new_item=None, old_item=None):
         follower_user_id = (new_item or old_item)['followerUserId']
@@ -43,12 +127,47 @@ class FeedManager:
             self.dynamo.delete_by_post_owner(follower_user_id, followed_user_id)
         self.appsync_client.fire_notification(follower_user_id, GqlNotificationType.USER_FEED_CHANGED)
 
+    def on_user_follower_count_change_sync_pull_users(self, user_id, new_item=None, old_item=None):
+        if not self.pull_follower_threshold:
+            return
+        follower_count = (new_item or {}).get('followerCount', 0)
+        is_pull_user = self.pull_users.is_pull_user(user_id)
+        if not is_pull_user and follower_count >= self.pull_follower_threshold:
+            self.pull_users.add(user_id)
+        if is_pull_user and follower_count < self.pull_follower_threshold * self.pull_leave_ratio:
+            if new_item:
+                self.stop_pulling_posts(user_id)
+            else:
+                # user was deleted, their posts go with them
+                self.pull_users.remove(user_id)
+
+    def stop_pulling_posts(self, user_id):
+        """
+        Switch the user back to having their posts pushed into their followers' feeds.
+
+        The posts they completed while a pull user were only ever pulled in, so those are pushed first,
+        through the same fan-out as new posts. Posts completed while that runs are caught up with after.
+        """
+        started_at = pendulum.now('utc')
+        # without a recorded start, push all their posts
+        self.fan_out_posts(user_id, posted_since=self.pull_users.get_pulled_since(user_id))
+        self.pull_users.remove(user_id)
+        self.fan_out_posts(user_id, posted_since=started_at)
+
+    def fan_out_posts(self, user_id, posted_since=None):
+        "Add the user's completed posts, newest first back to `posted_since`, to their followers' feeds"
+        for post_item in self.post_manager.dynamo.generate_newest_completed_posts_by_user(user_id):
+            if posted_since and post_item['postedAt'] < posted_since.to_iso8601_string():
+                break
+            self.fan_out.run(user_id, {**post_item, 'postedByUserId': user_id})
+
     def on_post_status_change_sync_feed(self, post_id, new_item=None, old_item=None):
         posted_by_user_id = (new_item or old_item)['postedByUserId']
         new_status = (new_item or {}).get('postStatus')
         if new_status == PostStatus.COMPLETED:
             feed_user_ids = self.add_post_to_followers_feeds(posted_by_user_id, new_item)
         else:
+            # a fan-out interrupted before the post left COMPLETED must not be resumed later
+            self.fan_out.delete_checkpoint(post_id)
             feed_user_ids = self.dynamo.delete_by_post(post_id)
-        for user_id in feed_user_ids:
-            self.appsync_client.fire_notification(user_id, GqlNotificationType.USER_FEED_CHANGED)
+        self.appsync_client.fire_notifications(feed_user_ids, GqlNotificationType.USER_FEED_CHANGED)
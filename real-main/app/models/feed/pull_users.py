@@ -0,0 +1,70 @@
+import logging
+import os
+import threading
+import time
+
+import pendulum
+
+logger = logging.getLogger()
+
+FEED_PULL_USERS_CACHE_TTL_SECONDS = int(os.environ.get('FEED_PULL_USERS_CACHE_TTL_SECONDS', 60))
+
+
+class FeedPullUsers:
+    """
+    The set of users whose posts are pulled into their followers' feeds at read time, rather
+    than being pushed into them on write.
+
+    The set is stored as a single item in the main table. It only changes when a user crosses
+    the follower threshold, so it is cached in memory and re-read after `cache_ttl` seconds.
+    When each user became a pull user is kept in an item of their own.
+    """
+
+    def __init__(self, dynamo_client, cache_ttl=FEED_PULL_USERS_CACHE_TTL_SECONDS):
+        self.client = dynamo_client
+        self.cache_ttl = cache_ttl
+        self.lock = threading.Lock()
+        self.user_ids = None
+        self.read_at = None
+
+    def pk(self):
+        return {
+            'partitionKey': 'feed/pullUsers',
+            'sortKey': '-',
+        }
+
+    def get_user_ids(self):
+        "Get the cached set of pull user ids, re-reading it as needed"
+        with self.lock:
+            if self.user_ids is None or time.monotonic() - self.read_at >= self.cache_ttl:
+                item = self.client.get_item(self.pk()) or {}
+                self.user_ids = frozenset(item.get('userIds', []))
+                self.read_at = time.monotonic()
+            return self.user_ids
+
+    def is_pull_user(self, user_id):
+        return user_id in self.get_user_ids()
+
+    def pulled_since_pk(self, user_id):
+        return {
+            'partitionKey': f'user/{user_id}',
+            'sortKey': 'feedPullUser',
+        }
+
+    def get_pulled_since(self, user_id):
+        "When the user became a pull user, if known"
+        item = self.client.get_item(self.pulled_since_pk(user_id))
+        return pendulum.parse(item['pulledSince']) if item else None
+
+    def add(self, user_id, now=None):
+        now = now or pendulum.now('utc')
+        self.client.set_attributes(
+            self.pulled_since_pk(user_id), schemaVersion=0, pulledSince=now.to_iso8601_string()
+        )
+        self.client.add_to_set(self.pk(), 'userIds', [user_id], schemaVersion=0)
+        self.user_ids = None
+
+    def remove(self, user_id):
+        self.client.delete_from_set(self.pk(), 'userIds', [user_id])
+        self.client.delete_item(self.pulled_since_pk(user_id))
+        self.user_ids = None
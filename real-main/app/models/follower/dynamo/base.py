@@ -19,10 +19,32 @@ class FollowerDynamo:
             'sortKey': f'follower/{follower_user_id}',
         }
 
+    def typed_pk(self, follower_user_id, followed_user_id):
+        return {
+            'partitionKey': {'S': f'user/{followed_user_id}'},
+            'sortKey': {'S': f'follower/{follower_user_id}'},
+        }
+
     def get_following(self, follower_user_id, followed_user_id, strongly_consistent=False):
         pk = self.pk(follower_user_id, followed_user_id)
         return self.client.get_item(pk, ConsistentRead=strongly_consistent)
 
+    def batch_get_followed_user_ids(self, follower_user_id, followed_user_ids, follow_status):
+        "Of the given `followed_user_ids`, return those that the follower has a following with `follow_status`"
+        # dynamo can't handle duplicates
+        typed_keys = [
+            self.typed_pk(follower_user_id, followed_user_id) for followed_user_id in set(followed_user_ids)
+        ]
+        followed_user_ids = []
+        for i in range(0, len(typed_keys), 100):
+            items = self.client.batch_get_items(
+                typed_keys[i : i + 100], projection_expression='followedUserId, followStatus'
+            )
+            followed_user_ids.extend(
+                item['followedUserId']['S'] for item in items if item['followStatus']['S'] == follow_status
+            )
+        return followed_user_ids
+
     def add_following(self, follower_user_id, followed_user_id, follow_status):
         followed_at_str = pendulum.now('utc').to_iso8601_string()
         query_kwargs = {
@@ -85,3 +107,17 @@ class FollowerDynamo:
         if keys_only:
             query_kwargs['ProjectionExpression'] = 'partitionKey, sortKey'
         return self.client.generate_all_query(query_kwargs)
+
+    def generate_follower_item_pages(self, user_id, exclusive_start_key=None, page_size=None):
+        """
+        Generate pages of items that represent a follower of the given user, as tuples of (items, last evaluated key).
+        Items only include `followerUserId`. Pass in the key of a page to resume after that page.
+        """
+        query_kwargs = {
+            'KeyConditionExpression': Key('gsiA2PartitionKey').eq(f'followed/{user_id}'),
+            'IndexName': 'GSI-A2',
+            'ProjectionExpression': 'followerUserId',
+        }
+        if page_size:
+            query_kwargs['Limit'] = page_size
+        return self.client.generate_query_pages(query_kwargs, exclusive_start_key=exclusive_start_key)
@@ -3,7 +3,7 @@ from itertools import chain
 
 from app import models
 from app.models.user.enums import UserPrivacyStatus, UserStatus
-from app.utils import GqlNotificationType
+from app.utils import GqlNotificationType, identity_map
 
 from .dynamo.base import FollowerDynamo
 from .dynamo.first_story import FirstStoryDynamo
@@ -16,7 +16,7 @@ logger = logging.getLogger()
 
 class FollowerManager:
     def __init__(self, clients, managers=None):
-        managers = managers or {}
+        managers = {} if managers is None else managers
         managers['follower'] = self
         self.block_manager = managers.get('block') or models.BlockManager(clients, managers=managers)
         self.post_manager = managers.get('post') or models.PostManager(clients, managers=managers)
@@ -29,10 +29,14 @@ class FollowerManager:
             self.first_story_dynamo = FirstStoryDynamo(clients['dynamo'])
 
     def get_follow(self, follower_user_id, followed_user_id, strongly_consistent=False):
-        item = self.dynamo.get_following(
-            follower_user_id, followed_user_id, strongly_consistent=strongly_consistent
-        )
-        return self.init_follow(item) if item else None
+        def load():
+            item = self.dynamo.get_following(
+                follower_user_id, followed_user_id, strongly_consistent=strongly_consistent
+            )
+            return self.init_follow(item) if item else None
+
+        key = ('follow', follower_user_id, followed_user_id)
+        return identity_map.get(key, load, refresh=strongly_consistent)
 
     def init_follow(self, follow_item):
         return Follower(follow_item, self.dynamo, self.first_story_dynamo)
@@ -79,6 +83,7 @@ class FollowerManager:
             else FollowStatus.FOLLOWING
         )
         follow_item = self.dynamo.add_following(follower_user.id, followed_user.id, follow_status)
+        identity_map.invalidate(('follow', follower_user.id, followed_user.id))
         return self.init_follow(follow_item)
 
     def accept_all_requested_follow_requests(self, followed_user_id):
@@ -90,6 +95,7 @@ class FollowerManager:
         for item in self.dynamo.generate_follower_items(followed_user_id, FollowStatus.DENIED):
             # TODO: do as batch write
             self.dynamo.delete_following(item)
+            identity_map.invalidate(('follow', item['followerUserId'], followed_user_id))
 
     def refresh_first_story(self, story_prev=None, story_now=None):
         "Refresh the firstStory items, if needed, after the a story has changed."
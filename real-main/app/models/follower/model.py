@@ -1,5 +1,7 @@
 import logging
 
+from app.utils import identity_map
+
 from .enums import FollowStatus
 from .exceptions import FollowerAlreadyHasStatus
 
@@ -14,6 +16,10 @@ class Follower:
         self.follower_user_id = follow_item['followerUserId']
         self.item = follow_item
 
+    @property
+    def identity_key(self):
+        return ('follow', self.follower_user_id, self.followed_user_id)
+
     @property
     def status(self):
         return self.item['followStatus'] if self.item else FollowStatus.NOT_FOLLOWING
@@ -27,6 +33,7 @@ class Follower:
         if not force and self.status == FollowStatus.DENIED:
             raise FollowerAlreadyHasStatus(self.follower_user_id, self.followed_user_id, FollowStatus.DENIED)
         self.dynamo.delete_following(self.item)
+        identity_map.invalidate(self.identity_key)
         self.item['followStatus'] = FollowStatus.NOT_FOLLOWING
         return self
 
@@ -35,6 +42,7 @@ class Follower:
         if self.status == FollowStatus.FOLLOWING:
             raise FollowerAlreadyHasStatus(self.follower_user_id, self.followed_user_id, FollowStatus.FOLLOWING)
         self.item = self.dynamo.update_following_status(self.item, FollowStatus.FOLLOWING)
+        identity_map.invalidate(self.identity_key)
         return self
 
     def deny(self):
@@ -42,4 +50,5 @@ class Follower:
         if self.status == FollowStatus.DENIED:
             raise FollowerAlreadyHasStatus(self.follower_user_id, self.followed_user_id, FollowStatus.DENIED)
         self.item = self.dynamo.update_following_status(self.item, FollowStatus.DENIED)
+        identity_map.invalidate(self.identity_key)
         return self
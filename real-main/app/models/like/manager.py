@@ -15,7 +15,7 @@ logger = logging.getLogger()
 
 class LikeManager:
     def __init__(self, clients, managers=None):
-        managers = managers or {}
+        managers = {} if managers is None else managers
         managers['like'] = self
         self.block_manager = managers.get('block') or models.BlockManager(clients, managers=managers)
         self.follower_manager = managers.get('follower') or models.FollowerManager(clients, managers=managers)
@@ -1,30 +1,27 @@
 import logging
 
-import gql
-
 logger = logging.getLogger()
 
 
 class PostAppSync:
+    trigger_notification_mutation = '''
+        mutation TriggerPostNotification ($input: PostNotificationInput!) {
+            triggerPostNotification (input: $input) {
+                userId
+                type
+                post {
+                    postId
+                    postStatus
+                    isVerified
+                }
+            }
+        }
+    '''
+
     def __init__(self, appsync_client):
         self.client = appsync_client
 
     def trigger_notification(self, notification_type, post):
-        mutation = gql.gql(
-            '''
-            mutation TriggerPostNotification ($input: PostNotificationInput!) {
-                triggerPostNotification (input: $input) {
-                    userId
-                    type
-                    post {
-                        postId
-                        postStatus
-                        isVerified
-                    }
-                }
-            }
-        '''
-        )
         input_obj = {
             'userId': post.user_id,
             'type': notification_type,
@@ -32,4 +29,4 @@ class PostAppSync:
             'postStatus': post.status,
             'isVerified': post.item.get('isVerified'),
         }
-        self.client.send(mutation, {'input': input_obj})
+        self.client.send(self.trigger_notification_mutation, {'input': input_obj})
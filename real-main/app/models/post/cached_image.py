@@ -1,12 +1,13 @@
+import hashlib
 import imghdr
 import io
-
-import PIL.Image
-import PIL.ImageOps
-import pyheif
+import math
 
 from .exceptions import PostException
 
+EXIF_ORIENTATION_TAG = 0x0112
+EXIF_ORIENTATIONS_ROTATED = (5, 6, 7, 8)
+
 
 class CachedImage:
     def __init__(self, post_id, image_size=None, s3_client=None, s3_path=None, source=None, content_type=None):
@@ -30,6 +31,9 @@ class CachedImage:
         #   - None: cache has never been filled
         self.is_synced = None
 
+        # md5 hex digest of the data in S3, when known from having read or written it
+        self.checksum = None
+
     @property
     def readonly_image(self):
         """
@@ -42,26 +46,77 @@ class CachedImage:
             self._fill_image_from_data()
         return self._image
 
-    def _fill_image_from_data(self):
+    @property
+    def size(self):
+        "(width, height) of the image. Read from the header of jpeg data that hasn't been decoded."
+        if not self._image and not self._data:
+            self.refresh()
+        if self._image or self.content_type != 'image/jpeg':
+            return self.readonly_image.size
+        image = self._open_jpeg()  # lazy, only the header is read
+        width, height = image.size
+        if image.getexif().get(EXIF_ORIENTATION_TAG) in EXIF_ORIENTATIONS_ROTATED:
+            return height, width
+        return width, height
+
+    def get_reduced_image(self, max_dimensions):
+        """
+        A copy of the image, safe to mutate, that is at least large enough to be thumbnailed into `max_dimensions`.
+
+        Jpeg data that hasn't been decoded is decoded with draft(), at the smallest scale (down to 1/8) that is
+        still large enough. That's much faster and lighter than decoding at full size, and the result isn't kept.
+        """
+        if not self._image and not self._data:
+            self.refresh()
+        if self._image or self.content_type != 'image/jpeg':
+            return self.readonly_image.copy()
+
+        width, height = self.size
+        scale = min(max_dimensions[0] / width, max_dimensions[1] / height, 1)
+        draft_size = (math.ceil(width * scale), math.ceil(height * scale))
+        image = self._open_jpeg()
+        if image.getexif().get(EXIF_ORIENTATION_TAG) in EXIF_ORIENTATIONS_ROTATED:
+            draft_size = draft_size[::-1]  # the draft is of the image before it's rotated
+        image.draft(None, draft_size)
+        return self._transpose(image)
+
+    def _open_jpeg(self):
         fh = io.BytesIO(self._data)
+        file_type = imghdr.what(fh)
+        if file_type is None:
+            raise PostException(f'Unable to recognize file type of uploaded file for post `{self.post_id}`')
+        if file_type != 'jpeg' and file_type != 'png':
+            raise PostException(f'File of type `{file_type}` for uploaded jpeg image post `{self.post_id}`')
+        # the image libraries are slow to import, so they are deferred until there is an image to process
+        import PIL.Image
+
+        try:
+            return PIL.Image.open(fh)
+        except Exception as err:
+            raise PostException(f'Unable to decode jpeg data for post `{self.post_id}`: {err}') from err
+
+    def _transpose(self, image):
+        import PIL.ImageOps
+
+        try:
+            return PIL.ImageOps.exif_transpose(image)
+        except Exception as err:
+            raise PostException(f'Unable to decode jpeg data for post `{self.post_id}`: {err}') from err
+
+    def _fill_image_from_data(self):
         if self.content_type == 'image/heic':
+            import PIL.Image
+            import pyheif
+
             try:
-                heif_file = pyheif.read(fh)
+                heif_file = pyheif.read(io.BytesIO(self._data))
             except (ValueError, pyheif.error.HeifError) as err:
                 raise PostException(f'Unable to read HEIC file for post `{self.post_id}`: {err}') from err
             self._image = PIL.Image.frombytes(
                 heif_file.mode, heif_file.size, heif_file.data, 'raw', heif_file.mode, heif_file.stride
             )
         elif self.content_type == 'image/jpeg':
-            file_type = imghdr.what(fh)
-            if file_type is None:
-                raise PostException(f'Unable to recognize file type of uploaded file for post `{self.post_id}`')
-            if file_type != 'jpeg' and file_type != 'png':
-                raise PostException(f'File of type `{file_type}` for uploaded jpeg image post `{self.post_id}`')
-            try:
-                self._image = PIL.ImageOps.exif_transpose(PIL.Image.open(fh))
-            except Exception as err:
-                raise PostException(f'Unable to decode jpeg data for post `{self.post_id}`: {err}') from err
+            self._image = self._transpose(self._open_jpeg())
         else:
             raise PostException(f'Unrecognized content-type `{self.content_type}`')
 
@@ -96,6 +151,7 @@ class CachedImage:
                 raise PostException(f'{self.s3_path} image data not found for post `{self.post_id}`') from err
             self._data = fh.read()
             self._image = None
+            self.checksum = hashlib.md5(self._data).hexdigest()
         self.is_synced = True
         return self
 
@@ -122,36 +178,95 @@ class CachedImage:
         return self
 
     def flush(self, include_deletes=False):
-        assert self.s3_path, 'Can only flush cached images backed by S3'
-        if self.is_synced is None:
-            raise Exception('Nothing to flush back')
-        if self.is_synced is False:
-            if not self._data and not self._image:
-                if not include_deletes:
-                    raise Exception('Refusing to flush back empty cache without `include_deletes` kwarg')
-                self.s3_client.delete_object(self.s3_path)
-            else:
-                if self._data:
-                    fh = io.BytesIO(self._data)
-                elif self._image:
-                    assert self.content_type == 'image/jpeg', 'Non-jpeg images can only be flushed back empty'
-                    fh = io.BytesIO()
-                    # Note: Pillow's Image.save treats None differently than not present for some kwargs
-                    kwargs = {
-                        k: v
-                        for k, v in {
-                            'format': 'JPEG',
-                            'quality': 100,  # per spec
-                            'icc_profile': self._image.info.get('icc_profile'),
-                            'exif': self._image.info.get('exif'),
-                        }.items()
-                        if v is not None
-                    }
-                    try:
-                        self._image.convert('RGB').save(fh, **kwargs)
-                    except Exception as err:
-                        raise PostException(f'Unable to save pil image for post `{self.post_id}`: {err}') from err
-                    fh.seek(0)
-                self.s3_client.put_object(self.s3_path, fh, self.content_type)
-            self.is_synced = True
+        self.flush_many([self], include_deletes=include_deletes)
         return self
+
+    @staticmethod
+    def flush_many(cached_images, include_deletes=False):
+        """
+        Flush back multiple cached images that share an S3 client.
+        Each image is encoded and written to S3 by the same worker of the S3 client's pool, so
+        the images are encoded concurrently as well. Empty images are deleted in one batch.
+        """
+        to_put, to_delete = [], []
+        for cached_image in cached_images:
+            assert cached_image.s3_path, 'Can only flush cached images backed by S3'
+            if cached_image.is_synced is None:
+                raise Exception('Nothing to flush back')
+            if cached_image.is_synced is False:
+                if cached_image._data or cached_image._image:
+                    to_put.append(cached_image)
+                elif include_deletes:
+                    to_delete.append(cached_image)
+                else:
+                    raise Exception('Refusing to flush back empty cache without `include_deletes` kwarg')
+
+        s3_clients = {cached_image.s3_client for cached_image in to_put + to_delete}
+        assert len(s3_clients) <= 1, 'Can only flush together cached images that share an S3 client'
+        if to_put:
+            to_put[0].s3_client.map_concurrently(CachedImage._put, to_put)
+        if to_delete:
+            to_delete[0].s3_client.delete_objects(ci.s3_path for ci in to_delete)
+        for cached_image in to_delete:
+            cached_image.checksum = None
+            cached_image.is_synced = True
+
+    def _put(self):
+        "Encode and write the image to S3"
+        fh = self._get_flush_data()
+        self.s3_client.put_object_with_client(self.s3_path, fh, self.content_type)
+        self.checksum = hashlib.md5(fh.getbuffer()).hexdigest()
+        self.is_synced = True
+
+    def _get_flush_data(self):
+        "Returns a file-like object of the data to write to S3"
+        if self._data:
+            return io.BytesIO(self._data)
+        assert self.content_type == 'image/jpeg', 'Non-jpeg images can only be flushed back empty'
+        fh = io.BytesIO()
+        # Note: Pillow's Image.save treats None differently than not present for some kwargs
+        kwargs = {
+            k: v
+            for k, v in {
+                'format': 'JPEG',
+                'quality': 100,  # per spec
+                'icc_profile': self._image.info.get('icc_profile'),
+                'exif': self._image.info.get('exif'),
+            }.items()
+            if v is not None
+        }
+        try:
+            self._image.convert('RGB').save(fh, **kwargs)
+        except Exception as err:
+            raise PostException(f'Unable to save pil image for post `{self.post_id}`: {err}') from err
+        fh.seek(0)
+        return fh
+
+
+class LazyCachedImage:
+    """
+    Descriptor for a model's CachedImage of one size, created only on first access.
+
+    The CachedImage is made by the model's `init_cached_image(image_size)`, which may return None if
+    the model has no image of that size, in which case the attribute doesn't exist. Once created it is
+    stored in the instance's __dict__, which shadows this (non-data) descriptor, so later accesses
+    are plain attribute lookups.
+    """
+
+    __slots__ = ('image_size', 'name')
+
+    def __init__(self, image_size):
+        self.image_size = image_size
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        cached_image = instance.init_cached_image(self.image_size)
+        if cached_image is None:
+            raise AttributeError(f'\'{type(instance).__name__}\' object has no attribute \'{self.name}\'')
+        # if another thread got here first, theirs wins
+        return instance.__dict__.setdefault(self.name, cached_image)
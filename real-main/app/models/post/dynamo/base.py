@@ -51,6 +51,27 @@ class PostDynamo:
             query_kwargs['FilterExpression'] = filter_exp(PostStatus.COMPLETED)
         return self.client.generate_all_query(query_kwargs)
 
+    def generate_newest_completed_posts_by_user(self, user_id, posted_at_or_before=None, page_size=None):
+        "Generate the postId and postedAt of the user's completed posts, newest first"
+        key_conditions = [Key('gsiA2PartitionKey').eq(f'post/{user_id}')]
+        if posted_at_or_before:
+            key_conditions.append(
+                Key('gsiA2SortKey').between(
+                    f'{PostStatus.COMPLETED}/', f'{PostStatus.COMPLETED}/{posted_at_or_before}'
+                )
+            )
+        else:
+            key_conditions.append(Key('gsiA2SortKey').begins_with(f'{PostStatus.COMPLETED}/'))
+        query_kwargs = {
+            'KeyConditionExpression': functools.reduce(lambda a, b: a & b, key_conditions),
+            'IndexName': 'GSI-A2',
+            'ScanIndexForward': False,
+            'ProjectionExpression': 'postId, postedAt',
+        }
+        if page_size:
+            query_kwargs['Limit'] = page_size
+        return self.client.generate_all_query(query_kwargs)
+
     def generate_expired_post_pks_by_day(self, date, cut_off_time=None):
         key_conditions = [Key('gsiK1PartitionKey').eq(f'post/{date}')]
         if cut_off_time:
@@ -62,15 +83,19 @@ class PostDynamo:
         }
         return self.client.generate_all_query(query_kwargs)
 
-    def generate_expired_post_pks_with_scan(self, cut_off_date):
-        "Do a table **scan** to generate pks of expired posts. Does *not* include cut_off_date."
-        query_kwargs = {
-            'FilterExpression': (
-                Attr('partitionKey').begins_with('post/') & Attr('expiresAt').lt(str(cut_off_date))
-            ),
-            'ProjectionExpression': 'partitionKey, sortKey',
+    def expired_sweep_pk(self):
+        return {
+            'partitionKey': 'post/expired',
+            'sortKey': 'sweep',
         }
-        return self.client.generate_all_scan(query_kwargs)
+
+    def get_expired_sweep_from_date(self):
+        "The oldest day that may hold expired posts older than the regular sweep looks back, if any"
+        item = self.client.get_item(self.expired_sweep_pk(), ConsistentRead=True)
+        return pendulum.parse(item['sweepFromDate']).date() if item else None
+
+    def delete_expired_sweep_from_date(self):
+        return self.client.delete_item(self.expired_sweep_pk())
 
     def add_pending_post(
         self,
@@ -1,11 +1,14 @@
 import collections
 import itertools
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 
 import pendulum
 
 from app import models
+from app.clients.dynamo import DynamoLoader
 from app.mixins.base import ManagerBase
 from app.mixins.flag.manager import FlagManagerMixin
 from app.mixins.trending.manager import TrendingManagerMixin
@@ -13,7 +16,7 @@ from app.mixins.view.enums import ViewType
 from app.mixins.view.manager import ViewManagerMixin
 from app.models.like.enums import LikeStatus
 from app.models.user.enums import UserSubscriptionLevel
-from app.utils import GqlNotificationType
+from app.utils import GqlNotificationType, identity_map
 
 from .appsync import PostAppSync
 from .dynamo import PostDynamo, PostImageDynamo, PostOriginalMetadataDynamo
@@ -23,6 +26,15 @@ from .model import Post
 
 logger = logging.getLogger()
 
+RECORD_VIEWS_MAX_WORKERS = int(os.environ.get('POST_RECORD_VIEWS_MAX_WORKERS', 8))
+EXPIRED_POSTS_LOOKBACK_DAYS = int(os.environ.get('POST_EXPIRED_LOOKBACK_DAYS', 90))
+
+# the attributes every post item has, used to tell post items apart from partial references to posts
+POST_ITEM_REQUIRED_KEYS = ('schemaVersion', 'postId', 'postedAt', 'postedByUserId', 'postStatus', 'postType')
+# attributes that are always set along with an index key. An item with the key but not the attribute is
+# a partial projection, ex: from a query of the index
+POST_ITEM_INDEXED_KEYS = {'gsiA1PartitionKey': 'expiresAt', 'gsiK3PartitionKey': 'albumId'}
+
 
 class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, ManagerBase):
 
@@ -32,7 +44,7 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
 
     def __init__(self, clients, managers=None):
         super().__init__(clients, managers=managers)
-        managers = managers or {}
+        managers = {} if managers is None else managers
         managers['post'] = self
         self.album_manager = managers.get('album') or models.AlbumManager(clients, managers=managers)
         self.block_manager = managers.get('block') or models.BlockManager(clients, managers=managers)
@@ -56,8 +68,60 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
         return self.get_post(item_id, strongly_consistent=strongly_consistent)
 
     def get_post(self, post_id, strongly_consistent=False):
-        post_item = self.dynamo.get_post(post_id, strongly_consistent=strongly_consistent)
-        return self.init_post(post_item) if post_item else None
+        def load():
+            post_item = self.dynamo.get_post(post_id, strongly_consistent=strongly_consistent)
+            return self.init_post(post_item) if post_item else None
+
+        return identity_map.get(('post', post_id), load, refresh=strongly_consistent)
+
+    def get_posts(self, post_ids, subitems=()):
+        """
+        Get many posts at once. Returns a list in the same order as `post_ids`, with None for any that DNE.
+        Any `subitems` named (see `init_posts_from_sources`) are loaded in the same batch.
+        """
+        return self.init_posts_from_sources([{'postId': post_id} for post_id in post_ids], subitems=subitems)
+
+    def is_complete_post_item(self, item):
+        "Is `item` a whole post item, as read from dynamo, rather than a partial reference to a post?"
+        post_id = item.get('postId')
+        if item.get('partitionKey') != f'post/{post_id}' or not all(k in item for k in POST_ITEM_REQUIRED_KEYS):
+            return False
+        if any(key in item and attr not in item for key, attr in POST_ITEM_INDEXED_KEYS.items()):
+            return False
+        # the status is copied into the index sort key, if they disagree the item was pieced together
+        return item.get('gsiA2SortKey', f'{item["postStatus"]}/').startswith(f'{item["postStatus"]}/')
+
+    def init_posts_from_sources(self, sources, subitems=()):
+        """
+        Build posts from the `source`s of graphql field resolutions, which are usually the post items
+        AppSync already has in hand. Sources that are not complete post items - references to posts, or
+        items missing attributes or with inconsistent ones - are fetched.
+
+        The named `subitems` - any of 'image', 'original_metadata' and 'trending' - are loaded along with
+        any fetched posts in one batch. Returns a list in the same order as `sources`, with None for any
+        post that DNE.
+        """
+        loader = DynamoLoader(self.dynamo.client)
+        subitem_keys = {
+            'image': self.image_dynamo.pk,
+            'original_metadata': self.original_metadata_dynamo.key,
+            'trending': self.trending_dynamo.pk,
+        }
+        post_getters, subitem_getters = [], []
+        for source in sources:
+            if self.is_complete_post_item(source):
+                # serialization adds the posting user, which isn't part of the post item
+                item = {k: v for k, v in source.items() if k != 'postedBy'}
+                post_getters.append(lambda item=item: item)
+            else:
+                post_getters.append(loader.load(self.dynamo.pk(source['postId'])))
+            subitem_getters.append({name: loader.load(subitem_keys[name](source['postId'])) for name in subitems})
+
+        posts = [self.init_post(post_item) if post_item else None for post_item in (g() for g in post_getters)]
+        for post, getters in zip(posts, subitem_getters):
+            if post:
+                post.set_subitems(**{name: getter() for name, getter in getters.items()})
+        return posts
 
     def init_post(self, post_item):
         kwargs = {
@@ -172,6 +236,7 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
             keywords=keywords,
             set_as_user_photo=set_as_user_photo,
         )
+        identity_map.invalidate(('post', post_id))
         post = self.init_post(post_item)
 
         # text-only posts can be completed immediately
@@ -207,17 +272,63 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
         grouped_post_ids = dict(collections.Counter(post_ids))
         if not grouped_post_ids:
             return
-
-        results = []
-        for post_id, view_count in grouped_post_ids.items():
-            post = self.get_post(post_id)
-            if not post:
-                logger.warning(f'Cannot record view(s) by user `{user_id}` on DNE post `{post_id}`')
-                continue
-            results.append(post.record_view_count(user_id, view_count, viewed_at=viewed_at, view_type=view_type))
-
-        if any(results):
-            self.user_manager.dynamo.update_last_post_view_at(user_id, now=viewed_at, view_type=view_type)
+        viewed_at = viewed_at or pendulum.now('utc')
+
+        # Views of a non-original post count as views of the original post as well. The posts and the user's
+        # existing views of them are batch loaded together, one round for each level of original posts.
+        loader = DynamoLoader(self.dynamo.client)
+        posts, view_exists = {}, {}
+        view_counts = collections.defaultdict(list)  # post id to the view counts to record on it, in order
+        level, is_reported_level = list(grouped_post_ids.items()), True
+        while level:
+            getters = {
+                post_id: (
+                    loader.load(self.dynamo.pk(post_id)),
+                    loader.load(self.view_dynamo.key(post_id, user_id)),
+                )
+                for post_id, _ in level
+            }
+            next_level = []
+            for post_id, view_count in level:
+                if post_id not in posts:
+                    get_post_item, get_view_item = getters[post_id]
+                    post_item = get_post_item()
+                    posts[post_id] = self.init_post(post_item) if post_item else None
+                    view_exists[post_id] = get_view_item() is not None
+                post = posts[post_id]
+                if not post:
+                    if is_reported_level:
+                        logger.warning(f'Cannot record view(s) by user `{user_id}` on DNE post `{post_id}`')
+                    continue
+                view_counts[post_id].append(view_count)
+                if post.status == PostStatus.COMPLETED and post.original_post_id != post_id:
+                    next_level.append((post.original_post_id, view_count))
+            level, is_reported_level = next_level, False
+
+        def record(post_id):
+            post, exists = posts[post_id], view_exists[post_id]
+            for view_count in view_counts[post_id]:
+                recorded = post.record_view_count(
+                    user_id,
+                    view_count,
+                    viewed_at=viewed_at,
+                    view_type=view_type,
+                    view_exists=exists,
+                    include_original=False,
+                )
+                exists = exists or recorded
+
+        # writes to different posts are independent, but those to the same post stay in order
+        if view_counts:
+            with ThreadPoolExecutor(max_workers=min(RECORD_VIEWS_MAX_WORKERS, len(view_counts))) as executor:
+                list(executor.map(record, view_counts))
+
+        reported_posts = (posts[post_id] for post_id in grouped_post_ids)
+        if any(post and post.status == PostStatus.COMPLETED for post in reported_posts):
+            # the user is already loaded when called for the caller of a request, so the write can be skipped
+            # if it was made recently
+            if user := self.user_manager.get_user(user_id):
+                user.update_last_post_view_at(now=viewed_at, view_type=view_type)
 
     def delete_recently_expired_posts(self, now=None):
         "Delete posts that expired yesterday or today"
@@ -245,16 +356,28 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
             )
             self.init_post(post_item).delete()
 
-    def delete_older_expired_posts(self, now=None):
-        "Delete posts that expired yesterday or earlier, via full table scan"
+    def delete_older_expired_posts(self, now=None, lookback_days=EXPIRED_POSTS_LOOKBACK_DAYS):
+        """
+        Delete posts that expired yesterday or earlier, going back `lookback_days` days, or further back
+        to the day recorded by migration post_3_3 if that's older.
+        """
         now = now or pendulum.now('utc')
-        today = now.date()
-
-        # scan for expired posts
-        for post_pk in self.dynamo.generate_expired_post_pks_with_scan(today):  # excludes today
-            logger.warning(f'Deleting expired post with pk ({post_pk["partitionKey"]}, {post_pk["sortKey"]})')
-            post_item = self.dynamo.client.get_item(post_pk)
-            self.init_post(post_item).delete()
+        yesterday = (now - pendulum.duration(days=1)).date()
+        start_date = yesterday - pendulum.duration(days=lookback_days - 1)
+        sweep_from_date = self.dynamo.get_expired_sweep_from_date()
+        if sweep_from_date and sweep_from_date < start_date:
+            start_date = sweep_from_date
+
+        # posts are indexed by the day they expire on, so query each day rather than scan the whole table
+        for expired_date in pendulum.period(start_date, yesterday).range('days'):
+            for post_pk in self.dynamo.generate_expired_post_pks_by_day(expired_date):
+                logger.warning(f'Deleting expired post with pk ({post_pk["partitionKey"]}, {post_pk["sortKey"]})')
+                post_item = self.dynamo.client.get_item(post_pk)
+                self.init_post(post_item).delete()
+
+        # the older days are clear, from now on they don't need to be swept
+        if sweep_from_date:
+            self.dynamo.delete_expired_sweep_from_date()
 
     def find_posts(self, keywords, limit, next_token):
         query = {
@@ -273,12 +396,11 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
         post_id_to_trending_score = {}
         sorted_post_ids = []
 
-        for hit in search_result['hits']['hits']:
-            source = hit.get('_source')
-            if source is not None:
-                post_id = source['postId']
-                trending_score = self.get_post(source['postId']).trending_score
-                post_id_to_trending_score[post_id] = trending_score
+        sources = (hit.get('_source') for hit in search_result['hits']['hits'])
+        post_ids = [source['postId'] for source in sources if source is not None]
+        for post_id, post in zip(post_ids, self.get_posts(post_ids, subitems=('trending',))):
+            if post:
+                post_id_to_trending_score[post_id] = post.trending_score
 
         if post_id_to_trending_score:
             # sort post ids by trending weight
@@ -493,10 +615,11 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
         royalty_paid = Decimal('0')
         posts_viewed_count = 0
 
-        for key in self.view_dynamo.generate_keys_by_user_past_30_days(user_id, now=now):
-            item_id = key['partitionKey'].split('/')[1]
-
-            post_view_item = self.view_dynamo.get_view(item_id, user_id)
+        keys = self.view_dynamo.generate_keys_by_user_past_30_days(user_id, now=now)
+        loader = DynamoLoader(self.view_dynamo.client, projection_expression='royaltyFee, viewCount')
+        for post_view_item in loader.load_many(keys):
+            if not post_view_item:
+                continue
             royalty_paid += post_view_item.get('royaltyFee', Decimal('0'))
             posts_viewed_count += post_view_item.get('viewCount', 0)
 
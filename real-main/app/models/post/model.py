@@ -1,10 +1,9 @@
 import base64
 import io
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
-import colorthief
 import pendulum
-import PIL.Image
 
 from app.mixins.flag.model import FlagModelMixin
 from app.mixins.trending.model import TrendingModelMixin
@@ -13,12 +12,12 @@ from app.mixins.view.model import ViewModelMixin
 from app.models.follower.enums import FollowStatus
 from app.models.user.enums import UserPrivacyStatus, UserSubscriptionLevel
 from app.models.user.exceptions import UserException
-from app.utils import image_size
+from app.utils import identity_map, image_size
 
-from .cached_image import CachedImage
+from .cached_image import CachedImage, LazyCachedImage
 from .enums import PostNotificationType, PostStatus, PostType
 from .exceptions import PostException
-from .text_image import generate_text_image
+from .text_image import generate_text_image, get_or_generate_text_image
 
 logger = logging.getLogger()
 
@@ -29,15 +28,30 @@ VIDEO_POSTER_PREFIX = 'video-poster/poster'
 IMAGE_DIR = 'image'
 
 
-class ColorThiefFromImage(colorthief.ColorThief):
-    def __init__(self, image):
-        self.image = image
+def get_color_palette(image, color_count):
+    "The palette of an already opened image, as ColorThief would compute it for an image file"
+    # colorthief is slow to import, so it is deferred until there are colors to compute
+    import colorthief
+
+    class ColorThiefFromImage(colorthief.ColorThief):
+        def __init__(self, image):
+            self.image = image
+
+    return ColorThiefFromImage(image).get_palette(color_count=color_count)
 
 
 class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
 
     item_type = 'post'
 
+    # lazy caches, see init_cached_image()
+    native_heic_cache = LazyCachedImage(image_size.NATIVE_HEIC)
+    native_jpeg_cache = LazyCachedImage(image_size.NATIVE)
+    k4_jpeg_cache = LazyCachedImage(image_size.K4)
+    p1080_jpeg_cache = LazyCachedImage(image_size.P1080)
+    p480_jpeg_cache = LazyCachedImage(image_size.P480)
+    p64_jpeg_cache = LazyCachedImage(image_size.P64)
+
     def __init__(
         self,
         item,
@@ -99,52 +113,22 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         self.type = self.item['postType']
         self.user_id = item['postedByUserId']
 
-        # lazy caches
+    def init_cached_image(self, size):
+        "Create the CachedImage of the given size, or return None if the post has none of that size"
         if self.type == PostType.TEXT_ONLY:
-            text = self.item['text']
-            self.k4_jpeg_cache = CachedImage(
-                self.id, source=lambda: generate_text_image(text, image_size.K4.max_dimensions)
-            )
-            self.p1080_jpeg_cache = CachedImage(
-                self.id, source=lambda: generate_text_image(text, image_size.P1080.max_dimensions)
-            )
-        elif s3_uploads_client:
-            self.native_heic_cache = CachedImage(
-                self.id,
-                image_size=image_size.NATIVE_HEIC,
-                s3_client=s3_uploads_client,
-                s3_path=self.get_image_path(image_size.NATIVE_HEIC),
-            )
-            self.native_jpeg_cache = CachedImage(
-                self.id,
-                image_size=image_size.NATIVE,
-                s3_client=s3_uploads_client,
-                s3_path=self.get_image_path(image_size.NATIVE),
-            )
-            self.k4_jpeg_cache = CachedImage(
-                self.id,
-                image_size=image_size.K4,
-                s3_client=s3_uploads_client,
-                s3_path=self.get_image_path(image_size.K4),
-            )
-            self.p1080_jpeg_cache = CachedImage(
-                self.id,
-                image_size=image_size.P1080,
-                s3_client=s3_uploads_client,
-                s3_path=self.get_image_path(image_size.P1080),
-            )
-            self.p480_jpeg_cache = CachedImage(
-                self.id,
-                image_size=image_size.P480,
-                s3_client=s3_uploads_client,
-                s3_path=self.get_image_path(image_size.P480),
-            )
-            self.p64_jpeg_cache = CachedImage(
-                self.id,
-                image_size=image_size.P64,
-                s3_client=s3_uploads_client,
-                s3_path=self.get_image_path(image_size.P64),
-            )
+            if size not in (image_size.K4, image_size.P1080):
+                return None
+            text, s3_client = self.item['text'], getattr(self, 's3_uploads_client', None)
+            if s3_client:
+                return CachedImage(
+                    self.id, source=lambda: get_or_generate_text_image(text, size.max_dimensions, s3_client)
+                )
+            return CachedImage(self.id, source=lambda: generate_text_image(text, size.max_dimensions))
+        if not hasattr(self, 's3_uploads_client'):
+            return None
+        return CachedImage(
+            self.id, image_size=size, s3_client=self.s3_uploads_client, s3_path=self.get_image_path(size)
+        )
 
     @property
     def status(self):
@@ -163,6 +147,11 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         this = self if hasattr(self, '_image_item') else self.refresh_image_item()
         return this._image_item
 
+    @property
+    def original_metadata_item(self):
+        this = self if hasattr(self, '_original_metadata_item') else self.refresh_original_metadata_item()
+        return this._original_metadata_item
+
     @property
     def user(self):
         if not hasattr(self, '_user'):
@@ -193,6 +182,20 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         self._image_item = self.image_dynamo.get(self.id, strongly_consistent=strongly_consistent) or {}
         return self
 
+    def refresh_original_metadata_item(self):
+        self._original_metadata_item = self.original_metadata_dynamo.get(self.id)
+        return self
+
+    def set_subitems(self, **subitems):
+        "Set subitems loaded elsewhere, so they're not lazy-loaded. Named 'image', 'original_metadata' or 'trending'"
+        if 'image' in subitems:
+            self._image_item = subitems['image'] or {}
+        if 'original_metadata' in subitems:
+            self._original_metadata_item = subitems['original_metadata']
+        if 'trending' in subitems:
+            self._trending_item = subitems['trending']
+        return self
+
     def get_s3_image_path(self, size):
         "From within the user's directory, return the path to the s3 object of the requested size"
         return '/'.join([self.item['postedByUserId'], 'post', self.item['postId'], 'image', size.filename])
@@ -236,7 +239,7 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
 
     def get_image_readonly_url(self, size):
         path = self.get_image_path(size)
-        return self.cloudfront_client.generate_presigned_url(path, ['GET', 'HEAD'])
+        return self.cloudfront_client.generate_presigned_readonly_url(path)
 
     def get_image_writeonly_url(self):
         assert self.type == PostType.IMAGE
@@ -249,16 +252,26 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         resp['postedBy'] = self.user_manager.get_user(self.user_id).serialize(caller_user_id)
         return resp
 
-    def build_image_thumbnails(self):
-        image = self.native_jpeg_cache.readonly_image.copy()
+    def get_thumbnails_source_image(self):
+        "A copy of the native image to build the thumbnails from, shares nothing with the native cache"
+        # decoded just once, at a reduced scale when the native image is much larger than the biggest thumbnail
+        return self.native_jpeg_cache.get_reduced_image(self.k4_jpeg_cache.image_size.max_dimensions)
+
+    def build_image_thumbnails(self, image=None):
+        "Build the thumbnails from `image`, which is mutated, default a new copy of the native image"
+        import PIL.Image
+
+        if image is None:
+            image = self.get_thumbnails_source_image()
         # ordered by decreasing size
-        for cache in (self.k4_jpeg_cache, self.p1080_jpeg_cache, self.p480_jpeg_cache, self.p64_jpeg_cache):
+        caches = (self.k4_jpeg_cache, self.p1080_jpeg_cache, self.p480_jpeg_cache, self.p64_jpeg_cache)
+        for cache in caches:
             try:
                 image.thumbnail(cache.image_size.max_dimensions, resample=PIL.Image.LANCZOS)
             except Exception as err:
                 raise PostException(f'Unable to thumbnail image as jpeg for post `{self.id}`: {err}') from err
             cache.set_image(image)
-            cache.flush()
+        CachedImage.flush_many(caches)
 
     def process_image_upload(self, image_data=None, now=None):
         assert self.type == PostType.IMAGE, 'Can only process_image_upload() for IMAGE posts'
@@ -284,15 +297,23 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         if source_cached_image != self.native_jpeg_cache:
             self.native_jpeg_cache.set_image(source_cached_image.readonly_image)  # set_image makes a copy
 
-        if self.native_jpeg_cache.is_synced is False:
-            self.native_jpeg_cache.flush()
+        # the native image is uploaded while the thumbnails are built, so they're built from their own copy,
+        # taken before the upload starts, rather than from the cached image being encoded on the other thread
+        thumbnails_source_image = self.get_thumbnails_source_image()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = []
+            if self.native_jpeg_cache.is_synced is False:
+                futures.append(executor.submit(self.native_jpeg_cache.flush))
 
-        if self.native_heic_cache.is_synced is False:
-            # the HEIC image was edited (cropped) but we can't save that as HEIC, so we just delete it
-            self.native_heic_cache.clear()
-            self.native_heic_cache.flush(include_deletes=True)
+            if self.native_heic_cache.is_synced is False:
+                # the HEIC image was edited (cropped) but we can't save that as HEIC, so we just delete it
+                self.native_heic_cache.clear()
+                futures.append(executor.submit(self.native_heic_cache.flush, include_deletes=True))
+
+            self.build_image_thumbnails(thumbnails_source_image)
+            for future in futures:
+                future.result()
 
-        self.build_image_thumbnails()
         self.set_height_and_width()
         self.set_colors()
         self.set_is_verified()
@@ -454,6 +475,7 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
             self.image_dynamo.delete(self.id)
         self.original_metadata_dynamo.delete(self.id)
         self.dynamo.delete_post(self.id)
+        identity_map.invalidate(('post', self.id))
 
         return self
 
@@ -487,13 +509,14 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         return self
 
     def set_height_and_width(self):
-        width, height = self.native_jpeg_cache.readonly_image.size
+        width, height = self.native_jpeg_cache.size
         self._image_item = self.image_dynamo.set_height_and_width(self.id, height, width)
         return self
 
     def set_colors(self):
         try:
-            colors = ColorThiefFromImage(self.native_jpeg_cache.readonly_image).get_palette(color_count=5)
+            # the palette of the 480p thumbnail is as good, and many times faster to compute
+            colors = get_color_palette(self.p480_jpeg_cache.readonly_image, color_count=5)
         except Exception as err:
             logger.warning(f'ColorTheif failed to get palette with error `{err}` for post `{self.id}`')
         else:
@@ -501,14 +524,17 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         return self
 
     def set_checksum(self):
-        path = self.get_image_path(image_size.NATIVE)
-        checksum = self.s3_uploads_client.get_object_checksum(path)
+        # known without a round trip to S3 if the native image has been read or written
+        native_jpeg_cache = getattr(self, 'native_jpeg_cache', None)
+        checksum = native_jpeg_cache.checksum if native_jpeg_cache else None
+        if not checksum:
+            path = self.get_image_path(image_size.NATIVE)
+            checksum = self.s3_uploads_client.get_object_checksum(path)
         self.item = self.dynamo.set_checksum(self.id, self.item['postedAt'], checksum)
         return self
 
     def set_is_verified(self):
-        path = self.get_image_path(image_size.NATIVE)
-        image_url = self.cloudfront_client.generate_presigned_url(path, ['GET', 'HEAD'])
+        image_url = self.get_image_readonly_url(image_size.NATIVE)
         is_verified = self.post_verification_client.verify_image(
             image_url,
             image_format=self.image_item.get('imageFormat'),
@@ -608,17 +634,21 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
 
         return super().flag(user)
 
-    def record_view_count(self, user_id, view_count, viewed_at=None, view_type=None):
+    def record_view_count(
+        self, user_id, view_count, viewed_at=None, view_type=None, view_exists=None, include_original=True
+    ):
         if self.status != PostStatus.COMPLETED:
             logger.warning(f'Cannot record views by user `{user_id}` on non-COMPLETED post `{self.id}`')
             return False
 
         # record user's view of their own post, but don't increment any counters about it
         # their view will be filtered out when looking at Post.viewedBy
-        super().record_view_count(user_id, view_count, viewed_at=viewed_at, view_type=view_type)
+        super().record_view_count(
+            user_id, view_count, viewed_at=viewed_at, view_type=view_type, view_exists=view_exists
+        )
 
         # If this is a non-original post, count this like a view of the original post as well
-        if self.original_post_id != self.id:
+        if include_original and self.original_post_id != self.id:
             original_post = self.post_manager.get_post(self.original_post_id)
             if original_post:
                 original_post.record_view_count(user_id, view_count, viewed_at=viewed_at, view_type=view_type)
@@ -1,29 +1,43 @@
+import functools
+import hashlib
+import io
 import logging
 import os.path
 
-import PIL.Image
-import PIL.ImageDraw
-import PIL.ImageFont
-
+# PIL is imported within the functions that use it, as it is slow to import and most lambda
+# invocations don't render text
 font_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'fonts', 'OpenSans-Regular.ttf')
 logger = logging.getLogger()
 
+FONT_CACHE_SIZE = int(os.environ.get('TEXT_IMAGE_FONT_CACHE_SIZE', 32))
 
-def generate_text_image(text, dimensions, font_size=None):
-    "Generate an image with text nicely wrapped and centered"
-    assert text, 'Must be called with some text to render'
+# rendered text images are stored in S3 under a path that's a hash of everything that goes into them,
+# bump the version when the rendering changes so they are all rendered afresh. The uploads bucket expires
+# everything under the prefix after a while (see serverless/resources/s3.yml), so keep the two in sync
+RENDER_CACHE_PREFIX = 'text-image'
+RENDER_VERSION = 1
+RENDER_CONTENT_TYPE = 'image/png'
 
-    image_width, image_height = dimensions
-    image_aspect_ratio = image_width / image_height
-    img = PIL.Image.new('RGB', dimensions)
 
-    font_size = font_size or image_height // 10
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+def get_font(font_size):
+    "Fonts are cached by size, as reading and parsing the font file is a good part of rendering"
+    import PIL.ImageFont
 
     with open(font_path, 'rb') as fh:
-        font = PIL.ImageFont.truetype(fh, size=font_size)
+        return PIL.ImageFont.truetype(fh, size=font_size)
 
-    # we want our text to match, more or less, the aspect ratio of the overall image
-    draw = PIL.ImageDraw.Draw(img)
+
+def layout_text(raw_tokens, font_size, aspect_ratio):
+    """
+    Wrap the tokens to the aspect ratio using the font of the given size.
+    Returns a tuple of (wrapped text, text width, text height, line spacing).
+    """
+    import PIL.Image
+    import PIL.ImageDraw
+
+    font = get_font(font_size)
+    draw = PIL.ImageDraw.Draw(PIL.Image.new('RGB', (1, 1)))
 
     # determine how big horizontal and vertical spaces are
     size_1 = draw.textsize('Z Z', font=font)
@@ -32,25 +46,83 @@ def generate_text_image(text, dimensions, font_size=None):
     line_height = size_1[1]
     line_spacing = size_2[1] - 2 * size_1[1]
 
-    # tokenize then wrap the text so it looks good
-    raw_tokens = text.split()
     token_widths = [draw.textsize(raw_token, font=font)[0] for raw_token in raw_tokens]
     text, text_width, text_height = rectangle_wrap(
-        raw_tokens, token_widths, token_spacing, line_spacing, line_height, image_aspect_ratio
+        raw_tokens, token_widths, token_spacing, line_spacing, line_height, aspect_ratio
     )
+    return text, text_width, text_height, line_spacing
 
-    logger.debug(f'Computed text size: ({text_width}, {text_height})')
-    logger.debug(f'Actual text size:   {draw.textsize(text, font=font)}')
 
-    # if it's too big to fit in the image, shrink the font size and re-run the algo
+def fit_text(raw_tokens, dimensions):
+    """
+    Find a font size, up to a tenth of the image height, at which the wrapped text fits in 90% of the image width.
+    Returns a tuple of (font size, layout) where layout is as layout_text().
+
+    Text width is close to proportional to font size, so when the text is too wide the font size is scaled
+    down by how much too wide it is, which usually fits on the first try.
+    """
+    image_width, image_height = dimensions
+    aspect_ratio = image_width / image_height
     max_text_width = image_width * 0.9
-    if text_width > max_text_width:
-        font_size = int(font_size * max_text_width / text_width)
-        return generate_text_image(text, dimensions, font_size=font_size)
+
+    font_size = max(image_height // 10, 1)
+    while True:
+        layout = layout_text(raw_tokens, font_size, aspect_ratio)
+        if layout[1] <= max_text_width or font_size == 1:
+            return font_size, layout
+        font_size = max(min(int(font_size * max_text_width / layout[1]), font_size - 1), 1)
+
+
+def generate_text_image(text, dimensions):
+    "Generate an image with text nicely wrapped and centered"
+    assert text, 'Must be called with some text to render'
+    import PIL.Image
+    import PIL.ImageDraw
+
+    image_width, image_height = dimensions
+    img = PIL.Image.new('RGB', dimensions)
+
+    # we want our text to match, more or less, the aspect ratio of the overall image
+    font_size, (text, text_width, text_height, line_spacing) = fit_text(text.split(), dimensions)
+    logger.debug(f'Computed text size: ({text_width}, {text_height}) at font size {font_size}')
 
     # write out the text in center of the image
+    draw = PIL.ImageDraw.Draw(img)
     xy = ((image_width - text_width) / 2, (image_height - text_height) / 2 - line_spacing / 2)
-    draw.text(xy, text, align='center', fill=(255, 255, 255), font=font)
+    draw.text(xy, text, align='center', fill=(255, 255, 255), font=get_font(font_size))
+    return img
+
+
+def get_render_cache_path(text, dimensions):
+    "Content-addressed path in S3 of the rendered text image"
+    key = f'{RENDER_VERSION}/{dimensions[0]}x{dimensions[1]}/{text}'
+    return f'{RENDER_CACHE_PREFIX}/{hashlib.sha256(key.encode("utf-8")).hexdigest()}.png'
+
+
+def get_or_generate_text_image(text, dimensions, s3_client):
+    """
+    As generate_text_image(), but read from the render cache in S3 if it has already been rendered.
+    Rendered images are written to the cache, as lossless png.
+    """
+    import PIL.Image
+
+    path = get_render_cache_path(text, dimensions)
+    try:
+        data = s3_client.get_object_data_stream(path).read()
+    except s3_client.exceptions.NoSuchKey:
+        pass
+    else:
+        img = PIL.Image.open(io.BytesIO(data))
+        img.load()
+        return img
+
+    img = generate_text_image(text, dimensions)
+    buf = io.BytesIO()
+    img.save(buf, format='PNG')
+    try:
+        s3_client.put_object(path, buf.getvalue(), RENDER_CONTENT_TYPE)
+    except Exception as err:
+        logger.warning(f'Unable to write rendered text image to `{path}`: {err}')
     return img
 
 
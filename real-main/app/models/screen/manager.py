@@ -15,7 +15,7 @@ class ScreenManager(ViewManagerMixin, ManagerBase):
 
     def __init__(self, clients, managers=None):
         super().__init__(clients, managers=managers)
-        managers = managers or {}
+        managers = {} if managers is None else managers
         managers['screen'] = self
 
     def init_screen(self, screen_name):
@@ -1,5 +1,6 @@
 import collections
 import logging
+import os
 from decimal import BasicContext, Decimal
 
 import pendulum
@@ -10,6 +11,9 @@ from ..exceptions import UserAlreadyExists, UserAlreadyGrantedSubscription
 
 logger = logging.getLogger()
 
+# writes of lastPostViewAt are skipped if the loaded item shows it was written less than this long ago
+LAST_POST_VIEW_AT_WRITE_WINDOW_SECONDS = int(os.environ.get('USER_LAST_POST_VIEW_AT_WRITE_WINDOW_SECONDS', 60))
+
 
 class UserDynamo:
     def __init__(self, dynamo_client):
@@ -61,6 +65,8 @@ class UserDynamo:
                 'username': username,
                 'privacyStatus': UserPrivacyStatus.PUBLIC,
                 'signedUpAt': now.to_iso8601_string(),
+                'gsiK3PartitionKey': f'userSignedUp/{now.to_date_string()}',
+                'gsiK3SortKey': now.int_timestamp,
             },
         }
         if full_name:
@@ -255,7 +261,14 @@ class UserDynamo:
             query_kwargs['ExpressionAttributeValues'] = {':aev': version}
         return self.client.update_item(query_kwargs)
 
-    def set_last_client(self, user_id, client):
+    def set_last_client(self, user_id, client, user_item=None):
+        """
+        Set the user's lastClient.
+        If the already-loaded `user_item` is given and shows it is unchanged, the write is skipped and
+        `user_item` is returned.
+        """
+        if user_item and user_item.get('lastClient') == client:
+            return user_item
         query_kwargs = {
             'Key': self.pk(user_id),
             'UpdateExpression': 'SET lastClient = :lc',
@@ -263,14 +276,19 @@ class UserDynamo:
         }
         return self.client.update_item(query_kwargs)
 
-    def set_last_disable_dating_date(self, user_id):
+    def set_last_disable_dating_date(self, user_id, user_item=None):
+        """
+        Push back the date dating is disabled on to 30 days from now.
+        If the already-loaded `user_item` is given and shows it is unchanged, the write is skipped and
+        `user_item` is returned.
+        """
+        disable_date = (pendulum.now('utc') + pendulum.duration(days=30)).to_date_string()
+        if user_item and user_item.get('gsiA3SortKey') == disable_date:
+            return user_item
         query_kwargs = {
             'Key': self.pk(user_id),
             'UpdateExpression': 'SET gsiA3PartitionKey = :gsia3pk, gsiA3SortKey = :gsia3sk',
-            'ExpressionAttributeValues': {
-                ':gsia3pk': 'userDisableDatingDate',
-                ':gsia3sk': (pendulum.now('utc') + pendulum.duration(days=30)).to_date_string(),
-            },
+            'ExpressionAttributeValues': {':gsia3pk': 'userDisableDatingDate', ':gsia3sk': disable_date},
         }
         return self.client.update_item(query_kwargs)
 
@@ -383,24 +401,57 @@ class UserDynamo:
         return (key['partitionKey'].split('/')[1] for key in self.client.generate_all_query(query_kwargs))
 
     def generate_dating_enabled_user_ids(self):
-        scan_kwargs = {
-            'FilterExpression': 'begins_with(partitionKey, :pk_prefix) AND sortKey = :sk_prefix AND datingStatus = :status',
-            'ExpressionAttributeValues': {':pk_prefix': 'user/', ':sk_prefix': 'profile', ':status': 'ENABLED'},
+        # users with dating enabled, and only them, are indexed by the date to auto-disable their dating on
+        query_kwargs = {
+            'KeyConditionExpression': 'gsiA3PartitionKey = :gsia3pk',
+            'FilterExpression': 'datingStatus = :status',
+            'ProjectionExpression': 'partitionKey',
+            'ExpressionAttributeValues': {
+                ':gsia3pk': 'userDisableDatingDate',
+                ':status': UserDatingStatus.ENABLED,
+            },
+            'IndexName': 'GSI-A3',
+        }
+        return (key['partitionKey'].split('/')[1] for key in self.client.generate_all_query(query_kwargs))
+
+    def generate_user_ids_by_signed_up_date(self, date):
+        "`date` should be a string in format YYYY-MM-DD"
+        query_kwargs = {
+            'KeyConditionExpression': 'gsiK3PartitionKey = :gsipk',
+            'ProjectionExpression': 'partitionKey',
+            'ExpressionAttributeValues': {':gsipk': f'userSignedUp/{date}'},
+            'IndexName': 'GSI-K3',
         }
-        return (key['partitionKey'].split('/')[1] for key in self.client.generate_all_scan(scan_kwargs))
+        return (key['partitionKey'].split('/')[1] for key in self.client.generate_all_query(query_kwargs))
 
-    def update_last_post_view_at(self, user_id, now=None, view_type=None):
+    def update_last_post_view_at(
+        self,
+        user_id,
+        now=None,
+        view_type=None,
+        user_item=None,
+        window_seconds=LAST_POST_VIEW_AT_WRITE_WINDOW_SECONDS,
+    ):
+        """
+        Best effort to update lastPostViewAt, and lastPostFocusViewAt for FOCUS views. Logs WARNING on failure.
+        If the already-loaded `user_item` is given and shows they were written less than `window_seconds`
+        before `now`, the write is skipped and `user_item` is returned.
+        """
         now = now or pendulum.now('utc')
+        attrs = ('lastPostViewAt', 'lastPostFocusViewAt') if view_type == 'FOCUS' else ('lastPostViewAt',)
+        if user_item and all(
+            attr in user_item
+            and now - pendulum.parse(user_item[attr]) < pendulum.duration(seconds=window_seconds)
+            for attr in attrs
+        ):
+            return user_item
+
         query_kwargs = {
             'Key': self.pk(user_id),
-            'UpdateExpression': 'SET lastPostViewAt = :lpva',
+            'UpdateExpression': 'SET ' + ', '.join(f'{attr} = :lpva' for attr in attrs),
             'ConditionExpression': 'NOT lastPostViewAt > :lpva',
             'ExpressionAttributeValues': {':lpva': now.to_iso8601_string()},
         }
-
-        if view_type == 'FOCUS':
-            query_kwargs['UpdateExpression'] = 'SET lastPostViewAt = :lpva, lastPostFocusViewAt = :lpva'
-
         failure_warning = f'Failed to update lastPostViewAt for user `{user_id}`'
         return self.client.update_item(query_kwargs, failure_warning=failure_warning)
 
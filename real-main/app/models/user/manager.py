@@ -16,7 +16,7 @@ from app.models.appstore.enums import AppStoreSubscriptionStatus
 from app.models.card.templates import ContactJoinedCardTemplate, UserNewDatingMatchesTemplate
 from app.models.follower.enums import FollowStatus
 from app.models.post.enums import PostStatus
-from app.utils import GqlNotificationType
+from app.utils import GqlNotificationType, identity_map
 
 from .dynamo import UserContactAttributeDynamo, UserDynamo
 from .enums import UserDatingStatus, UserStatus, UserSubscriptionLevel
@@ -52,7 +52,7 @@ class UserManager(TrendingManagerMixin, ManagerBase):
 
     def __init__(self, clients, managers=None, placeholder_photos_directory=S3_PLACEHOLDER_PHOTOS_DIRECTORY):
         super().__init__(clients, managers=managers)
-        managers = managers or {}
+        managers = {} if managers is None else managers
         managers['user'] = self
         self.album_manager = managers.get('album') or models.AlbumManager(clients, managers=managers)
         self.block_manager = managers.get('block') or models.BlockManager(clients, managers=managers)
@@ -83,8 +83,11 @@ class UserManager(TrendingManagerMixin, ManagerBase):
         return self._real_user_id
 
     def get_user(self, user_id, strongly_consistent=False):
-        user_item = self.dynamo.get_user(user_id, strongly_consistent=strongly_consistent)
-        return self.init_user(user_item) if user_item else None
+        def load():
+            user_item = self.dynamo.get_user(user_id, strongly_consistent=strongly_consistent)
+            return self.init_user(user_item) if user_item else None
+
+        return identity_map.get(('user', user_id), load, refresh=strongly_consistent)
 
     def get_user_by_username(self, username):
         user_item = self.dynamo.get_user_by_username(username)
@@ -165,6 +168,7 @@ class UserManager(TrendingManagerMixin, ManagerBase):
         item = self.dynamo.add_user(
             user_id, username, placeholder_photo_code=photo_code, status=UserStatus.ANONYMOUS
         )
+        identity_map.invalidate(('user', user_id))
         user = self.init_user(item)
         self.follow_real_user(user)
         return user, tokens
@@ -214,6 +218,7 @@ class UserManager(TrendingManagerMixin, ManagerBase):
                 self.cognito_client.clear_user_attribute(user_id, 'preferred_username')
             raise
 
+        identity_map.invalidate(('user', user_id))
         user = self.init_user(item)
         self.follow_real_user(user)
         return user
@@ -265,6 +270,7 @@ class UserManager(TrendingManagerMixin, ManagerBase):
         item = self.dynamo.add_user(
             user_id, username, full_name=full_name, email=email, placeholder_photo_code=photo_code
         )
+        identity_map.invalidate(('user', user_id))
         user = self.init_user(item)
         self.follow_real_user(user)
         return user
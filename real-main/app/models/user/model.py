@@ -10,7 +10,7 @@ from app.clients import RealDatingClient
 from app.clients.cognito import InvalidEncryption
 from app.mixins.trending.model import TrendingModelMixin
 from app.models.post.enums import PostStatus, PostType
-from app.utils import image_size
+from app.utils import identity_map, image_size
 
 from .enums import UserDatingStatus, UserPrivacyStatus, UserStatus, UserSubscriptionLevel
 from .error_codes import UserDatingMissingError, UserDatingWrongError
@@ -94,7 +94,7 @@ class User(TrendingModelMixin):
         self.id = user_item['userId']
         self.placeholder_photos_directory = placeholder_photos_directory
         self.frontend_resources_domain = frontend_resources_domain
-        self.real_dating_client = RealDatingClient()
+        self.real_dating_client = clients.get('real_dating') or RealDatingClient()
 
     @property
     def username(self):
@@ -134,7 +134,7 @@ class User(TrendingModelMixin):
     def get_photo_url(self, size):
         photo_path = self.get_photo_path(size)
         if photo_path:
-            return self.cloudfront_client.generate_presigned_url(photo_path, ['GET', 'HEAD'])
+            return self.cloudfront_client.generate_presigned_readonly_url(photo_path)
         placeholder_path = self.get_placeholder_photo_path(size)
         if placeholder_path and self.frontend_resources_domain:
             return f'https://{self.frontend_resources_domain}/{placeholder_path}'
@@ -213,6 +213,7 @@ class User(TrendingModelMixin):
         if self.status != UserStatus.RESETTING:
             self.item = self.dynamo.set_user_status(self.id, UserStatus.RESETTING)
         self.dynamo.delete_user(self.id)
+        identity_map.invalidate(('user', self.id))
         # release the user's username from cognito
         try:
             self.cognito_client.clear_user_attribute(self.id, 'preferred_username')
@@ -225,6 +226,7 @@ class User(TrendingModelMixin):
         if self.status != UserStatus.DELETING:
             self.item = self.dynamo.set_user_status(self.id, UserStatus.DELETING)
         self.dynamo.delete_user(self.id)
+        identity_map.invalidate(('user', self.id))
         return self
 
     def set_accepted_eula_version(self, version):
@@ -258,13 +260,17 @@ class User(TrendingModelMixin):
         return self
 
     def set_last_client(self, client):
-        if self.item.get('lastClient') != client:
-            self.item = self.dynamo.set_last_client(self.id, client)
+        self.item = self.dynamo.set_last_client(self.id, client, user_item=self.item)
         return self
 
     def set_last_disable_dating_date(self):
         if self.item.get('datingStatus') == 'ENABLED':
-            self.item = self.dynamo.set_last_disable_dating_date(self.id)
+            self.item = self.dynamo.set_last_disable_dating_date(self.id, user_item=self.item)
+        return self
+
+    def update_last_post_view_at(self, now=None, view_type=None):
+        kwargs = {'now': now, 'view_type': view_type, 'user_item': self.item}
+        self.item = self.dynamo.update_last_post_view_at(self.id, **kwargs) or self.item
         return self
 
     def update_username(self, username):
@@ -1,6 +1,9 @@
 __all__ = [
     'DecimalJsonEncoder',
     'GqlNotificationType',
+    'IdentityMap',
+    'identity_map',
 ]
 from .decimal_json_encoder import DecimalJsonEncoder
 from .gql_notification_type import GqlNotificationType
+from .identity_map import IdentityMap, identity_map
@@ -0,0 +1,98 @@
+import contextlib
+import threading
+from concurrent.futures import Future
+
+_missing = object()
+
+
+class IdentityMap:
+    """
+    Request-scoped cache of loaded models, keyed by (item type, item id...).
+
+    Outside of a scope every lookup goes straight through to the loader, so code running
+    in stream handlers, crons and the like sees no change in behavior. Inside a scope the
+    first lookup of a key loads it (a result of None is remembered too) and later lookups
+    return the same instance. Code that writes an item without going through the cached
+    instance must invalidate its key.
+
+    Loads run outside the lock, so threads loading different keys don't wait on each other.
+    A lookup of a key that another thread is loading waits for that load rather than repeating it.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.active = False
+        self.items = {}
+        self.loading = {}  # futures of the loads in progress, by key
+        self.hits = 0
+        self.misses = 0
+
+    @contextlib.contextmanager
+    def scope(self):
+        with self.lock:
+            self.active = True
+            self.items = {}
+            self.loading = {}
+            self.hits = 0
+            self.misses = 0
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self.active = False
+                self.items = {}
+                self.loading = {}
+
+    def get(self, key, loader, refresh=False):
+        "Return the value for `key`, calling `loader()` to load it if it's not already mapped"
+        if not self.active:
+            return loader()
+        with self.lock:
+            value = _missing if refresh else self.items.get(key, _missing)
+            if value is not _missing:
+                self.hits += 1
+                return value
+            future = None if refresh else self.loading.get(key)
+            # a loader that looks up its own key loads it again, rather than waiting on itself
+            is_loading_elsewhere = future is not None and future.thread_id != threading.get_ident()
+            if is_loading_elsewhere:
+                self.hits += 1
+            else:
+                self.misses += 1
+                future = self.loading[key] = Future()
+                future.thread_id = threading.get_ident()
+        if is_loading_elsewhere:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as err:
+            with self.lock:
+                if self.loading.get(key) is future:
+                    del self.loading[key]
+            future.set_exception(err)
+            raise
+        with self.lock:
+            # unless the key was invalidated or reloaded while this load was in progress
+            if self.loading.get(key) is future:
+                del self.loading[key]
+                self.items[key] = value
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+            self.loading.pop(key, None)
+
+    def invalidate_type(self, item_type):
+        "Invalidate all keys of the given item type"
+        with self.lock:
+            self.items = {k: v for k, v in self.items.items() if k[0] != item_type}
+            self.loading = {k: v for k, v in self.loading.items() if k[0] != item_type}
+
+    def get_stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.items)}
+
+
+identity_map = IdentityMap()
@@ -0,0 +1,107 @@
+import logging
+from decimal import Decimal
+
+import pytest
+
+from app.clients import AmplitudeClient
+
+URL = 'https://amplitude-url/batch'
+
+
+@pytest.fixture
+def amplitude_client():
+    yield AmplitudeClient(api_key='the-api-key', url=URL, batch_size=3, max_attempts=3, backoff_seconds=0)
+
+
+def sent_events(requests_mock):
+    return [req.json()['events'] for req in requests_mock.request_history]
+
+
+def test_send_event(amplitude_client, requests_mock):
+    requests_mock.post(URL, json={'code': 200})
+    item = {'userId': 'uid', 'postCount': Decimal(2), 'ratio': Decimal('0.5'), 'tags': {'a'}}
+    assert amplitude_client.send_event('uid', item) is True
+
+    assert len(requests_mock.request_history) == 1
+    body = requests_mock.request_history[0].json()
+    assert body['api_key'] == 'the-api-key'
+    assert len(body['events']) == 1
+    event = body['events'][0]
+    assert event['user_id'] == 'uid'
+    assert event['event_type'] == 'CREATE_USER'
+    assert event['event_properties'] == {'userId': 'uid', 'postCount': 2.0, 'ratio': 0.5, 'tags': ['a']}
+    assert event['insert_id']
+    # the item is not mutated
+    assert item['postCount'] == Decimal(2)
+
+    new_item = {**item, 'fullName': 'Joe'}
+    assert amplitude_client.send_event('uid', new_item, item) is True
+    assert sent_events(requests_mock)[1][0]['event_type'] == 'UPDATE_USER'
+
+
+def test_send_event_skips_ignored_changes(amplitude_client, requests_mock):
+    requests_mock.post(URL, json={'code': 200})
+    old_item = {'userId': 'uid', 'lastClient': {'version': '1'}}
+    assert amplitude_client.send_event('uid', dict(old_item), old_item) is False
+    new_item = {**old_item, 'lastClient': {'version': '2'}, 'lastPostViewAt': 'now'}
+    assert amplitude_client.send_event('uid', new_item, old_item) is False
+    assert requests_mock.request_history == []
+
+
+def test_send_event_retries(amplitude_client, requests_mock):
+    requests_mock.post(URL, [{'status_code': 503}, {'status_code': 429}, {'json': {'code': 200}}])
+    assert amplitude_client.send_event('uid', {'userId': 'uid'}) is True
+    events = sent_events(requests_mock)
+    assert len(events) == 3
+    # retries are of the very same events, so amplitude can de-duplicate them
+    assert events[0] == events[1] == events[2]
+
+
+def test_send_event_failure_logs_warning(amplitude_client, requests_mock, caplog):
+    requests_mock.post(URL, status_code=500, text='server error')
+    with caplog.at_level(logging.WARNING):
+        assert amplitude_client.send_event('uid', {'userId': 'uid'}) is False
+    assert len(requests_mock.request_history) == 3
+    assert len(caplog.records) == 1
+    assert 'Failed to send 1 events to amplitude' in caplog.records[0].msg
+    assert 'server error' in caplog.records[0].msg
+
+    # bad requests aren't retried
+    requests_mock.post(URL, status_code=400, text='bad request')
+    with caplog.at_level(logging.WARNING):
+        assert amplitude_client.send_event('uid', {'userId': 'uid'}) is False
+    assert len(requests_mock.request_history) == 4
+    assert 'bad request' in caplog.records[1].msg
+
+
+def test_batch(amplitude_client, requests_mock):
+    requests_mock.post(URL, json={'code': 200})
+    with amplitude_client.batch():
+        for idx in range(7):
+            assert amplitude_client.send_event(f'uid{idx}', {'userId': f'uid{idx}'}) is True
+        # a no-op change isn't queued
+        assert amplitude_client.send_event('uid', {'userId': 'uid'}, {'userId': 'uid'}) is False
+    assert [[event['user_id'] for event in events] for events in sent_events(requests_mock)] == [
+        ['uid0', 'uid1', 'uid2'],
+        ['uid3', 'uid4', 'uid5'],
+        ['uid6'],
+    ]
+
+    # nothing to send, no request made
+    with amplitude_client.batch():
+        pass
+    assert len(requests_mock.request_history) == 3
+
+    # outside of a scope, sent right away
+    amplitude_client.send_event('uid', {'userId': 'uid'})
+    assert len(requests_mock.request_history) == 4
+
+
+def test_batch_sent_on_exception(amplitude_client, requests_mock):
+    requests_mock.post(URL, json={'code': 200})
+    with pytest.raises(Exception, match='oops'):
+        with amplitude_client.batch():
+            amplitude_client.send_event('uid', {'userId': 'uid'})
+            raise Exception('oops')
+    assert len(sent_events(requests_mock)) == 1
+    assert amplitude_client.events is None
@@ -0,0 +1,154 @@
+import json
+from os import path
+
+import graphql
+import pytest
+
+from app.clients import AppSyncClient
+
+# the requests_mock parameter is auto-supplied, no need to even import the
+# requests-mock library # https://requests-mock.readthedocs.io/en/latest/pytest.html
+
+URL = 'https://real.appsync-api.amazonaws.com/graphql'
+
+schema_path = path.join(path.dirname(__file__), '..', '..', 'schema.graphql')
+
+# definitions appsync provides that aren't in our schema file
+APPSYNC_PRELUDE = '''
+    scalar AWSDate
+    scalar AWSDateTime
+    scalar AWSEmail
+    scalar AWSPhone
+    scalar AWSURL
+    directive @aws_subscribe(mutations: [String]) on FIELD_DEFINITION
+'''
+
+
+@pytest.fixture
+def appsync_client(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'foo')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'bar')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    yield AppSyncClient(appsync_graphql_url=URL, batch_size=2)
+
+
+@pytest.fixture(scope='module')
+def schema():
+    with open(schema_path) as fh:
+        schema = graphql.build_ast_schema(graphql.parse(APPSYNC_PRELUDE + fh.read()))
+    # as the appsync resolver does, echo back the notification
+    schema.get_mutation_type().fields['triggerNotification'].resolver = lambda root, info, input: input
+    yield schema
+
+
+def test_fire_notification(appsync_client, requests_mock):
+    requests_mock.post(URL, json={'data': {}})
+    appsync_client.fire_notification('uid', 'USER_FEED_CHANGED', postId='pid')
+    assert requests_mock.call_count == 1
+    req = requests_mock.request_history[0]
+    assert req.headers['Authorization'].startswith('AWS4-HMAC-SHA256 Credential=foo/')
+    body = json.loads(req.body)
+    assert 'triggerNotification(input: $input)' in body['query']
+    assert 'postId' in body['query']
+    assert body['variables'] == {'input': {'userId': 'uid', 'type': 'USER_FEED_CHANGED', 'postId': 'pid'}}
+
+
+def test_transport_and_mutations_are_reused(appsync_client, requests_mock):
+    requests_mock.post(URL, json={'data': {}})
+    appsync_client.fire_notification('uid1', 'USER_FEED_CHANGED')
+    transport = appsync_client.transport
+    mutation = appsync_client.get_notification_mutation(())
+    appsync_client.fire_notification('uid2', 'USER_FEED_CHANGED')
+    assert appsync_client.transport is transport
+    assert appsync_client.get_notification_mutation(()) is mutation
+    assert requests_mock.call_count == 2
+
+
+def test_fire_notification_error(appsync_client, requests_mock):
+    requests_mock.post(URL, json={'data': None, 'errors': [{'message': 'oops'}]})
+    with pytest.raises(Exception, match='oops'):
+        appsync_client.fire_notification('uid', 'USER_FEED_CHANGED')
+
+
+def test_fire_notifications(appsync_client, requests_mock):
+    requests_mock.post(URL, json={'data': {}})
+    appsync_client.fire_notifications(iter(['uid1', 'uid2', 'uid3']), 'USER_FEED_CHANGED', postId='pid')
+
+    # batch size of two means two requests
+    assert requests_mock.call_count == 2
+    bodies = sorted(
+        (json.loads(req.body) for req in requests_mock.request_history), key=lambda b: len(b['variables'])
+    )
+    assert 'n0: triggerNotification(input: $input0)' in bodies[0]['query']
+    assert 'n1:' not in bodies[0]['query']
+    assert bodies[0]['variables'] == {'input0': {'userId': 'uid3', 'type': 'USER_FEED_CHANGED', 'postId': 'pid'}}
+    assert 'n1: triggerNotification(input: $input1)' in bodies[1]['query']
+    assert bodies[1]['variables'] == {
+        'input0': {'userId': 'uid1', 'type': 'USER_FEED_CHANGED', 'postId': 'pid'},
+        'input1': {'userId': 'uid2', 'type': 'USER_FEED_CHANGED', 'postId': 'pid'},
+    }
+
+
+def test_fire_notifications_none(appsync_client, requests_mock):
+    appsync_client.fire_notifications([], 'USER_FEED_CHANGED')
+    assert requests_mock.call_count == 0
+
+
+def test_fire_notifications_error_sends_all_batches(appsync_client, requests_mock, caplog):
+    requests_mock.post(URL, json={'data': None, 'errors': [{'message': 'oops'}]})
+    with pytest.raises(Exception, match='2 of 2 notification batches failed'):
+        appsync_client.fire_notifications(['uid1', 'uid2', 'uid3'], 'USER_FEED_CHANGED')
+    assert requests_mock.call_count == 2
+    assert len(caplog.records) == 2
+    assert all(rec.levelname == 'WARNING' for rec in caplog.records)
+
+
+def test_send_query_string(appsync_client, requests_mock):
+    requests_mock.post(URL, json={'data': {}})
+    query = '''
+        mutation TriggerCardNotification ($input: CardNotificationInput!) {
+            triggerCardNotification (input: $input) { userId }
+        }
+    '''
+    appsync_client.send(query, {'input': {'userId': 'uid'}})
+    appsync_client.send(query, {'input': {'userId': 'uid2'}})
+    assert requests_mock.call_count == 2
+    body = json.loads(requests_mock.request_history[0].body)
+    assert 'triggerCardNotification(input: $input)' in body['query']
+    assert body['variables'] == {'input': {'userId': 'uid'}}
+
+    # parsed once, and already parsed queries are passed through
+    document = appsync_client.parse(query)
+    assert appsync_client.parse(query) is document
+    assert appsync_client.parse(document) is document
+
+
+def test_fire_notifications_against_schema(appsync_client, requests_mock, schema):
+    sent = []
+
+    def execute(request, context):
+        body = json.loads(request.body)
+        result = graphql.graphql(schema, body['query'], variable_values=body['variables'])
+        sent.append(result.data)
+        return {'data': result.data, 'errors': [str(err) for err in result.errors or []] or None}
+
+    requests_mock.post(URL, json=execute)
+    appsync_client.fire_notifications(['uid1', 'uid2', 'uid3'], 'USER_FEED_CHANGED', postId='pid')
+    appsync_client.fire_notifications(['uid1', 'uid2'], 'USER_CHATS_WITH_UNVIEWED_MESSAGES_COUNT_CHANGED')
+
+    # every aliased mutation is executed, with its own input
+    assert sorted(sent, key=len) == [
+        {'n0': {'userId': 'uid3', 'type': 'USER_FEED_CHANGED', 'postId': 'pid'}},
+        {
+            'n0': {'userId': 'uid1', 'type': 'USER_FEED_CHANGED', 'postId': 'pid'},
+            'n1': {'userId': 'uid2', 'type': 'USER_FEED_CHANGED', 'postId': 'pid'},
+        },
+        {
+            'n0': {'userId': 'uid1', 'type': 'USER_CHATS_WITH_UNVIEWED_MESSAGES_COUNT_CHANGED'},
+            'n1': {'userId': 'uid2', 'type': 'USER_CHATS_WITH_UNVIEWED_MESSAGES_COUNT_CHANGED'},
+        },
+    ]
+
+    # and the schema rejects what it should
+    with pytest.raises(Exception, match='1 of 1 notification batches failed'):
+        appsync_client.fire_notifications(['uid1'], 'NOT_A_NOTIFICATION_TYPE')
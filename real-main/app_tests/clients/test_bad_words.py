@@ -0,0 +1,142 @@
+import json
+from unittest import mock
+
+import moto
+import pytest
+
+from app.clients import BadWordsClient
+from app.clients.bad_words import BadWordsIndex
+
+
+@pytest.fixture
+def client():
+    with moto.mock_s3():
+        client = BadWordsClient(bucket_name='bad-words-bucket', cache_ttl=60)
+        client.s3_bad_words.s3.create_bucket(Bucket='bad-words-bucket')
+        yield client
+
+
+def put_bad_words(client, bad_words):
+    body = json.dumps({word: '' for word in bad_words}).encode()
+    client.s3_bad_words.put_object(client.file_name, body, 'application/json')
+
+
+def test_index_words():
+    index = BadWordsIndex(['Bad', 'worse'])
+    assert index.matches('bad') is True
+    assert index.matches('this is BAD') is True
+    assert index.matches('this is bad, very bad.') is True
+    assert index.matches('"worse"!') is True
+    assert index.matches('this is good') is False
+    assert index.matches('badly') is False
+    assert index.matches('') is False
+
+
+def test_index_phrases():
+    index = BadWordsIndex(['very bad thing', 'very  worse', '!!!'])
+    assert index.words == set()
+    assert index.matches('a very bad thing') is True
+    assert index.matches('a Very bad... thing!') is True
+    assert index.matches('very very worse') is True
+    assert index.matches('very bad') is False
+    assert index.matches('a bad thing') is False
+    assert index.matches('very good thing') is False
+    assert index.matches('!!') is False
+
+
+def test_index_entries_with_symbols():
+    index = BadWordsIndex(['a$$', 'a$$hole', 'f-off now', '!!!', "don't"])
+    # not cut down to the word characters they contain
+    assert index.words == set()
+    assert index.phrases == {}
+    assert index.matches('a') is False
+    assert index.matches('a hole') is False
+    assert index.matches('f off now') is False
+    assert index.matches('don t') is False
+    assert index.matches('') is False
+
+    # matched as whitespace separated tokens, ignoring punctuation at their ends
+    assert index.matches('you A$$') is True
+    assert index.matches('what an a$$hole!') is True
+    assert index.matches('"f-off", now') is True
+    assert index.matches('!!!') is True
+    assert index.matches("Don't") is True
+    assert index.matches('a$$ets') is False
+
+
+def test_validate_bad_words_detection(client):
+    put_bad_words(client, ['bad', 'ugly phrase'])
+    assert client.validate_bad_words_detection('this is bad.') is True
+    assert client.validate_bad_words_detection('an ugly, phrase') is True
+    assert client.validate_bad_words_detection('this is good') is False
+
+
+def test_bad_words_list_is_cached_and_revalidated(client):
+    put_bad_words(client, ['bad'])
+    client.s3_bad_words = mock.Mock(wraps=client.s3_bad_words)
+
+    # first use loads the list
+    with mock.patch('time.monotonic', return_value=100):
+        assert client.validate_bad_words_detection('bad') is True
+        assert client.validate_bad_words_detection('worse') is False
+    assert client.s3_bad_words.get_object_data_stream_if_modified.mock_calls == [
+        mock.call('bad_words.json', None)
+    ]
+    etag = client.etag
+    assert etag
+    client.s3_bad_words.reset_mock()
+
+    # within the ttl, list is not revalidated even if it has changed
+    put_bad_words(client, ['worse'])
+    with mock.patch('time.monotonic', return_value=159):
+        assert client.validate_bad_words_detection('worse') is False
+    assert client.s3_bad_words.get_object_data_stream_if_modified.mock_calls == []
+
+    # after the ttl, the list is revalidated with the etag and re-loaded
+    with mock.patch('time.monotonic', return_value=160):
+        assert client.validate_bad_words_detection('bad') is False
+        assert client.validate_bad_words_detection('worse') is True
+    assert client.s3_bad_words.get_object_data_stream_if_modified.mock_calls == [
+        mock.call('bad_words.json', etag)
+    ]
+    assert client.etag != etag
+    client.s3_bad_words.reset_mock()
+
+    # after the ttl, if the list has not been modified the index is kept
+    client.s3_bad_words.get_object_data_stream_if_modified.return_value = None
+    index = client.index
+    with mock.patch('time.monotonic', return_value=220):
+        assert client.validate_bad_words_detection('worse') is True
+    assert client.s3_bad_words.get_object_data_stream_if_modified.mock_calls == [
+        mock.call('bad_words.json', client.etag)
+    ]
+    assert client.index is index
+
+
+def test_failed_revalidation_keeps_stale_list(client, caplog):
+    put_bad_words(client, ['bad'])
+    with mock.patch('time.monotonic', return_value=100):
+        assert client.validate_bad_words_detection('bad') is True
+
+    client.s3_bad_words.delete_object(client.file_name)
+    with mock.patch('time.monotonic', return_value=200):
+        assert client.validate_bad_words_detection('bad') is True
+    assert len(caplog.records) == 1
+    assert caplog.records[0].levelname == 'WARNING'
+
+
+def test_failed_initial_load_raises(client):
+    with pytest.raises(client.s3_bad_words.exceptions.NoSuchKey):
+        client.validate_bad_words_detection('bad')
+
+
+def test_refresh_index_ignores_ttl(client):
+    put_bad_words(client, ['bad'])
+    with mock.patch('time.monotonic', return_value=100):
+        assert client.validate_bad_words_detection('worse') is False
+
+    put_bad_words(client, ['worse'])
+    with mock.patch('time.monotonic', return_value=101):
+        client.refresh_index()
+        assert client.validate_bad_words_detection('worse') is True
+    assert client.validated_at == 101
@@ -1,4 +1,14 @@
+import base64
+import json
 import urllib
+from unittest import mock
+
+import pendulum
+import pytest
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric.padding import PKCS1v15
+from cryptography.hazmat.primitives.hashes import SHA1
+from cryptography.hazmat.primitives.serialization import load_der_public_key
 
 from app.clients import CloudFrontClient
 
@@ -64,3 +74,72 @@ def test_generate_presigned_url():
     parsed_qs = urllib.parse.parse_qs(parsed.query)
     assert set(parsed_qs.keys()) == set(['Method', 'Expires', 'Key-Pair-Id', 'Signature'])
     assert set(parsed_qs['Method']) == set(methods)
+
+
+def decode(msg):
+    return base64.b64decode(msg.replace('-', '+').replace('_', '=').replace('~', '/'))
+
+
+def test_generate_presigned_readonly_url():
+    domain = 'random-domain-stirng.cloudfront.net'
+    client = CloudFrontClient(get_key_pair, domain=domain)
+    path = 'uid/post/pid/image/native.jpg'
+    now = pendulum.parse('2020-06-08T12:34:56Z')
+
+    signed_url = client.generate_presigned_readonly_url(path, now=now)
+    parsed = urllib.parse.urlparse(signed_url)
+    assert parsed.scheme == 'https'
+    assert parsed.netloc == domain
+    assert parsed.path == f'/{path}'
+
+    parsed_qs = urllib.parse.parse_qs(parsed.query)
+    assert set(parsed_qs.keys()) == set(['Policy', 'Signature', 'Key-Pair-Id'])
+    assert parsed_qs['Key-Pair-Id'] == [testing_only_key_pair['keyId']]
+
+    # the policy covers the whole directory, until the end of the hour the lifetime ends in
+    policy = decode(parsed_qs['Policy'][0])
+    statement = json.loads(policy)['Statement'][0]
+    assert statement['Resource'] == f'https://{domain}/uid/post/pid/image/*'
+    expires_at = pendulum.parse('2020-06-10T13:00:00Z')
+    assert statement['Condition']['DateLessThan']['AWS:EpochTime'] == expires_at.int_timestamp
+
+    # and is really signed with the key pair
+    public_key = load_der_public_key(base64.b64decode(testing_only_key_pair['publicKey']), default_backend())
+    public_key.verify(decode(parsed_qs['Signature'][0]), policy, PKCS1v15(), SHA1())
+
+
+def test_generate_presigned_readonly_url_shares_signatures():
+    client = CloudFrontClient(get_key_pair, domain='d.cloudfront.net')
+    now = pendulum.parse('2020-06-08T12:00:01Z')
+
+    def get_qs(path, now):
+        return urllib.parse.urlparse(client.generate_presigned_readonly_url(path, now=now)).query
+
+    with mock.patch.object(
+        client, 'generate_readonly_directory_qs', wraps=client.generate_readonly_directory_qs
+    ) as generate_mock:
+        # all the objects of a directory share one signature, within the expiry bucket
+        qs = get_qs('uid/post/pid/image/native.jpg', now)
+        assert get_qs('uid/post/pid/image/4K.jpg', now) == qs
+        assert get_qs('uid/post/pid/image/64p.jpg', now + pendulum.duration(minutes=59)) == qs
+        assert generate_mock.call_count == 1
+
+        # but not with other directories, or in the next bucket
+        assert get_qs('uid/post/pid2/image/native.jpg', now) != qs
+        assert get_qs('uid/post/pid/image/native.jpg', now + pendulum.duration(hours=1)) != qs
+        assert generate_mock.call_count == 3
+
+    with pytest.raises(AssertionError, match='not in a directory'):
+        client.generate_presigned_readonly_url('native.jpg')
+
+
+def test_sign_readonly_directory_cache_is_bounded():
+    client = CloudFrontClient(get_key_pair, domain='d.cloudfront.net', readonly_cache_size=2)
+    qs1 = client.sign_readonly_directory('dir1', 1591797600)
+    client.sign_readonly_directory('dir2', 1591797600)
+    assert client.sign_readonly_directory('dir1', 1591797600) == qs1
+    assert len(client.readonly_signatures) == 2
+
+    # the oldest entry makes way for the newest
+    client.sign_readonly_directory('dir3', 1591797600)
+    assert list(client.readonly_signatures) == [('dir2', 1591797600), ('dir3', 1591797600)]
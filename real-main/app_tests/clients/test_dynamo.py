@@ -0,0 +1,344 @@
+import collections
+import threading
+import zlib
+from unittest import mock
+
+import pytest
+
+from app.clients.dynamo import DynamoClient, DynamoLoader, ScanConcurrency
+
+
+def put_request(pk):
+    return {'PutRequest': {'Item': {'partitionKey': pk, 'sortKey': '-'}}}
+
+
+def test_batch_write_items(dynamo_client):
+    assert dynamo_client.batch_write_items([]) == 0
+    assert dynamo_client.batch_write_items(put_request(f'pk{i}') for i in range(60)) == 60
+    assert dynamo_client.get_item({'partitionKey': 'pk0', 'sortKey': '-'})
+    assert dynamo_client.get_item({'partitionKey': 'pk59', 'sortKey': '-'})
+
+    assert (
+        dynamo_client.batch_write_items(
+            {'DeleteRequest': {'Key': {'partitionKey': f'pk{i}', 'sortKey': '-'}}} for i in range(60)
+        )
+        == 60
+    )
+    assert dynamo_client.get_item({'partitionKey': 'pk0', 'sortKey': '-'}) is None
+
+
+def test_batch_write_items_retries_unprocessed_items(dynamo_client):
+    boto_client = dynamo_client.table.meta.client
+    requests = [put_request(f'pk{i}') for i in range(3)]
+    responses = [
+        {'UnprocessedItems': {dynamo_client.table_name: requests[1:]}},
+        {'UnprocessedItems': {dynamo_client.table_name: requests[2:]}},
+        {'UnprocessedItems': {}},
+    ]
+    with mock.patch.object(boto_client, 'batch_write_item', side_effect=responses) as batch_write_item_mock:
+        with mock.patch('time.sleep') as sleep_mock:
+            assert dynamo_client.batch_write_items(requests) == 3
+    assert batch_write_item_mock.mock_calls == [
+        mock.call(RequestItems={dynamo_client.table_name: requests}),
+        mock.call(RequestItems={dynamo_client.table_name: requests[1:]}),
+        mock.call(RequestItems={dynamo_client.table_name: requests[2:]}),
+    ]
+    assert len(sleep_mock.mock_calls) == 2
+
+
+def test_batch_write_items_gives_up(dynamo_client):
+    boto_client = dynamo_client.table.meta.client
+    requests = [put_request('pk')]
+    resp = {'UnprocessedItems': {dynamo_client.table_name: requests}}
+    with mock.patch.object(boto_client, 'batch_write_item', return_value=resp) as batch_write_item_mock:
+        with mock.patch('time.sleep'):
+            with pytest.raises(Exception, match='1 items unprocessed after 3 attempts'):
+                dynamo_client.batch_write_items(requests, max_attempts=3)
+    assert len(batch_write_item_mock.mock_calls) == 3
+
+
+def key(pk):
+    return {'partitionKey': pk, 'sortKey': '-'}
+
+
+def test_add_to_and_delete_from_set(dynamo_client):
+    key = {'partitionKey': 'pk', 'sortKey': '-'}
+    assert dynamo_client.add_to_set(key, 'ids', ['id1', 'id2'], schemaVersion=0) == {
+        **key,
+        'ids': {'id1', 'id2'},
+        'schemaVersion': 0,
+    }
+    assert dynamo_client.add_to_set(key, 'ids', ['id2', 'id3'])['ids'] == {'id1', 'id2', 'id3'}
+
+    assert dynamo_client.delete_from_set(key, 'ids', ['id1', 'id4'])['ids'] == {'id2', 'id3'}
+    assert not dynamo_client.delete_from_set(key, 'ids', ['id2', 'id3']).get('ids')
+
+
+def test_batch_load_items(dynamo_client):
+    assert dynamo_client.batch_load_items([]) == []
+    dynamo_client.batch_write_items(
+        {'PutRequest': {'Item': {**key(f'pk{i}'), 'value': i, 'other': 'o'}}} for i in range(250)
+    )
+
+    # order of the request is maintained, duplicates and missing items are handled, spans many batches
+    keys = [key(f'pk{i}') for i in reversed(range(250))] + [key('pk-dne'), key('pk3')]
+    with mock.patch.object(
+        dynamo_client.table.meta.client, 'batch_get_item', wraps=dynamo_client.table.meta.client.batch_get_item
+    ) as batch_get_item_mock:
+        items = dynamo_client.batch_load_items(keys)
+    assert len(batch_get_item_mock.mock_calls) == 3
+    assert [item['value'] for item in items[:250]] == list(reversed(range(250)))
+    assert items[250] is None
+    assert items[251] == {**key('pk3'), 'value': 3, 'other': 'o'}
+
+    # key attributes are always included in the projection
+    items = dynamo_client.batch_load_items([key('pk1'), key('pk0')], projection_expression='value')
+    assert items == [{**key('pk1'), 'value': 1}, {**key('pk0'), 'value': 0}]
+
+
+def test_batch_load_items_retries_unprocessed_keys(dynamo_client):
+    boto_client = dynamo_client.table.meta.client
+    table_name = dynamo_client.table_name
+    keys = [key(f'pk{i}') for i in range(3)]
+    responses = [
+        {'Responses': {table_name: [{**keys[0], 'v': 0}]}, 'UnprocessedKeys': {table_name: {'Keys': keys[1:]}}},
+        {'Responses': {}, 'UnprocessedKeys': {table_name: {'Keys': keys[1:]}}},
+        {'Responses': {table_name: [{**keys[2], 'v': 2}, {**keys[1], 'v': 1}]}, 'UnprocessedKeys': {}},
+    ]
+    with mock.patch.object(boto_client, 'batch_get_item', side_effect=responses) as batch_get_item_mock:
+        with mock.patch('time.sleep') as sleep_mock:
+            assert dynamo_client.batch_load_items(keys) == [{**k, 'v': i} for i, k in enumerate(keys)]
+    assert batch_get_item_mock.mock_calls == [
+        mock.call(RequestItems={table_name: {'Keys': keys}}),
+        mock.call(RequestItems={table_name: {'Keys': keys[1:]}}),
+        mock.call(RequestItems={table_name: {'Keys': keys[1:]}}),
+    ]
+    assert len(sleep_mock.mock_calls) == 2
+
+    resp = {'Responses': {}, 'UnprocessedKeys': {table_name: {'Keys': keys}}}
+    with mock.patch.object(boto_client, 'batch_get_item', return_value=resp):
+        with mock.patch('time.sleep'):
+            with pytest.raises(Exception, match='3 keys unprocessed after 2 attempts'):
+                dynamo_client.batch_load_items(keys, max_attempts=2)
+
+
+def test_loader(dynamo_client):
+    dynamo_client.batch_write_items({'PutRequest': {'Item': {**key(f'pk{i}'), 'v': i}}} for i in range(3))
+    loader = DynamoLoader(dynamo_client)
+
+    with mock.patch.object(dynamo_client, 'batch_load_items', wraps=dynamo_client.batch_load_items) as load_mock:
+        # keys are collected until one of them is needed
+        get_0, get_dne = loader.load(key('pk0')), loader.load(key('pk-dne'))
+        assert load_mock.call_count == 0
+        assert get_0() == {**key('pk0'), 'v': 0}
+        assert get_dne() is None
+        assert load_mock.call_count == 1
+
+        # already loaded keys are not fetched again
+        assert loader.load_many([key('pk2'), key('pk0'), key('pk1')]) == [
+            {**key('pk2'), 'v': 2},
+            {**key('pk0'), 'v': 0},
+            {**key('pk1'), 'v': 1},
+        ]
+        assert load_mock.call_count == 2
+        assert list(load_mock.call_args.args[0]) == [key('pk2'), key('pk1')]
+
+
+def test_generate_query_pages(dynamo_client):
+    dynamo_client.batch_write_items(
+        {'PutRequest': {'Item': {'partitionKey': 'pk', 'sortKey': f'sk{i}'}}} for i in range(5)
+    )
+    query_kwargs = {
+        'KeyConditionExpression': 'partitionKey = :pk',
+        'ExpressionAttributeValues': {':pk': 'pk'},
+        'Limit': 2,
+    }
+    pages = list(dynamo_client.generate_query_pages(query_kwargs))
+    assert [[item['sortKey'] for item in items] for items, _ in pages] == [
+        ['sk0', 'sk1'],
+        ['sk2', 'sk3'],
+        ['sk4'],
+    ]
+    assert [last_key for _, last_key in pages] == [
+        {'partitionKey': 'pk', 'sortKey': 'sk1'},
+        {'partitionKey': 'pk', 'sortKey': 'sk3'},
+        None,
+    ]
+
+    # resume after the first page
+    pages = list(dynamo_client.generate_query_pages(query_kwargs, exclusive_start_key=pages[0][1]))
+    assert [[item['sortKey'] for item in items] for items, _ in pages] == [['sk2', 'sk3'], ['sk4']]
+
+    # generate_all_query flattens the pages
+    assert [item['sortKey'] for item in dynamo_client.generate_all_query(query_kwargs)] == [
+        f'sk{i}' for i in range(5)
+    ]
+
+
+@pytest.fixture
+def segmented_scan(dynamo_client):
+    "Moto ignores Segment and TotalSegments, so split its results into segments by a hash of the partitionKey"
+    scan = dynamo_client.table.meta.client.scan
+
+    def segmented(Segment=None, TotalSegments=None, **kwargs):
+        resp = scan(**kwargs)
+        if TotalSegments:
+            resp['Items'] = [
+                item
+                for item in resp['Items']
+                if zlib.crc32(item['partitionKey'].encode()) % TotalSegments == Segment
+            ]
+        return resp
+
+    with mock.patch.object(dynamo_client.table.meta.client, 'scan', side_effect=segmented) as scan_mock:
+        yield scan_mock
+
+
+def test_generate_all_scan(dynamo_client):
+    dynamo_client.batch_write_items(put_request(f'pk{i}') for i in range(5))
+    scan_kwargs = {
+        'FilterExpression': 'begins_with(partitionKey, :pk)',
+        'ExpressionAttributeValues': {':pk': 'pk'},
+    }
+    items = list(dynamo_client.generate_all_scan(scan_kwargs, total_segments=1))
+    assert sorted(item['partitionKey'] for item in items) == [f'pk{i}' for i in range(5)]
+
+
+def test_generate_scan_pages_parallel(dynamo_client, segmented_scan):
+    dynamo_client.batch_write_items(put_request(f'pk{i}') for i in range(50))
+    pages = list(dynamo_client.generate_scan_pages({'Limit': 7}, total_segments=4, max_workers=3))
+    assert sorted(item['partitionKey'] for items, _ in pages for item in items) == sorted(
+        f'pk{i}' for i in range(50)
+    )
+    assert {call.kwargs['TotalSegments'] for call in segmented_scan.call_args_list} == {4}
+    assert {call.kwargs['Segment'] for call in segmented_scan.call_args_list} == {0, 1, 2, 3}
+    assert all(call.kwargs['ReturnConsumedCapacity'] == 'TOTAL' for call in segmented_scan.call_args_list)
+    assert all(call.kwargs['TableName'] == dynamo_client.table_name for call in segmented_scan.call_args_list)
+    # each segment finishes exactly once, and the last cursor has them all done
+    assert sum(1 for _, cursor in pages for last_key in cursor if last_key is None) >= 4
+    assert pages[-1][1] == [None] * 4
+
+    # generate_all_scan flattens the pages
+    items = list(dynamo_client.generate_all_scan({}, total_segments=4))
+    assert sorted(item['partitionKey'] for item in items) == sorted(f'pk{i}' for i in range(50))
+
+
+@pytest.mark.parametrize('total_segments, max_workers, max_queued_pages', [(8, 8, 4), (5, 2, 1), (16, 3, 2)])
+def test_generate_all_scan_segments_default(
+    dynamo_client, segmented_scan, total_segments, max_workers, max_queued_pages
+):
+    # the test env sets DYNAMO_SCAN_TOTAL_SEGMENTS=1, so put back defaults like those deployed
+    defaults = (None, total_segments, max_workers, 0, max_queued_pages)
+    dynamo_client.batch_write_items(put_request(f'pk{i}') for i in range(100))
+    with mock.patch.object(DynamoClient.generate_scan_pages, '__defaults__', defaults):
+        pks = [item['partitionKey'] for item in dynamo_client.generate_all_scan({'Limit': 9})]
+
+    # every item comes back exactly once, however the segments' pages were interleaved
+    assert len(pks) == 100
+    assert collections.Counter(pks) == collections.Counter(f'pk{i}' for i in range(100))
+
+    # every segment was scanned, each over several pages
+    segments = collections.Counter(call.kwargs['Segment'] for call in segmented_scan.call_args_list)
+    assert set(segments) == set(range(total_segments))
+    assert all(count > 1 for count in segments.values())
+    assert {call.kwargs['TotalSegments'] for call in segmented_scan.call_args_list} == {total_segments}
+
+
+def test_generate_scan_pages_resume(dynamo_client, segmented_scan):
+    dynamo_client.batch_write_items(put_request(f'pk{i}') for i in range(50))
+    pks = []
+    pages = dynamo_client.generate_scan_pages({'Limit': 7}, total_segments=4)
+    for _ in range(5):
+        items, cursor = next(pages)
+        pks.extend(item['partitionKey'] for item in items)
+    pages.close()
+    assert cursor != [None] * 4
+
+    # resuming picks up where each segment was up to, nothing is skipped or repeated
+    for items, _ in dynamo_client.generate_scan_pages({'Limit': 7}, cursor=cursor):
+        pks.extend(item['partitionKey'] for item in items)
+    assert sorted(pks) == sorted(f'pk{i}' for i in range(50))
+
+    # the cursor can be serialized
+    assert dynamo_client.decode_pagination_token(dynamo_client.encode_pagination_token(cursor)) == cursor
+
+    # a finished scan resumes to nothing
+    assert list(dynamo_client.generate_scan_pages({}, cursor=[None] * 4)) == []
+
+
+def test_generate_scan_pages_stops_workers(dynamo_client, segmented_scan):
+    dynamo_client.batch_write_items(put_request(f'pk{i}') for i in range(50))
+    thread_count = threading.active_count()
+    pages = dynamo_client.generate_scan_pages({'Limit': 1}, total_segments=4, max_queued_pages=1)
+    next(pages)
+    assert threading.active_count() > thread_count
+    pages.close()
+    assert threading.active_count() == thread_count
+
+
+def test_generate_scan_pages_segment_error(dynamo_client, segmented_scan):
+    dynamo_client.batch_write_items(put_request(f'pk{i}') for i in range(10))
+    scan = segmented_scan.side_effect
+
+    def failing_scan(**kwargs):
+        if kwargs['Segment'] == 2:
+            raise Exception('segment broke')
+        return scan(**kwargs)
+
+    segmented_scan.side_effect = failing_scan
+    with pytest.raises(Exception, match='segment broke'):
+        list(dynamo_client.generate_scan_pages({}, total_segments=4))
+
+
+def test_generate_scan_pages_retries_throttled(dynamo_client):
+    throttled = dynamo_client.exceptions.ProvisionedThroughputExceededException({'Error': {}}, 'Scan')
+    resp = {'Items': [key('pk0')], 'ConsumedCapacity': {'CapacityUnits': 1}}
+    with mock.patch.object(
+        dynamo_client.table.meta.client, 'scan', side_effect=[throttled, throttled, resp]
+    ) as scan_mock:
+        with mock.patch('time.sleep') as sleep_mock:
+            assert list(dynamo_client.generate_all_scan({}, total_segments=1)) == [key('pk0')]
+    assert scan_mock.call_count == 3
+    assert sleep_mock.call_count == 2
+
+    with mock.patch.object(dynamo_client.table.meta.client, 'scan', side_effect=throttled):
+        with mock.patch('time.sleep'):
+            with pytest.raises(Exception, match='segment 0 throttled after 8 attempts'):
+                list(dynamo_client.generate_all_scan({}, total_segments=1))
+
+
+def test_scan_concurrency_throttled():
+    concurrency = ScanConcurrency(8)
+    concurrency.record(1, throttled=True)
+    assert concurrency.limit == 4
+    concurrency.record(1, throttled=True)
+    concurrency.record(1, throttled=True)
+    concurrency.record(1, throttled=True)
+    assert concurrency.limit == 1
+
+    # grows back one page at a time, up to the maximum
+    for limit in range(2, 9):
+        concurrency.record(1)
+        assert concurrency.limit == limit
+    concurrency.record(1)
+    assert concurrency.limit == 8
+
+
+def test_scan_concurrency_capacity_budget():
+    concurrency = ScanConcurrency(8, max_capacity_per_second=10)
+    concurrency.record(6)
+    assert concurrency.limit == 8
+    concurrency.record(6)
+    assert concurrency.limit == 4
+
+    # over budget, slots wait until the pages consumed leave the one second window
+    with mock.patch('time.monotonic', return_value=concurrency.window[-1][0] + 0.5):
+        with mock.patch.object(concurrency.cond, 'wait', side_effect=Exception('waited')) as wait_mock:
+            with pytest.raises(Exception, match='waited'):
+                with concurrency.slot():
+                    pass
+    assert wait_mock.call_args.kwargs['timeout'] == pytest.approx(0.5, abs=0.01)
+    with mock.patch('time.monotonic', return_value=concurrency.window[-1][0] + 1):
+        with concurrency.slot():
+            assert concurrency.active == 1
+    assert concurrency.active == 0
@@ -42,28 +42,24 @@ def test_token_badly_invalid(id_token):
 
 
 def test_token_wrong_audience():
-    with mock.patch('app.clients.google.google_id_token') as google_id_token:
-        google_id_token.verify_oauth2_token.return_value = {**google_id_info, **{'aud': 'anything else'}}
+    with mock.patch('google.oauth2.id_token.verify_oauth2_token') as verify_oauth2_token:
+        verify_oauth2_token.return_value = {**google_id_info, **{'aud': 'anything else'}}
         google_client = GoogleClient(client_ids_getter)
         with pytest.raises(ValueError, match='audience'):
             google_client.get_verified_email(None)
 
 
 def test_token_email_not_verified():
-    with mock.patch('app.clients.google.google_id_token') as google_id_token:
-        google_id_token.verify_oauth2_token.return_value = {
-            k: v for k, v in google_id_info.items() if k != 'email_verified'
-        }
+    with mock.patch('google.oauth2.id_token.verify_oauth2_token') as verify_oauth2_token:
+        verify_oauth2_token.return_value = {k: v for k, v in google_id_info.items() if k != 'email_verified'}
         google_client = GoogleClient(client_ids_getter)
         with pytest.raises(ValueError, match='verified email'):
             google_client.get_verified_email(None)
 
 
 def test_token_no_email():
-    with mock.patch('app.clients.google.google_id_token') as google_id_token:
-        google_id_token.verify_oauth2_token.return_value = {
-            k: v for k, v in google_id_info.items() if k != 'email'
-        }
+    with mock.patch('google.oauth2.id_token.verify_oauth2_token') as verify_oauth2_token:
+        verify_oauth2_token.return_value = {k: v for k, v in google_id_info.items() if k != 'email'}
         google_client = GoogleClient(client_ids_getter)
         with pytest.raises(ValueError, match='verified email'):
             google_client.get_verified_email(None)
@@ -71,8 +67,8 @@ def test_token_no_email():
 
 def test_token_valid():
     # the token actually is expired, but the timestamp check is behind the mock so it's skipped
-    with mock.patch('app.clients.google.google_id_token') as google_id_token:
-        google_id_token.verify_oauth2_token.return_value = google_id_info
+    with mock.patch('google.oauth2.id_token.verify_oauth2_token') as verify_oauth2_token:
+        verify_oauth2_token.return_value = google_id_info
         google_client = GoogleClient(client_ids_getter)
         email = google_client.get_verified_email(None)
         assert email == 'mike@real.app'
@@ -0,0 +1,94 @@
+import logging
+import threading
+from unittest import mock
+
+import pytest
+
+
+def test_put_objects(s3_uploads_client):
+    client = s3_uploads_client
+    client.put_objects([])
+
+    objects = [(f'a/{i}.jpg', f'data {i}'.encode(), 'image/jpeg') for i in range(5)]
+    with mock.patch.object(client.boto_client, 'put_object', wraps=client.boto_client.put_object) as put_object:
+        client.put_objects(iter(objects))
+    assert put_object.call_count == 5
+    for path, body, content_type in objects:
+        obj = client.bucket.Object(path).get()
+        assert obj['Body'].read() == body
+        assert obj['ContentType'] == content_type
+
+
+def test_put_objects_raises_first_error_once_all_done(s3_uploads_client):
+    client = s3_uploads_client
+    put_object_with_client = client.put_object_with_client
+
+    def put_unless_bad(path, body, content_type):
+        if path == 'bad':
+            raise Exception('Nope')
+        return put_object_with_client(path, body, content_type)
+
+    objects = [('bad', b'', 'image/jpeg'), ('good', b'data', 'image/jpeg')]
+    with mock.patch.object(client, 'put_object_with_client', side_effect=put_unless_bad):
+        with pytest.raises(Exception, match='Nope'):
+            client.put_objects(objects)
+    assert client.exists('good')
+    assert not client.exists('bad')
+
+
+def test_map_concurrently_shares_one_bounded_pool(s3_uploads_client):
+    client = s3_uploads_client
+    assert client._executor is None
+    thread_names = set()
+
+    def record_thread(arg):
+        thread_names.add(threading.current_thread().name)
+        return arg * 2
+
+    assert client.map_concurrently(record_thread, [1]) == [2]
+    assert client._executor is None  # a single call is made inline
+
+    args = list(range(3 * client.max_workers))
+    assert client.map_concurrently(record_thread, args) == [arg * 2 for arg in args]
+    executor = client._executor
+    assert client.map_concurrently(record_thread, args) == [arg * 2 for arg in args]
+    assert client._executor is executor
+    assert 1 < len(thread_names - {threading.current_thread().name}) <= client.max_workers
+
+    # called from one of the pool's workers, it runs inline rather than wait on the pool
+    nested = client.map_concurrently(lambda arg: client.map_concurrently(record_thread, [arg, arg]), args)
+    assert nested == [[arg * 2, arg * 2] for arg in args]
+
+
+def test_delete_objects(s3_uploads_client):
+    client = s3_uploads_client
+    client.delete_objects([])
+
+    paths = [f'a/{i}' for i in range(5)]
+    client.put_objects((path, b'data', 'text/plain') for path in paths)
+    client.delete_objects(paths[:3] + ['a/does-not-exist'])
+    assert [client.exists(path) for path in paths] == [False, False, False, True, True]
+
+
+def test_delete_objects_chunked(s3_uploads_client):
+    client = s3_uploads_client
+    client.delete_objects_max_keys = 2
+
+    paths = [f'a/{i}' for i in range(5)]
+    client.put_objects((path, b'data', 'text/plain') for path in paths)
+    with mock.patch.object(
+        client.boto_client, 'delete_objects', wraps=client.boto_client.delete_objects
+    ) as delete:
+        client.delete_objects(iter(paths))
+    assert sorted(len(c.kwargs['Delete']['Objects']) for c in delete.call_args_list) == [1, 2, 2]
+    assert not any(client.exists(path) for path in paths)
+
+
+def test_delete_objects_errors_logged(s3_uploads_client, caplog):
+    client = s3_uploads_client
+    resp = {'Errors': [{'Key': 'a/1', 'Code': 'AccessDenied', 'Message': 'Access Denied'}]}
+    with mock.patch.object(client.boto_client, 'delete_objects', return_value=resp):
+        with caplog.at_level(logging.WARNING):
+            client.delete_objects(['a/0', 'a/1'])
+    assert len(caplog.records) == 1
+    assert caplog.records[0].msg == 'Unable to delete S3 object `a/1`: Access Denied'
@@ -1,3 +1,4 @@
+import logging
 import os
 
 import pytest
@@ -5,6 +6,8 @@ import pytest
 # turning off route autodiscovery
 os.environ['APPSYNC_ROUTE_AUTODISCOVERY_PATH'] = ''
 from app.handlers.appsync import dispatch, routes  # noqa: E402 isort:skip
+from app.handlers.appsync.exceptions import ClientException  # noqa: E402 isort:skip
+from app.utils import identity_map  # noqa: E402 isort:skip
 
 
 @pytest.fixture
@@ -109,3 +112,113 @@ def test_context_passed(setup_one_route, api_key_authed_event):
             },
         },
     }
+
+
+def test_identity_map_scoped_to_dispatch(cognito_authed_event, caplog):
+    routes.clear()
+
+    @routes.register('Type.field')
+    def mocked_handler(caller_user_id, arguments, **kwargs):  # pylint: disable=unused-variable
+        assert identity_map.active is True
+        return [identity_map.get(('item', 'id1'), lambda: 'value') for _ in range(3)]
+
+    assert identity_map.active is False
+    with caplog.at_level(logging.DEBUG):
+        assert dispatch(cognito_authed_event, {}) == {'data': ['value', 'value', 'value']}
+    assert identity_map.active is False
+    assert identity_map.items == {}
+    assert identity_map.get_stats()['hits'] == 2
+    assert identity_map.get_stats()['misses'] == 1
+    assert 'Identity map for `Type.field`: 2 hits, 1 misses' in caplog.messages
+
+
+def test_batch_without_batch_handler_resolves_one_by_one(setup_one_route, cognito_authed_event):
+    event2 = {**cognito_authed_event, 'source': {'anotherField': 43}}
+    results = dispatch([cognito_authed_event, event2], {})
+    assert [result['data']['kwargs']['source'] for result in results] == [
+        {'anotherField': 42},
+        {'anotherField': 43},
+    ]
+    assert [result['data']['kwargs']['event'] for result in results] == [cognito_authed_event, event2]
+
+
+def test_batch_unknown_field_raises_exception(setup_one_route, cognito_authed_event):
+    event2 = {**cognito_authed_event, 'info': {'parentTypeName': 'Type', 'fieldName': 'unknownField'}}
+    with pytest.raises(Exception, match='No handler for field `Type.unknownField` found'):
+        dispatch([cognito_authed_event, event2], {})
+
+
+def test_batch_groups_by_field(cognito_authed_event, api_key_authed_event):
+    routes.clear()
+    calls = []
+
+    @routes.register('Type.field')
+    def mocked_handler(caller_user_id, arguments, **kwargs):  # pylint: disable=unused-variable
+        raise Exception('Should not be called')
+
+    @routes.register_batch('Type.field')
+    def mocked_batch_handler(caller_user_id, arguments, sources, **kwargs):  # pylint: disable=unused-variable
+        calls.append({'caller_user_id': caller_user_id, 'sources': sources, 'kwargs': kwargs})
+        return [
+            ClientException(f'Bad {source["id"]}') if source['id'] == 'bad' else source['id']
+            for source in sources
+        ]
+
+    @routes.register('Type.other')
+    def mocked_other_handler(caller_user_id, arguments, source, **kwargs):  # pylint: disable=unused-variable
+        return f'other {source["id"]}'
+
+    events = [
+        {**cognito_authed_event, 'source': {'id': 'a'}},
+        {**cognito_authed_event, 'source': {'id': 'b'}, 'info': {'parentTypeName': 'Type', 'fieldName': 'other'}},
+        {**cognito_authed_event, 'source': {'id': 'bad'}},
+        {**api_key_authed_event, 'source': {'id': 'c'}},
+        {**cognito_authed_event, 'source': {'id': 'd'}},
+    ]
+    assert dispatch(events, {'foo': 'bar'}) == [
+        {'data': 'a'},
+        {'data': 'other b'},
+        {'error': {'type': 'ClientError', 'message': 'ClientError: Bad bad', 'info': None}},
+        {'data': 'c'},
+        {'data': 'd'},
+    ]
+    assert calls == [
+        {
+            'caller_user_id': '42-42',
+            'sources': [{'id': 'a'}, {'id': 'bad'}, {'id': 'd'}],
+            'kwargs': {
+                'context': {'foo': 'bar'},
+                'events': [events[0], events[2], events[4]],
+                'client': {'version': '1.2.3(456)'},
+            },
+        },
+        {
+            'caller_user_id': None,
+            'sources': [{'id': 'c'}],
+            'kwargs': {'context': {'foo': 'bar'}, 'events': [events[3]], 'client': {}},
+        },
+    ]
+
+
+def test_batch_handler_client_exception_fails_all_items(cognito_authed_event):
+    routes.clear()
+
+    @routes.register_batch('Type.field')
+    def mocked_batch_handler(caller_user_id, arguments, sources, **kwargs):  # pylint: disable=unused-variable
+        raise ClientException('Nope')
+
+    error = {'error': {'type': 'ClientError', 'message': 'ClientError: Nope', 'info': None}}
+    assert dispatch([cognito_authed_event, cognito_authed_event], {}) == [error, error]
+
+
+def test_batch_shares_identity_map(cognito_authed_event, caplog):
+    routes.clear()
+
+    @routes.register('Type.field')
+    def mocked_handler(caller_user_id, arguments, **kwargs):  # pylint: disable=unused-variable
+        return identity_map.get(('item', 'id1'), lambda: 'value')
+
+    with caplog.at_level(logging.DEBUG):
+        assert dispatch([cognito_authed_event] * 3, {}) == [{'data': 'value'}] * 3
+    assert identity_map.active is False
+    assert 'Identity map for `Type.field`: 2 hits, 1 misses' in caplog.messages
@@ -36,3 +36,22 @@ def test_discover():
         'Type.field1': mock_handlers.handler_1,
         'Type.field2': mock_handlers.handler_2,
     }
+
+
+def test_register_batch():
+    @routes.register('Mytype.myfield')
+    def myfunc():
+        pass
+
+    @routes.register_batch('Mytype.myfield')
+    def myfunc_batch():
+        pass
+
+    assert routes.cache == {'Mytype.myfield': myfunc}
+    assert routes.batch_cache == {'Mytype.myfield': myfunc_batch}
+    assert routes.get_handler('Mytype.myfield') is myfunc
+    assert routes.get_batch_handler('Mytype.myfield') is myfunc_batch
+    assert routes.get_batch_handler('Mytype.other') is None
+
+    routes.clear()
+    assert routes.batch_cache == {}
@@ -94,3 +94,44 @@ def test_dynamo_dispatch_attributes():
     assert dispatch.search('pkpre', 'skpre', 'INSERT', {}, {'k3': 'd'}) == []
     assert dispatch.search('pkpre', 'skpre', 'INSERT', {'k3': ''}, {}) == [f3]
     assert dispatch.search('pkpre', 'skpre', 'INSERT', {'k3': 42}, {}) == [f3]
+
+
+def test_dynamo_dispatch_attributes_shared_across_listeners():
+    dispatch = DynamoDispatch()
+
+    f1, f2, f3, f4 = Mock(), Mock(), Mock(), Mock()
+    dispatch.register('pkpre', 'skpre', ['MODIFY'], f1, {'k1': 0})
+    dispatch.register('pkpre', 'skpre', ['MODIFY'], f2, {'k1': 0, 'k2': None})
+    dispatch.register('pkpre', 'skpre', ['MODIFY'], f3, {'k1': False})
+    dispatch.register('pkpre', 'skpre', ['MODIFY'], f4)
+
+    plan = dispatch.get_plan('pkpre', 'skpre', 'MODIFY')
+    assert plan.attributes == [('k1', 0), ('k2', None), ('k1', False)]
+    assert plan.attribute_names == {'k1', 'k2'}
+    assert dispatch.get_plan('pkpre', 'skpre', 'MODIFY') is plan
+
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {}, {}) == [f4]
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {'k1': 0}, {'k1': 1}) == [f1, f2, f3, f4]
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {'k2': 'a'}, {'k2': 'b'}) == [f2, f4]
+
+    # registering another listener recompiles the plan
+    f5 = Mock()
+    dispatch.register('pkpre', 'skpre', ['MODIFY'], f5, {'k3': []})
+    assert dispatch.get_plan('pkpre', 'skpre', 'MODIFY') is not plan
+    assert dispatch.get_plan('pkpre', 'skpre', 'MODIFY').attribute_names == {'k1', 'k2', 'k3'}
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {'k3': []}, {}) == [f4]
+    assert dispatch.search('pkpre', 'skpre', 'MODIFY', {'k3': ['a']}, {}) == [f4, f5]
+
+    # searching for prefixes that have no listeners does not register them
+    assert dispatch.search('pkother', 'skother', 'INSERT', {}, {}) == []
+    assert 'pkother' not in dispatch.listeners
+
+
+def test_dynamo_dispatch_idempotent():
+    dispatch = DynamoDispatch()
+
+    f1, f2 = Mock(), Mock()
+    dispatch.register('pkpre', 'skpre', ['INSERT', 'MODIFY'], f1)
+    dispatch.register('pkpre', 'skpre', ['MODIFY'], f2, {'k1': 0}, idempotent=True)
+    assert dispatch.get_plan('pkpre', 'skpre', 'INSERT').idempotent_handlers == set()
+    assert dispatch.get_plan('pkpre', 'skpre', 'MODIFY').idempotent_handlers == {f2}
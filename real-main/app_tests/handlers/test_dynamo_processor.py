@@ -0,0 +1,214 @@
+import threading
+from unittest.mock import Mock, call, patch
+
+import pytest
+
+from app.handlers.dynamo.dispatch import DynamoDispatch
+from app.handlers.dynamo.processor import DynamoStreamProcessor
+
+
+def build_record(seq_num, pk, sk, event_name='INSERT', old_item=None, new_item=None):
+    record = {
+        'eventName': event_name,
+        'dynamodb': {
+            'Keys': {'partitionKey': {'S': pk}, 'sortKey': {'S': sk}},
+            'SequenceNumber': seq_num,
+        },
+    }
+    if old_item is not None:
+        record['dynamodb']['OldImage'] = {k: {'S': v} for k, v in old_item.items()}
+    if new_item is not None:
+        record['dynamodb']['NewImage'] = {k: {'S': v} for k, v in new_item.items()}
+    return record
+
+
+@pytest.fixture
+def dispatch():
+    yield DynamoDispatch()
+
+
+@pytest.fixture
+def processor(dispatch):
+    yield DynamoStreamProcessor(dispatch, max_workers=4)
+
+
+def test_process_calls_matching_listeners_with_items(dispatch, processor):
+    f_insert, f_modify, f_attr = Mock(), Mock(), Mock()
+    dispatch.register('post', '-', ['INSERT'], f_insert)
+    dispatch.register('post', '-', ['MODIFY'], f_modify)
+    dispatch.register('post', '-', ['MODIFY'], f_attr, {'k': None})
+
+    records = [
+        build_record('1', 'post/pid1', '-', 'INSERT', new_item={'k': 'a'}),
+        build_record('2', 'post/pid1', '-', 'MODIFY', old_item={'k': 'a'}, new_item={'k': 'a'}),
+        build_record('3', 'post/pid2', '-', 'MODIFY', old_item={'k': 'a'}, new_item={'k': 'b'}),
+        build_record('4', 'user/uid1', 'profile', 'INSERT', new_item={'k': 'a'}),
+    ]
+    assert processor.process(records) == []
+    assert f_insert.mock_calls == [call('pid1', new_item={'k': 'a'})]
+    assert sorted(f_modify.mock_calls) == [
+        call('pid1', new_item={'k': 'a'}, old_item={'k': 'a'}),
+        call('pid2', new_item={'k': 'b'}, old_item={'k': 'a'}),
+    ]
+    assert f_attr.mock_calls == [call('pid2', new_item={'k': 'b'}, old_item={'k': 'a'})]
+
+
+def test_process_maintains_order_within_partition_key(dispatch, processor):
+    seen = []
+    dispatch.register('post', '-', ['INSERT', 'MODIFY', 'REMOVE'], lambda pid, **kwargs: seen.append(pid))
+
+    records = [
+        build_record(
+            str(i), f'post/pid{i % 3}', '-', ['INSERT', 'MODIFY', 'REMOVE'][i % 3], new_item={'i': str(i)}
+        )
+        for i in range(30)
+    ]
+    assert processor.process(records) == []
+    for pid in ('pid0', 'pid1', 'pid2'):
+        assert [s for s in seen if s == pid] == [pid] * 10
+
+    seq_nums = []
+    dispatch.register('user', 'profile', ['INSERT'], lambda uid, new_item: seq_nums.append(new_item['seq']))
+    records = [build_record(str(i), 'user/uid', 'profile', new_item={'seq': str(i)}) for i in range(20)]
+    assert processor.process(records) == []
+    assert seq_nums == [str(i) for i in range(20)]
+
+
+def test_process_runs_partition_keys_concurrently(dispatch):
+    processor = DynamoStreamProcessor(dispatch, max_workers=2)
+    barrier = threading.Barrier(2, timeout=5)
+    dispatch.register('post', '-', ['INSERT'], lambda pid, **kwargs: barrier.wait())
+
+    # would deadlock (and then time out and fail) if the two keys were processed serially
+    records = [build_record('1', 'post/pid1', '-'), build_record('2', 'post/pid2', '-')]
+    assert processor.process(records) == []
+
+
+def test_process_serially_with_one_worker(dispatch):
+    processor = DynamoStreamProcessor(dispatch, max_workers=1)
+    thread_ids = set()
+    dispatch.register('post', '-', ['INSERT'], lambda pid, **kwargs: thread_ids.add(threading.get_ident()))
+
+    records = [build_record(str(i), f'post/pid{i}', '-') for i in range(5)]
+    assert processor.process(records) == []
+    assert thread_ids == {threading.get_ident()}
+
+
+def test_process_reports_failures(dispatch, caplog):
+    # serially, so which records run before the failure is known
+    processor = DynamoStreamProcessor(dispatch, max_workers=1)
+
+    def fail_on_pid2(pid, **kwargs):
+        if pid == 'pid2':
+            raise Exception('boom')
+
+    f1, f2 = Mock(), Mock()
+    dispatch.register('post', '-', ['INSERT', 'MODIFY'], f1, idempotent=True)
+    dispatch.register('post', '-', ['INSERT', 'MODIFY'], fail_on_pid2, idempotent=True)
+    dispatch.register('post', '-', ['INSERT', 'MODIFY'], f2, idempotent=True)
+
+    records = [
+        build_record('1', 'post/pid1', '-', 'INSERT'),
+        build_record('2', 'post/pid2', '-', 'INSERT'),
+        build_record('3', 'post/pid1', '-', 'MODIFY'),
+        build_record('4', 'post/pid2', '-', 'MODIFY'),
+        build_record('5', 'post/pid3', '-', 'INSERT'),
+    ]
+    # the lambda service retries everything after the first failed record, whatever its partition key
+    assert processor.process(records) == ['2', '3', '4', '5']
+    assert 'boom' in caplog.text
+
+    # all listeners of the failing record ran, but following records with the same pk did not,
+    # nor did records of other pks that were not started before the failure
+    assert [c.args[0] for c in f1.mock_calls] == ['pid1', 'pid1', 'pid2']
+    assert [c.args[0] for c in f2.mock_calls] == ['pid1', 'pid1', 'pid2']
+
+
+def test_process_does_not_retry_listeners_that_are_not_idempotent(dispatch, processor, caplog):
+    calls = []
+
+    def listener(name, fail_on=None):
+        def func(pid, **kwargs):
+            calls.append((name, pid))
+            if pid == fail_on:
+                raise Exception(f'{name} boom')
+
+        return func
+
+    dispatch.register('post', '-', ['INSERT'], listener('counter', fail_on='pid1'))
+    dispatch.register('post', '-', ['INSERT'], listener('sync', fail_on='pid2'), idempotent=True)
+    dispatch.register('post', '-', ['INSERT'], listener('other_sync'), idempotent=True)
+
+    records = [build_record('1', 'post/pid1', '-'), build_record('2', 'post/pid2', '-')]
+    # failure of a listener that's not idempotent is logged only
+    assert processor.process(records) == ['2']
+    assert 'counter boom' in caplog.text
+    assert 'sync boom' in caplog.text
+
+    # idempotent listeners run first, the others only once they all succeed
+    assert [name for name, pid in calls if pid == 'pid1'] == ['sync', 'other_sync', 'counter']
+    assert [name for name, pid in calls if pid == 'pid2'] == ['sync', 'other_sync']
+
+    # retries of the record don't run the counters until the idempotent listeners succeed
+    calls.clear()
+    dispatch.register('post', '-', ['INSERT'], listener('another_counter'))
+    assert processor.process(records[1:]) == ['2']
+    assert [name for name, pid in calls] == ['sync', 'other_sync']
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_process_does_not_double_apply_listeners_on_other_partition_keys(dispatch, max_workers):
+    processor = DynamoStreamProcessor(dispatch, max_workers=max_workers)
+    counts, fail = {}, {'pid1'}
+
+    def sync(pid, **kwargs):
+        if pid in fail:
+            raise Exception('sync boom')
+
+    def counter(pid, **kwargs):
+        counts[pid] = counts.get(pid, 0) + 1
+
+    dispatch.register('post', '-', ['INSERT'], sync, idempotent=True)
+    dispatch.register('post', '-', ['INSERT'], counter)
+
+    records = [
+        build_record('1', 'post/pid0', '-'),
+        build_record('2', 'post/pid1', '-'),
+        build_record('3', 'post/pid2', '-'),
+        build_record('4', 'post/pid2', '-'),
+    ]
+    assert processor.process(records) == ['2', '3', '4']
+    # the records after the failed one, of any partition key, will be retried so their counters didn't run
+    assert counts == {'pid0': 1}
+
+    # the lambda service retries from the failed record on
+    fail.clear()
+    assert processor.process(records[1:]) == []
+    assert counts == {'pid0': 1, 'pid1': 1, 'pid2': 2}
+
+
+def test_process_only_deserializes_full_images_for_matching_records(dispatch, processor):
+    f1 = Mock()
+    dispatch.register('post', '-', ['MODIFY'], f1, {'k': None})
+
+    records = [
+        build_record(
+            '1', 'post/pid1', '-', 'MODIFY', old_item={'k': 'a', 'o': '1'}, new_item={'k': 'a', 'o': '2'}
+        ),
+        build_record(
+            '2', 'post/pid2', '-', 'MODIFY', old_item={'k': 'a', 'o': '1'}, new_item={'k': 'b', 'o': '2'}
+        ),
+    ]
+    deserialized = []
+
+    def deserialize(value):
+        deserialized.append(value)
+        return value['S']
+
+    with patch('app.handlers.dynamo.processor.deserialize', deserialize):
+        assert processor.process(records) == []
+    assert f1.mock_calls == [call('pid2', new_item={'k': 'b', 'o': '2'}, old_item={'k': 'a', 'o': '1'})]
+    # keys, `k` from the first record and everything from the second
+    assert sorted(v['S'] for v in deserialized) == sorted(
+        ['post/pid1', 'post/pid2', 'post/pid1', '-', 'a', 'a'] + ['post/pid2', '-', 'a', 'b', 'a', '1', 'b', '2']
+    )
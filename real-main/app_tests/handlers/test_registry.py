@@ -0,0 +1,133 @@
+import importlib
+import os
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import boto3
+import moto
+
+from app import clients, models
+from app.handlers.registry import Lazy, Registry
+
+
+def test_lazy_constructs_on_first_attribute_access():
+    factory = Mock(return_value=Mock(name='target'))
+    lazy = Lazy(factory)
+    assert factory.call_count == 0
+    assert 'not yet constructed' in repr(lazy)
+
+    assert lazy.attr is factory.return_value.attr
+    assert factory.call_count == 1
+    lazy.method(42)
+    assert factory.call_count == 1
+    assert factory.return_value.method.mock_calls[-1].args == (42,)
+    assert 'target' in repr(lazy)
+
+
+def test_lazy_constructs_once_when_first_used_concurrently():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return Mock()
+
+    lazy = Lazy(factory)
+    threads = [threading.Thread(target=lambda: lazy.attr) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+
+
+def test_registry_clients_constructed_on_first_use():
+    with patch('app.clients.DynamoClient') as dynamo_client_cls, patch(
+        'app.clients.CloudFrontClient'
+    ) as cloudfront_client_cls, patch('app.clients.SecretsManagerClient') as secrets_client_cls:
+        registry = Registry(['dynamo', 'dynamo_feed', 'cloudfront'])
+        assert set(registry.clients) == {'dynamo', 'dynamo_feed', 'cloudfront'}
+        assert dynamo_client_cls.call_count == 0
+        assert cloudfront_client_cls.call_count == 0
+
+        registry.clients['dynamo'].get_item
+        assert set(dynamo_client_cls.mock_calls[0].kwargs) == {'boto3_resource', 'boto3_client'}
+        registry.clients['dynamo'].add_item
+        assert dynamo_client_cls.call_count == 1
+
+        # the secret isn't fetched, nor the secrets client constructed, until the client needs it
+        registry.clients['cloudfront'].generate_presigned_url
+        assert cloudfront_client_cls.call_count == 1
+        assert secrets_client_cls.call_count == 0
+        key_pair_getter = cloudfront_client_cls.call_args.args[0]
+        assert key_pair_getter() is secrets_client_cls.return_value.get_cloudfront_key_pair.return_value
+        assert secrets_client_cls.call_count == 1
+
+
+def test_registry_managers_share_one_graph():
+    with patch('app.clients.DynamoClient'):
+        registry = Registry(['dynamo'])
+        user_manager = registry.get_manager('user')
+        post_manager = registry.get_manager('post')
+        assert registry.managers == {}
+
+        assert isinstance(user_manager.post_manager, models.PostManager)
+        # the whole graph was constructed along with the user manager, and is shared
+        assert post_manager.user_manager is user_manager.post_manager.user_manager
+        assert registry.managers['post'] is user_manager.post_manager
+        assert registry.managers['post'].dynamo.client is registry.managers['user'].dynamo.client
+        assert registry.get_manager('user').post_manager is user_manager.post_manager
+
+
+def test_registry_models_share_the_real_dating_client():
+    patch_real_dating_client = patch('app.clients.RealDatingClient')
+    patch_fallback_client = patch('app.models.user.model.RealDatingClient')
+    with patch('app.clients.DynamoClient'), patch_real_dating_client as real_dating_client_cls:
+        with patch_fallback_client as fallback_client_cls:
+            registry = Registry(['dynamo', 'real_dating'])
+            user_manager = registry.get_manager('user')
+            users = [user_manager.init_user({'userId': f'uid{i}'}) for i in range(3)]
+            assert all(user.real_dating_client is registry.clients['real_dating'] for user in users)
+            assert fallback_client_cls.call_count == 0
+
+            users[0].real_dating_client.match_status
+            assert real_dating_client_cls.call_count == 1
+
+
+def test_registry_clients_share_boto3_clients():
+    # the table & bucket names are read from the env at import
+    patch_tables = patch.multiple(
+        'app.handlers.registry',
+        DYNAMO_FEED_TABLE='feed-table',
+        S3_UPLOADS_BUCKET='uploads-bucket',
+        S3_PLACEHOLDER_PHOTOS_BUCKET='placeholder-photos-bucket',
+    )
+    patch_main_table = patch.object(
+        clients.DynamoClient.__init__, '__defaults__', ('main-table', None, None, None)
+    )
+    with moto.mock_dynamodb2(), moto.mock_s3(), patch_tables, patch_main_table:
+        with patch.object(boto3.session, 'Session', wraps=boto3.session.Session) as session_cls:
+            registry = Registry(['dynamo', 'dynamo_feed', 's3_uploads', 's3_placeholder_photos'])
+            assert session_cls.call_count == 0
+
+            dynamo, dynamo_feed = registry.clients['dynamo'], registry.clients['dynamo_feed']
+            assert dynamo.boto3_client is dynamo_feed.boto3_client
+            assert dynamo.table.meta.client is dynamo_feed.table.meta.client
+            assert dynamo.table_name != dynamo_feed.table_name
+
+            s3_uploads, s3_placeholder_photos = (
+                registry.clients['s3_uploads'],
+                registry.clients['s3_placeholder_photos'],
+            )
+            assert s3_uploads.boto_client is s3_placeholder_photos.boto_client
+            assert s3_uploads.boto_client.meta.config.max_pool_connections == s3_uploads.max_workers
+            assert s3_uploads.bucket_name != s3_placeholder_photos.bucket_name
+            assert session_cls.call_count == 1
+
+
+def test_dynamo_handler_import_constructs_no_managers():
+    with patch.dict(os.environ, {'DYNAMO_TABLE': 'main-table', 'DYNAMO_FEED_TABLE': 'feed-table'}):
+        handlers = importlib.import_module('app.handlers.dynamo.handlers')
+    assert handlers.registry.managers == {}
+    assert not handlers.dispatch.listeners
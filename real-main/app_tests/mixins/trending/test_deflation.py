@@ -0,0 +1,256 @@
+import logging
+from decimal import Decimal
+from unittest.mock import Mock, patch
+from uuid import uuid4
+
+import pendulum
+import pytest
+
+from app.mixins.trending.deflation import TrendingDeflation
+
+
+@pytest.fixture
+def now():
+    yield pendulum.parse('2020-06-08T12:00:00Z')
+
+
+@pytest.fixture
+def add_items(now):
+    "Returns a function to add trending items last deflated yesterday, returning their ids in score order"
+
+    def add_items(manager, *scores):
+        yesterday = now - pendulum.duration(days=1)
+        item_ids = [str(uuid4()) for _ in scores]
+        for item_id, score in zip(item_ids, scores):
+            manager.trending_dynamo.add(item_id, Decimal(score), now=yesterday)
+        return [item_id for _, item_id in sorted(zip(scores, item_ids))]
+
+    yield add_items
+
+
+def get_scores(manager, item_ids):
+    items = [manager.trending_dynamo.get(item_id) for item_id in item_ids]
+    return [item['gsiA4SortKey'] if item else None for item in items]
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_deflate_item_retry_count(manager):
+    # add a trending item
+    item_id, item_score = str(uuid4()), Decimal(0.4)
+    item = manager.trending_dynamo.add(item_id, item_score, now=pendulum.now('utc').subtract(days=1))
+
+    with pytest.raises(
+        Exception, match=f'Deflation failed for item `{manager.item_type}:{item_id}` after 3 tries'
+    ):
+        TrendingDeflation(manager).deflate_item(item, pendulum.now('utc'), retry_count=3)
+    TrendingDeflation(manager).deflate_item(item, pendulum.now('utc'), retry_count=2)  # no exception thrown
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_deflate_item_already_deflated_today(manager, caplog):
+    # add a trending item
+    item_id, item_score = str(uuid4()), Decimal(0.4)
+    item = manager.trending_dynamo.add(item_id, item_score)
+    manager.trending_dynamo.deflate_score = Mock()
+
+    with caplog.at_level(logging.WARNING):
+        deflated = TrendingDeflation(manager).deflate_item(item, pendulum.now('utc'))
+    assert deflated is False
+    assert len(caplog.records) == 1
+    assert manager.item_type in caplog.records[0].msg
+    assert item_id in caplog.records[0].msg
+    assert 'already been deflated today' in caplog.records[0].msg
+    assert manager.trending_dynamo.deflate_score.mock_calls == []
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_deflate_item_already_has_score_of_zero(manager, caplog):
+    # add a trending item
+    item_id, item_score = str(uuid4()), Decimal(0)
+    item = manager.trending_dynamo.add(item_id, item_score)
+    manager.trending_dynamo.deflate_score = Mock()
+
+    with caplog.at_level(logging.WARNING):
+        deflated = TrendingDeflation(manager).deflate_item(item, pendulum.now('utc'))
+    assert deflated is False
+    assert len(caplog.records) == 2
+    assert manager.item_type in caplog.records[0].msg
+    assert item_id in caplog.records[0].msg
+    assert 'already has score of zero' in caplog.records[0].msg
+    assert manager.trending_dynamo.deflate_score.mock_calls == []
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_deflate_item_score_of_zero_update_deflated_at(manager, caplog):
+    # add a trending item
+    created_at = pendulum.parse('2020-06-07T12:00:00Z')
+    item_id, item_score = str(uuid4()), Decimal(0)
+    item = manager.trending_dynamo.add(item_id, item_score, now=created_at)
+    assert pendulum.parse(item['lastDeflatedAt']) == created_at
+    assert item['gsiA4SortKey'] == pytest.approx(Decimal(0))
+
+    # do the deflation, next day
+    now = pendulum.parse('2020-06-08T18:00:00Z')
+    with caplog.at_level(logging.WARNING):
+        deflated = TrendingDeflation(manager).deflate_item(item, now)
+    assert deflated is True
+    item = manager.trending_dynamo.get(item_id)
+    assert pendulum.parse(item['lastDeflatedAt']) == now
+    assert item['gsiA4SortKey'] == pytest.approx(Decimal(0))
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_deflate_item_no_recursion(manager, caplog):
+    # add a trending item
+    created_at = pendulum.parse('2020-06-07T12:00:00Z')
+    item_id, item_score = str(uuid4()), Decimal(0.4)
+    item = manager.trending_dynamo.add(item_id, item_score, now=created_at)
+    assert pendulum.parse(item['lastDeflatedAt']) == created_at
+    assert item['gsiA4SortKey'] == pytest.approx(Decimal(0.4))
+
+    # do the deflation, next day
+    now = pendulum.parse('2020-06-08T18:00:00Z')
+    with caplog.at_level(logging.WARNING):
+        deflated = TrendingDeflation(manager).deflate_item(item, now)
+    assert deflated is True
+    assert caplog.records == []
+    item = manager.trending_dynamo.get(item_id)
+    assert pendulum.parse(item['lastDeflatedAt']) == now
+    assert item['gsiA4SortKey'] == pytest.approx(Decimal(0.20))
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_deflate_item_with_recursion(manager, caplog):
+    # add a trending item
+    created_at = pendulum.parse('2020-06-07T12:00:00Z')
+    item_id, item_score = str(uuid4()), Decimal(0.4)
+    item = manager.trending_dynamo.add(item_id, item_score, now=created_at)
+    assert pendulum.parse(item['lastDeflatedAt']) == created_at
+    assert item['gsiA4SortKey'] == pytest.approx(Decimal(0.4))
+
+    # sneak behind our manager's back and increment its score
+    manager.trending_dynamo.add_score(item_id, Decimal(1), created_at)
+
+    # do a deflation run
+    now = pendulum.parse('2020-06-08T18:00:00Z')
+    with caplog.at_level(logging.WARNING):
+        deflated = TrendingDeflation(manager).deflate_item(item, now)
+    assert deflated is True
+    assert len(caplog.records) == 1
+    assert 'trying again' in caplog.records[0].msg
+    assert manager.item_type in caplog.records[0].msg
+    assert item_id in caplog.records[0].msg
+
+    # verify it was deflated correctly
+    item = manager.trending_dynamo.get(item_id)
+    assert pendulum.parse(item['lastDeflatedAt']) == now
+    assert item['gsiA4SortKey'] == pytest.approx(Decimal(0.7))
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_run_nothing_to_do(manager, now):
+    result = TrendingDeflation(manager).run(now=now)
+    assert result['seconds'] > 0
+    assert {k: v for k, v in result.items() if k != 'seconds'} == {
+        'total': 0,
+        'processed': 0,
+        'deflated': 0,
+        'deleted': 0,
+        'resumed': False,
+    }
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_run_deflates_and_deletes_tail(manager, now, add_items):
+    item_ids = add_items(manager, '0.2', '4', '0.9', '2', '0.6')
+    manager.min_count_to_keep = 2
+
+    # the page boundary is on an item that is deflated, not deleted: moto can't resume a query from the key
+    # of an item deleted since it was read, as dynamo can
+    result = TrendingDeflation(manager, max_workers=3, page_size=4).run(now=now)
+    assert result['total'] == 5
+    assert result['processed'] == 5
+    assert result['deflated'] == 2
+    assert result['deleted'] == 3
+    assert get_scores(manager, item_ids) == [None, None, None, 1, 2]
+    assert manager.trending_dynamo.count_items() == 2
+    assert manager.trending_dynamo.client.get_item(TrendingDeflation(manager).checkpoint_pk()) is None
+
+    # a second run the same day does nothing
+    result = TrendingDeflation(manager).run(now=now)
+    assert (result['total'], result['processed'], result['deflated'], result['deleted']) == (2, 2, 0, 0)
+    assert get_scores(manager, item_ids) == [None, None, None, 1, 2]
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_run_keeps_min_count(manager, now, add_items):
+    item_ids = add_items(manager, '0.2', '0.6', '0.9', '2')
+    manager.min_count_to_keep = 3
+
+    result = TrendingDeflation(manager).run(now=now)
+    assert (result['total'], result['deflated'], result['deleted']) == (4, 3, 1)
+    assert get_scores(manager, item_ids) == [None, Decimal('0.3'), Decimal('0.45'), 1]
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_run_lost_race_to_delete_deflates_instead(manager, now, add_items, caplog):
+    item_ids = add_items(manager, '0.2', '2')
+    manager.min_count_to_keep = 0
+
+    # boost the score after the item has been read, but before it is deleted
+    deflation = TrendingDeflation(manager)
+    yesterday = now - pendulum.duration(days=1)
+    process_item = deflation.process_item
+
+    def boost_then_process_item(trending_item, delete, now):
+        if delete:
+            manager.trending_dynamo.add_score(item_ids[0], Decimal('1'), yesterday)
+        return process_item(trending_item, delete, now)
+
+    with patch.object(deflation, 'process_item', side_effect=boost_then_process_item):
+        with caplog.at_level(logging.WARNING):
+            result = deflation.run(now=now)
+    assert (result['total'], result['deflated'], result['deleted']) == (2, 2, 0)
+    assert get_scores(manager, item_ids) == [Decimal('0.6'), 1]
+    assert 'not deleting trending' in caplog.records[0].msg
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_run_resumes_from_checkpoint(manager, now, add_items):
+    item_ids = add_items(manager, '1', '2', '3', '4')
+    deflation = TrendingDeflation(manager, max_workers=1, page_size=1)
+
+    # fail on the third item
+    deflate_item = deflation.deflate_item
+
+    def fail_on_third(trending_item, now):
+        if trending_item['partitionKey'].endswith(item_ids[2]):
+            raise Exception('Nope')
+        return deflate_item(trending_item, now)
+
+    with patch.object(deflation, 'deflate_item', side_effect=fail_on_third):
+        with pytest.raises(Exception, match='Nope'):
+            deflation.run(now=now)
+    # the fourth item had already been handed to a worker, the checkpoint is after the second
+    assert get_scores(manager, item_ids) == [Decimal('0.5'), 1, 3, 2]
+    checkpoint = deflation.get_checkpoint(now)
+    assert checkpoint['deflationDate'] == '2020-06-08'
+    assert checkpoint['lastEvaluatedKey']['partitionKey'].endswith(item_ids[1])
+
+    # a checkpoint from another day is ignored
+    assert deflation.get_checkpoint(now + pendulum.duration(days=1)) is None
+
+    # resume the same day
+    result = deflation.run(now=now)
+    assert result['resumed'] is True
+    assert (result['total'], result['processed'], result['deflated']) == (4, 2, 1)
+    assert get_scores(manager, item_ids) == [Decimal('0.5'), 1, Decimal('1.5'), 2]
+    assert deflation.get_checkpoint(now) is None
+
+
+@pytest.mark.parametrize('manager', pytest.lazy_fixture(['user_manager', 'post_manager']))
+def test_trending_deflate_and_delete_tail(manager, now, add_items):
+    item_ids = add_items(manager, '0.2', '2')
+    result = manager.trending_deflate_and_delete_tail(now=now, max_workers=2)
+    assert (result['total'], result['deflated'], result['deleted']) == (2, 2, 0)
+    assert get_scores(manager, item_ids) == [Decimal('0.1'), 1]
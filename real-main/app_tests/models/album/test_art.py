@@ -4,6 +4,7 @@ Tests for generating album art.
 These tests mainly intended to just ensure the art-generating logic
 doesn't crash, not that the output has the correct visual form.
 """
+
 from os import path
 
 import PIL.Image
@@ -49,3 +50,28 @@ def test_generate_zoomed_grid_failures(cnt):
 def test_generate_zoomed_grid_success(cnt, size):
     assert (image := art.generate_zoomed_grid(get_images(cnt)))
     assert image.size == size
+
+
+@pytest.mark.parametrize(
+    'dimensions, max_dimensions, fit',
+    [
+        [(3840, 2160), (3840, 2160), (3840, 2160)],
+        [(3840, 2160), (854, 480), (853, 480)],
+        [(3840, 2160), (114, 64), (114, 64)],
+        [(240, 320), (854, 480), (240, 320)],
+        [(4000, 3000), (1920, 1080), (1440, 1080)],
+        [(5000, 1), (114, 64), (114, 1)],
+    ],
+)
+def test_fit_dimensions(dimensions, max_dimensions, fit):
+    assert art.fit_dimensions(dimensions, max_dimensions) == fit
+    image = PIL.Image.new('RGB', dimensions)
+    image.thumbnail(max_dimensions)
+    assert image.size == fit
+
+
+@pytest.mark.parametrize('cnt', [4, 9, 16])
+@pytest.mark.parametrize('size', [(3840, 2160), (853, 480), (114, 64)])
+def test_generate_zoomed_grid_output_size(cnt, size):
+    assert (image := art.generate_zoomed_grid(get_images(cnt), output_size=size))
+    assert image.size == size
@@ -0,0 +1,181 @@
+import base64
+import io
+import uuid
+from os import path
+from unittest.mock import Mock, patch
+
+import PIL.Image
+import pytest
+
+from app.models.album.art_engine import AlbumArtEngine, TileCache
+from app.models.album.exceptions import AlbumException
+from app.models.post.enums import PostType
+from app.utils import image_size
+
+grant_path = path.join(path.dirname(__file__), '..', '..', 'fixtures', 'grant.jpg')
+grant_horz_path = path.join(path.dirname(__file__), '..', '..', 'fixtures', 'grant-horizontal.jpg')
+grant_vert_path = path.join(path.dirname(__file__), '..', '..', 'fixtures', 'grant-vertical.jpg')
+
+
+@pytest.fixture
+def user(user_manager, cognito_client):
+    user_id, username = str(uuid.uuid4()), str(uuid.uuid4())[:8]
+    cognito_client.create_user_pool_entry(user_id, username, verified_email=f'{username}@real.app')
+    yield user_manager.create_cognito_only_user(user_id, username)
+
+
+@pytest.fixture
+def posts(post_manager, user):
+    "Four completed image posts"
+    posts = []
+    for image_path in (grant_path, grant_horz_path, grant_vert_path, grant_path):
+        with open(image_path, 'rb') as fh:
+            image_data = base64.b64encode(fh.read())
+        post = post_manager.add_post(
+            user, str(uuid.uuid4()), PostType.IMAGE, image_input={'imageData': image_data}
+        )
+        posts.append(post)
+    yield posts
+
+
+@pytest.fixture
+def art_engine(album_manager):
+    yield album_manager.art_engine
+
+
+def mock_post(post_type=PostType.IMAGE, width=None, height=None):
+    image_item = {'width': width, 'height': height} if width else {}
+    return Mock(id=str(uuid.uuid4()), type=post_type, image_item=image_item)
+
+
+def image_sizes(art_images):
+    return {size.name: PIL.Image.open(io.BytesIO(data)).size for size, data in art_images.items()}
+
+
+@pytest.mark.parametrize(
+    'post, dimensions, tile_size',
+    [
+        [mock_post(width=4000, height=3000), (960, 540), image_size.P1080],
+        [mock_post(width=4000, height=3000), (480, 270), image_size.P480],
+        [mock_post(width=4000, height=3000), (29, 16), image_size.P64],
+        [mock_post(width=4000, height=3000), (3840, 2160), image_size.K4],
+        [mock_post(width=4000, height=3000), (5000, 5000), image_size.K4],
+        # a small image isn't enlarged in the bigger thumbnails, so the smallest that holds it whole is chosen
+        [mock_post(width=240, height=320), (960, 540), image_size.P480],
+        # unknown dimensions are taken to fill the thumbnail
+        [mock_post(), (854, 480), image_size.P480],
+        [mock_post(post_type=PostType.TEXT_ONLY), (29, 16), image_size.P1080],
+        [mock_post(post_type=PostType.TEXT_ONLY), (1921, 1080), image_size.K4],
+    ],
+)
+def test_choose_tile_size(art_engine, post, dimensions, tile_size):
+    assert art_engine.choose_tile_size(post, dimensions) == tile_size
+
+
+def test_plan_grid(art_engine):
+    posts = [mock_post(width=4000, height=3000), mock_post(post_type=PostType.TEXT_ONLY)] * 8
+    plans = art_engine.plan(posts)
+    assert {size.name: dimensions for size, (dimensions, _) in plans.items()} == {
+        'native': (3840, 2160),
+        '4K': (3840, 2160),
+        '1080p': (1920, 1080),
+        '480p': (853, 480),
+        '64p': (114, 64),
+    }
+    assert plans[image_size.NATIVE] == plans[image_size.K4]
+    assert plans[image_size.K4][1] == (image_size.P1080, image_size.P1080) * 8
+    assert plans[image_size.P1080][1] == (image_size.P480, image_size.P1080) * 8
+    assert plans[image_size.P64][1] == (image_size.P64, image_size.P1080) * 8
+
+
+def test_plan_single_post(art_engine):
+    plans = art_engine.plan([mock_post(width=4000, height=3000)])
+    assert {size.name: plan for size, plan in plans.items()} == {
+        'native': ((2880, 2160), (image_size.K4,)),
+        '4K': ((2880, 2160), (image_size.K4,)),
+        '1080p': ((1440, 1080), (image_size.P1080,)),
+        '480p': ((640, 480), (image_size.P480,)),
+        '64p': ((85, 64), (image_size.P64,)),
+    }
+
+
+def test_generate_grid(art_engine, posts):
+    art_images = art_engine.generate([post.id for post in posts])
+    assert image_sizes(art_images) == {
+        'native': (3840, 2160),
+        '4K': (3840, 2160),
+        '1080p': (1920, 1080),
+        '480p': (853, 480),
+        '64p': (114, 64),
+    }
+    assert art_images[image_size.NATIVE] == art_images[image_size.K4]
+
+
+def test_generate_single_post(art_engine, posts):
+    art_images = art_engine.generate([posts[1].id])
+    assert image_sizes(art_images) == {
+        'native': (240, 120),
+        '4K': (240, 120),
+        '1080p': (240, 120),
+        '480p': (240, 120),
+        '64p': (114, 57),
+    }
+    assert art_images[image_size.NATIVE] == art_images[image_size.K4]
+
+
+def test_generate_post_not_found(art_engine, posts):
+    with pytest.raises(AlbumException, match='not found'):
+        art_engine.generate([posts[0].id, posts[1].id, 'pid-dne', posts[2].id])
+
+
+def test_generate_fetches_tiles_once_per_scope(art_engine, posts, s3_uploads_client):
+    post_ids = [post.id for post in posts]
+    get_data = s3_uploads_client.get_object_data_stream
+    with patch.object(s3_uploads_client, 'get_object_data_stream', wraps=get_data) as get_object_data_stream:
+        art_images = art_engine.generate(post_ids)
+        # grant.jpg is used twice, but they're different posts
+        fetch_count = get_object_data_stream.call_count
+        assert fetch_count == len({call.args for call in get_object_data_stream.call_args_list})
+
+        # nothing is cached outside of a scope
+        assert art_engine.generate(post_ids) == art_images
+        assert get_object_data_stream.call_count == 2 * fetch_count
+
+        with art_engine.tile_cache.scope():
+            assert art_engine.generate(post_ids) == art_images
+            assert art_engine.generate(post_ids[::-1]) != art_images
+            assert get_object_data_stream.call_count == 3 * fetch_count
+        assert art_engine.tile_cache.tiles == {}
+
+
+def test_tile_cache():
+    tiles = [PIL.Image.new('RGB', (10, 10)) for _ in range(4)]
+    cache = TileCache(max_bytes=3 * 300)
+
+    # inactive outside of a scope
+    cache.put('k0', tiles[0])
+    assert cache.get('k0') is None
+
+    with cache.scope():
+        for idx, tile in enumerate(tiles[:3]):
+            cache.put(f'k{idx}', tile)
+        assert cache.get('k0') is tiles[0]
+
+        # the least recently used is evicted
+        cache.put('k3', tiles[3])
+        assert cache.bytes == 900
+        assert [cache.get(f'k{idx}') for idx in range(4)] == [tiles[0], None, tiles[2], tiles[3]]
+
+        # tiles bigger than the whole cache aren't cached
+        cache.put('big', PIL.Image.new('RGB', (100, 100)))
+        assert cache.get('big') is None
+        assert cache.bytes == 900
+
+    assert cache.get('k0') is None
+    assert cache.bytes == 0
+
+
+def test_album_manager_shares_art_engine(album_manager, user):
+    album = album_manager.add_album(user.id, 'aid', 'album name')
+    assert album.art_engine is album_manager.art_engine
+    assert isinstance(album.art_engine, AlbumArtEngine)
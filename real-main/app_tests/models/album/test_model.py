@@ -1,4 +1,3 @@
-import io
 import logging
 import uuid
 from os import path
@@ -97,7 +96,7 @@ def test_get_art_image_path(album):
 
 def test_get_art_image_url(album):
     image_url = 'https://the-image.com'
-    album.cloudfront_client.configure_mock(**{'generate_presigned_url.return_value': image_url})
+    album.cloudfront_client.configure_mock(**{'generate_presigned_readonly_url.return_value': image_url})
 
     # should get placeholder image when album has no artHash
     assert 'artHash' not in album.item
@@ -145,33 +144,25 @@ def test_save_art_images(album):
         path = album.get_art_image_path(size, art_hash)
         assert not album.s3_uploads_client.exists(path)
 
-    # save an image as the art
+    # save images as the art
     with open(grant_horz_path, 'rb') as fh:
         image_data = fh.read()
-    album.save_art_images(art_hash, io.BytesIO(image_data))
+    album.save_art_images(art_hash, {size: image_data + size.name.encode() for size in image_size.JPEGS})
 
     # check all sizes are in S3
     for size in image_size.JPEGS:
         path = album.get_art_image_path(size, art_hash)
-        assert album.s3_uploads_client.exists(path)
-
-    # check the value of the native image
-    native_path = album.get_art_image_path(image_size.NATIVE, art_hash)
-    assert album.s3_uploads_client.get_object_data_stream(native_path).read() == image_data
+        assert album.s3_uploads_client.get_object_data_stream(path).read() == image_data + size.name.encode()
 
-    # save an new image as the art
+    # save new images as the art
     with open(grant_vert_path, 'rb') as fh:
         image_data = fh.read()
-    album.save_art_images(art_hash, io.BytesIO(image_data))
+    album.save_art_images(art_hash, {size: image_data for size in image_size.JPEGS})
 
-    # check all sizes are in S3
+    # check all sizes were overwritten in S3
     for size in image_size.JPEGS:
         path = album.get_art_image_path(size, art_hash)
-        assert album.s3_uploads_client.exists(path)
-
-    # check the value of the native image
-    native_path = album.get_art_image_path(image_size.NATIVE, art_hash)
-    assert album.s3_uploads_client.get_object_data_stream(native_path).read() == image_data
+        assert album.s3_uploads_client.get_object_data_stream(path).read() == image_data
 
 
 def test_increment_rank_count(album, caplog):
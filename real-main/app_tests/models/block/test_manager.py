@@ -8,6 +8,7 @@ from app.models.block.exceptions import AlreadyBlocked, BlockException, NotBlock
 from app.models.like.enums import LikeStatus
 from app.models.post.enums import PostType
 from app.models.user.enums import UserStatus
+from app.utils import identity_map
 
 
 @pytest.fixture
@@ -103,6 +104,19 @@ def test_is_blocked(block_manager, blocker_user, blocked_user):
     assert block_manager.is_blocked(blocker_user.id, blocked_user.id) is False
 
 
+def test_is_blocked_within_identity_map_scope(block_manager, blocker_user, blocked_user):
+    with identity_map.scope():
+        assert block_manager.is_blocked(blocker_user.id, blocked_user.id) is False
+        assert block_manager.is_blocked(blocker_user.id, blocked_user.id) is False
+        assert identity_map.get_stats()['hits'] == 1
+
+        # writes invalidate the cached value
+        assert block_manager.block(blocker_user, blocked_user)
+        assert block_manager.is_blocked(blocker_user.id, blocked_user.id) is True
+        assert block_manager.unblock(blocker_user, blocked_user)
+        assert block_manager.is_blocked(blocker_user.id, blocked_user.id) is False
+
+
 def test_get_block_status(block_manager, blocker_user, blocked_user):
     assert block_manager.get_block_status(blocker_user.id, blocker_user.id) == 'SELF'
     assert block_manager.get_block_status(blocker_user.id, blocked_user.id) == 'NOT_BLOCKING'
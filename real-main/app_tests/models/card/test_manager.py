@@ -140,6 +140,31 @@ def test_add_or_update_card_with_only_usernames(user, template, card_manager):
     assert card_manager.get_card(template.card_id)
 
 
+def test_get_cards(user, card_manager, post1, post2, chat_card_template):
+    template1 = templates.CommentCardTemplate(user.id, post1.id, unviewed_comments_count=4)
+    template2 = templates.CommentCardTemplate(user.id, post2.id, unviewed_comments_count=3)
+    for template in (template1, template2, chat_card_template):
+        card_manager.add_or_update_card(template)
+    post2.delete()
+    card_ids = [template2.card_id, 'cid-dne', chat_card_template.card_id, template1.card_id]
+    assert card_manager.get_cards([]) == []
+
+    cards = card_manager.get_cards(card_ids)
+    assert [card.id if card else None for card in cards] == [
+        template2.card_id,
+        None,
+        chat_card_template.card_id,
+        template1.card_id,
+    ]
+
+    # posts loaded in one batch up front
+    cards = card_manager.get_cards(card_ids, with_posts=True)
+    with patch.object(card_manager.post_manager, 'get_post', side_effect=Exception('Should not be called')):
+        assert cards[0].post is None
+        assert cards[2].post is None
+        assert cards[3].post.id == post1.id
+
+
 def test_comment_cards_are_per_post(user, card_manager, post1, post2):
     template1 = templates.CommentCardTemplate(user.id, post1.id, unviewed_comments_count=4)
     template2 = templates.CommentCardTemplate(user.id, post2.id, unviewed_comments_count=3)
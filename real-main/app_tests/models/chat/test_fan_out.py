@@ -0,0 +1,111 @@
+import logging
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+
+from app.models.chat.fan_out import ChatMemberFanOut
+
+
+@pytest.fixture
+def user(user_manager, cognito_client):
+    user_id, username = str(uuid4()), str(uuid4())[:8]
+    cognito_client.create_user_pool_entry(user_id, username, verified_email=f'{username}@real.app')
+    yield user_manager.create_cognito_only_user(user_id, username)
+
+
+user1 = user
+user2 = user
+user3 = user
+user4 = user
+
+
+@pytest.fixture
+def users(user1, user2, user3, user4):
+    yield [user1, user2, user3, user4]
+
+
+@pytest.fixture
+def chat(chat_manager, users):
+    yield chat_manager.add_group_chat(str(uuid4()), users[0], name='group')
+
+
+@pytest.fixture
+def members(chat_manager, chat, users):
+    transacts = [chat_manager.member_dynamo.transact_add(chat.id, user.id) for user in users[1:]]
+    chat_manager.dynamo.client.transact_write_items(transacts)
+    yield users
+
+
+@pytest.fixture
+def fan_out(chat_manager):
+    yield ChatMemberFanOut(chat_manager.member_dynamo, chat_manager.view_dynamo, max_workers=2)
+
+
+def unviewed_counts(fan_out, chat, users):
+    return [fan_out.member_dynamo.get(chat.id, user.id).get('messagesUnviewedCount', 0) for user in users]
+
+
+def test_on_message_add(fan_out, chat, members, chat_message_manager, caplog):
+    message = chat_message_manager.add_chat_message(str(uuid4()), 'lore', chat.id, members[1].id)
+    with caplog.at_level(logging.INFO):
+        user_ids = fan_out.on_message_add(message)
+    assert sorted(user_ids) == sorted(user.id for user in members)
+    assert unviewed_counts(fan_out, chat, members) == [1, 0, 1, 1]
+    for user in members:
+        member_item = fan_out.member_dynamo.get(chat.id, user.id)
+        assert member_item['gsiK2SortKey'] == 'chat/' + message.created_at.to_iso8601_string()
+
+    fan_out_records = [rec for rec in caplog.records if 'fan-out' in rec.msg]
+    assert len(fan_out_records) == 1
+    assert f'message add `{message.id}` in chat `{chat.id}`: 4 members updated in' in fan_out_records[0].msg
+
+
+def test_on_message_delete_batch_loads_views(fan_out, chat, members, chat_message_manager, chat_manager):
+    message = chat_message_manager.add_chat_message(str(uuid4()), 'lore', chat.id, members[0].id)
+    fan_out.on_message_add(message)
+    assert unviewed_counts(fan_out, chat, members) == [0, 1, 1, 1]
+
+    # one member viewed the chat after the message was created, another before it
+    viewed_at = message.created_at.add(seconds=1)
+    chat_manager.view_dynamo.add_view(chat.id, members[1].id, 1, viewed_at)
+    chat_manager.view_dynamo.add_view(chat.id, members[2].id, 1, message.created_at.subtract(seconds=1))
+
+    batch_load_items = fan_out.view_dynamo.client.batch_load_items
+    with patch.object(fan_out.view_dynamo, 'get_view') as get_view_mock:
+        with patch.object(
+            fan_out.view_dynamo.client, 'batch_load_items', wraps=batch_load_items
+        ) as batch_load_items_mock:
+            user_ids = fan_out.on_message_delete(message)
+    assert get_view_mock.mock_calls == []
+    assert batch_load_items_mock.call_count == 1
+    assert sorted(user_ids) == sorted([members[2].id, members[3].id])
+    assert unviewed_counts(fan_out, chat, members) == [0, 1, 0, 0]
+
+
+def test_run_concurrently(fan_out, chat_message_manager, chat):
+    message = chat_message_manager.add_system_message(chat.id, 'system lore')
+    updated = []
+    fan_out.run(message, 'add', [], updated.append)
+    assert updated == []
+    fan_out.run(message, 'add', ['uid1'], updated.append)
+    assert updated == ['uid1']
+    fan_out.run(message, 'add', [f'uid{i}' for i in range(2, 10)], updated.append)
+    assert sorted(updated) == sorted(f'uid{i}' for i in range(1, 10))
+
+
+def test_run_failure_raises(fan_out, chat_message_manager, chat):
+    message = chat_message_manager.add_system_message(chat.id, 'system lore')
+
+    def update_member(user_id):
+        if user_id == 'uid2':
+            raise Exception('Update failed')
+
+    with pytest.raises(Exception, match='Update failed'):
+        fan_out.run(message, 'add', ['uid1', 'uid2', 'uid3'], update_member)
+
+
+def test_chat_manager_uses_fan_out(chat_manager):
+    assert isinstance(chat_manager.member_fan_out, ChatMemberFanOut)
+    assert chat_manager.member_fan_out.member_dynamo is chat_manager.member_dynamo
+    assert chat_manager.member_fan_out.view_dynamo is chat_manager.view_dynamo
@@ -87,8 +87,9 @@ def test_on_message_added(chat_manager, chat, user1, user2, caplog, user1_messag
     assert all('Failed' in rec.msg for rec in caplog.records)
     assert all('last message activity' in rec.msg for rec in caplog.records)
     assert all(chat.id in rec.msg for rec in caplog.records)
-    assert user1.id in caplog.records[1].msg
-    assert user2.id in caplog.records[2].msg
+    # members are updated concurrently, in no particular order
+    assert sorted([user1.id in caplog.records[1].msg, user1.id in caplog.records[2].msg]) == [False, True]
+    assert sorted([user2.id in caplog.records[1].msg, user2.id in caplog.records[2].msg]) == [False, True]
 
     # verify final state
     chat.refresh_item()
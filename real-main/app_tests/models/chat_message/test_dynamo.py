@@ -37,6 +37,8 @@ def test_add_chat_message(chat_message_dynamo, user_id):
     }
     if user_id:
         expected_item['userId'] = user_id
+        expected_item['gsiK1PartitionKey'] = 'chatMessageShard/14'
+        expected_item['gsiK1SortKey'] = now.to_iso8601_string()
 
     # add the chat to the DB, verify correct form
     item = chat_message_dynamo.add_chat_message(message_id, chat_id, user_id, text, text_tags, now)
@@ -147,18 +149,20 @@ def test_generate_chat_messages_by_chat(chat_message_dynamo):
     assert pks[1] == {'partitionKey': 'chatMessage/mid2', 'sortKey': '-'}
 
 
-def test_generate_all_chat_messages_by_scan(chat_message_dynamo):
-    message_id_1 = 'mid_1'
-    message_id_2 = 'mid_2'
-    message_id_3 = 'mid_3'
-
+def test_generate_all_chat_messages_with_author(chat_message_dynamo):
     now = pendulum.now('utc')
-    chat_message_dynamo.add_chat_message(message_id_1, 'cid', 'uid', 'lore ipsum', [], now)
-    chat_message_dynamo.add_chat_message(message_id_2, 'cid', 'uid', 'lore ipsum', [], now)
-    chat_message_dynamo.add_chat_message(message_id_3, 'cid', 'uid', 'lore ipsum', [], now)
-
-    pks = [pk['partitionKey'].split('/')[1] for pk in chat_message_dynamo.generate_all_chat_messages_by_scan()]
-    assert pks == [message_id_1, message_id_2, message_id_3]
+    chat_message_dynamo.add_chat_message('mid1', 'cid', 'uid', 'lore', [], now)
+    chat_message_dynamo.add_chat_message('mid2', 'cid', None, 'ipsum', [], now)
+    chat_message_dynamo.add_chat_message('mid3', 'cid', 'uid', 'dolor', [], now)
+
+    # system messages aren't indexed, the others are spread over the shards of the index
+    assert chat_message_dynamo.index_shard_pk('mid1') == 'chatMessageShard/4'
+    assert chat_message_dynamo.index_shard_pk('mid3') == 'chatMessageShard/8'
+    messages = sorted(
+        chat_message_dynamo.generate_all_chat_messages_with_author(), key=lambda message: message['messageId']
+    )
+    assert [message['messageId'] for message in messages] == ['mid1', 'mid3']
+    assert [message['text'] for message in messages] == ['lore', 'dolor']
 
 
 @pytest.mark.parametrize(
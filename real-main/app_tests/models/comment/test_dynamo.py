@@ -32,6 +32,8 @@ def test_add_comment(comment_dynamo):
         'gsiA1SortKey': now.to_iso8601_string(),
         'gsiA2PartitionKey': 'comment/uid',
         'gsiA2SortKey': now.to_iso8601_string(),
+        'gsiK1PartitionKey': 'commentShard/4',
+        'gsiK1SortKey': now.to_iso8601_string(),
         'commentId': 'cid',
         'postId': 'pid',
         'userId': 'uid',
@@ -120,20 +122,25 @@ def test_generate_by_user(comment_dynamo):
     assert comment_items[1]['commentId'] == comment_id_2
 
 
-def test_generate_all_comments_by_scan(comment_dynamo):
-    user_id_1 = 'uid1'
-    user_id_2 = 'uid2'
+def test_generate_all_comments(comment_dynamo):
+    comment_dynamo.add_comment('cid1', 'pid1', 'uid1', 't1', [])
+    comment_dynamo.add_comment('cid2', 'pid2', 'uid1', 't2', [])
+    comment_dynamo.add_comment('cid3', 'pid3', 'uid2', 't3', [])
 
-    comment_id_1 = 'cid1'
-    comment_id_2 = 'cid2'
-    comment_id_3 = 'cid3'
-
-    comment_dynamo.add_comment(comment_id_1, 'pid1', user_id_1, 't', [])
-    comment_dynamo.add_comment(comment_id_2, 'pid2', user_id_1, 't', [])
-    comment_dynamo.add_comment(comment_id_3, 'pid3', user_id_2, 't', [])
-
-    pks = [pk['partitionKey'].split('/')[1] for pk in comment_dynamo.generate_all_comments_by_scan()]
-    assert pks == [comment_id_1, comment_id_2, comment_id_3]
+    # the comments are spread over the shards of the index
+    assert {comment_dynamo.index_shard_pk(cid) for cid in ('cid1', 'cid2', 'cid3')} == {
+        'commentShard/7',
+        'commentShard/13',
+        'commentShard/11',
+    }
+    comments = sorted(comment_dynamo.generate_all_comments(), key=lambda comment: comment['commentId'])
+    assert [comment['commentId'] for comment in comments] == ['cid1', 'cid2', 'cid3']
+    assert [comment['text'] for comment in comments] == ['t1', 't2', 't3']
+
+    # deleted comments are no longer generated
+    comment_dynamo.delete_comment('cid2')
+    comments = sorted(comment_dynamo.generate_all_comments(), key=lambda comment: comment['commentId'])
+    assert [comment['commentId'] for comment in comments] == ['cid1', 'cid3']
 
 
 @pytest.mark.parametrize(
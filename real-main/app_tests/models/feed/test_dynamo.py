@@ -239,3 +239,24 @@ def test_generate_keys_by_posted_by_user(feed_dynamo):
         {'postId': pid2, 'feedUserId': feed_user_id}
     ]
     assert list(feed_dynamo.generate_keys_by_posted_by_user(feed_user_id, str(uuid4()))) == []
+
+
+def test_generate_newest_items(feed_dynamo):
+    posted_at = pendulum.parse('2020-06-01T12:00:00Z')
+    post_items = [
+        {'postId': f'pid{i}', 'postedByUserId': 'pbuid', 'postedAt': posted_at.add(hours=i).to_iso8601_string()}
+        for i in range(3)
+    ]
+    for post_item in post_items:
+        feed_dynamo.add_post_to_feeds(['uid', 'other-uid'], post_item)
+
+    assert list(feed_dynamo.generate_newest_items('uid', page_size=2)) == [
+        {'postId': 'pid2', 'postedAt': post_items[2]['postedAt']},
+        {'postId': 'pid1', 'postedAt': post_items[1]['postedAt']},
+        {'postId': 'pid0', 'postedAt': post_items[0]['postedAt']},
+    ]
+    assert [item['postId'] for item in feed_dynamo.generate_newest_items('uid', post_items[1]['postedAt'])] == [
+        'pid1',
+        'pid0',
+    ]
+    assert list(feed_dynamo.generate_newest_items('nope-uid')) == []
@@ -0,0 +1,97 @@
+import logging
+from unittest.mock import patch
+from uuid import uuid4
+
+import pendulum
+import pytest
+
+from app.models.feed.fan_out import FeedFanOut
+
+
+@pytest.fixture
+def fan_out(feed_manager):
+    yield FeedFanOut(
+        feed_manager.dynamo,
+        feed_manager.follower_manager.dynamo,
+        feed_manager.fan_out.client,
+        max_workers=4,
+        shard_size=2,
+        page_size=3,
+    )
+
+
+@pytest.fixture
+def post_item():
+    yield {
+        'postId': str(uuid4()),
+        'postedByUserId': 'ouid',
+        'postedAt': pendulum.now('utc').to_iso8601_string(),
+    }
+
+
+@pytest.fixture
+def follower_user_ids(feed_manager):
+    user_ids = [f'fuid{i}' for i in range(8)]
+    for user_id in user_ids:
+        feed_manager.follower_manager.dynamo.add_following(user_id, 'ouid', 'FOLLOWING')
+    yield user_ids
+
+
+def feed_post_ids(fan_out, user_id):
+    return [item['postId'] for item in fan_out.feed_dynamo.generate_items(user_id)]
+
+
+def test_run(fan_out, post_item, follower_user_ids, caplog):
+    with caplog.at_level(logging.INFO):
+        feed_user_ids = fan_out.run('ouid', post_item)
+    assert sorted(feed_user_ids) == sorted(['ouid', *follower_user_ids])
+    for user_id in feed_user_ids:
+        assert feed_post_ids(fan_out, user_id) == [post_item['postId']]
+    assert fan_out.get_checkpoint(post_item['postId']) is None
+    assert len(caplog.records) == 1
+    assert f'Feed fan-out of post `{post_item["postId"]}`: 9 feed items written' in caplog.records[0].msg
+
+
+def test_run_no_followers(fan_out, post_item):
+    with patch.object(fan_out, 'delete_checkpoint') as delete_checkpoint_mock:
+        assert fan_out.run('ouid', post_item) == ['ouid']
+    assert feed_post_ids(fan_out, 'ouid') == [post_item['postId']]
+    # nothing to clean up
+    assert delete_checkpoint_mock.mock_calls == []
+
+
+def test_run_interrupted_resumes_from_checkpoint(fan_out, post_item, follower_user_ids):
+    post_id = post_item['postId']
+    pages = list(fan_out.generate_user_id_pages('ouid'))
+    assert [len(user_ids) for user_ids, _ in pages] == [4, 3, 2]
+    last_page_user_ids = pages[2][0]
+    add_post_to_feeds = fan_out.feed_dynamo.add_post_to_feeds
+    written_user_ids = []
+
+    def fail_on_last_page(user_ids, post_item):
+        if set(user_ids) & set(last_page_user_ids):
+            raise Exception('lambda timed out')
+        written_user_ids.extend(user_ids)
+        return add_post_to_feeds(user_ids, post_item)
+
+    # first run gets through the first two pages, then fails
+    with patch.object(fan_out.feed_dynamo, 'add_post_to_feeds', side_effect=fail_on_last_page):
+        with pytest.raises(Exception, match='lambda timed out'):
+            fan_out.run('ouid', post_item)
+    assert fan_out.get_checkpoint(post_id)['followerLastEvaluatedKey'] == pages[1][1]
+    assert sorted(written_user_ids) == sorted(pages[0][0] + pages[1][0])
+
+    # the second run picks up after the last completed page
+    assert sorted(fan_out.run('ouid', post_item)) == sorted(last_page_user_ids)
+    for user_id in ['ouid', *follower_user_ids]:
+        assert feed_post_ids(fan_out, user_id) == [post_id]
+    assert fan_out.get_checkpoint(post_id) is None
+
+
+def test_delete_checkpoint(fan_out, post_item):
+    post_id = post_item['postId']
+    assert fan_out.get_checkpoint(post_id) is None
+    fan_out.save_checkpoint(post_id, {'partitionKey': 'pk'})
+    assert fan_out.get_checkpoint(post_id)['followerLastEvaluatedKey'] == {'partitionKey': 'pk'}
+    fan_out.delete_checkpoint(post_id)
+    assert fan_out.get_checkpoint(post_id) is None
@@ -1,9 +1,14 @@
+import base64
+import json
+import logging
+from unittest.mock import patch
 from uuid import uuid4
 
 import pendulum
 import pytest
 
-from app.models.post.enums import PostType
+from app.models.feed.exceptions import FeedException
+from app.models.post.enums import PostStatus, PostType
 
 
 @pytest.fixture
@@ -77,3 +82,153 @@ def test_add_post_to_followers_feeds(feed_manager, user_manager):
     )
     assert [i['postId'] for i in feed_manager.dynamo.generate_items(their_user.id)] == [post_id_2]
     assert list(feed_manager.dynamo.generate_items(another_user.id)) == []
+
+
+def test_add_post_to_followers_feeds_pull_user(feed_manager):
+    feed_manager.follower_manager.dynamo.add_following('tuid', 'ouid', 'FOLLOWING')
+    feed_manager.pull_users.add('ouid')
+    post_item = {'postId': 'pid', 'postedByUserId': 'ouid', 'postedAt': pendulum.now('utc').to_iso8601_string()}
+
+    # the post only goes into the poster's own feed
+    with patch.object(feed_manager, 'fan_out') as fan_out_mock:
+        assert feed_manager.add_post_to_followers_feeds('ouid', post_item) == ['ouid']
+    assert fan_out_mock.mock_calls == []
+    assert [i['postId'] for i in feed_manager.dynamo.generate_items('ouid')] == ['pid']
+    assert list(feed_manager.dynamo.generate_items('tuid')) == []
+
+
+def test_add_users_posts_to_feed_pull_user(feed_manager, post_manager, user):
+    post_manager.add_post(user, str(uuid4()), PostType.TEXT_ONLY, text='t')
+    feed_manager.pull_users.add(user.id)
+    feed_manager.add_users_posts_to_feed('fuid', user.id)
+    assert list(feed_manager.dynamo.generate_items('fuid')) == []
+
+
+def add_completed_post(feed_manager, user_id, post_id, posted_at):
+    post_dynamo = feed_manager.post_manager.dynamo
+    post_item = post_dynamo.add_pending_post(user_id, post_id, PostType.TEXT_ONLY, posted_at=posted_at, text='t')
+    return post_dynamo.set_post_status(post_item, PostStatus.COMPLETED)
+
+
+def test_stop_pulling_posts(feed_manager):
+    feed_manager.follower_manager.dynamo.add_following('fuid', 'puid', 'FOLLOWING')
+    pulled_since = pendulum.parse('2020-06-01T12:00:00Z')
+    add_completed_post(feed_manager, 'puid', 'pushed', pulled_since.subtract(hours=1))
+    feed_manager.dynamo.add_posts_to_feed(
+        'fuid', [{'postId': 'pushed', 'postedByUserId': 'puid', 'postedAt': str(pulled_since.subtract(hours=1))}]
+    )
+    feed_manager.pull_users.add('puid', now=pulled_since)
+    add_completed_post(feed_manager, 'puid', 'pulled1', pulled_since.add(hours=1))
+    add_completed_post(feed_manager, 'puid', 'pulled2', pulled_since.add(hours=2))
+    assert [i['postId'] for i in feed_manager.dynamo.generate_items('fuid')] == ['pushed']
+
+    # the posts made while a pull user are pushed through the fan-out, the ones before are not re-pushed
+    with patch.object(feed_manager.fan_out, 'run', wraps=feed_manager.fan_out.run) as run_mock:
+        feed_manager.stop_pulling_posts('puid')
+    assert [c.args[1]['postId'] for c in run_mock.call_args_list] == ['pulled2', 'pulled1']
+    assert feed_manager.pull_users.is_pull_user('puid') is False
+    assert feed_manager.pull_users.get_pulled_since('puid') is None
+    assert sorted(i['postId'] for i in feed_manager.dynamo.generate_items('fuid')) == [
+        'pulled1',
+        'pulled2',
+        'pushed',
+    ]
+    assert feed_manager.get_feed('fuid')['items'] == ['pulled2', 'pulled1', 'pushed']
+
+
+def test_get_feed_push_only(feed_manager):
+    assert feed_manager.get_feed('uid') == {'items': [], 'nextToken': None}
+
+    posted_at = pendulum.parse('2020-06-01T12:00:00Z')
+    for i in range(5):
+        post_item = {
+            'postId': f'pid{i}',
+            'postedByUserId': 'pbuid',
+            'postedAt': posted_at.add(hours=i).to_iso8601_string(),
+        }
+        feed_manager.dynamo.add_post_to_feeds(['uid'], post_item)
+
+    assert feed_manager.get_feed('uid') == {'items': ['pid4', 'pid3', 'pid2', 'pid1', 'pid0'], 'nextToken': None}
+
+    # paginate through
+    page = feed_manager.get_feed('uid', limit=2)
+    assert page['items'] == ['pid4', 'pid3']
+    page = feed_manager.get_feed('uid', limit=2, next_token=page['nextToken'])
+    assert page['items'] == ['pid2', 'pid1']
+    page = feed_manager.get_feed('uid', limit=2, next_token=page['nextToken'])
+    assert page == {'items': ['pid0'], 'nextToken': None}
+
+
+def test_get_feed_merges_followed_pull_users_posts(feed_manager):
+    posted_at = pendulum.parse('2020-06-01T12:00:00Z')
+    follower_dynamo = feed_manager.follower_manager.dynamo
+    follower_dynamo.add_following('uid', 'puid1', 'FOLLOWING')
+    follower_dynamo.add_following('uid', 'puid2', 'FOLLOWING')
+    follower_dynamo.add_following('uid', 'puid3', 'REQUESTED')
+    feed_manager.pull_users.add('puid1')
+    feed_manager.pull_users.add('puid2')
+    feed_manager.pull_users.add('puid3')
+    feed_manager.pull_users.add('puid4')
+
+    # pushed posts, one of which was pushed before its poster became a pull user
+    for hours, post_id, user_id in ((0, 'push0', 'pbuid'), (3, 'push3', 'pbuid'), (5, 'pull5', 'puid1')):
+        post_item = {
+            'postId': post_id,
+            'postedByUserId': user_id,
+            'postedAt': posted_at.add(hours=hours).to_iso8601_string(),
+        }
+        feed_manager.dynamo.add_post_to_feeds(['uid'], post_item)
+
+    # pulled posts
+    add_completed_post(feed_manager, 'puid1', 'pull1', posted_at.add(hours=1))
+    add_completed_post(feed_manager, 'puid1', 'pull5', posted_at.add(hours=5))
+    add_completed_post(feed_manager, 'puid2', 'pull2', posted_at.add(hours=2))
+    add_completed_post(feed_manager, 'puid2', 'pull4', posted_at.add(hours=4))
+    feed_manager.post_manager.dynamo.add_pending_post('puid2', 'pending', PostType.TEXT_ONLY, text='t')
+    add_completed_post(feed_manager, 'puid3', 'requested', posted_at.add(hours=1))
+    add_completed_post(feed_manager, 'puid4', 'not-followed', posted_at.add(hours=1))
+
+    expected = ['pull5', 'pull4', 'push3', 'pull2', 'pull1', 'push0']
+    assert feed_manager.get_feed('uid') == {'items': expected, 'nextToken': None}
+
+    # paginate through
+    items, next_token = [], None
+    while True:
+        page = feed_manager.get_feed('uid', limit=2, next_token=next_token)
+        items.extend(page['items'])
+        next_token = page['nextToken']
+        if not next_token:
+            break
+    assert items == expected
+
+
+def test_get_feed_invalid_next_token(feed_manager):
+    with pytest.raises(FeedException, match='Invalid nextToken'):
+        feed_manager.get_feed('uid', next_token='not-a-token')
+    with pytest.raises(FeedException, match='Invalid nextToken'):
+        feed_manager.get_feed('uid', next_token=feed_manager.dynamo.feed_client.encode_pagination_token({}))
+    with pytest.raises(FeedException, match='Invalid nextToken'):
+        feed_manager.get_feed('uid', next_token=feed_manager.dynamo.feed_client.encode_pagination_token(['a']))
+
+
+def test_get_feed_next_token_from_appsync_resolver(feed_manager, caplog):
+    posted_at = pendulum.parse('2020-06-01T12:00:00Z')
+    for i in range(3):
+        post_item = {
+            'postId': f'pid{i}',
+            'postedByUserId': 'pbuid',
+            'postedAt': posted_at.add(hours=i).to_iso8601_string(),
+        }
+        feed_manager.dynamo.add_post_to_feeds(['uid'], post_item)
+
+    # the tokens of the appsync dynamo resolver that used to read the feed wrap an encrypted key
+    old_token = base64.b64encode(json.dumps({'version': 1, 'token': 'AQICAHh99B'}).encode()).decode()
+    with caplog.at_level(logging.WARNING):
+        page = feed_manager.get_feed('uid', limit=2, next_token=old_token)
+    assert page['items'] == ['pid2', 'pid1']
+    assert len(caplog.records) == 1
+    assert 'ignoring nextToken' in caplog.records[0].msg
+
+    # the page's token is in the new format
+    page = feed_manager.get_feed('uid', limit=2, next_token=page['nextToken'])
+    assert page == {'items': ['pid0'], 'nextToken': None}
@@ -65,8 +65,7 @@ def test_on_post_status_change_sync_feed_post_completed(feed_manager, post):
     assert add_post_mock.mock_calls == [call(post.user_id, post.item)]
     assert dynamo_mock.mock_calls == []
     assert appsync_client_mock.mock_calls == [
-        call.fire_notification(user_ids[0], GqlNotificationType.USER_FEED_CHANGED),
-        call.fire_notification(user_ids[1], GqlNotificationType.USER_FEED_CHANGED),
+        call.fire_notifications(user_ids, GqlNotificationType.USER_FEED_CHANGED),
     ]
 
 
@@ -85,6 +84,40 @@ def test_on_post_status_change_sync_feed_post_uncompleted(feed_manager, post, st
     assert add_post_mock.mock_calls == []
     assert dynamo_mock.mock_calls == [call.delete_by_post(post.id)]
     assert appsync_client_mock.mock_calls == [
-        call.fire_notification(user_ids[0], GqlNotificationType.USER_FEED_CHANGED),
-        call.fire_notification(user_ids[1], GqlNotificationType.USER_FEED_CHANGED),
+        call.fire_notifications(user_ids, GqlNotificationType.USER_FEED_CHANGED),
     ]
+
+
+def test_on_user_follower_count_change_sync_pull_users(feed_manager, user1):
+    feed_manager.pull_follower_threshold = 10
+    handler = feed_manager.on_user_follower_count_change_sync_pull_users
+
+    # below the threshold
+    handler(user1.id, new_item={**user1.item, 'followerCount': 9}, old_item=user1.item)
+    assert feed_manager.pull_users.get_user_ids() == set()
+
+    # reaches the threshold
+    handler(user1.id, new_item={**user1.item, 'followerCount': 10}, old_item={**user1.item, 'followerCount': 9})
+    assert feed_manager.pull_users.get_user_ids() == {user1.id}
+
+    # drops a bit below the threshold, stays a pull user
+    handler(user1.id, new_item={**user1.item, 'followerCount': 9}, old_item={**user1.item, 'followerCount': 10})
+    assert feed_manager.pull_users.get_user_ids() == {user1.id}
+
+    # drops well below the threshold
+    handler(user1.id, new_item={**user1.item, 'followerCount': 8}, old_item={**user1.item, 'followerCount': 9})
+    assert feed_manager.pull_users.get_user_ids() == set()
+
+    # user deleted while a pull user
+    feed_manager.pull_users.add(user1.id)
+    handler(user1.id, old_item={**user1.item, 'followerCount': 20})
+    assert feed_manager.pull_users.get_user_ids() == set()
+
+
+def test_on_user_follower_count_change_sync_pull_users_disabled(feed_manager, user1):
+    feed_manager.pull_follower_threshold = 0
+    with patch.object(feed_manager, 'pull_users') as pull_users_mock:
+        feed_manager.on_user_follower_count_change_sync_pull_users(
+            user1.id, new_item={**user1.item, 'followerCount': 10}, old_item=user1.item
+        )
+    assert pull_users_mock.mock_calls == []
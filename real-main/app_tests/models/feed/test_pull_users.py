@@ -0,0 +1,56 @@
+from unittest.mock import patch
+
+import pendulum
+import pytest
+
+from app.models.feed.pull_users import FeedPullUsers
+
+
+@pytest.fixture
+def pull_users(dynamo_client):
+    yield FeedPullUsers(dynamo_client, cache_ttl=60)
+
+
+def test_add_remove(pull_users):
+    assert pull_users.get_user_ids() == set()
+    assert pull_users.is_pull_user('uid1') is False
+
+    pull_users.add('uid1')
+    pull_users.add('uid2')
+    pull_users.add('uid1')
+    assert pull_users.get_user_ids() == {'uid1', 'uid2'}
+    assert pull_users.is_pull_user('uid1') is True
+
+    pull_users.remove('uid1')
+    pull_users.remove('uid3')
+    assert pull_users.get_user_ids() == {'uid2'}
+
+    pull_users.remove('uid2')
+    assert pull_users.get_user_ids() == set()
+
+
+def test_pulled_since(pull_users):
+    assert pull_users.get_pulled_since('uid1') is None
+
+    now = pendulum.now('utc')
+    pull_users.add('uid1', now=now)
+    assert pull_users.get_pulled_since('uid1') == now
+    assert pull_users.get_pulled_since('uid2') is None
+
+    pull_users.remove('uid1')
+    assert pull_users.get_pulled_since('uid1') is None
+
+
+def test_user_ids_are_cached(pull_users, dynamo_client):
+    other_pull_users = FeedPullUsers(dynamo_client)
+    with patch('time.monotonic', return_value=100):
+        assert pull_users.get_user_ids() == set()
+
+    # changes by others are not seen within the ttl
+    other_pull_users.add('uid1')
+    with patch('time.monotonic', return_value=159):
+        assert pull_users.get_user_ids() == set()
+
+    # but are after it
+    with patch('time.monotonic', return_value=160):
+        assert pull_users.get_user_ids() == {'uid1'}
@@ -179,3 +179,19 @@ def test_generate_followeds(follower_dynamo, user1, user2, user3):
     # test generating just the keys,
     keys = list(follower_dynamo.generate_followed_items(our_user.id, keys_only=True))
     assert keys == [{k: item[k] for k in ('partitionKey', 'sortKey')} for item in items]
+
+
+def test_batch_get_followed_user_ids(follower_dynamo):
+    follower_dynamo.add_following('fuid', 'uid1', FollowStatus.FOLLOWING)
+    follower_dynamo.add_following('fuid', 'uid2', FollowStatus.REQUESTED)
+    follower_dynamo.add_following('fuid', 'uid3', FollowStatus.FOLLOWING)
+    follower_dynamo.add_following('other-fuid', 'uid4', FollowStatus.FOLLOWING)
+
+    assert follower_dynamo.batch_get_followed_user_ids('fuid', [], FollowStatus.FOLLOWING) == []
+    followed_user_ids = follower_dynamo.batch_get_followed_user_ids(
+        'fuid', ['uid1', 'uid2', 'uid3', 'uid4', 'uid1'], FollowStatus.FOLLOWING
+    )
+    assert sorted(followed_user_ids) == ['uid1', 'uid3']
+    assert follower_dynamo.batch_get_followed_user_ids('fuid', ['uid1', 'uid2'], FollowStatus.REQUESTED) == [
+        'uid2'
+    ]
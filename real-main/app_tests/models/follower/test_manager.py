@@ -8,7 +8,7 @@ from app.models.follower.enums import FollowStatus
 from app.models.follower.exceptions import FollowerAlreadyExists, FollowerException
 from app.models.post.enums import PostType
 from app.models.user.enums import UserPrivacyStatus, UserStatus
-from app.utils import GqlNotificationType
+from app.utils import GqlNotificationType, identity_map
 
 
 @pytest.fixture
@@ -75,6 +75,26 @@ def test_get_follow_status(follower_manager, users):
     assert follower_manager.get_follow_status(their_user.id, our_user.id) == 'NOT_FOLLOWING'
 
 
+def test_get_follow_within_identity_map_scope(follower_manager, users):
+    our_user, their_user = users
+    with identity_map.scope():
+        assert follower_manager.get_follow(our_user.id, their_user.id) is None
+        follower_manager.request_to_follow(our_user, their_user)
+        follow = follower_manager.get_follow(our_user.id, their_user.id)
+        assert follow.status == FollowStatus.FOLLOWING
+        hits = identity_map.get_stats()['hits']
+        assert follower_manager.get_follow(our_user.id, their_user.id) is follow
+        assert identity_map.get_stats()['hits'] == hits + 1
+
+        follower_manager.get_follow(our_user.id, their_user.id).unfollow()
+        assert follower_manager.get_follow(our_user.id, their_user.id) is None
+
+        # a strongly consistent read always goes to the DB
+        with patch.object(follower_manager.dynamo, 'get_following', return_value=None) as get_following:
+            assert follower_manager.get_follow(our_user.id, their_user.id, strongly_consistent=True) is None
+        assert get_following.call_count == 1
+
+
 def test_request_to_follow_public_user(follower_manager, users):
     our_user, their_user = users
 
@@ -0,0 +1,141 @@
+import hashlib
+import io
+import threading
+from os import path
+from unittest import mock
+
+import PIL.Image
+import pytest
+
+from app.models.post.cached_image import CachedImage
+from app.models.post.exceptions import PostException
+from app.utils import image_size
+
+grant_path = path.join(path.dirname(__file__), '..', '..', 'fixtures', 'grant.jpg')
+grant_rotated_path = path.join(path.dirname(__file__), '..', '..', 'fixtures', 'grant-rotated.jpg')
+blank_path = path.join(path.dirname(__file__), '..', '..', 'fixtures', 'big-blank.jpg')
+squirrel_path = path.join(path.dirname(__file__), '..', '..', 'fixtures', 'squirrel.png')
+
+
+@pytest.fixture
+def cached_image(s3_uploads_client):
+    yield CachedImage(
+        'pid', image_size=image_size.NATIVE, s3_client=s3_uploads_client, s3_path='uid/post/pid/n.jpg'
+    )
+
+
+def test_size_read_from_header(cached_image, s3_uploads_client):
+    s3_uploads_client.put_object(cached_image.s3_path, open(grant_rotated_path, 'rb'), 'image/jpeg')
+    with mock.patch.object(CachedImage, '_fill_image_from_data', side_effect=Exception('Not decoded')):
+        # the exif orientation of the image swaps width and height
+        assert cached_image.size == (320, 240)
+    assert cached_image.size == cached_image.readonly_image.size
+
+
+def test_size_png(cached_image, s3_uploads_client):
+    s3_uploads_client.put_object(cached_image.s3_path, open(squirrel_path, 'rb'), 'image/jpeg')
+    assert cached_image.size == (800, 683)
+
+
+def test_size_not_an_image(cached_image, s3_uploads_client):
+    s3_uploads_client.put_object(cached_image.s3_path, b'aintnojpeg', 'image/jpeg')
+    with pytest.raises(PostException, match='Unable to recognize file type'):
+        cached_image.size
+
+
+def test_get_reduced_image_uses_draft(cached_image, s3_uploads_client):
+    s3_uploads_client.put_object(cached_image.s3_path, open(blank_path, 'rb'), 'image/jpeg')
+
+    # decoded at half, quarter and eighth size, never smaller than needed
+    assert cached_image.get_reduced_image((3840, 2160)).size == (4000, 2000)
+    assert cached_image.get_reduced_image((1920, 1080)).size == (2000, 1000)
+    assert cached_image.get_reduced_image((854, 480)).size == (1000, 500)
+    assert cached_image.get_reduced_image((64, 64)).size == (500, 250)
+
+    # the reduced images are not kept
+    assert cached_image._image is None
+
+    # once decoded at full size, that's used
+    cached_image.readonly_image
+    image = cached_image.get_reduced_image((64, 64))
+    assert image.size == (4000, 2000)
+    assert image is not cached_image.readonly_image
+
+
+def test_get_reduced_image_rotated(cached_image, s3_uploads_client):
+    s3_uploads_client.put_object(cached_image.s3_path, open(grant_rotated_path, 'rb'), 'image/jpeg')
+    image = cached_image.get_reduced_image((100, 100))
+    assert image.size == (160, 120)
+    image = cached_image.get_reduced_image((1000, 1000))
+    assert image.size == (320, 240)
+
+
+def test_checksum(cached_image, s3_uploads_client):
+    data = open(grant_path, 'rb').read()
+    s3_uploads_client.put_object(cached_image.s3_path, data, 'image/jpeg')
+    assert cached_image.checksum is None
+
+    # known once read
+    cached_image.refresh()
+    assert cached_image.checksum == hashlib.md5(data).hexdigest()
+    assert cached_image.checksum == s3_uploads_client.get_object_checksum(cached_image.s3_path)
+
+    # and once written
+    cached_image.set_image(cached_image.readonly_image.rotate(90, expand=True)).flush()
+    assert cached_image.checksum != hashlib.md5(data).hexdigest()
+    assert cached_image.checksum == s3_uploads_client.get_object_checksum(cached_image.s3_path)
+    new_data = s3_uploads_client.get_object_data_stream(cached_image.s3_path).read()
+    assert PIL.Image.open(io.BytesIO(new_data)).size == (320, 240)
+
+    # but not once deleted
+    cached_image.clear().flush(include_deletes=True)
+    assert cached_image.checksum is None
+
+
+def test_flush_many(s3_uploads_client):
+    caches = [
+        CachedImage('pid', image_size=size, s3_client=s3_uploads_client, s3_path=f'uid/post/pid/{size.filename}')
+        for size in (image_size.NATIVE, image_size.K4, image_size.P64)
+    ]
+    data = open(grant_path, 'rb').read()
+    caches[0].set_data(io.BytesIO(data))
+    caches[1].set_image(PIL.Image.open(grant_path))
+    s3_uploads_client.put_object(caches[2].s3_path, data, 'image/jpeg')
+    caches[2].refresh()  # synced, nothing to flush
+
+    encode_threads = []
+    get_flush_data = CachedImage._get_flush_data
+
+    def encode(cached_image):
+        encode_threads.append(threading.get_ident())
+        return get_flush_data(cached_image)
+
+    with mock.patch.object(CachedImage, '_get_flush_data', autospec=True, side_effect=encode):
+        with mock.patch.object(
+            s3_uploads_client, 'put_object_with_client', wraps=s3_uploads_client.put_object_with_client
+        ) as put_object:
+            CachedImage.flush_many(caches)
+    assert put_object.call_count == 2
+    # the images are encoded by the workers that write them, not one after another up front
+    assert len(encode_threads) == 2
+    assert threading.get_ident() not in encode_threads
+    assert all(cache.is_synced for cache in caches)
+    assert s3_uploads_client.get_object_data_stream(caches[0].s3_path).read() == data
+    assert s3_uploads_client.exists(caches[1].s3_path)
+    for cache in caches[:2]:
+        assert cache.checksum == s3_uploads_client.get_object_checksum(cache.s3_path)
+
+    # empty caches are only deleted when asked to
+    caches[0].clear()
+    caches[1].clear()
+    with pytest.raises(Exception, match='Refusing to flush back empty cache'):
+        CachedImage.flush_many(caches)
+    CachedImage.flush_many(caches, include_deletes=True)
+    assert not s3_uploads_client.exists(caches[0].s3_path)
+    assert not s3_uploads_client.exists(caches[1].s3_path)
+    assert caches[0].checksum is None
+
+
+def test_flush_many_nothing_to_flush(cached_image):
+    with pytest.raises(Exception, match='Nothing to flush back'):
+        CachedImage.flush_many([cached_image])
@@ -660,38 +660,6 @@ def test_generate_expired_post_pks_by_day(post_dynamo):
     assert expired_posts[1]['sortKey'] == post2['sortKey']
 
 
-def test_generate_expired_post_pks_with_scan(post_dynamo):
-    # add four posts, one that expires a week ago, one that expires yesterday
-    # and one that expires today, and one that doesnt expire
-    now = pendulum.now('utc')
-    week_ago = now - pendulum.duration(days=7)
-    yesterday = now - pendulum.duration(days=1)
-    lifetime = pendulum.duration(seconds=1)
-
-    post1 = post_dynamo.add_pending_post(
-        'u', 'p1', 'ptype', text='no', posted_at=week_ago, expires_at=(week_ago + lifetime)
-    )
-    post2 = post_dynamo.add_pending_post(
-        'u', 'p2', 'ptype', text='me', posted_at=yesterday, expires_at=(yesterday + lifetime)
-    )
-    post_dynamo.add_pending_post('u', 'p3', 'ptype', text='digas', posted_at=now, expires_at=(now + lifetime))
-    post_dynamo.add_pending_post('u', 'p4', 'ptype', text='por favor')
-
-    # scan with cutoff of yesterday should only see the post from a week ago
-    expired_posts = list(post_dynamo.generate_expired_post_pks_with_scan(yesterday.date()))
-    assert len(expired_posts) == 1
-    assert expired_posts[0]['partitionKey'] == post1['partitionKey']
-    assert expired_posts[0]['sortKey'] == post1['sortKey']
-
-    # scan with cutoff of today should see posts of yesterday and a week ago
-    expired_posts = list(post_dynamo.generate_expired_post_pks_with_scan(now.date()))
-    assert len(expired_posts) == 2
-    assert expired_posts[0]['partitionKey'] == post1['partitionKey']
-    assert expired_posts[0]['sortKey'] == post1['sortKey']
-    assert expired_posts[1]['partitionKey'] == post2['partitionKey']
-    assert expired_posts[1]['sortKey'] == post2['sortKey']
-
-
 def test_set_last_unviewed_comment_at(post_dynamo):
     user_id = 'uid'
     post_id = 'pid'
@@ -1052,3 +1020,24 @@ def test_increment_decrement_count(post_dynamo, caplog, incrementor_name, decrem
         assert caplog.records[0].levelname == 'WARNING'
         assert all(x in caplog.records[0].msg for x in ['Failed to decrement', attribute_name, post_id])
         assert post_dynamo.get_post(post_id)[attribute_name] == 0
+
+
+def test_generate_newest_completed_posts_by_user(post_dynamo):
+    posted_at = pendulum.parse('2020-06-01T12:00:00Z')
+    for i in range(3):
+        post_item = post_dynamo.add_pending_post('uid', f'pid{i}', 'ptype', posted_at=posted_at.add(hours=i))
+        post_dynamo.set_post_status(post_item, PostStatus.COMPLETED)
+    post_dynamo.add_pending_post('uid', 'pid3', 'ptype', posted_at=posted_at.add(hours=3))
+    post_item = post_dynamo.add_pending_post('other-uid', 'pidX', 'ptype', posted_at=posted_at)
+    post_dynamo.set_post_status(post_item, PostStatus.COMPLETED)
+
+    assert list(post_dynamo.generate_newest_completed_posts_by_user('uid', page_size=2)) == [
+        {'postId': 'pid2', 'postedAt': posted_at.add(hours=2).to_iso8601_string()},
+        {'postId': 'pid1', 'postedAt': posted_at.add(hours=1).to_iso8601_string()},
+        {'postId': 'pid0', 'postedAt': posted_at.to_iso8601_string()},
+    ]
+    posted_at_or_before = posted_at.add(hours=1).to_iso8601_string()
+    assert [
+        item['postId'] for item in post_dynamo.generate_newest_completed_posts_by_user('uid', posted_at_or_before)
+    ] == ['pid1', 'pid0']
+    assert list(post_dynamo.generate_newest_completed_posts_by_user('nope-uid')) == []
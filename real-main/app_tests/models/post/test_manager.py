@@ -9,7 +9,7 @@ import stringcase
 from app.mixins.view.enums import ViewType
 from app.models.post.enums import PostStatus, PostType
 from app.models.post.exceptions import PostException
-from app.utils import image_size
+from app.utils import identity_map, image_size
 
 
 @pytest.fixture
@@ -47,6 +47,97 @@ def test_get_post_dne(post_manager):
     assert post_manager.get_post('pid-dne') is None
 
 
+def test_get_post_within_identity_map_scope(post_manager, user):
+    with identity_map.scope():
+        assert post_manager.get_post('pid') is None
+        post_manager.add_post(user, 'pid', PostType.TEXT_ONLY, text='t')
+        assert post_manager.get_post('pid').id == 'pid'
+        hits = identity_map.get_stats()['hits']
+        assert post_manager.get_post('pid') is post_manager.get_post('pid')
+        assert identity_map.get_stats()['hits'] == hits + 2
+
+        post_manager.get_post('pid').delete()
+        assert post_manager.get_post('pid') is None
+
+
+def test_get_posts(post_manager, posts):
+    post1, post2 = posts
+    assert post_manager.get_posts([]) == []
+    fetched = post_manager.get_posts([post2.id, 'pid-dne', post1.id])
+    assert [post.id if post else None for post in fetched] == [post2.id, None, post1.id]
+    assert fetched[0].item == post2.item
+
+
+def test_get_posts_with_subitems(post_manager, posts):
+    post1, post2 = posts
+    image_item = post_manager.image_dynamo.set_initial_attributes(post1.id, image_format='JPEG')
+    batch_load_items = post_manager.dynamo.client.batch_load_items
+    with patch.object(post_manager.dynamo.client, 'batch_load_items', wraps=batch_load_items) as batch_load_mock:
+        fetched = post_manager.get_posts([post1.id, 'pid-dne', post2.id], subitems=['image'])
+    assert batch_load_mock.call_count == 1
+    assert [post.id if post else None for post in fetched] == [post1.id, None, post2.id]
+    with patch.object(post_manager.image_dynamo, 'get', side_effect=Exception('Should not be called')):
+        assert fetched[0].image_item == image_item
+        assert fetched[2].image_item == {}
+
+
+def test_init_posts_from_sources(post_manager, posts, user):
+    post1, post2 = posts
+    post_manager.original_metadata_dynamo.add(post1.id, '{"meta": "data"}')
+    source1 = post1.refresh_item().serialize(user.id)
+    assert post1.trending_item and post2.trending_item
+    assert 'postedBy' in source1
+
+    # complete post items are used as is
+    with patch.object(
+        post_manager.dynamo.client, 'batch_load_items', side_effect=Exception('Should not be called')
+    ):
+        with patch.object(post_manager.dynamo.client, 'get_item', side_effect=Exception('Should not be called')):
+            assert post_manager.init_posts_from_sources([]) == []
+            hydrated = post_manager.init_posts_from_sources([source1])
+    assert hydrated[0].id == post1.id
+    assert hydrated[0].item == post1.item
+
+    # partial references to posts are fetched, in the same batch as the subitems
+    sources = [{'postId': post2.id}, {'postId': 'pid-dne'}, source1]
+    batch_load_items = post_manager.dynamo.client.batch_load_items
+    with patch.object(post_manager.dynamo.client, 'batch_load_items', wraps=batch_load_items) as batch_load_mock:
+        hydrated = post_manager.init_posts_from_sources(
+            sources, subitems=['image', 'original_metadata', 'trending']
+        )
+    assert batch_load_mock.call_count == 1
+    assert [post.id if post else None for post in hydrated] == [post2.id, None, post1.id]
+    assert hydrated[0].item == post2.item
+    with patch.object(post_manager.dynamo.client, 'get_item', side_effect=Exception('Should not be called')):
+        assert hydrated[0].image_item == {}
+        assert hydrated[0].original_metadata_item is None
+        assert hydrated[0].trending_item == post2.trending_item
+        assert hydrated[2].original_metadata_item['originalMetadata'] == '{"meta": "data"}'
+        assert hydrated[2].trending_item == post1.trending_item
+
+
+def test_init_posts_from_sources_partial_items(post_manager, user):
+    lifetime_duration = pendulum.duration(days=1)
+    post = post_manager.add_post(
+        user, str(uuid.uuid4()), PostType.TEXT_ONLY, text='t', lifetime_duration=lifetime_duration
+    )
+    item = post.refresh_item().item
+    assert post_manager.is_complete_post_item(item)
+
+    # items missing attributes, or with attributes that disagree, are fetched
+    sources = [
+        {k: v for k, v in item.items() if k != 'postStatus'},
+        {k: v for k, v in item.items() if k != 'expiresAt'},
+        {**item, 'postStatus': PostStatus.ARCHIVED},
+    ]
+    assert not any(post_manager.is_complete_post_item(source) for source in sources)
+    batch_load_items = post_manager.dynamo.client.batch_load_items
+    with patch.object(post_manager.dynamo.client, 'batch_load_items', wraps=batch_load_items) as batch_load_mock:
+        hydrated = post_manager.init_posts_from_sources(sources)
+    assert batch_load_mock.call_count == 1
+    assert [post.item for post in hydrated] == [item] * 3
+
+
 def test_add_post_errors(post_manager, user):
     # try to add a post without any content (no text or media)
     with pytest.raises(PostException, match='without text'):
@@ -500,6 +591,11 @@ def test_delete_older_expired_posts(post_manager, user, caplog):
     )
     assert post_expired_last_week.item['expiresAt'] < (now - pendulum.duration(days=6)).to_iso8601_string()
 
+    # posts that expired further back than the lookback are left alone
+    post_manager.delete_older_expired_posts(lookback_days=6)
+    assert len(caplog.records) == 0
+    assert post_expired_last_week.refresh_item().item
+
     # run the deletion run
     post_manager.delete_older_expired_posts()
 
@@ -516,6 +612,38 @@ def test_delete_older_expired_posts(post_manager, user, caplog):
     assert post_expired_last_week.refresh_item().item is None
 
 
+def test_delete_older_expired_posts_sweeps_back_to_recorded_date(post_manager, user, caplog):
+    now = pendulum.now('utc')
+    post_expired_long_ago = post_manager.add_post(
+        user,
+        'pid1',
+        PostType.TEXT_ONLY,
+        text='t',
+        lifetime_duration=pendulum.duration(hours=1),
+        now=(now - pendulum.duration(days=10)),
+    )
+    assert post_manager.dynamo.get_expired_sweep_from_date() is None
+
+    # further back than the lookback, and nothing recorded to sweep back to
+    post_manager.delete_older_expired_posts(lookback_days=6)
+    assert post_expired_long_ago.refresh_item().item
+
+    # as migration post_3_3 records it
+    sweep_from_date = (now - pendulum.duration(days=12)).date()
+    post_manager.dynamo.client.add_item(
+        {'Item': {**post_manager.dynamo.expired_sweep_pk(), 'sweepFromDate': str(sweep_from_date)}}
+    )
+    assert post_manager.dynamo.get_expired_sweep_from_date() == sweep_from_date
+
+    # the older days are swept once, then the recorded date is cleared
+    with caplog.at_level(logging.WARNING):
+        post_manager.delete_older_expired_posts(lookback_days=6)
+    assert len(caplog.records) == 1
+    assert post_expired_long_ago.id in caplog.records[0].msg
+    assert post_expired_long_ago.refresh_item().item is None
+    assert post_manager.dynamo.get_expired_sweep_from_date() is None
+
+
 def test_set_post_status_to_error(post_manager, user_manager, user):
     # create a COMPLETED post, verify cannot transition it to ERROR
     post = post_manager.add_post(user, 'pid1', PostType.TEXT_ONLY, text='t')
@@ -580,6 +708,54 @@ def test_record_views(post_manager, user, user2, posts, caplog):
     assert user2.refresh_item().item['lastPostFocusViewAt']
 
 
+def test_record_views_coalesces_last_post_view_at(post_manager, user_manager, user2, posts):
+    post1, _ = posts
+    viewed_at = pendulum.now('utc')
+    post_manager.record_views([post1.id], user2.id, viewed_at=viewed_at)
+    assert user2.refresh_item().item['lastPostViewAt'] == viewed_at.to_iso8601_string()
+
+    # within a request the caller is already loaded, and a recent lastPostViewAt isn't written again
+    with identity_map.scope():
+        user_manager.get_user(user2.id)
+        update_item = user_manager.dynamo.client.update_item
+        with patch.object(user_manager.dynamo.client, 'update_item', wraps=update_item) as update_item_mock:
+            post_manager.record_views([post1.id], user2.id, viewed_at=viewed_at.add(seconds=1))
+        updated_keys = [c.args[0]['Key'] for c in update_item_mock.call_args_list]
+        assert user_manager.dynamo.pk(user2.id) not in updated_keys
+        assert post_manager.view_dynamo.key(post1.id, user2.id) in updated_keys
+
+        post_manager.record_views([post1.id], user2.id, viewed_at=viewed_at.add(minutes=5))
+        assert (
+            user_manager.get_user(user2.id).item['lastPostViewAt'] == viewed_at.add(minutes=5).to_iso8601_string()
+        )
+    assert user2.refresh_item().item['lastPostViewAt'] == viewed_at.add(minutes=5).to_iso8601_string()
+
+
+def test_record_views_batches_reads_and_redirects_to_original(post_manager, user, user2, posts, caplog):
+    post1, post2 = posts
+    post3 = post_manager.add_post(user, 'pid3', PostType.IMAGE)
+    assert post3.status == PostStatus.PENDING
+    post_manager.dynamo.client.set_attributes(post_manager.dynamo.pk(post2.id), originalPostId=post1.id)
+    post_manager.record_views([post1.id], user2.id)
+
+    boto_client = post_manager.dynamo.client.table.meta.client
+    with patch.object(boto_client, 'batch_get_item', wraps=boto_client.batch_get_item) as batch_get_item_mock:
+        with patch.object(post_manager.view_dynamo, 'get_view') as get_view_mock:
+            with caplog.at_level(logging.WARNING):
+                post_manager.record_views([post2.id, post3.id, 'pid-dne', post2.id, post1.id], user2.id)
+
+    # the original post was also reported, so everything was read in a single round
+    assert len(batch_get_item_mock.mock_calls) == 1
+    assert get_view_mock.mock_calls == []
+    assert post_manager.view_dynamo.get_view(post1.id, user2.id)['viewCount'] == 4
+    assert post_manager.view_dynamo.get_view(post2.id, user2.id)['viewCount'] == 2
+    assert post_manager.view_dynamo.get_view(post3.id, user2.id) is None
+    assert sorted(rec.msg.split(' on ')[1].split(' post ')[0] for rec in caplog.records) == [
+        'DNE',
+        'non-COMPLETED',
+    ]
+
+
 def test_add_post_with_keywords_attribute(post_manager, user):
     # create a post behind the scenes
     post_id = 'pid'
@@ -617,3 +793,20 @@ def test_find_posts(post_manager, user):
         call.query_posts().__getitem__().__getitem__('hits'),
         call.query_posts().__getitem__().__getitem__().__iter__(),
     ]
+
+
+def test_find_posts_sorted_by_trending_score(post_manager, posts):
+    post1, post2 = posts
+    post2.trending_increment_score()
+    hits = [
+        {'_source': {'postId': post1.id}},
+        {'_source': {'postId': 'pid-dne'}},
+        {},
+        {'_source': {'postId': post2.id}},
+    ]
+    with patch.object(post_manager, 'elasticsearch_client') as elasticsearch_client_mock:
+        elasticsearch_client_mock.query_posts.return_value = {'hits': {'total': {'value': 5}, 'hits': hits}}
+        # the trending items are loaded in the same batch as the posts, not one by one
+        with patch.object(post_manager.trending_dynamo, 'get') as trending_get_mock:
+            assert post_manager.find_posts('bird', 4, 0) == {'nextToken': '4', 'items': [post2.id, post1.id]}
+        assert trending_get_mock.mock_calls == []
@@ -118,6 +118,52 @@ def test_refresh_item(post):
     assert new_post_item == post.item
 
 
+def test_cached_images_created_lazily(s3_uploads_client):
+    item = {'postedByUserId': 'uid', 'postId': 'pid', 'postType': PostType.IMAGE}
+    post = Post(item, s3_uploads_client=s3_uploads_client)
+    assert not any(name.endswith('_cache') for name in vars(post))
+
+    # created on first access, then the same one is always returned
+    cached_image = post.p480_jpeg_cache
+    assert cached_image.s3_client is s3_uploads_client
+    assert cached_image.s3_path == post.get_image_path(image_size.P480)
+    assert post.p480_jpeg_cache is cached_image
+    assert [name for name in vars(post) if name.endswith('_cache')] == ['p480_jpeg_cache']
+    assert post.native_heic_cache.image_size is image_size.NATIVE_HEIC
+
+    # without an s3 client, there are none
+    post = Post(item)
+    assert not hasattr(post, 'k4_jpeg_cache')
+    assert getattr(post, 'native_jpeg_cache', None) is None
+
+
+def test_cached_images_of_text_only_post(s3_uploads_client):
+    item = {'postedByUserId': 'uid', 'postId': 'pid', 'postType': PostType.TEXT_ONLY, 'text': 'lore ipsum'}
+    post = Post(item, s3_uploads_client=s3_uploads_client)
+    with mock.patch('app.models.post.model.get_or_generate_text_image') as get_or_generate_text_image:
+        assert post.k4_jpeg_cache.readonly_image is get_or_generate_text_image.return_value
+        assert get_or_generate_text_image.call_args.args == (
+            'lore ipsum',
+            image_size.K4.max_dimensions,
+            s3_uploads_client,
+        )
+        assert post.p1080_jpeg_cache.readonly_image is get_or_generate_text_image.return_value
+        assert get_or_generate_text_image.call_args.args == (
+            'lore ipsum',
+            image_size.P1080.max_dimensions,
+            s3_uploads_client,
+        )
+    for name in ('native_heic_cache', 'native_jpeg_cache', 'p480_jpeg_cache', 'p64_jpeg_cache'):
+        with pytest.raises(AttributeError, match=f"'Post' object has no attribute '{name}'"):
+            getattr(post, name)
+
+    # without an S3 client, the text is always rendered
+    post = Post(item)
+    with mock.patch('app.models.post.model.generate_text_image') as generate_text_image:
+        assert post.k4_jpeg_cache.readonly_image is generate_text_image.return_value
+        assert generate_text_image.call_args.args == ('lore ipsum', image_size.K4.max_dimensions)
+
+
 def test_get_original_video_path(post):
     user_id = post.item['postedByUserId']
     post_id = post.id
@@ -152,14 +198,14 @@ def test_get_image_readonly_url(cloudfront_client, s3_uploads_client):
         'postStatus': PostStatus.PENDING,
     }
     expected_url = {}
-    cloudfront_client.configure_mock(**{'generate_presigned_url.return_value': expected_url})
+    cloudfront_client.configure_mock(**{'generate_presigned_readonly_url.return_value': expected_url})
 
     post = Post(item, cloudfront_client=cloudfront_client, s3_uploads_client=s3_uploads_client)
     url = post.get_image_readonly_url(image_size.NATIVE)
     assert url == expected_url
 
     expected_path = f'user-id/post/post-id/image/{image_size.NATIVE.filename}'
-    assert cloudfront_client.mock_calls == [mock.call.generate_presigned_url(expected_path, ['GET', 'HEAD'])]
+    assert cloudfront_client.mock_calls == [mock.call.generate_presigned_readonly_url(expected_path)]
 
 
 def test_get_hls_access_cookies(cloudfront_client, s3_uploads_client):
@@ -215,6 +261,19 @@ def test_set_checksum(post):
     assert post.item['checksum'] == md5
 
 
+def test_set_checksum_of_native_image_already_read(pending_image_post, s3_uploads_client):
+    post = pending_image_post
+    path = post.get_image_path(image_size.NATIVE)
+    s3_uploads_client.put_object(path, open(grant_path, 'rb'), 'image/jpeg')
+    md5 = s3_uploads_client.get_object_checksum(path)
+
+    # once the image has been read, there's no need to ask S3 for the checksum
+    post.native_jpeg_cache.readonly_image
+    with mock.patch.object(s3_uploads_client, 'get_object_checksum', side_effect=Exception('Not called')):
+        post.set_checksum()
+    assert post.refresh_item().item['checksum'] == md5
+
+
 def test_set_is_verified_minimal(pending_image_post):
     # check initial state and configure mock
     post = pending_image_post
@@ -779,9 +838,10 @@ def test_set_colors(s3_uploads_client, pending_image_post):
     post = pending_image_post
     assert 'colors' not in post.image_item
 
-    # put an image in the bucket
+    # put an image in the bucket, the colors are taken from the 480p thumbnail
     s3_path = post.get_image_path(image_size.NATIVE)
     s3_uploads_client.put_object(s3_path, open(grant_path, 'rb'), 'image/jpeg')
+    post.build_image_thumbnails()
 
     post.set_colors()
     assert post.image_item['colors'] == grant_colors
@@ -85,7 +85,7 @@ def test_process_image_upload_success_jpeg(pending_post, s3_uploads_client, gran
 
     # check the mocks were called correctly
     assert post.native_jpeg_cache.flush.mock_calls == []
-    assert post.build_image_thumbnails.mock_calls == [mock.call()]
+    assert post.build_image_thumbnails.mock_calls == [mock.call(mock.ANY)]
     assert post.set_height_and_width.mock_calls == [mock.call()]
     assert post.set_colors.mock_calls == [mock.call()]
     assert post.set_is_verified.mock_calls == [mock.call()]
@@ -119,7 +119,9 @@ def test_process_image_upload_success_jpeg_with_crop(pending_post, s3_uploads_cl
 
     # check the mocks were called correctly
     assert post.native_jpeg_cache.flush.mock_calls == [mock.call()]
-    assert post.build_image_thumbnails.mock_calls == [mock.call()]
+    assert post.build_image_thumbnails.mock_calls == [mock.call(mock.ANY)]
+    # the thumbnails were built from a copy, not the cropped image that was flushed concurrently
+    assert post.build_image_thumbnails.call_args.args[0] is not post.native_jpeg_cache._image
     assert post.set_height_and_width.mock_calls == [mock.call()]
     assert post.set_colors.mock_calls == [mock.call()]
     assert post.set_is_verified.mock_calls == [mock.call()]
@@ -155,7 +157,7 @@ def test_process_image_upload_success_heic_with_crop(pending_post, s3_uploads_cl
 
     # check the mocks were called correctly
     assert post.native_jpeg_cache.flush.mock_calls == [mock.call()]
-    assert post.build_image_thumbnails.mock_calls == [mock.call()]
+    assert post.build_image_thumbnails.mock_calls == [mock.call(mock.ANY)]
     assert post.set_height_and_width.mock_calls == [mock.call()]
     assert post.set_colors.mock_calls == [mock.call()]
     assert post.set_is_verified.mock_calls == [mock.call()]
@@ -4,9 +4,21 @@ Tests for generating images from text.
 These tests aren't intended to ensure the output looks correct,
 they're more just intended to ensure the alogirthm doesn't crash.
 """
+
+from unittest import mock
+
+import PIL.Image
 import pytest
 
-from app.models.post.text_image import generate_text_image, rectangle_wrap
+from app.models.post import text_image
+from app.models.post.text_image import (
+    fit_text,
+    generate_text_image,
+    get_font,
+    get_or_generate_text_image,
+    get_render_cache_path,
+    rectangle_wrap,
+)
 
 dims_4k = (3840, 2160)
 dims_64p = (114, 64)
@@ -31,6 +43,65 @@ def test_genearate_text_image():
     assert generate_text_image(msg, dims_4k)
 
 
+def test_get_font():
+    assert get_font(20) is get_font(20)
+    assert get_font(20) is not get_font(21)
+    assert get_font(20).size == 20
+
+
+def test_fit_text():
+    # short text fits at the largest size
+    font_size, (text, text_width, _, _) = fit_text(['Fly', 'high'], dims_4k)
+    assert font_size == 216
+    assert text == 'Fly high'
+    assert text_width <= dims_4k[0] * 0.9
+
+    # long text is shrunk to fit
+    msg = ('And you, what did you have for lunch today? ' * 10).strip()
+    font_size, (_, text_width, _, _) = fit_text(msg.split(), dims_4k)
+    assert font_size < 216
+    assert text_width <= dims_4k[0] * 0.9
+
+    # text too long to fit at any size goes with the smallest
+    font_size, _ = fit_text(['supercalifragilisticexpialidocious'] * 50, (10, 10))
+    assert font_size == 1
+
+
+def test_get_render_cache_path():
+    path = get_render_cache_path('Fly high', dims_4k)
+    assert path.startswith('text-image/')
+    assert path.endswith('.png')
+    assert get_render_cache_path('Fly high', dims_4k) == path
+    assert get_render_cache_path('Fly high', dims_64p) != path
+    assert get_render_cache_path('Fly higher', dims_4k) != path
+
+
+def test_get_or_generate_text_image(s3_uploads_client):
+    path = get_render_cache_path('Fly high', dims_64p)
+    assert not s3_uploads_client.exists(path)
+
+    # first time it's rendered, and written to the cache
+    img = get_or_generate_text_image('Fly high', dims_64p, s3_uploads_client)
+    assert img.size == dims_64p
+    assert s3_uploads_client.exists(path)
+
+    # second time it's read from the cache
+    with mock.patch.object(text_image, 'generate_text_image') as generate:
+        cached_img = get_or_generate_text_image('Fly high', dims_64p, s3_uploads_client)
+    assert generate.call_count == 0
+    assert cached_img.tobytes() == img.tobytes()
+
+
+def test_get_or_generate_text_image_write_fails(s3_uploads_client, caplog):
+    with mock.patch.object(s3_uploads_client, 'put_object', side_effect=Exception('nope')):
+        with mock.patch.object(text_image, 'generate_text_image', return_value=PIL.Image.new('RGB', dims_64p)):
+            img = get_or_generate_text_image('Fly high', dims_64p, s3_uploads_client)
+    assert img.size == dims_64p
+    assert len(caplog.records) == 1
+    assert 'Unable to write rendered text image' in caplog.records[0].msg
+    assert not s3_uploads_client.exists(get_render_cache_path('Fly high', dims_64p))
+
+
 def test_rectangle_wrap():
     token_spacing = 2
     line_spacing = 2
@@ -1,5 +1,6 @@
 import logging
 from decimal import Decimal
+from unittest.mock import patch
 from uuid import uuid4
 
 import pendulum
@@ -39,6 +40,8 @@ def test_add_user_minimal(user_dynamo):
         'username': username,
         'privacyStatus': UserPrivacyStatus.PUBLIC,
         'signedUpAt': now.to_iso8601_string(),
+        'gsiK3PartitionKey': f'userSignedUp/{now.to_date_string()}',
+        'gsiK3SortKey': now.int_timestamp,
     }
 
 
@@ -74,6 +77,8 @@ def test_add_user_maximal(user_dynamo):
         'userStatus': UserStatus.ANONYMOUS,
         'privacyStatus': UserPrivacyStatus.PUBLIC,
         'signedUpAt': now.to_iso8601_string(),
+        'gsiK3PartitionKey': f'userSignedUp/{now.to_date_string()}',
+        'gsiK3SortKey': now.int_timestamp,
         'fullName': full_name,
         'email': email,
         'phoneNumber': phone,
@@ -114,6 +119,8 @@ def test_add_user_at_specific_time(user_dynamo):
         'username': username,
         'privacyStatus': UserPrivacyStatus.PUBLIC,
         'signedUpAt': now.to_iso8601_string(),
+        'gsiK3PartitionKey': f'userSignedUp/{now.to_date_string()}',
+        'gsiK3SortKey': now.int_timestamp,
     }
 
 
@@ -801,6 +808,33 @@ def test_update_last_post_view_at(user_dynamo, caplog, view_type):
         assert 'lastPostFocusViewAt' not in user_item
 
 
+@pytest.mark.parametrize('view_type', [None, ViewType.FOCUS])
+def test_update_last_post_view_at_coalesces_with_user_item(user_dynamo, view_type):
+    user_id = str(uuid4())
+    user_dynamo.add_user(user_id, str(uuid4())[:8])
+    now = pendulum.now('utc')
+    user_item = user_dynamo.update_last_post_view_at(user_id, now=now, view_type=view_type)
+
+    # within the window of the loaded item, no write
+    later = now + pendulum.duration(seconds=59)
+    with patch.object(user_dynamo.client, 'update_item') as update_item_mock:
+        assert user_dynamo.update_last_post_view_at(user_id, now=later, view_type=view_type, user_item=user_item)
+    assert update_item_mock.mock_calls == []
+    assert user_dynamo.get_user(user_id) == user_item
+
+    # without the loaded item, or outside the window, written
+    item = user_dynamo.update_last_post_view_at(user_id, now=later, view_type=view_type)
+    assert pendulum.parse(item['lastPostViewAt']) == later
+    later = later + pendulum.duration(seconds=60)
+    item = user_dynamo.update_last_post_view_at(user_id, now=later, view_type=view_type, user_item=item)
+    assert pendulum.parse(item['lastPostViewAt']) == later
+
+    # a focus view is written if only lastPostViewAt is within the window
+    if view_type is None:
+        item = user_dynamo.update_last_post_view_at(user_id, now=later, view_type=ViewType.FOCUS, user_item=item)
+        assert pendulum.parse(item['lastPostFocusViewAt']) == later
+
+
 def test_update_last_post_view_at_user_dne(user_dynamo, caplog):
     # verify setting it on a user that DNE fails softly
     user_id_2 = str(uuid4())
@@ -966,6 +1000,23 @@ def test_set_user_last_found_contacts_at(user_dynamo):
     assert current_time == resp['lastFoundContactsAt']
 
 
+def test_set_last_client_coalesces_with_user_item(user_dynamo):
+    user_id = str(uuid4())
+    user_dynamo.add_user(user_id, str(uuid4())[:8])
+    client = {'version': 'v2001'}
+    user_item = user_dynamo.set_last_client(user_id, client)
+
+    # unchanged in the loaded item, no write
+    with patch.object(user_dynamo.client, 'update_item') as update_item_mock:
+        assert user_dynamo.set_last_client(user_id, client, user_item=user_item) == user_item
+    assert update_item_mock.mock_calls == []
+
+    # changed, written
+    user_item = user_dynamo.set_last_client(user_id, {'version': 'v2002'}, user_item=user_item)
+    assert user_item['lastClient'] == {'version': 'v2002'}
+    assert user_dynamo.get_user(user_id) == user_item
+
+
 def test_set_last_disable_dating_date(user_dynamo):
     expired_at = (pendulum.now('utc') + pendulum.duration(days=30)).to_date_string()
     user_id = str(uuid4())
@@ -986,6 +1037,11 @@ def test_set_last_disable_dating_date(user_dynamo):
     assert item['gsiA3PartitionKey'] == 'userDisableDatingDate'
     assert item['gsiA3SortKey'] == expired_at
 
+    # already set to the same date in the loaded item, no write
+    with patch.object(user_dynamo.client, 'update_item') as update_item_mock:
+        assert user_dynamo.set_last_disable_dating_date(user_id, user_item=item) == item
+    assert update_item_mock.mock_calls == []
+
 
 def test_generate_user_ids_by_expired_dating(user_dynamo):
     # add a few users
@@ -1113,6 +1169,17 @@ def test_generate_dating_enabled_user_ids(user_dynamo):
     assert list(user_dynamo.generate_dating_enabled_user_ids()) == [user1_id, user2_id]
 
 
+def test_generate_user_ids_by_signed_up_date(user_dynamo):
+    now = pendulum.parse('2020-06-08T12:00:00Z')
+    user_dynamo.add_user('uid1', 'uname1', now=now)
+    user_dynamo.add_user('uid2', 'uname2', now=now + pendulum.duration(hours=11, minutes=59))
+    user_dynamo.add_user('uid3', 'uname3', now=now + pendulum.duration(hours=12))
+
+    assert list(user_dynamo.generate_user_ids_by_signed_up_date('2020-06-07')) == []
+    assert list(user_dynamo.generate_user_ids_by_signed_up_date('2020-06-08')) == ['uid1', 'uid2']
+    assert list(user_dynamo.generate_user_ids_by_signed_up_date('2020-06-09')) == ['uid3']
+
+
 def test_increment_paid_real_so_far(user_dynamo):
     user_id = str(uuid4())
     user_dynamo.add_user(user_id, str(uuid4())[:8])
@@ -8,7 +8,7 @@ import pytest
 
 from app.models.follower.enums import FollowStatus
 from app.models.user.enums import UserDatingStatus, UserGender
-from app.utils import GqlNotificationType
+from app.utils import GqlNotificationType, identity_map
 
 
 @pytest.fixture
@@ -54,6 +54,21 @@ def test_get_user_that_doesnt_exist(user_manager):
     assert resp is None
 
 
+def test_get_user_within_identity_map_scope(user_manager, user1):
+    with identity_map.scope():
+        user = user_manager.get_user(user1.id)
+        assert user.id == user1.id
+        assert user_manager.get_user(user1.id) is user
+        assert identity_map.get_stats() == {'hits': 1, 'misses': 1, 'size': 1}
+
+        # writes through the cached instance are seen by later reads
+        user.update_details(full_name='fn')
+        assert user_manager.get_user(user1.id).item['fullName'] == 'fn'
+
+        user.delete()
+        assert user_manager.get_user(user1.id) is None
+
+
 def test_get_user_by_username(user_manager, user1):
     # check a user that doesn't exist
     user = user_manager.get_user_by_username('nope_not_there')
@@ -775,7 +775,7 @@ def test_get_apns_token(user):
     assert pc_mock.mock_calls == [call.get_user_endpoints(user.id, 'APNS')]
 
 
-def test_set_last_client(user):
+def test_set_last_client(user, dynamo_client):
     assert 'lastClient' not in user.refresh_item().item
     user.dynamo = Mock(wraps=user.dynamo)
 
@@ -802,9 +802,9 @@ def test_set_last_client(user):
     assert user.item['lastClient'] == client_2
 
     # verify setting it to the same value does no writes to dynamo
-    with patch.object(user, 'dynamo', Mock(wraps=user.dynamo)) as dynamo_mock:
+    with patch.object(dynamo_client, 'update_item') as update_item_mock:
         user.set_last_client(client_2)
-    assert dynamo_mock.mock_calls == []
+    assert update_item_mock.mock_calls == []
     assert user.item['lastClient'] == client_2
 
 
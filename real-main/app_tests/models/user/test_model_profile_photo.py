@@ -98,14 +98,14 @@ def test_get_photo_url(user, uploaded_post, cloudfront_client):
     assert user.item['photoPostId'] == uploaded_post.id
 
     presigned_url = {}
-    cloudfront_client.configure_mock(**{'generate_presigned_url.return_value': presigned_url})
+    cloudfront_client.configure_mock(**{'generate_presigned_readonly_url.return_value': presigned_url})
     cloudfront_client.reset_mock()
 
     for size in image_size.JPEGS:
         url = user.get_photo_url(size)
         assert url is presigned_url
         path = user.get_photo_path(size)
-        assert cloudfront_client.mock_calls == [mock.call.generate_presigned_url(path, ['GET', 'HEAD'])]
+        assert cloudfront_client.mock_calls == [mock.call.generate_presigned_readonly_url(path)]
         cloudfront_client.reset_mock()
 
 
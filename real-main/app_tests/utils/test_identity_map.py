@@ -0,0 +1,127 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+import pytest
+
+from app.utils import IdentityMap
+
+
+def test_no_scope_passes_through():
+    identity_map = IdentityMap()
+    loader = Mock(side_effect=[1, 2])
+    assert identity_map.get(('item', 'id1'), loader) == 1
+    assert identity_map.get(('item', 'id1'), loader) == 2
+    assert identity_map.get_stats() == {'hits': 0, 'misses': 0, 'size': 0}
+
+
+def test_scope_caches_and_counts():
+    identity_map = IdentityMap()
+    loader = Mock(side_effect=[1, None, 3])
+    with identity_map.scope():
+        assert identity_map.get(('item', 'id1'), loader) == 1
+        assert identity_map.get(('item', 'id1'), loader) == 1
+        assert identity_map.get(('item', 'id2'), loader) is None
+        assert identity_map.get(('item', 'id2'), loader) is None
+        assert identity_map.get_stats() == {'hits': 2, 'misses': 2, 'size': 2}
+
+        # refresh always loads, and remembers the new value
+        assert identity_map.get(('item', 'id1'), loader, refresh=True) == 3
+        assert identity_map.get(('item', 'id1'), loader) == 3
+        assert loader.call_count == 3
+
+    # cleared at the end of the scope, but stats remain readable
+    assert identity_map.items == {}
+    assert identity_map.get_stats() == {'hits': 3, 'misses': 3, 'size': 0}
+
+
+def test_new_scope_resets():
+    identity_map = IdentityMap()
+    with identity_map.scope():
+        identity_map.get(('item', 'id1'), lambda: 1)
+        identity_map.get(('item', 'id1'), lambda: 1)
+    with identity_map.scope():
+        assert identity_map.get_stats() == {'hits': 0, 'misses': 0, 'size': 0}
+        assert identity_map.get(('item', 'id1'), lambda: 2) == 2
+
+
+def test_invalidate():
+    identity_map = IdentityMap()
+    with identity_map.scope():
+        identity_map.get(('item', 'id1'), lambda: 1)
+        identity_map.get(('item', 'id2'), lambda: 2)
+        identity_map.get(('other', 'id1'), lambda: 3)
+
+        identity_map.invalidate(('item', 'id1'))
+        identity_map.invalidate(('item', 'id3'))
+        assert identity_map.get(('item', 'id1'), lambda: 4) == 4
+
+        identity_map.invalidate_type('item')
+        assert identity_map.get(('item', 'id1'), lambda: 5) == 5
+        assert identity_map.get(('item', 'id2'), lambda: 6) == 6
+        assert identity_map.get(('other', 'id1'), lambda: 7) == 3
+
+
+def test_loads_of_different_keys_run_concurrently():
+    identity_map = IdentityMap()
+    barrier = threading.Barrier(2, timeout=5)
+
+    def loader():
+        # both loads must be in progress at the same time to get past the barrier
+        barrier.wait()
+        return 'value'
+
+    with identity_map.scope():
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(identity_map.get, ('item', f'id{i}'), loader) for i in range(2)]
+        assert [future.result() for future in futures] == ['value', 'value']
+        assert identity_map.get_stats() == {'hits': 0, 'misses': 2, 'size': 2}
+
+
+def test_concurrent_lookups_of_a_key_share_one_load():
+    identity_map = IdentityMap()
+    loading = threading.Event()
+    release = threading.Event()
+
+    def load():
+        loading.set()
+        release.wait(5)
+        return 'value'
+
+    loader = Mock(side_effect=load)
+
+    with identity_map.scope():
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            first = executor.submit(identity_map.get, ('item', 'id1'), loader)
+            loading.wait(5)
+            others = [executor.submit(identity_map.get, ('item', 'id1'), loader) for _ in range(2)]
+            release.set()
+        assert [f.result() for f in [first, *others]] == ['value'] * 3
+        assert loader.call_count == 1
+
+
+def test_invalidate_during_load_drops_the_loaded_value():
+    identity_map = IdentityMap()
+    with identity_map.scope():
+
+        def loader():
+            identity_map.invalidate(('item', 'id1'))
+            return 1
+
+        assert identity_map.get(('item', 'id1'), loader) == 1
+        assert identity_map.get(('item', 'id1'), lambda: 2) == 2
+
+
+def test_failed_load_is_not_mapped():
+    identity_map = IdentityMap()
+    with identity_map.scope():
+        with pytest.raises(Exception, match='broke'):
+            identity_map.get(('item', 'id1'), Mock(side_effect=Exception('broke')))
+        assert identity_map.get(('item', 'id1'), lambda: 1) == 1
+
+
+def test_invalidate_outside_scope():
+    identity_map = IdentityMap()
+    identity_map.invalidate(('item', 'id1'))
+    identity_map.invalidate_type('item')
+    assert identity_map.get(('item', 'id1'), lambda: 1) == 1
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+Benchmark bad words detection over a large number of texts, with the bad words list served from moto.
+
+For comparison, also runs a sample of the texts through the previous approach
+of downloading and parsing the list for every text checked.
+"""
+
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+import moto
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+from app.clients import BadWordsClient  # noqa E402
+
+BUCKET_NAME = 'bad-words-bucket'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark bad words detection")
+    parser.add_argument('-f', dest='bad_words_path', help='path to a bad_words.json, default is a synthetic list')
+    parser.add_argument('-n', dest='text_count', type=int, default=100000, help='number of texts to scan')
+    parser.add_argument(
+        '-l',
+        dest='legacy_count',
+        type=int,
+        default=200,
+        help='number of texts to scan with the previous approach',
+    )
+    args = parser.parse_args()
+    return args.bad_words_path, args.text_count, args.legacy_count
+
+
+def random_word():
+    return ''.join(random.choices(string.ascii_lowercase, k=random.randint(2, 10)))
+
+
+def generate_texts(count, vocabulary):
+    punctuation = ['', '', '', ',', '.', '!', '?', '...']
+    for _ in range(count):
+        words = random.choices(vocabulary, k=random.randint(1, 40))
+        yield ' '.join(word + random.choice(punctuation) for word in words)
+
+
+def legacy_validate_bad_words_detection(s3_client, file_name, text):
+    "The approach used prior to the bad words list being cached"
+    data = json.loads(s3_client.get_object_data_stream(file_name).read().decode())
+    bad_words = {word.lower(): '' for word in data.keys()}
+    return any(bad_words.get(word.lower(), None) == '' for word in text.split(' '))
+
+
+def main():
+    bad_words_path, text_count, legacy_count = parse_args()
+    random.seed(42)
+
+    if bad_words_path:
+        with open(bad_words_path) as fh:
+            bad_words = json.load(fh)
+    else:
+        bad_words = {random_word(): '' for _ in range(2000)}
+        bad_words.update({f'{random_word()} {random_word()}': '' for _ in range(200)})
+    vocabulary = [random_word() for _ in range(20000)] + random.sample(list(bad_words.keys()), 20)
+    texts = list(generate_texts(text_count, vocabulary))
+
+    with moto.mock_s3():
+        client = BadWordsClient(bucket_name=BUCKET_NAME)
+        client.s3_bad_words.s3.create_bucket(Bucket=BUCKET_NAME)
+        client.s3_bad_words.put_object(client.file_name, json.dumps(bad_words).encode(), 'application/json')
+
+        start = time.perf_counter()
+        client.get_index()
+        elapsed = time.perf_counter() - start
+        print(f'Loaded and indexed {len(bad_words)} bad words and phrases in {elapsed * 1000:.1f}ms')
+
+        start = time.perf_counter()
+        matched = sum(1 for text in texts if client.validate_bad_words_detection(text))
+        elapsed = time.perf_counter() - start
+        print(f'Cached index: scanned {len(texts)} texts in {elapsed:.2f}s, {len(texts) / elapsed:.0f} texts/sec')
+        print(f'Cached index: {matched} texts matched')
+
+        if legacy_count:
+            sample = texts[:legacy_count]
+            start = time.perf_counter()
+            for text in sample:
+                legacy_validate_bad_words_detection(client.s3_bad_words, client.file_name, text)
+            elapsed = time.perf_counter() - start
+            rate = len(sample) / elapsed
+            print(f'Previous approach: scanned {len(sample)} texts in {elapsed:.2f}s, {rate:.0f} texts/sec')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Benchmark signing the read-only urls of image url sets, as resolved by Post.image & co.
+
+Compares one canned-policy signature per url (the previous approach) against one
+custom-policy signature per directory, with and without the signature cache warm.
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import Encoding, NoEncryption, PrivateFormat
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+from app.clients import CloudFrontClient  # noqa E402
+from app.utils import image_size  # noqa E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark signing cloudfront read-only urls")
+    parser.add_argument('-n', dest='set_count', type=int, default=500, help='number of image url sets to sign')
+    args = parser.parse_args()
+    return args.set_count
+
+
+def generate_key_pair():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+    pem = private_key.private_bytes(Encoding.PEM, PrivateFormat.TraditionalOpenSSL, NoEncryption()).decode()
+    # stored in the secrets manager without header, footer or newlines
+    return {'keyId': 'APKABENCHMARK', 'privateKey': ''.join(pem.splitlines()[1:-1])}
+
+
+def run(label, directories, sign_url):
+    start = time.perf_counter()
+    for directory in directories:
+        for size in image_size.JPEGS:
+            sign_url(f'{directory}/{size.filename}')
+    elapsed = time.perf_counter() - start
+    url_count = len(directories) * len(image_size.JPEGS)
+    print(f'{label}: signed {url_count} urls in {elapsed:.2f}s, {url_count / elapsed:.0f} urls/sec')
+
+
+def main():
+    set_count = parse_args()
+    key_pair = generate_key_pair()
+    client = CloudFrontClient(lambda: key_pair, domain='benchmark.cloudfront.net')
+    client.get_cloudfront_signer()  # load the key outside of the timings
+
+    def canned(path):
+        return client.generate_presigned_url(path, ['GET', 'HEAD'])
+
+    directories = [f'{uuid.uuid4()}/post/{uuid.uuid4()}/image' for _ in range(set_count)]
+    run('Canned policy per url', directories, canned)
+    run('Custom policy per directory', directories, client.generate_presigned_readonly_url)
+    # the same image url sets resolved again within the expiry bucket
+    run('Custom policy per directory, cache warm', directories, client.generate_presigned_readonly_url)
+    print(f'Signature cache: {client.sign_readonly_directory.cache_info()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+Benchmark the cold start of each lambda handler module against moto.
+
+For each handler, in a fresh process: the time to import the handler module, then the time of its
+first invocation with a small event, and how many boto3 clients were constructed during each. The
+tables and buckets the handlers use are created before the import starts, and aren't counted.
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+
+import boto3
+import moto
+import pendulum
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+
+ENVIRONMENT = {
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_XRAY_SDK_ENABLED': 'false',
+    'DYNAMO_TABLE': 'main-table',
+    'DYNAMO_FEED_TABLE': 'feed-table',
+    'S3_UPLOADS_BUCKET': 'uploads-bucket',
+    'S3_PLACEHOLDER_PHOTOS_BUCKET': 'placeholder-photos-bucket',
+    'S3_BAD_WORDS_BUCKET': 'bad-words-bucket',
+    'MEDIACONVERT_ROLE_ARN': 'arn:aws:iam::123456789012:role/dummy',
+    'APPSYNC_GRAPHQL_URL': 'https://dummy.appsync-api.us-east-1.amazonaws.com/graphql',
+    'CLOUDFRONT_UPLOADS_DOMAIN': 'dummy.cloudfront.net',
+    'COGNITO_USER_POOL_ID': 'dummy',
+    'COGNITO_USER_POOL_BACKEND_CLIENT_ID': 'dummy',
+    'ELASTICSEARCH_DOMAIN': 'dummy.es.amazonaws.com',
+    'PINPOINT_APPLICATION_ID': 'dummy',
+}
+
+
+def appsync_event():
+    "A mutation by a caller that doesn't exist, so it's rejected after the caller is looked up"
+    return {
+        'info': {'parentTypeName': 'Mutation', 'fieldName': 'reportScreenViews'},
+        'arguments': {'screens': ['home']},
+        'identity': {'cognitoIdentityId': str(uuid.uuid4())},
+        'request': {'headers': {}},
+    }
+
+
+def dynamo_event():
+    "A view of a post that doesn't exist"
+    from boto3.dynamodb.types import TypeSerializer
+
+    serialize = TypeSerializer().serialize
+    now_str = pendulum.now('utc').to_iso8601_string()
+    item = {
+        'partitionKey': f'post/{uuid.uuid4()}',
+        'sortKey': f'view/{uuid.uuid4()}',
+        'viewCount': 1,
+        'firstViewedAt': now_str,
+        'lastViewedAt': now_str,
+    }
+    return {
+        'Records': [
+            {
+                'eventName': 'INSERT',
+                'dynamodb': {
+                    'Keys': {k: serialize(item[k]) for k in ('partitionKey', 'sortKey')},
+                    'NewImage': {k: serialize(v) for k, v in item.items()},
+                    'SequenceNumber': '1',
+                },
+            }
+        ]
+    }
+
+
+def s3_event():
+    "An upload of the image of a post that doesn't exist"
+    key = f'{uuid.uuid4()}/post/{uuid.uuid4()}/image/native.jpg'
+    return {'Records': [{'s3': {'object': {'key': key}}}]}
+
+
+# handler module, handler function name, event builder
+HANDLERS = {
+    'api': ('app.handlers.api', 'handle_appstore_server_notification', lambda: {}),
+    'appsync': ('app.handlers.appsync.dispatch', 'dispatch', appsync_event),
+    'cognito': ('app.handlers.cognito', 'pre_sign_up', None),
+    'cron': ('app.handlers.cron', 'deflate_trending_users', lambda: {}),
+    'dynamo': ('app.handlers.dynamo.handlers', 'process_records', dynamo_event),
+    's3': ('app.handlers.s3', 'image_post_uploaded', s3_event),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the cold start of the lambda handlers")
+    parser.add_argument(
+        'handlers', nargs='*', choices=[[], *HANDLERS], help='handlers to benchmark. Default: all of them'
+    )
+    parser.add_argument('-r', dest='runs', type=int, default=3, help='runs per handler, the best is reported')
+    args = parser.parse_args()
+    return args.handlers or list(HANDLERS), args.runs
+
+
+def run(handler_name):
+    "Run in a fresh process, returns ((import seconds, clients), (first invoke seconds, clients))"
+    import importlib
+    import logging
+
+    os.environ.update(ENVIRONMENT)
+    logging.disable(logging.WARNING)
+    module_name, func_name, build_event = HANDLERS[handler_name]
+
+    with moto.mock_dynamodb2(), moto.mock_s3():
+        from app_tests.dynamodb.table_schema import feed_table_schema, main_table_schema
+
+        boto3.setup_default_session()
+        dynamodb = boto3.resource('dynamodb')
+        dynamodb.create_table(TableName=ENVIRONMENT['DYNAMO_TABLE'], **main_table_schema)
+        dynamodb.create_table(TableName=ENVIRONMENT['DYNAMO_FEED_TABLE'], **feed_table_schema)
+        boto3.resource('s3').create_bucket(Bucket=ENVIRONMENT['S3_UPLOADS_BUCKET'])
+
+        client_count = 0
+
+        def count_client(**kwargs):
+            nonlocal client_count
+            client_count += 1
+
+        boto3.DEFAULT_SESSION.events.register('creating-client-class', count_client)
+
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        imported = (time.perf_counter() - start, client_count)
+
+        if build_event is None:
+            return imported, None
+        event, client_count = build_event(), 0
+        start = time.perf_counter()
+        try:
+            getattr(module, func_name)(event, None)
+        except Exception:
+            pass  # the events are made up, some handlers are expected to reject them
+        return imported, (time.perf_counter() - start, client_count)
+
+
+def main():
+    handler_names, run_count = parse_args()
+    ctx = multiprocessing.get_context('spawn')
+    print(f'Cold start, best of {run_count} runs:')
+    for handler_name in handler_names:
+        results = []
+        for _ in range(run_count):
+            with ctx.Pool(1) as pool:
+                results.append(pool.apply(run, (handler_name,)))
+        (import_seconds, import_clients), invoked = min(results, key=lambda r: r[0][0] + (r[1] or (0,))[0])
+        line = f'  {handler_name}: import {import_seconds * 1000:.0f}ms ({import_clients} boto3 clients)'
+        if invoked:
+            line += f', first invoke {invoked[0] * 1000:.0f}ms ({invoked[1]} boto3 clients)'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""
+Replay a batch of dynamo stream records through the dynamo stream handler against moto and report throughput.
+
+The batch is either a recorded lambda event (ex: captured from CloudWatch) or a synthetic batch.
+All new images in the batch are written to the mocked table before the replay starts, so that
+listeners find the items they expect. Clients for external services are mocked out.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from unittest import mock
+
+import boto3
+import moto
+import pendulum
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+
+ENVIRONMENT = {
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_XRAY_SDK_ENABLED': 'false',
+    'DYNAMO_TABLE': 'main-table',
+    'DYNAMO_FEED_TABLE': 'feed-table',
+    'S3_UPLOADS_BUCKET': 'uploads-bucket',
+    'COGNITO_USER_POOL_ID': 'dummy',
+    'COGNITO_USER_POOL_BACKEND_CLIENT_ID': 'dummy',
+    'ELASTICSEARCH_DOMAIN': 'dummy.es.amazonaws.com',
+}
+MOCKED_CLIENTS = (
+    'AmplitudeClient',
+    'AppStoreClient',
+    'AppSyncClient',
+    'BadWordsClient',
+    'CognitoClient',
+    'ElasticSearchClient',
+    'PinpointClient',
+    'RealDatingClient',
+)
+
+serialize = TypeSerializer().serialize
+deserialize = TypeDeserializer().deserialize
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark dynamo stream record processing against moto")
+    parser.add_argument('-e', dest='event_path', help='path to a recorded lambda event json with `Records`')
+    parser.add_argument('-u', dest='users', type=int, default=50, help='users in the synthetic batch')
+    parser.add_argument(
+        '-w', dest='workers', type=int, action='append', help='max workers, may be repeated. Default: 1 and 8'
+    )
+    parser.add_argument(
+        '-l', dest='latency_ms', type=float, default=0, help='simulated network latency per aws api call'
+    )
+    args = parser.parse_args()
+    return args.event_path, args.users, args.workers or [1, 8], args.latency_ms
+
+
+def build_record(seq_num, event_name, old_item=None, new_item=None):
+    item = new_item or old_item
+    record = {
+        'eventName': event_name,
+        'dynamodb': {
+            'Keys': {k: serialize(item[k]) for k in ('partitionKey', 'sortKey')},
+            'SequenceNumber': str(seq_num),
+        },
+    }
+    if old_item:
+        record['dynamodb']['OldImage'] = {k: serialize(v) for k, v in old_item.items()}
+    if new_item:
+        record['dynamodb']['NewImage'] = {k: serialize(v) for k, v in new_item.items()}
+    return record
+
+
+def generate_synthetic_records(user_count):
+    "Per user: a profile insert, a profile modify, a post going from pending to completed, and views of it"
+    now_str = pendulum.now('utc').to_iso8601_string()
+    user_ids = [str(uuid.uuid4()) for _ in range(user_count)]
+    records = []
+    for idx, user_id in enumerate(user_ids):
+        user_item = {
+            'partitionKey': f'user/{user_id}',
+            'sortKey': 'profile',
+            'userId': user_id,
+            'username': f'user{idx}',
+            'userStatus': 'ACTIVE',
+            'privacyStatus': 'PUBLIC',
+            'signedUpAt': now_str,
+        }
+        records.append(build_record(len(records), 'INSERT', new_item=user_item))
+        records.append(
+            build_record(len(records), 'MODIFY', old_item=user_item, new_item={**user_item, 'fullName': 'Bob'})
+        )
+
+        post_id = str(uuid.uuid4())
+        post_item = {
+            'partitionKey': f'post/{post_id}',
+            'sortKey': '-',
+            'postId': post_id,
+            'postedByUserId': user_id,
+            'postedAt': now_str,
+            'postType': 'TEXT_ONLY',
+            'postStatus': 'PENDING',
+            'text': 'lore ipsum',
+        }
+        records.append(build_record(len(records), 'INSERT', new_item=post_item))
+        completed_post_item = {**post_item, 'postStatus': 'COMPLETED'}
+        records.append(build_record(len(records), 'MODIFY', old_item=post_item, new_item=completed_post_item))
+
+        for viewer_id in user_ids[max(0, idx - 3) : idx]:
+            view_item = {
+                'partitionKey': f'post/{post_id}',
+                'sortKey': f'view/{viewer_id}',
+                'viewCount': 1,
+                'firstViewedAt': now_str,
+                'lastViewedAt': now_str,
+            }
+            records.append(build_record(len(records), 'INSERT', new_item=view_item))
+    return records
+
+
+def main():
+    event_path, user_count, workers, latency_ms = parse_args()
+    os.environ.update(ENVIRONMENT)
+    # the handlers log every record processed at INFO level
+    logging.disable(logging.INFO)
+
+    mocks = [
+        moto.mock_dynamodb2(),
+        moto.mock_s3(),
+        *(mock.patch(f'app.clients.{name}') for name in MOCKED_CLIENTS),
+    ]
+    for m in mocks:
+        m.start()
+
+    from app_tests.dynamodb.table_schema import feed_table_schema, main_table_schema  # noqa E402
+
+    boto3.setup_default_session()
+    if latency_ms:
+        boto3.DEFAULT_SESSION.events.register('before-send', lambda **kwargs: time.sleep(latency_ms / 1000))
+    dynamodb = boto3.resource('dynamodb')
+    table = dynamodb.create_table(TableName=ENVIRONMENT['DYNAMO_TABLE'], **main_table_schema)
+    dynamodb.create_table(TableName=ENVIRONMENT['DYNAMO_FEED_TABLE'], **feed_table_schema)
+    boto3.resource('s3').create_bucket(Bucket=ENVIRONMENT['S3_UPLOADS_BUCKET'])
+
+    from app.handlers.dynamo import handlers  # noqa E402
+    from app.handlers.dynamo.processor import DynamoStreamProcessor  # noqa E402
+
+    if event_path:
+        with open(event_path) as fh:
+            records = json.load(fh)['Records']
+    else:
+        records = generate_synthetic_records(user_count)
+
+    with table.batch_writer(overwrite_by_pkeys=['partitionKey', 'sortKey']) as batch:
+        for record in records:
+            if 'NewImage' in record['dynamodb']:
+                batch.put_item(Item={k: deserialize(v) for k, v in record['dynamodb']['NewImage'].items()})
+
+    partition_keys = set(deserialize(r['dynamodb']['Keys']['partitionKey']) for r in records)
+    print(f'Replaying {len(records)} records over {len(partition_keys)} partition keys')
+    for max_workers in workers:
+        processor = DynamoStreamProcessor(handlers.dispatch, max_workers=max_workers)
+        start = time.perf_counter()
+        failed = processor.process(records)
+        elapsed = time.perf_counter() - start
+        print(
+            f'max_workers={max_workers}: {elapsed:.2f}s, {len(records) / elapsed:.1f} records/sec, '
+            f'{len(failed)} records failed'
+        )
+
+    for m in mocks:
+        m.stop()
+
+
+if __name__ == '__main__':
+    main()
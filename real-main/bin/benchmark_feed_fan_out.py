@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Benchmark adding a post to the feeds of a user with many followers, against moto.
+
+Compares the feed fan-out with the previous approach of materializing all follower
+user ids and writing them through a single batch writer.
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import sys
+import time
+import uuid
+
+import moto
+import pendulum
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+from app.clients import DynamoClient  # noqa E402
+from app.models.feed.dynamo import FeedDynamo  # noqa E402
+from app.models.feed.fan_out import FeedFanOut  # noqa E402
+from app.models.follower.dynamo.base import FollowerDynamo  # noqa E402
+from app_tests.dynamodb.table_schema import feed_table_schema, main_table_schema  # noqa E402
+
+ENVIRONMENT = {
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the feed fan-out against moto")
+    parser.add_argument('-f', dest='followers', type=int, default=100000, help='number of followers')
+    parser.add_argument(
+        '-w', dest='workers', type=int, action='append', help='max workers, may be repeated. Default: 1 and 8'
+    )
+    parser.add_argument(
+        '-l', dest='latency_ms', type=float, default=0, help='simulated network latency per aws api call'
+    )
+    parser.add_argument('--skip-previous', action='store_true', help='do not benchmark the previous approach')
+    args = parser.parse_args()
+    return args.followers, args.workers or [1, 8], args.latency_ms, args.skip_previous
+
+
+def add_followers(dynamo_client, followed_user_id, count):
+    followed_at = pendulum.now('utc').to_iso8601_string()
+    items = (
+        {
+            'partitionKey': f'user/{followed_user_id}',
+            'sortKey': f'follower/{follower_user_id}',
+            'schemaVersion': 1,
+            'gsiA1PartitionKey': f'follower/{follower_user_id}',
+            'gsiA1SortKey': f'FOLLOWING/{followed_at}',
+            'gsiA2PartitionKey': f'followed/{followed_user_id}',
+            'gsiA2SortKey': f'FOLLOWING/{followed_at}',
+            'followedAt': followed_at,
+            'followStatus': 'FOLLOWING',
+            'followerUserId': follower_user_id,
+            'followedUserId': followed_user_id,
+        }
+        for follower_user_id in (str(uuid.uuid4()) for _ in range(count))
+    )
+    dynamo_client.batch_put_items(items)
+
+
+def post_item(user_id):
+    return {
+        'postId': str(uuid.uuid4()),
+        'postedByUserId': user_id,
+        'postedAt': pendulum.now('utc').to_iso8601_string(),
+    }
+
+
+def previous_add_post_to_followers_feeds(feed_client, follower_dynamo, followed_user_id, post_item):
+    "The approach used prior to the feed fan-out"
+    follower_items = follower_dynamo.generate_follower_items(followed_user_id)
+    feed_user_ids = list(itertools.chain([followed_user_id], (item['followerUserId'] for item in follower_items)))
+    feed_dynamo = FeedDynamo(feed_client)
+    feed_client.batch_put_items(feed_dynamo.item(feed_user_id, post_item) for feed_user_id in feed_user_ids)
+    return feed_user_ids
+
+
+def report(label, count, elapsed):
+    print(f'{label}: {count} feed items in {elapsed:.2f}s, {count / elapsed:.0f} items/sec')
+
+
+def main():
+    follower_count, workers, latency_ms, skip_previous = parse_args()
+    os.environ.update(ENVIRONMENT)
+    logging.disable(logging.INFO)
+
+    with moto.mock_dynamodb2():
+        dynamo_client = DynamoClient(table_name='main-table', create_table_schema=main_table_schema)
+        feed_client = DynamoClient(table_name='feed-table', create_table_schema=feed_table_schema)
+        follower_dynamo = FollowerDynamo(dynamo_client)
+        feed_dynamo = FeedDynamo(feed_client)
+
+        user_id = str(uuid.uuid4())
+        start = time.perf_counter()
+        add_followers(dynamo_client, user_id, follower_count)
+        print(f'Added {follower_count} followers in {time.perf_counter() - start:.2f}s')
+
+        if latency_ms:
+            for client in (dynamo_client, feed_client):
+                client.table.meta.client.meta.events.register(
+                    'before-send', lambda **kwargs: time.sleep(latency_ms / 1000)
+                )
+
+        if not skip_previous:
+            start = time.perf_counter()
+            cnt = len(
+                previous_add_post_to_followers_feeds(feed_client, follower_dynamo, user_id, post_item(user_id))
+            )
+            report('Previous approach', cnt, time.perf_counter() - start)
+
+        for max_workers in workers:
+            fan_out = FeedFanOut(feed_dynamo, follower_dynamo, dynamo_client, max_workers=max_workers)
+            start = time.perf_counter()
+            cnt = len(fan_out.run(user_id, post_item(user_id)))
+            report(f'Fan-out max_workers={max_workers}', cnt, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""
+Benchmark processing an uploaded image, with S3 served from moto.
+
+Runs the stages of Post.process_image_upload that touch the image - decode, thumbnail, upload,
+height & width, colors and checksum - with both the previous approach (full decode, full-size
+copy, palette of the native image, serial uploads, checksum from S3) and the current pipeline.
+Each run is in a fresh process so its peak RSS can be reported.
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import moto
+import PIL.Image
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+from app.clients import S3Client  # noqa E402
+from app.models.post.cached_image import CachedImage  # noqa E402
+from app.models.post.model import ColorThiefFromImage  # noqa E402
+from app.utils import image_size  # noqa E402
+
+ENVIRONMENT = {
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+}
+BUCKET_NAME = 'uploads-bucket'
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(SCRIPT_PATH)), 'app_tests', 'fixtures')
+DEFAULT_PATHS = [os.path.join(FIXTURES_DIR, 'IMG_0265.HEIC'), os.path.join(FIXTURES_DIR, 'big-blank.jpg')]
+THUMBNAIL_SIZES = (image_size.K4, image_size.P1080, image_size.P480, image_size.P64)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark processing an uploaded image")
+    parser.add_argument(
+        '-f',
+        dest='paths',
+        action='append',
+        help='path to a .jpg or .heic image, may be repeated. Default: fixtures',
+    )
+    parser.add_argument(
+        '-s',
+        dest='synthetic_mp',
+        type=int,
+        default=48,
+        help='megapixels of a synthetic jpeg to also benchmark, 0 to skip',
+    )
+    parser.add_argument(
+        '-l', dest='latency_ms', type=float, default=50, help='simulated network latency per S3 api call'
+    )
+    args = parser.parse_args()
+    return args.paths or DEFAULT_PATHS, args.synthetic_mp, args.latency_ms
+
+
+def write_synthetic_jpeg(megapixels, path):
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    gradient = PIL.Image.linear_gradient('L').resize((width, height))
+    noise = PIL.Image.effect_noise((width, height), 40)
+    image = PIL.Image.merge('RGB', (gradient, noise, gradient.transpose(PIL.Image.FLIP_LEFT_RIGHT)))
+    image.save(path, format='JPEG', quality=90)
+    return path
+
+
+def new_cache(s3_client, size):
+    return CachedImage('pid', image_size=size, s3_client=s3_client, s3_path=f'uid/post/pid/image/{size.filename}')
+
+
+def get_palette(image):
+    try:
+        ColorThiefFromImage(image).get_palette(color_count=5)
+    except Exception:
+        pass  # as for post.set_colors(), ex: a blank image has no palette
+
+
+def previous_approach(s3_client, native, thumbnails, stage):
+    with stage('decode'):
+        image = native.readonly_image.copy()
+    with stage('thumbnails'):
+        for cache in thumbnails:
+            image.thumbnail(cache.image_size.max_dimensions, resample=PIL.Image.LANCZOS)
+            cache.set_image(image)
+    with stage('upload'):
+        if native.is_synced is False:
+            native.flush()
+        for cache in thumbnails:
+            cache.flush()
+    with stage('height & width'):
+        native.readonly_image.size
+    with stage('colors'):
+        get_palette(native.readonly_image)
+    with stage('checksum'):
+        s3_client.get_object_checksum(native.s3_path)
+
+
+def pipeline(s3_client, native, thumbnails, stage):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        native_flushed = executor.submit(native.flush) if native.is_synced is False else None
+        with stage('decode'):
+            image = native.get_reduced_image(image_size.K4.max_dimensions)
+        with stage('thumbnails'):
+            for cache in thumbnails:
+                image.thumbnail(cache.image_size.max_dimensions, resample=PIL.Image.LANCZOS)
+                cache.set_image(image)
+        with stage('upload'):
+            CachedImage.flush_many(thumbnails)
+            if native_flushed:
+                native_flushed.result()
+    with stage('height & width'):
+        native.size
+    with stage('colors'):
+        get_palette(thumbnails[2].readonly_image)
+    with stage('checksum'):
+        native.checksum or s3_client.get_object_checksum(native.s3_path)
+
+
+def run(approach, path, latency_ms):
+    "Run in a fresh process, returns the timings of each stage, and the peak RSS before and after in MB"
+    os.environ.update(ENVIRONMENT)
+    timings = {}
+
+    class stage:
+        def __init__(self, name):
+            self.name = name
+
+        def __enter__(self):
+            self.start = time.perf_counter()
+
+        def __exit__(self, *args):
+            timings[self.name] = time.perf_counter() - self.start
+
+    with moto.mock_s3():
+        s3_client = S3Client(BUCKET_NAME, create_bucket=True)
+        is_heic = path.lower().endswith('.heic')
+        native = new_cache(s3_client, image_size.NATIVE)
+        source = new_cache(s3_client, image_size.NATIVE_HEIC) if is_heic else native
+        with open(path, 'rb') as fh:
+            s3_client.put_object(source.s3_path, fh.read(), source.content_type)
+        thumbnails = [new_cache(s3_client, size) for size in THUMBNAIL_SIZES]
+        if latency_ms:
+            s3_client.boto_client.meta.events.register(
+                'before-send', lambda **kwargs: time.sleep(latency_ms / 1000)
+            )
+            s3_client.s3.meta.client.meta.events.register(
+                'before-send', lambda **kwargs: time.sleep(latency_ms / 1000)
+            )
+
+        base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        with stage('read'):
+            source.refresh()
+        if is_heic:
+            # as done by process_image_upload, HEIC can't be draft decoded
+            with stage('heic decode'):
+                native.set_image(source.readonly_image)
+        globals()[approach](s3_client, native, thumbnails, stage)
+        timings['total'] = time.perf_counter() - start
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return timings, base_rss / 1024, peak_rss / 1024
+
+
+def main():
+    paths, synthetic_mp, latency_ms = parse_args()
+    if synthetic_mp:
+        synthetic_path = f'/tmp/benchmark-{synthetic_mp}mp.jpg'
+        if not os.path.exists(synthetic_path):
+            write_synthetic_jpeg(synthetic_mp, synthetic_path)
+        paths = paths + [synthetic_path]
+
+    ctx = multiprocessing.get_context('spawn')
+    for path in paths:
+        print(f'{os.path.basename(path)} ({os.path.getsize(path) / 1e6:.1f}MB):')
+        for approach in ('previous_approach', 'pipeline'):
+            with ctx.Pool(1) as pool:
+                timings, base_rss_mb, peak_rss_mb = pool.apply(run, (approach, path, latency_ms))
+            stages = ', '.join(f'{name} {secs * 1000:.0f}ms' for name, secs in timings.items())
+            rss = f'peak RSS {peak_rss_mb:.0f}MB, {base_rss_mb:.0f}MB before reading the image'
+            print(f'  {approach.replace("_", " ")}: {stages}, {rss}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Benchmark constructing Post models from stored post items, as PostManager.init_post does.
+
+Reports the time and the memory allocated per Post, both for construction alone - all most
+stream handlers and resolvers need - and for construction followed by access to every one of
+the post's cached images, which is what construction used to cost when they were built eagerly.
+Each run is in a fresh process, and the memory is measured in a separate pass from the time as
+tracemalloc slows allocations down.
+"""
+
+import argparse
+import gc
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+import moto
+import pendulum
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+from app import clients, models  # noqa E402
+from app.models.post.enums import PostStatus, PostType  # noqa E402
+
+ENVIRONMENT = {
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+}
+CACHE_ATTRS = (
+    'native_heic_cache',
+    'native_jpeg_cache',
+    'k4_jpeg_cache',
+    'p1080_jpeg_cache',
+    'p480_jpeg_cache',
+    'p64_jpeg_cache',
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark constructing Post models")
+    parser.add_argument('-n', dest='post_count', type=int, default=100_000, help='number of posts to construct')
+    args = parser.parse_args()
+    return args.post_count
+
+
+def generate_post_items(count):
+    "Stored post items, 80% image posts, 10% text-only and 10% video"
+    posted_at = pendulum.now('utc').to_iso8601_string()
+    user_ids = [str(uuid.uuid4()) for _ in range(100)]
+    post_types = [PostType.IMAGE] * 8 + [PostType.TEXT_ONLY, PostType.VIDEO]
+    for idx in range(count):
+        post_id, user_id = str(uuid.uuid4()), user_ids[idx % len(user_ids)]
+        post_type = post_types[idx % len(post_types)]
+        item = {
+            'partitionKey': f'post/{post_id}',
+            'sortKey': '-',
+            'schemaVersion': 3,
+            'gsiA2PartitionKey': f'post/{user_id}',
+            'gsiA2SortKey': f'{PostStatus.COMPLETED}/{posted_at}',
+            'postId': post_id,
+            'postedAt': posted_at,
+            'postedByUserId': user_id,
+            'postType': post_type,
+            'postStatus': PostStatus.COMPLETED,
+        }
+        if post_type == PostType.TEXT_ONLY:
+            item['text'] = 'lore ipsum dolor sit amet'
+        yield item
+
+
+def construct(post_manager, items, access_caches):
+    posts = [post_manager.init_post(item) for item in items]
+    if access_caches:
+        for post in posts:
+            for attr in CACHE_ATTRS:
+                getattr(post, attr, None)
+    return posts
+
+
+def run(post_count, access_caches, measure_memory):
+    "Run in a fresh process, returns the seconds or the bytes allocated per post"
+    os.environ.update(ENVIRONMENT)
+    with moto.mock_s3(), moto.mock_dynamodb2():
+        post_manager = models.PostManager(
+            {
+                'dynamo': clients.DynamoClient(table_name='main-table'),
+                's3_uploads': clients.S3Client('uploads-bucket', create_bucket=True),
+            }
+        )
+        items = list(generate_post_items(post_count))
+        gc.collect()
+        if measure_memory:
+            tracemalloc.start()
+            posts = construct(post_manager, items, access_caches)
+            allocated, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return allocated / len(posts)
+        start = time.perf_counter()
+        posts = construct(post_manager, items, access_caches)
+        return (time.perf_counter() - start) / len(posts)
+
+
+def main():
+    post_count = parse_args()
+    ctx = multiprocessing.get_context('spawn')
+    print(f'Constructing {post_count} posts:')
+    for label, access_caches in (('construct', False), ('construct, then access all cached images', True)):
+        with ctx.Pool(1) as pool:
+            seconds = pool.apply(run, (post_count, access_caches, False))
+        with ctx.Pool(1) as pool:
+            allocated = pool.apply(run, (post_count, access_caches, True))
+        print(f'  {label}: {seconds * 1e6:.1f}us and {allocated:.0f} bytes per post')
+
+
+if __name__ == '__main__':
+    main()
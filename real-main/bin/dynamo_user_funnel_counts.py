@@ -7,7 +7,7 @@ import pprint
 import boto3
 import dotenv
 import pendulum
-from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.conditions import Key
 
 dotenv.load_dotenv()
 
@@ -32,21 +32,18 @@ def parse_args():
 
 def generate_users(table, signed_up_date):
     "A generator that generates all users that signed up on the given date"
-    # TODO: add an index to the user item, change this from a scan to a query
     kwargs = {
-        'ProjectionExpression': 'userId',
-        'FilterExpression': (
-            Key('partitionKey').begins_with('user/')
-            & Attr('signedUpAt').between(signed_up_date, signed_up_date + 'T24')
-        ),
+        'ProjectionExpression': 'partitionKey',
+        'KeyConditionExpression': Key('gsiK3PartitionKey').eq(f'userSignedUp/{signed_up_date}'),
+        'IndexName': 'GSI-K3',
     }
     last_key = False
     while last_key is not None:
         if last_key:
             kwargs['ExclusiveStartKey'] = last_key
-        resp = table.scan(**kwargs)
+        resp = table.query(**kwargs)
         for item in resp['Items']:
-            yield item
+            yield {'userId': item['partitionKey'].split('/')[1]}
         last_key = resp.get('LastEvaluatedKey')
 
 
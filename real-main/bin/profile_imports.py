@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Profile the import of each lambda entry point module, as reported by `python -X importtime`.
+
+Each entry point is imported in a fresh interpreter. Reported per entry point are the total import
+time, the top-level packages that took the most time to import, and optionally the slowest modules.
+
+With a budget, exits with an error if any entry point takes longer than that to import, or imports
+any of the modules that are deferred until first use.
+"""
+
+import argparse
+import collections
+import os
+import subprocess
+import sys
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+ROOT_PATH = os.path.dirname(os.path.dirname(SCRIPT_PATH))
+
+ENVIRONMENT = {
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_XRAY_SDK_ENABLED': 'false',
+}
+
+# the modules the lambda handlers in serverless.yml are found in
+ENTRY_POINTS = (
+    'app.handlers.api',
+    'app.handlers.appsync',
+    'app.handlers.cognito',
+    'app.handlers.cron',
+    'app.handlers.dynamo.handlers',
+    'app.handlers.s3',
+)
+
+# slow to import and only needed by some invocations, so imported on first use
+DEFERRED_PACKAGES = ('PIL', 'colorthief', 'cryptography', 'google.auth', 'google.oauth2', 'gql', 'jwt', 'pyheif')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Profile the import time of the lambda entry points")
+    parser.add_argument(
+        'entry_points', nargs='*', choices=[[], *ENTRY_POINTS], help='entry point modules. Default: all of them'
+    )
+    parser.add_argument(
+        '-r', dest='runs', type=int, default=3, help='runs per entry point, the fastest is reported'
+    )
+    parser.add_argument('-p', dest='packages', type=int, default=10, help='slowest top-level packages to report')
+    parser.add_argument('-m', dest='modules', type=int, default=0, help='slowest modules to report, by self time')
+    parser.add_argument(
+        '-b',
+        dest='budget_ms',
+        type=float,
+        help='fail if an entry point imports slower, or imports a deferred module',
+    )
+    args = parser.parse_args()
+    return args.entry_points or list(ENTRY_POINTS), args
+
+
+def profile_import(module_name):
+    "Import the module in a fresh interpreter. Returns a list of (module name, self us, cumulative us)"
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        cwd=ROOT_PATH,
+        env={**os.environ, **ENVIRONMENT},
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise Exception(f'Failed to import `{module_name}`:\n{proc.stderr}')
+
+    # lines look like: 'import time:       193 |        434 |   botocore.vendored'
+    timings = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('imported package'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:') :].split('|')
+        timings.append((name.strip(), int(self_us), int(cumulative_us)))
+    return timings
+
+
+def is_deferred(name):
+    return any(name == package or name.startswith(package + '.') for package in DEFERRED_PACKAGES)
+
+
+def main():
+    entry_points, args = parse_args()
+    over_budget = []
+    for entry_point in entry_points:
+        # the first run is not reported, it may be compiling .pyc files
+        profile_import(entry_point)
+        timings = min((profile_import(entry_point) for _ in range(args.runs)), key=lambda t: sum(x[1] for x in t))
+        total_ms = sum(self_us for _, self_us, _ in timings) / 1000
+        print(f'{entry_point}: {total_ms:.0f}ms, {len(timings)} modules')
+
+        by_package = collections.Counter()
+        for name, self_us, _ in timings:
+            by_package[name.split('.')[0]] += self_us
+        for package, self_us in by_package.most_common(args.packages):
+            print(f'  {self_us / 1000:8.1f}ms  {package}')
+        if args.modules:
+            print('  slowest modules:')
+            for name, self_us, cumulative_us in sorted(timings, key=lambda t: -t[1])[: args.modules]:
+                print(f'  {self_us / 1000:8.1f}ms  {name} (cumulative {cumulative_us / 1000:.1f}ms)')
+
+        if args.budget_ms is not None:
+            deferred = sorted({name for name, _, _ in timings if is_deferred(name)})
+            if deferred:
+                over_budget.append(f'`{entry_point}` imports deferred modules: {", ".join(deferred)}')
+            if total_ms > args.budget_ms:
+                over_budget.append(
+                    f'`{entry_point}` took {total_ms:.0f}ms to import, over {args.budget_ms:.0f}ms'
+                )
+
+    if over_budget:
+        print('\n'.join(['Import budget exceeded:', *over_budget]), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
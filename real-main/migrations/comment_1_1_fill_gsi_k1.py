@@ -0,0 +1,77 @@
+import logging
+import os
+import zlib
+
+import boto3
+
+logger = logging.getLogger()
+
+DYNAMO_TABLE = os.environ.get('DYNAMO_TABLE')
+# must match the model's index_shard_count
+INDEX_SHARD_COUNT = 16
+
+
+class Migration:
+    """
+    For all comments, fill in Comment.gsiK1PartitionKey and Comment.gsiK1SortKey to index them by shard,
+    for bad words review. Comments indexed under the earlier, unsharded, partition key are moved to their shard.
+    """
+
+    def __init__(self, dynamo_client, dynamo_table):
+        self.dynamo_client = dynamo_client
+        self.dynamo_table = dynamo_table
+
+    def run(self):
+        for comment in self.generate_all_comments_to_migrate():
+            self.migrate_comment(comment)
+
+    def generate_all_comments_to_migrate(self):
+        scan_kwargs = {
+            'FilterExpression': ' AND '.join(
+                [
+                    'begins_with(partitionKey, :pk_prefix)',
+                    'sortKey = :sk',
+                    '(attribute_not_exists(gsiK1PartitionKey) OR gsiK1PartitionKey = :unsharded_pk)',
+                ]
+            ),
+            'ExpressionAttributeValues': {
+                ':unsharded_pk': 'commentBadWordsReview',
+                ':pk_prefix': 'comment/',
+                ':sk': '-',
+            },
+        }
+        while True:
+            paginated = self.dynamo_table.scan(**scan_kwargs)
+            for item in paginated['Items']:
+                yield item
+            if 'LastEvaluatedKey' not in paginated:
+                break
+            scan_kwargs['ExclusiveStartKey'] = paginated['LastEvaluatedKey']
+
+    def migrate_comment(self, comment):
+        comment_id = comment['commentId']
+        logger.warning(f'Comment `{comment_id}`: filling GSI-K1')
+        kwargs = {
+            'Key': {'partitionKey': f'comment/{comment_id}', 'sortKey': '-'},
+            'UpdateExpression': 'SET gsiK1PartitionKey = :gsik1pk, gsiK1SortKey = :gsik1sk',
+            'ConditionExpression': (
+                'attribute_exists(partitionKey) AND '
+                '(attribute_not_exists(gsiK1PartitionKey) OR gsiK1PartitionKey = :unsharded_pk)'
+            ),
+            'ExpressionAttributeValues': {
+                ':gsik1pk': f'commentShard/{zlib.crc32(comment_id.encode()) % INDEX_SHARD_COUNT}',
+                ':unsharded_pk': 'commentBadWordsReview',
+                ':gsik1sk': comment['commentedAt'],
+            },
+        }
+        self.dynamo_table.update_item(**kwargs)
+
+
+if __name__ == '__main__':
+    assert DYNAMO_TABLE, 'Must set env variable DYNAMO_TABLE to dynamo table name'
+
+    dynamo_client = boto3.client('dynamodb')
+    dynamo_table = boto3.resource('dynamodb').Table(DYNAMO_TABLE)
+
+    migration = Migration(dynamo_client, dynamo_table)
+    migration.run()
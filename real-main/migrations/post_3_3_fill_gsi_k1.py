@@ -0,0 +1,89 @@
+import logging
+import os
+
+import boto3
+import pendulum
+
+logger = logging.getLogger()
+
+DYNAMO_TABLE = os.environ.get('DYNAMO_TABLE')
+
+
+class Migration:
+    """
+    For posts that expire, fill in any missing Post.gsiK1PartitionKey and Post.gsiK1SortKey.
+
+    The expired posts cron only looks back so many days in that index, so the oldest day any post has
+    already expired on is recorded for the cron to sweep back to, once.
+    """
+
+    def __init__(self, dynamo_client, dynamo_table):
+        self.dynamo_client = dynamo_client
+        self.dynamo_table = dynamo_table
+
+    def run(self):
+        today = pendulum.now('utc').date()
+        oldest_expired_date = None
+        for post in self.generate_all_expiring_posts():
+            if 'gsiK1PartitionKey' not in post:
+                self.migrate_post(post)
+            expired_date = pendulum.parse(post['expiresAt']).date()
+            if expired_date < today and (oldest_expired_date is None or expired_date < oldest_expired_date):
+                oldest_expired_date = expired_date
+        if oldest_expired_date:
+            self.record_expired_sweep_from_date(oldest_expired_date)
+
+    def generate_all_expiring_posts(self):
+        scan_kwargs = {
+            'FilterExpression': ' AND '.join(
+                ['begins_with(partitionKey, :pk_prefix)', 'sortKey = :sk', 'attribute_exists(expiresAt)']
+            ),
+            'ExpressionAttributeValues': {':pk_prefix': 'post/', ':sk': '-'},
+        }
+        while True:
+            paginated = self.dynamo_table.scan(**scan_kwargs)
+            for item in paginated['Items']:
+                yield item
+            if 'LastEvaluatedKey' not in paginated:
+                break
+            scan_kwargs['ExclusiveStartKey'] = paginated['LastEvaluatedKey']
+
+    def migrate_post(self, post):
+        post_id = post['postId']
+        logger.warning(f'Post `{post_id}`: filling GSI-K1')
+        expires_at = pendulum.parse(post['expiresAt'])
+        kwargs = {
+            'Key': {'partitionKey': f'post/{post_id}', 'sortKey': '-'},
+            'UpdateExpression': 'SET gsiK1PartitionKey = :gsik1pk, gsiK1SortKey = :gsik1sk',
+            'ConditionExpression': 'expiresAt = :ea AND attribute_not_exists(gsiK1PartitionKey)',
+            'ExpressionAttributeValues': {
+                ':ea': post['expiresAt'],
+                ':gsik1pk': f'post/{expires_at.date()}',
+                ':gsik1sk': str(expires_at.time()),
+            },
+        }
+        self.dynamo_table.update_item(**kwargs)
+
+    def record_expired_sweep_from_date(self, date):
+        "Same item as PostDynamo.expired_sweep_pk(). Only ever moves the date further back."
+        kwargs = {
+            'Key': {'partitionKey': 'post/expired', 'sortKey': 'sweep'},
+            'UpdateExpression': 'SET schemaVersion = :zero, sweepFromDate = :date',
+            'ConditionExpression': 'attribute_not_exists(sweepFromDate) OR sweepFromDate > :date',
+            'ExpressionAttributeValues': {':zero': 0, ':date': str(date)},
+        }
+        try:
+            self.dynamo_table.update_item(**kwargs)
+        except self.dynamo_client.exceptions.ConditionalCheckFailedException:
+            return
+        logger.warning(f'Expired posts: to be swept back to `{date}`')
+
+
+if __name__ == '__main__':
+    assert DYNAMO_TABLE, 'Must set env variable DYNAMO_TABLE to dynamo table name'
+
+    dynamo_client = boto3.client('dynamodb')
+    dynamo_table = boto3.resource('dynamodb').Table(DYNAMO_TABLE)
+
+    migration = Migration(dynamo_client, dynamo_table)
+    migration.run()
@@ -0,0 +1,66 @@
+import logging
+import os
+
+import boto3
+import pendulum
+
+logger = logging.getLogger()
+
+DYNAMO_TABLE = os.environ.get('DYNAMO_TABLE')
+
+
+class Migration:
+    "For all profile items, fill in User.gsiK3PartitionKey and User.gsiK3SortKey from User.signedUpAt"
+
+    def __init__(self, dynamo_client, dynamo_table):
+        self.dynamo_client = dynamo_client
+        self.dynamo_table = dynamo_table
+
+    def run(self):
+        for user in self.generate_all_users_to_migrate():
+            self.migrate_user(user)
+
+    def generate_all_users_to_migrate(self):
+        scan_kwargs = {
+            'FilterExpression': ' AND '.join(
+                [
+                    'begins_with(partitionKey, :pk_prefix)',
+                    'sortKey = :sk',
+                    'attribute_exists(signedUpAt)',
+                    'attribute_not_exists(gsiK3PartitionKey)',
+                ]
+            ),
+            'ExpressionAttributeValues': {':pk_prefix': 'user/', ':sk': 'profile'},
+        }
+        while True:
+            paginated = self.dynamo_table.scan(**scan_kwargs)
+            for item in paginated['Items']:
+                yield item
+            if 'LastEvaluatedKey' not in paginated:
+                break
+            scan_kwargs['ExclusiveStartKey'] = paginated['LastEvaluatedKey']
+
+    def migrate_user(self, user):
+        user_id = user['userId']
+        logger.warning(f'User `{user_id}`: filling GSI-K3')
+        signed_up_at = pendulum.parse(user['signedUpAt'])
+        kwargs = {
+            'Key': {'partitionKey': f'user/{user_id}', 'sortKey': 'profile'},
+            'UpdateExpression': 'SET gsiK3PartitionKey = :gsik3pk, gsiK3SortKey = :gsik3sk',
+            'ConditionExpression': 'attribute_exists(partitionKey) AND attribute_not_exists(gsiK3PartitionKey)',
+            'ExpressionAttributeValues': {
+                ':gsik3pk': f'userSignedUp/{signed_up_at.to_date_string()}',
+                ':gsik3sk': signed_up_at.int_timestamp,
+            },
+        }
+        self.dynamo_table.update_item(**kwargs)
+
+
+if __name__ == '__main__':
+    assert DYNAMO_TABLE, 'Must set env variable DYNAMO_TABLE to dynamo table name'
+
+    dynamo_client = boto3.client('dynamodb')
+    dynamo_table = boto3.resource('dynamodb').Table(DYNAMO_TABLE)
+
+    migration = Migration(dynamo_client, dynamo_table)
+    migration.run()
@@ -0,0 +1,116 @@
+import logging
+import zlib
+from uuid import uuid4
+
+import pendulum
+import pytest
+
+from migrations.chat_message_1_0_fill_gsi_k1 import Migration
+
+
+def shard_pk(message_id):
+    return f'chatMessageShard/{zlib.crc32(message_id.encode()) % 16}'
+
+
+def chat_message_item(user_id=None):
+    message_id, chat_id = str(uuid4()), str(uuid4())
+    created_at_str = pendulum.now('utc').to_iso8601_string()
+    item = {
+        'partitionKey': f'chatMessage/{message_id}',
+        'sortKey': '-',
+        'schemaVersion': 1,
+        'gsiA1PartitionKey': f'chatMessage/{chat_id}',
+        'gsiA1SortKey': created_at_str,
+        'messageId': message_id,
+        'chatId': chat_id,
+        'createdAt': created_at_str,
+        'text': 'lore',
+        'textTags': [],
+    }
+    if user_id:
+        item['userId'] = user_id
+    return item
+
+
+@pytest.fixture
+def distractions(dynamo_table):
+    already_migrated = chat_message_item(user_id=str(uuid4()))
+    already_migrated['gsiK1PartitionKey'] = shard_pk(already_migrated['messageId'])
+    already_migrated['gsiK1SortKey'] = already_migrated['createdAt']
+    items = [
+        chat_message_item(),  # system message
+        already_migrated,
+        {**chat_message_item(user_id=str(uuid4())), 'sortKey': 'flag/uid'},
+    ]
+    for item in items:
+        dynamo_table.put_item(Item=item)
+    yield items
+
+
+@pytest.fixture
+def chat_message(dynamo_table):
+    item = chat_message_item(user_id=str(uuid4()))
+    dynamo_table.put_item(Item=item)
+    yield item
+
+
+chat_message1 = chat_message
+chat_message2 = chat_message
+
+
+@pytest.fixture
+def unsharded_chat_message(dynamo_table):
+    "Indexed under the partition key used before the index was sharded"
+    item = chat_message_item(user_id=str(uuid4()))
+    item['gsiK1PartitionKey'] = 'chatMessageBadWordsReview'
+    item['gsiK1SortKey'] = item['createdAt']
+    dynamo_table.put_item(Item=item)
+    yield item
+
+
+@pytest.fixture
+def chat_messages(chat_message1, chat_message2, unsharded_chat_message):
+    yield [chat_message1, chat_message2, unsharded_chat_message]
+
+
+def test_nothing_to_migrate(dynamo_client, dynamo_table, caplog, distractions):
+    keys = [{k: item[k] for k in ('partitionKey', 'sortKey')} for item in distractions]
+
+    # do the migration
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 0
+
+    # verify state has not changed
+    for key, item in zip(keys, distractions):
+        assert dynamo_table.get_item(Key=key)['Item'] == item
+
+
+def test_migrate_multiple(dynamo_client, dynamo_table, caplog, chat_messages):
+    keys = [{k: message[k] for k in ('partitionKey', 'sortKey')} for message in chat_messages]
+    new_messages = [
+        {**message, 'gsiK1PartitionKey': shard_pk(message['messageId']), 'gsiK1SortKey': message['createdAt']}
+        for message in chat_messages
+    ]
+
+    # do the migration
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 3
+    assert all('filling GSI-K1' in str(rec) for rec in caplog.records)
+    for message in chat_messages:
+        assert sum(message['messageId'] in str(rec) for rec in caplog.records) == 1
+
+    # verify final state
+    for key, new_message in zip(keys, new_messages):
+        assert dynamo_table.get_item(Key=key)['Item'] == new_message
+
+    # migrate again, verify no affect
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 0
+    for key, new_message in zip(keys, new_messages):
+        assert dynamo_table.get_item(Key=key)['Item'] == new_message
@@ -0,0 +1,116 @@
+import logging
+import zlib
+from uuid import uuid4
+
+import pendulum
+import pytest
+
+from migrations.comment_1_1_fill_gsi_k1 import Migration
+
+
+def shard_pk(comment_id):
+    return f'commentShard/{zlib.crc32(comment_id.encode()) % 16}'
+
+
+@pytest.fixture
+def distractions(dynamo_table):
+    comment_id, commented_at_str = str(uuid4()), pendulum.now('utc').to_iso8601_string()
+    items = [
+        {'partitionKey': f'comment/{comment_id}', 'sortKey': 'flag/uid', 'commentedAt': commented_at_str},
+        {'partitionKey': f'post/{comment_id}', 'sortKey': '-', 'commentedAt': commented_at_str},
+        {  # already migrated
+            'partitionKey': f'comment/{comment_id}',
+            'sortKey': '-',
+            'commentId': comment_id,
+            'commentedAt': commented_at_str,
+            'gsiK1PartitionKey': shard_pk(comment_id),
+            'gsiK1SortKey': commented_at_str,
+        },
+    ]
+    for item in items:
+        dynamo_table.put_item(Item=item)
+    yield items
+
+
+@pytest.fixture
+def comment(dynamo_table):
+    comment_id, post_id, user_id = str(uuid4()), str(uuid4()), str(uuid4())
+    commented_at_str = pendulum.now('utc').to_iso8601_string()
+    item = {
+        'partitionKey': f'comment/{comment_id}',
+        'sortKey': '-',
+        'schemaVersion': 1,
+        'gsiA1PartitionKey': f'comment/{post_id}',
+        'gsiA1SortKey': commented_at_str,
+        'gsiA2PartitionKey': f'comment/{user_id}',
+        'gsiA2SortKey': commented_at_str,
+        'commentId': comment_id,
+        'postId': post_id,
+        'userId': user_id,
+        'commentedAt': commented_at_str,
+        'text': 'lore',
+        'textTags': [],
+    }
+    dynamo_table.put_item(Item=item)
+    yield item
+
+
+comment1 = comment
+comment2 = comment
+comment3 = comment
+
+
+@pytest.fixture
+def unsharded_comment(dynamo_table, comment3):
+    "Indexed under the partition key used before the index was sharded"
+    item = {**comment3, 'gsiK1PartitionKey': 'commentBadWordsReview', 'gsiK1SortKey': comment3['commentedAt']}
+    dynamo_table.put_item(Item=item)
+    yield item
+
+
+@pytest.fixture
+def comments(comment1, comment2, unsharded_comment):
+    yield [comment1, comment2, unsharded_comment]
+
+
+def test_nothing_to_migrate(dynamo_client, dynamo_table, caplog, distractions):
+    keys = [{k: item[k] for k in ('partitionKey', 'sortKey')} for item in distractions]
+
+    # do the migration
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 0
+
+    # verify state has not changed
+    for key, item in zip(keys, distractions):
+        assert dynamo_table.get_item(Key=key)['Item'] == item
+
+
+def test_migrate_multiple(dynamo_client, dynamo_table, caplog, comments):
+    keys = [{k: comment[k] for k in ('partitionKey', 'sortKey')} for comment in comments]
+    new_comments = [
+        {**comment, 'gsiK1PartitionKey': shard_pk(comment['commentId']), 'gsiK1SortKey': comment['commentedAt']}
+        for comment in comments
+    ]
+
+    # do the migration
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 3
+    assert all('filling GSI-K1' in str(rec) for rec in caplog.records)
+    for comment in comments:
+        assert sum(comment['commentId'] in str(rec) for rec in caplog.records) == 1
+
+    # verify final state
+    for key, new_comment in zip(keys, new_comments):
+        assert dynamo_table.get_item(Key=key)['Item'] == new_comment
+
+    # migrate again, verify no affect
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 0
+    for key, new_comment in zip(keys, new_comments):
+        assert dynamo_table.get_item(Key=key)['Item'] == new_comment
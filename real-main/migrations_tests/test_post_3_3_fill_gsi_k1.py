@@ -0,0 +1,157 @@
+import logging
+from random import randrange
+from uuid import uuid4
+
+import pendulum
+import pytest
+
+from migrations.post_3_3_fill_gsi_k1 import Migration
+
+
+def post_item(expires_at=None):
+    post_id, user_id = str(uuid4()), str(uuid4())
+    item = {
+        'partitionKey': f'post/{post_id}',
+        'sortKey': '-',
+        'schemaVersion': 3,
+        'postId': post_id,
+        'postedByUserId': user_id,
+        'postStatus': 'COMPLETED',
+    }
+    if expires_at:
+        item['expiresAt'] = expires_at.to_iso8601_string()
+    return item
+
+
+@pytest.fixture
+def distractions(dynamo_table):
+    expires_at = pendulum.parse('2020-06-08T23:59:59.123456Z')
+    items = [
+        post_item(),  # doesn't expire
+        {  # already migrated
+            **post_item(expires_at=expires_at),
+            'gsiK1PartitionKey': 'post/2020-06-08',
+            'gsiK1SortKey': '23:59:59.123456',
+        },
+        {**post_item(expires_at=expires_at), 'sortKey': 'image'},
+    ]
+    for item in items:
+        dynamo_table.put_item(Item=item)
+    yield items
+
+
+@pytest.fixture
+def post(dynamo_table):
+    item = post_item(expires_at=pendulum.now('utc') + pendulum.duration(hours=randrange(100)))
+    dynamo_table.put_item(Item=item)
+    yield item
+
+
+post1 = post
+post2 = post
+post3 = post
+
+
+@pytest.fixture
+def posts(post1, post2, post3):
+    yield [post1, post2, post3]
+
+
+def test_nothing_to_migrate(dynamo_client, dynamo_table, caplog, distractions):
+    keys = [{k: item[k] for k in ('partitionKey', 'sortKey')} for item in distractions]
+
+    # do the migration
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    # the already-migrated post has expired, so is only recorded to be swept
+    assert len(caplog.records) == 1
+    assert 'swept back to `2020-06-08`' in str(caplog.records[0])
+
+    # verify state has not changed
+    for key, item in zip(keys, distractions):
+        assert dynamo_table.get_item(Key=key)['Item'] == item
+
+
+def test_migrate_one(dynamo_client, dynamo_table, caplog):
+    item = post_item(expires_at=pendulum.parse('2020-06-08T23:59:59.123456Z'))
+    dynamo_table.put_item(Item=item)
+    key = {k: item[k] for k in ('partitionKey', 'sortKey')}
+
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 2
+    assert item['postId'] in str(caplog.records[0])
+    assert 'swept back to `2020-06-08`' in str(caplog.records[1])
+
+    # same as PostDynamo fills them in
+    assert dynamo_table.get_item(Key=key)['Item'] == {
+        **item,
+        'gsiK1PartitionKey': 'post/2020-06-08',
+        'gsiK1SortKey': '23:59:59.123456',
+    }
+
+
+def test_migrate_multiple(dynamo_client, dynamo_table, caplog, posts):
+    keys = [{k: post[k] for k in ('partitionKey', 'sortKey')} for post in posts]
+    new_posts = []
+    for post in posts:
+        expires_at = pendulum.parse(post['expiresAt'])
+        gsi_k1 = {'gsiK1PartitionKey': f'post/{expires_at.date()}', 'gsiK1SortKey': str(expires_at.time())}
+        new_posts.append({**post, **gsi_k1})
+
+    # do the migration
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 3
+    assert all('filling GSI-K1' in str(rec) for rec in caplog.records)
+    for post in posts:
+        assert sum(post['postId'] in str(rec) for rec in caplog.records) == 1
+
+    # verify final state
+    for key, new_post in zip(keys, new_posts):
+        assert dynamo_table.get_item(Key=key)['Item'] == new_post
+
+    # migrate again, verify no affect
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 0
+    for key, new_post in zip(keys, new_posts):
+        assert dynamo_table.get_item(Key=key)['Item'] == new_post
+
+
+def test_records_oldest_expired_date(dynamo_client, dynamo_table, caplog, post):
+    sweep_key = {'partitionKey': 'post/expired', 'sortKey': 'sweep'}
+    items = [
+        {  # already migrated, but the oldest
+            **post_item(expires_at=pendulum.parse('2020-06-08T23:59:59.123456Z')),
+            'gsiK1PartitionKey': 'post/2020-06-08',
+            'gsiK1SortKey': '23:59:59.123456',
+        },
+        post_item(expires_at=pendulum.parse('2020-07-01T12:00:00Z')),
+    ]
+    for item in items:
+        dynamo_table.put_item(Item=item)
+
+    # posts that have yet to expire don't count
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 3
+    assert '2020-06-08' in str(caplog.records[-1])
+    assert dynamo_table.get_item(Key=sweep_key)['Item'] == {
+        **sweep_key,
+        'schemaVersion': 0,
+        'sweepFromDate': '2020-06-08',
+    }
+
+    # migrate again, the recorded date is not moved forward
+    caplog.clear()
+    dynamo_table.delete_item(Key={k: items[0][k] for k in ('partitionKey', 'sortKey')})
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 0
+    assert dynamo_table.get_item(Key=sweep_key)['Item']['sweepFromDate'] == '2020-06-08'
@@ -0,0 +1,119 @@
+import logging
+from uuid import uuid4
+
+import pendulum
+import pytest
+
+from migrations.user_12_3_fill_gsi_k3 import Migration
+
+
+def user_item(signed_up_at):
+    user_id = str(uuid4())
+    return {
+        'partitionKey': f'user/{user_id}',
+        'sortKey': 'profile',
+        'schemaVersion': 11,
+        'userId': user_id,
+        'username': user_id[:8],
+        'signedUpAt': signed_up_at.to_iso8601_string(),
+    }
+
+
+@pytest.fixture
+def distractions(dynamo_table):
+    signed_up_at = pendulum.parse('2020-06-08T12:34:56Z')
+    items = [
+        {**user_item(signed_up_at), 'sortKey': 'trending'},
+        {  # already migrated
+            **user_item(signed_up_at),
+            'gsiK3PartitionKey': 'userSignedUp/2020-06-08',
+            'gsiK3SortKey': signed_up_at.int_timestamp,
+        },
+        {k: v for k, v in user_item(signed_up_at).items() if k != 'signedUpAt'},
+    ]
+    for item in items:
+        dynamo_table.put_item(Item=item)
+    yield items
+
+
+@pytest.fixture
+def user(dynamo_table):
+    item = user_item(pendulum.now('utc'))
+    dynamo_table.put_item(Item=item)
+    yield item
+
+
+user1 = user
+user2 = user
+user3 = user
+
+
+@pytest.fixture
+def users(user1, user2, user3):
+    yield [user1, user2, user3]
+
+
+def test_nothing_to_migrate(dynamo_client, dynamo_table, caplog, distractions):
+    keys = [{k: item[k] for k in ('partitionKey', 'sortKey')} for item in distractions]
+
+    # do the migration
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 0
+
+    # verify state has not changed
+    for key, item in zip(keys, distractions):
+        assert dynamo_table.get_item(Key=key)['Item'] == item
+
+
+def test_migrate_one(dynamo_client, dynamo_table, caplog):
+    item = user_item(pendulum.parse('2020-06-08T23:59:59.123456Z'))
+    dynamo_table.put_item(Item=item)
+    key = {k: item[k] for k in ('partitionKey', 'sortKey')}
+
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 1
+    assert item['userId'] in str(caplog.records[0])
+
+    # same as UserDynamo fills them in
+    assert dynamo_table.get_item(Key=key)['Item'] == {
+        **item,
+        'gsiK3PartitionKey': 'userSignedUp/2020-06-08',
+        'gsiK3SortKey': 1591660799,
+    }
+
+
+def test_migrate_multiple(dynamo_client, dynamo_table, caplog, users):
+    keys = [{k: user[k] for k in ('partitionKey', 'sortKey')} for user in users]
+    new_users = []
+    for user in users:
+        signed_up_at = pendulum.parse(user['signedUpAt'])
+        gsi_k3 = {
+            'gsiK3PartitionKey': f'userSignedUp/{signed_up_at.to_date_string()}',
+            'gsiK3SortKey': signed_up_at.int_timestamp,
+        }
+        new_users.append({**user, **gsi_k3})
+
+    # do the migration
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 3
+    assert all('filling GSI-K3' in str(rec) for rec in caplog.records)
+    for user in users:
+        assert sum(user['userId'] in str(rec) for rec in caplog.records) == 1
+
+    # verify final state
+    for key, new_user in zip(keys, new_users):
+        assert dynamo_table.get_item(Key=key)['Item'] == new_user
+
+    # migrate again, verify no affect
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 0
+    for key, new_user in zip(keys, new_users):
+        assert dynamo_table.get_item(Key=key)['Item'] == new_user